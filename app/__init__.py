@@ -33,6 +33,8 @@ def create_app() -> Flask:
         DEBUG=os.getenv("DEBUG", "1") in ("1", "true", "True"),
         VERSION=os.getenv("APP_VERSION", "0.1.0"),
         TZ=os.getenv("TZ", "Asia/Tokyo"),
+        JOBS_INLINE=os.getenv("JOBS_INLINE", "0") in ("1", "true", "True"),
+        SQL_REPEAT_THRESHOLD=int(os.getenv("SQL_REPEAT_THRESHOLD", "10")),
     )
 
     # config.py があれば上書き
@@ -43,6 +45,8 @@ def create_app() -> Flask:
             DEBUG=getattr(settings, "DEBUG", app.config["DEBUG"]),
             VERSION=getattr(settings, "VERSION", app.config["VERSION"]),
             TZ=getattr(settings, "TZ", app.config["TZ"]),
+            JOBS_INLINE=getattr(settings, "JOBS_INLINE", app.config["JOBS_INLINE"]),
+            SQL_REPEAT_THRESHOLD=getattr(settings, "SQL_REPEAT_THRESHOLD", app.config["SQL_REPEAT_THRESHOLD"]),
         )
     except Exception:
         # 存在しない場合は無視
@@ -55,6 +59,21 @@ def create_app() -> Flask:
     except Exception:
         pass
 
+    # リクエストごとの処理時間・SQL実行回数をJSONログに出力
+    try:
+        from .utils.request_metrics import init_request_metrics
+        from .db import engine
+        init_request_metrics(app, engine)
+    except Exception as e:
+        print(f"⚠️ リクエスト計測の初期化エラー: {e}")
+
+    # システム管理者が _profile=1 を付けたリクエストを cProfile で計測
+    try:
+        from .utils.request_profiler import init_request_profiler
+        init_request_profiler(app)
+    except Exception as e:
+        print(f"⚠️ プロファイラの初期化エラー: {e}")
+
     # CSRF トークンをテンプレートで使えるようにする
     @app.context_processor
     def inject_csrf():
@@ -175,10 +194,18 @@ def create_app() -> Flask:
             (models_property.TGenkashokaku, 'T_減価償却'),
             (models_property.TSimulation, 'T_シミュレーション'),
             (models_property.TSimulationResult, 'T_シミュレーション結果'),
+            (models_property.TSimulationSummary, 'T_シミュレーション指標'),
             (models_property.TBukkenKeihi, 'T_物件経費'),
             (models_property.THeyaKeihi, 'T_部屋経費'),
             (models_property.TLoanCondition, 'T_ローン条件'),
             (models_property.TLoanInterestSchedule, 'T_ローン金利スケジュール'),
+            (models_property.TSearchIndex, 'T_検索インデックス'),
+            (models_property.TPropertySummary, 'T_物件集計'),
+            (models_property.TRenewalTask, 'T_更新タスク'),
+            (models_property.TOccupancyMonthly, 'T_月次稼働'),
+            (models_property.TOccupancyMonthlyProperty, 'T_月次稼働_物件'),
+            (models_property.TJob, 'T_ジョブ'),
+            (models_property.TJobFile, 'T_ジョブファイル'),
         ]
         
         auto_migrate_all(engine, migration_targets)
@@ -188,6 +215,35 @@ def create_app() -> Flask:
         import traceback
         traceback.print_exc()
 
+    # 横断検索の準備（PostgreSQL: pg_trgm / SQLite: FTS5、導入直後は既存データを登録）
+    try:
+        from .utils.global_search import setup_search_backend
+        from .db import engine
+        backend = setup_search_backend(engine)
+        print(f"✅ 検索インデックス準備完了（{backend}）")
+    except Exception as e:
+        print(f"⚠️ 検索インデックス準備エラー: {e}")
+
+    # 物件集計の準備（導入直後は既存の物件・部屋・契約から作成）
+    try:
+        from .utils.property_summary import ensure_property_summaries
+        from .db import engine
+        count = ensure_property_summaries(engine)
+        if count:
+            print(f"✅ 物件集計を作成しました（{count}件）")
+    except Exception as e:
+        print(f"⚠️ 物件集計準備エラー: {e}")
+
+    # 月次稼働の準備（導入直後は既存の契約から作成）
+    try:
+        from .utils.occupancy_history import ensure_occupancy_history
+        from .db import engine
+        count = ensure_occupancy_history(engine)
+        if count:
+            print(f"✅ 月次稼働を作成しました（{count}件）")
+    except Exception as e:
+        print(f"⚠️ 月次稼働準備エラー: {e}")
+
     # blueprints 登録
     try:
         from .blueprints.health import bp as health_bp  # type: ignore
@@ -10,6 +10,7 @@ from app.models_login import TKanrisha, TJugyoin, TTenant, TTenpo, TKanrishaTenp
 from sqlalchemy import func, and_, or_
 from ..utils.decorators import ROLES
 from ..utils.decorators import require_roles
+from ..utils.employee_directory import list_employees
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -414,36 +415,29 @@ def employees():
         # 店舗情報を取得
         store = db.query(TTenpo).filter(TTenpo.id == store_id).first()
         
-        # 店舗に紐づく従業員を取得
-        employee_relations = db.query(TJugyoinTenpo).filter(
-            TJugyoinTenpo.store_id == store_id
-        ).all()
+        # 店舗に紐づく従業員を所属店舗付きで取得
+        search = request.args.get('q', '').strip()
+        page = list_employees(
+            db,
+            store_id=store_id,
+            search=search,
+            after_id=request.args.get('after', type=int)
+        )
         
         employees_data = []
-        for rel in employee_relations:
-            employee = db.query(TJugyoin).filter(TJugyoin.id == rel.employee_id).first()
-            if employee:
-                # 所属店舗を取得
-                employee_stores = db.query(TTenpo).join(
-                    TJugyoinTenpo, TTenpo.id == TJugyoinTenpo.store_id
-                ).filter(
-                    TJugyoinTenpo.employee_id == employee.id
-                ).all()
-                
-                stores_list = [{'id': s.id, 'name': s.名称} for s in employee_stores]
-                
-                employees_data.append({
-                    'id': employee.id,
-                    'login_id': employee.login_id,
-                    'name': employee.name,
-                    'email': employee.email,
-                    'active': employee.active,
-                    'created_at': employee.created_at.strftime('%Y-%m-%d %H:%M:%S') if employee.created_at else '-',
-                    'updated_at': employee.updated_at.strftime('%Y-%m-%d %H:%M:%S') if employee.updated_at else None,
-                    'stores': stores_list
-                })
-        
-        return render_template('admin_employees.html', employees=employees_data, tenant=tenant, store=store)
+        for employee in page['employees']:
+            employees_data.append(dict(
+                employee,
+                created_at=employee['created_at'].strftime('%Y-%m-%d %H:%M:%S') if employee['created_at'] else '-',
+                updated_at=employee['updated_at'].strftime('%Y-%m-%d %H:%M:%S') if employee['updated_at'] else None
+            ))
+        
+        return render_template('admin_employees.html',
+                             employees=employees_data,
+                             next_cursor=page['next_cursor'],
+                             search=search,
+                             tenant=tenant,
+                             store=store)
     finally:
         db.close()
 
@@ -1,4 +1,7 @@
-from flask import Blueprint, jsonify, current_app
+import hmac
+import os
+
+from flask import Blueprint, jsonify, current_app, request, Response
 
 bp = Blueprint("health", __name__)
 
@@ -13,3 +16,51 @@ def healthz():
         env=current_app.config.get("ENVIRONMENT"),
         version=current_app.config.get("VERSION"),
     )
+
+@bp.get("/metrics")
+def metrics():
+    """
+    全ワーカープロセスの集計値をPrometheusのテキスト形式で返します。
+    環境変数 METRICS_TOKEN を設定した場合は Authorization: Bearer <トークン> が必要です。
+    """
+    from ..db import engine, SessionLocal
+    from ..utils.metrics import collect, flush, render_prometheus, update_pool_gauges, job_queue_depth
+
+    token = os.getenv("METRICS_TOKEN")
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return Response("unauthorized\n", status=401, mimetype="text/plain")
+
+    update_pool_gauges(engine)
+    try:
+        flush()
+    except OSError:
+        pass
+    counters, histograms, gauges = collect()
+
+    # ジョブキューの件数はDB全体の値のため、プロセスごとに合算せずここで取得する
+    db = SessionLocal()
+    try:
+        for status, count in job_queue_depth(db).items():
+            gauges[("job_queue_jobs", (("status", status),))] = count
+    except Exception:
+        current_app.logger.exception("ジョブキューの件数を取得できませんでした")
+    finally:
+        db.close()
+
+    return Response(render_prometheus(counters, histograms, gauges),
+                    mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+@bp.get("/readyz")
+def readyz():
+    """
+    リクエストを受けられる状態かを返します（ロードバランサーのレディネスチェック用）。
+    DBへの接続・スキーマが最新か・コネクションプールの空きを確認し、それぞれの所要時間を返します。
+    準備ができていない場合は 503 を返します。結果は数秒間キャッシュします。
+    """
+    from ..db import engine, Base
+    from ..utils.readiness import get_readiness
+
+    result = get_readiness(engine, Base.metadata)
+    return jsonify(
+        dict(result, env=current_app.config.get("ENVIRONMENT"), version=current_app.config.get("VERSION"))
+    ), (200 if result["ok"] else 503)
@@ -2,12 +2,19 @@
 """
 不動産管理アプリのBlueprint
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from sqlalchemy import select, update, delete, and_
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, Response, current_app
+from sqlalchemy import select, update, delete, insert, and_, case, func
+import time
 from datetime import datetime, date
 from decimal import Decimal
 from app.db import SessionLocal
-from app.models_property import TBukken, THeya, TNyukyosha, TKeiyaku, TYachinShushi, TGenkashokaku, TSimulation, TSimulationResult, TBukkenKeihi, THeyaKeihi, TLoanCondition, TLoanInterestSchedule
+from app.utils.simulation_hash import mark_simulations_stale
+from app.utils.simulation_kernel import calculate_loan_payment, calculate_progressive_tax, run_simulation_kernel, SIMULATION_RESULT_COLUMNS
+from app.utils.simulation_monthly import merge_room_contracts, run_monthly_simulation
+from app.utils.global_search import global_search
+from app.utils.property_summary import SUMMARY_COLUMNS, occupancy_rate
+from app.utils.list_api import parse_list_args, search_condition, keyset_page, aggregate_totals, list_response, link_params, json_value, serialize_rows
+from app.models_property import TBukken, THeya, TNyukyosha, TKeiyaku, TYachinShushi, TGenkashokaku, TSimulation, TSimulationResult, TSimulationSummary, TBukkenKeihi, THeyaKeihi, TLoanCondition, TLoanInterestSchedule, TPropertySummary, TRenewalTask
 
 property_bp = Blueprint('property', __name__, url_prefix='/property')
 
@@ -38,68 +45,246 @@ def index():
     db = SessionLocal()
     tenant_id = session.get('tenant_id')
     
-    # 統計情報を取得
-    properties_count = db.execute(
-        select(TBukken).where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
-    ).scalars().all()
-    
-    rooms_count = 0
-    vacant_rooms_count = 0
-    occupied_rooms_count = 0
-    
-    for prop in properties_count:
-        rooms = db.execute(
-            select(THeya).where(THeya.property_id == prop.id, THeya.有効 == 1)
-        ).scalars().all()
-        rooms_count += len(rooms)
-        vacant_rooms_count += sum(1 for r in rooms if r.入居状況 == '空室')
-        occupied_rooms_count += sum(1 for r in rooms if r.入居状況 == '入居中')
+    # 統計情報を取得（部屋・契約は物件集計から1クエリで合計）
+    stats = db.execute(
+        select(
+            func.count(TBukken.id),
+            func.coalesce(func.sum(TPropertySummary.部屋数), 0),
+            func.coalesce(func.sum(TPropertySummary.空室数), 0),
+            func.coalesce(func.sum(TPropertySummary.入居中部屋数), 0),
+            func.coalesce(func.sum(TPropertySummary.契約中件数), 0),
+        )
+        .select_from(TBukken)
+        .outerjoin(TPropertySummary, TPropertySummary.物件id == TBukken.id)
+        .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+    ).one()
+    properties_count, rooms_count, vacant_rooms_count, occupied_rooms_count, contracts_count = stats
     
     tenants_count = db.execute(
-        select(TNyukyosha).where(TNyukyosha.tenant_id == tenant_id, TNyukyosha.有効 == 1)
-    ).scalars().all()
-    
-    contracts_count = db.execute(
-        select(TKeiyaku).where(TKeiyaku.契約状況 == '契約中')
-    ).scalars().all()
-    
-    # 契約中の契約のみをフィルタリング（テナントIDで絞り込み）
-    active_contracts = []
-    for contract in contracts_count:
-        room = db.execute(
-            select(THeya).where(THeya.id == contract.room_id)
-        ).scalar_one_or_none()
-        if room:
-            prop = db.execute(
-                select(TBukken).where(TBukken.id == room.property_id, TBukken.tenant_id == tenant_id)
-            ).scalar_one_or_none()
-            if prop:
-                active_contracts.append(contract)
+        select(func.count()).select_from(TNyukyosha).where(TNyukyosha.tenant_id == tenant_id, TNyukyosha.有効 == 1)
+    ).scalar_one()
+    db.close()
     
     return render_template('property_dashboard.html',
-                         properties_count=len(properties_count),
+                         properties_count=properties_count,
                          rooms_count=rooms_count,
                          vacant_rooms_count=vacant_rooms_count,
                          occupied_rooms_count=occupied_rooms_count,
-                         tenants_count=len(tenants_count),
-                         contracts_count=len(active_contracts))
+                         tenants_count=tenants_count,
+                         contracts_count=contracts_count)
+
+
+# ==================== 横断検索 ====================
+
+@property_bp.route('/search')
+@require_tenant_admin
+def search():
+    """物件・部屋・入居者・契約の横断検索（format=json でJSONを返す）"""
+    query = request.args.get('q', '').strip()
+    db = SessionLocal()
+    try:
+        result = global_search(db, session.get('tenant_id'), query)
+    finally:
+        db.close()
+    
+    if request.args.get('format') == 'json':
+        endpoints = {
+            '物件': ('property.property_detail', 'id'),
+            '部屋': ('property.room_detail', 'id'),
+            '入居者': ('property.tenant_detail', 'id'),
+            '契約': ('property.contract_detail', 'id'),
+        }
+        for kind, items in result['groups'].items():
+            endpoint, key = endpoints[kind]
+            for item in items:
+                item['url'] = url_for(endpoint, **{key: item['id']})
+        return jsonify(result)
+    
+    return render_template('property_search.html', result=result, query=query)
+
+
+# ==================== 一括取込 ====================
+
+@property_bp.route('/import', methods=['GET', 'POST'])
+@require_tenant_admin
+def bulk_import():
+    """物件・部屋・入居者・契約のCSV / Excel一括取込（登録はジョブで実行。検証のみはこの場で実行）"""
+    from app.utils.bulk_import import IMPORT_TARGETS, import_columns, import_rows, iter_file_rows, openpyxl
+    
+    result = None
+    target = request.form.get('target') or request.args.get('target') or '物件'
+    if target not in IMPORT_TARGETS:
+        target = '物件'
+    
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        dry_run = request.form.get('dry_run') == '1'
+        if not upload or not upload.filename:
+            flash('ファイルを選択してください', 'warning')
+        elif not dry_run:
+            # 登録はジョブとして実行（数万行の取込でリクエストがタイムアウトしないように）
+            db = SessionLocal()
+            job = _submit_job(db, '一括取込', {'target': target, 'filename': upload.filename},
+                              file=(upload.filename, upload.read()))
+            db.close()
+            return _job_redirect(job, f'{target}の一括取込')
+        else:
+            # 検証のみは登録しないため、エラーの一覧をこの画面に表示できるようその場で実行
+            db = SessionLocal()
+            try:
+                result = import_rows(
+                    db, session.get('tenant_id'), target,
+                    iter_file_rows(upload.stream, upload.filename), dry_run=True
+                )
+            finally:
+                db.rollback()
+                db.close()
+            
+            if result['aborted']:
+                flash('ファイルを最後まで読み込めませんでした', 'danger')
+            else:
+                flash(f'検証のみ実行しました: {result["valid"]}件が登録可能、{result["error_count"]}件がエラーです', 'info')
+    
+    return render_template('property_import.html',
+                         targets=list(IMPORT_TARGETS),
+                         target=target,
+                         columns=import_columns(target),
+                         excel_available=openpyxl is not None,
+                         result=result)
+
+
+@property_bp.route('/import/template/<target>')
+@require_tenant_admin
+def bulk_import_template(target):
+    """取込用CSVのひな形（ヘッダー行のみ、Excelで開けるBOM付きUTF-8）"""
+    from urllib.parse import quote
+    from app.utils.bulk_import import IMPORT_TARGETS, template_csv
+    
+    if target not in IMPORT_TARGETS:
+        flash('取込対象が正しくありません', 'danger')
+        return redirect(url_for('property.bulk_import'))
+    
+    filename = quote(f'{target}_取込.csv')
+    return Response(
+        '\ufeff' + template_csv(target),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f"attachment; filename*=UTF-8''{filename}"}
+    )
+
+
+# ==================== エクスポート ====================
+
+@property_bp.route('/export')
+@require_tenant_admin
+def export_index():
+    """エクスポートするテーブルと形式の選択"""
+    from app.utils.data_export import EXPORT_TABLES, pyarrow
+    
+    return render_template('property_export.html',
+                         tables=list(EXPORT_TABLES),
+                         parquet_available=pyarrow is not None)
+
+
+@property_bp.route('/export/<table>/<export_format>')
+@require_tenant_admin
+def export_download(table, export_format):
+    """テナントのデータをストリーミングでダウンロード（csv / jsonl / columnar / parquet）"""
+    from urllib.parse import quote
+    from app.utils.data_export import EXPORT_FORMATS, export_stream
+    
+    try:
+        stream = export_stream(table, session.get('tenant_id'), export_format)
+    except ValueError as e:
+        flash(str(e), 'danger')
+        return redirect(url_for('property.export_index'))
+    
+    content_type, extension = EXPORT_FORMATS[export_format]
+    filename = quote(f'{table}_{date.today().strftime("%Y%m%d")}.{extension}')
+    return Response(
+        stream,
+        content_type=content_type,
+        headers={
+            'Content-Disposition': f"attachment; filename*=UTF-8''{filename}",
+            'X-Accel-Buffering': 'no',
+        }
+    )
 
 
 # ==================== 物件管理 ====================
 
+PROPERTY_SORT_COLUMNS = {
+    'created_at': TBukken.created_at,
+    'name': TBukken.物件名,
+    'price': TBukken.取得価額,
+    'rooms': TPropertySummary.部屋数,
+    'occupancy': TPropertySummary.稼働率,
+    'vacant': TPropertySummary.空室数,
+}
+PROPERTY_LIST_COLUMNS = ['id', '物件名', '物件種別', '住所', '構造', '階数', '部屋数', '取得価額', '取得年月日', 'created_at']
+
+
 @property_bp.route('/properties')
 @require_tenant_admin
 def properties():
-    """物件一覧"""
+    """物件一覧（検索・並び替え・キーセットページング / format=json でJSONを返す）"""
     db = SessionLocal()
     tenant_id = session.get('tenant_id')
+    args = parse_list_args(request.args, PROPERTY_SORT_COLUMNS, 'created_at')
     
-    properties = db.execute(
-        select(TBukken).where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
-        .order_by(TBukken.created_at.desc())
+    # 物件集計を結合して1物件1行で取得
+    query = (
+        select(TBukken, TPropertySummary)
+        .outerjoin(TPropertySummary, TPropertySummary.物件id == TBukken.id)
+        .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+    )
+    condition = search_condition(args['q'], TBukken.物件名, TBukken.住所)
+    if condition is not None:
+        query = query.where(condition)
+    property_type = request.args.get('type')
+    if property_type:
+        query = query.where(TBukken.物件種別 == property_type)
+    
+    sort_column = PROPERTY_SORT_COLUMNS[args['sort']]
+    sort_entity = 1 if sort_column.class_ is TPropertySummary else 0
+    page = keyset_page(db, query, sort_column, TBukken.id, args['order'], args['cursor'], args['limit'],
+                       sort_key=lambda row: (getattr(row[sort_entity], sort_column.key, None), row[0].id))
+    properties = [row[0] for row in page['rows']]
+    summaries = {row[0].id: row[1] for row in page['rows'] if row[1] is not None}
+    totals = aggregate_totals(
+        db, query,
+        件数=func.count(),
+        部屋数合計=func.coalesce(func.sum(TPropertySummary.部屋数), 0),
+        空室数合計=func.coalesce(func.sum(TPropertySummary.空室数), 0),
+        入居中部屋数合計=func.coalesce(func.sum(TPropertySummary.入居中部屋数), 0),
+        契約賃料合計=func.coalesce(func.sum(TPropertySummary.契約賃料), 0),
+        取得価額合計=func.coalesce(func.sum(TBukken.取得価額), 0),
+    )
+    totals['稼働率'] = occupancy_rate(totals['部屋数合計'], totals['入居中部屋数合計'])
+    
+    if args['format'] == 'json':
+        items = serialize_rows(properties, PROPERTY_LIST_COLUMNS)
+        for item in items:
+            summary = summaries.get(item['id'])
+            item['集計'] = serialize_rows([summary], SUMMARY_COLUMNS)[0] if summary else None
+        body = list_response(items, page, totals, args)
+        db.close()
+        return jsonify(body)
+    
+    property_types = db.execute(
+        select(TBukken.物件種別).where(
+            TBukken.tenant_id == tenant_id, TBukken.有効 == 1, TBukken.物件種別.isnot(None)
+        ).distinct().order_by(TBukken.物件種別)
     ).scalars().all()
     
-    return render_template('property_properties.html', properties=properties)
+    db.close()
+    return render_template('property_properties.html',
+                         properties=properties,
+                         summaries=summaries,
+                         property_types=property_types,
+                         totals=totals,
+                         next_cursor=page['next_cursor'],
+                         list_args=args,
+                         params=link_params(request.args))
 
 
 @property_bp.route('/properties/new', methods=['GET', 'POST'])
@@ -240,6 +425,7 @@ def property_delete(id):
     
     property_data.有効 = 0
     property_data.updated_at = datetime.now()
+    mark_simulations_stale(db, property_data.id)
     db.commit()
     
     flash('物件を削除しました', 'success')
@@ -279,6 +465,8 @@ def room_new(property_id):
         )
         
         db.add(room_data)
+        if room_data.賃料:
+            mark_simulations_stale(db, property_id)
         db.commit()
         
         flash('部屋を登録しました', 'success')
@@ -345,6 +533,7 @@ def room_edit(id):
         return redirect(url_for('property.properties'))
     
     if request.method == 'POST':
+        previous_rent = room.賃料
         room.部屋番号 = request.form.get('部屋番号')
         room.間取り = request.form.get('間取り')
         room.専有面積 = Decimal(request.form.get('専有面積')) if request.form.get('専有面積') else None
@@ -356,6 +545,10 @@ def room_edit(id):
         room.備考 = request.form.get('備考')
         room.updated_at = datetime.now()
         
+        # 賃料が変わった場合は関連シミュレーションを要再計算にする
+        if room.賃料 != previous_rent:
+            mark_simulations_stale(db, room.property_id)
+        
         db.commit()
         
         flash('部屋を更新しました', 'success')
@@ -390,6 +583,7 @@ def room_delete(id):
     
     room.有効 = 0
     room.updated_at = datetime.now()
+    mark_simulations_stale(db, room.property_id)
     db.commit()
     
     flash('部屋を削除しました', 'success')
@@ -398,19 +592,44 @@ def room_delete(id):
 
 # ==================== 入居者管理 ====================
 
+TENANT_SORT_COLUMNS = {
+    'created_at': TNyukyosha.created_at,
+    'name': TNyukyosha.氏名,
+    'kana': TNyukyosha.フリガナ,
+}
+TENANT_LIST_COLUMNS = ['id', '氏名', 'フリガナ', '電話番号', 'メールアドレス', 'created_at']
+
+
 @property_bp.route('/tenants')
 @require_tenant_admin
 def tenants():
-    """入居者一覧"""
+    """入居者一覧（検索・並び替え・キーセットページング / format=json でJSONを返す）"""
     db = SessionLocal()
     tenant_id = session.get('tenant_id')
+    args = parse_list_args(request.args, TENANT_SORT_COLUMNS, 'created_at')
     
-    tenants = db.execute(
-        select(TNyukyosha).where(TNyukyosha.tenant_id == tenant_id, TNyukyosha.有効 == 1)
-        .order_by(TNyukyosha.created_at.desc())
-    ).scalars().all()
+    query = select(TNyukyosha).where(TNyukyosha.tenant_id == tenant_id, TNyukyosha.有効 == 1)
+    condition = search_condition(
+        args['q'], TNyukyosha.氏名, TNyukyosha.フリガナ, TNyukyosha.電話番号, TNyukyosha.メールアドレス
+    )
+    if condition is not None:
+        query = query.where(condition)
+    
+    page = keyset_page(db, query, TENANT_SORT_COLUMNS[args['sort']], TNyukyosha.id,
+                       args['order'], args['cursor'], args['limit'])
+    tenants = [row[0] for row in page['rows']]
+    totals = aggregate_totals(db, query, 件数=func.count())
+    db.close()
+    
+    if args['format'] == 'json':
+        return jsonify(list_response(tenants, page, totals, args, TENANT_LIST_COLUMNS))
     
-    return render_template('property_tenants.html', tenants=tenants)
+    return render_template('property_tenants.html',
+                         tenants=tenants,
+                         totals=totals,
+                         next_cursor=page['next_cursor'],
+                         list_args=args,
+                         params=link_params(request.args))
 
 
 @property_bp.route('/tenants/new', methods=['GET', 'POST'])
@@ -591,6 +810,7 @@ def contract_new():
         if room:
             room.入居状況 = '入居中'
             room.updated_at = datetime.now()
+            mark_simulations_stale(db, room.property_id)
         
         db.commit()
         
@@ -712,6 +932,7 @@ def contract_edit(id):
         contract.礼金 = Decimal(request.form.get('礼金')) if request.form.get('礼金') else None
         contract.備考 = request.form.get('備考')
         contract.updated_at = datetime.now()
+        mark_simulations_stale(db, property_data.id)
         
         db.commit()
         
@@ -761,6 +982,7 @@ def contract_terminate(id):
     # 部屋の入居状況を更新
     room.入居状況 = '空室'
     room.updated_at = datetime.now()
+    mark_simulations_stale(db, property_data.id)
     
     db.commit()
     
@@ -768,6 +990,299 @@ def contract_terminate(id):
     return redirect(url_for('property.contracts'))
 
 
+@property_bp.route('/contracts/renewals', methods=['GET', 'POST'])
+@require_tenant_admin
+def contract_renewals():
+    """満了が近い契約と更新タスク（POSTでこのテナントの契約満了スキャンを実行 / format=json でJSONを返す）"""
+    from app.utils.contract_lifecycle import RENEWAL_NOTICE_DAYS, build_digests
+    
+    db = SessionLocal()
+    tenant_id = session.get('tenant_id')
+    try:
+        days = max(1, min(int(request.values.get('days', RENEWAL_NOTICE_DAYS)), 365))
+    except (TypeError, ValueError):
+        days = RENEWAL_NOTICE_DAYS
+    
+    if request.method == 'POST':
+        job = _submit_job(db, '契約満了スキャン', {'days': days})
+        db.close()
+        if job['状況'] == '完了':
+            result = job['結果']
+            flash(f"契約満了スキャンを実行しました（満了 {result['expired']}件 / 空室化 {result['vacated']}部屋 / "
+                  f"入居中化 {result['occupied']}部屋 / 更新タスク作成 {result['tasks_created']}件）", 'success')
+            return redirect(url_for('property.contract_renewals', days=days))
+        return _job_redirect(job, '契約満了スキャン')
+    
+    today = date.today()
+    digest = build_digests(db, today, days, tenant_id).get(tenant_id) or {
+        'tenant_id': tenant_id, '満了': 0, '更新期限間近': [], '未対応タスク': 0, '月額賃料合計': 0
+    }
+    db.close()
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'date': today.isoformat(),
+            'days': days,
+            'digest': dict(digest, 更新期限間近=[
+                {key: json_value(value) for key, value in item.items()} for item in digest['更新期限間近']
+            ], 月額賃料合計=json_value(digest['月額賃料合計'])),
+        })
+    
+    return render_template('property_contract_renewals.html', digest=digest, days=days, today=today)
+
+
+@property_bp.route('/renewal-tasks/<int:id>/done', methods=['POST'])
+@require_tenant_admin
+def renewal_task_done(id):
+    """更新タスクを対応済みにする"""
+    db = SessionLocal()
+    task = db.execute(
+        select(TRenewalTask).where(TRenewalTask.id == id, TRenewalTask.tenant_id == session.get('tenant_id'))
+    ).scalar_one_or_none()
+    
+    if not task:
+        db.close()
+        flash('更新タスクが見つかりません', 'danger')
+        return redirect(url_for('property.contract_renewals'))
+    
+    task.状況 = '対応済'
+    task.備考 = request.form.get('備考') or task.備考
+    db.commit()
+    db.close()
+    
+    flash('更新タスクを対応済みにしました', 'success')
+    return redirect(url_for('property.contract_renewals', days=request.form.get('days')))
+
+
+# ==================== 稼働分析 ====================
+
+@property_bp.route('/occupancy')
+@require_tenant_admin
+def occupancy_analytics():
+    """稼働率・空室損失の月次推移と物件別の空室損失（format=json でJSONを返す）"""
+    from app.utils.occupancy_history import monthly_occupancy, vacancy_loss_by_property, trailing_months
+    
+    db = SessionLocal()
+    tenant_id = session.get('tenant_id')
+    property_id = request.args.get('property_id', type=int)
+    try:
+        years = max(1, min(int(request.args.get('years', 10)), 30))
+    except (TypeError, ValueError):
+        years = 10
+    first_month, last_month = trailing_months(years * 12)
+    
+    monthly = monthly_occupancy(db, tenant_id, property_id, first_month, last_month)
+    # 物件別の空室損失は直近12か月
+    loss_first_month, loss_last_month = trailing_months(12)
+    losses = vacancy_loss_by_property(db, tenant_id, loss_first_month, loss_last_month)
+    properties_list = db.execute(
+        select(TBukken.id, TBukken.物件名)
+        .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+        .order_by(TBukken.物件名)
+    ).all()
+    db.close()
+    
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'property_id': property_id,
+            'first_month': first_month,
+            'last_month': last_month,
+            'monthly': [{key: json_value(value) for key, value in row.items()} for row in monthly],
+            'vacancy_loss': [{key: json_value(value) for key, value in row.items()} for row in losses],
+        })
+    
+    chart = {
+        'months': [row['年月'] for row in monthly],
+        'rates': [json_value(row['稼働率']) for row in monthly],
+        'losses': [json_value(row['空室損失']) for row in monthly],
+    }
+    return render_template('property_occupancy.html',
+                         monthly=monthly,
+                         chart=chart,
+                         losses=losses,
+                         properties=properties_list,
+                         property_id=property_id,
+                         years=years,
+                         loss_period=(loss_first_month, loss_last_month))
+
+
+@property_bp.route('/occupancy/rebuild', methods=['POST'])
+@require_tenant_admin
+def occupancy_rebuild():
+    """テナントの月次稼働を契約から作り直す（ジョブとして実行）"""
+    db = SessionLocal()
+    job = _submit_job(db, '月次稼働再集計')
+    db.close()
+    
+    if job['状況'] == '完了':
+        flash(f"月次稼働を再集計しました（{job['結果']['件数']:,}件）", 'success')
+        return redirect(url_for('property.occupancy_analytics'))
+    return _job_redirect(job, '月次稼働の再集計')
+
+
+@property_bp.route('/expenses/rollup')
+@require_tenant_admin
+def expense_rollup():
+    """経費集計（カテゴリ × 月/年 × 物件/部屋）。format=json / csv で全集計行を返す"""
+    import csv
+    import io
+    from urllib.parse import quote
+    from app.utils.expense_rollup import ROLLUP_COLUMNS, get_expense_rollup, year_period, pivot
+
+    export_format = request.args.get('format')
+    year = _requested_year(date.today().year)
+    if year is None:
+        message = f'対象年は{REPORT_YEAR_MIN}〜{REPORT_YEAR_MAX}年で指定してください'
+        if export_format == 'json':
+            return jsonify({'error': message}), 400
+        flash(message, 'danger')
+        return redirect(url_for('property.expense_rollup'))
+
+    db = SessionLocal()
+    tenant_id = session.get('tenant_id')
+    property_id = request.args.get('property_id', type=int)
+    start, end = year_period(year)
+
+    rollup = get_expense_rollup(db, tenant_id, start, end)
+    property_names = dict(db.execute(
+        select(TBukken.id, TBukken.物件名).where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+    ).all())
+    room_ids = {row['部屋id'] for row in rollup['levels']['部屋'] if row['部屋id'] is not None}
+    room_numbers = dict(db.execute(
+        select(THeya.id, THeya.部屋番号).where(THeya.id.in_(room_ids))
+    ).all()) if room_ids else {}
+    db.close()
+
+    if export_format in ('json', 'csv'):
+        rows = [
+            dict(row, 物件名=property_names.get(row['物件id']), 部屋番号=room_numbers.get(row['部屋id']))
+            for row in rollup['rows']
+        ]
+        if export_format == 'json':
+            return jsonify({
+                'year': year,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'items': [{key: json_value(value) for key, value in row.items()} for row in rows],
+            })
+        columns = ROLLUP_COLUMNS[:2] + ['物件名'] + ROLLUP_COLUMNS[2:3] + ['部屋番号'] + ROLLUP_COLUMNS[3:]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        writer.writerows([row[column] for column in columns] for row in rows)
+        filename = quote(f'経費集計_{year}.csv')
+        return Response(
+            '\ufeff' + buffer.getvalue(),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f"attachment; filename*=UTF-8''{filename}"}
+        )
+
+    total = rollup['levels']['合計'][0] if rollup['levels']['合計'] else {'件数': 0, '金額': 0}
+    categories = [row['経費カテゴリ'] for row in sorted(rollup['levels']['カテゴリ'], key=lambda row: -row['金額'])]
+    property_rows = [
+        {'物件id': row['物件id'], '物件名': property_names.get(row['物件id']), '件数': row['件数'], '合計': row['金額']}
+        for row in sorted(rollup['levels']['物件'], key=lambda row: -row['金額'])
+    ]
+    room_rows = []
+    if property_id:
+        room_rows = [
+            {'部屋id': row['部屋id'], '部屋番号': room_numbers.get(row['部屋id']), '件数': row['件数'], '合計': row['金額']}
+            for row in sorted(rollup['levels']['部屋'], key=lambda row: (row['部屋id'] is not None, -row['金額']))
+            if row['物件id'] == property_id
+        ]
+    return render_template('property_expense_rollup.html',
+                         year=year,
+                         years=range(date.today().year, date.today().year - 10, -1),
+                         property_id=property_id,
+                         property_name=property_names.get(property_id),
+                         total=total,
+                         categories=categories,
+                         category_totals=pivot(rollup, 'カテゴリ', '経費カテゴリ', '集計単位'),
+                         property_rows=property_rows,
+                         by_property=pivot(rollup, '物件_カテゴリ', '物件id'),
+                         months=[f'{year}-{month:02d}' for month in range(1, 13)],
+                         by_month=pivot(rollup, 'カテゴリ_月', '年月'),
+                         month_totals=pivot(rollup, '月', '年月', '集計単位'),
+                         room_rows=room_rows,
+                         by_room=pivot(rollup, '部屋_カテゴリ', '部屋id') if property_id else {})
+
+
+# 集計・帳票で指定できる年の範囲
+REPORT_YEAR_MIN = 1900
+REPORT_YEAR_MAX = 2100
+
+
+def _requested_year(default: int):
+    """
+    クエリパラメータ year の年（未指定の場合は default）
+    
+    Returns:
+        int or None: 数値でない・REPORT_YEAR_MIN〜REPORT_YEAR_MAX の範囲外の場合はNone
+    """
+    value = (request.args.get('year') or '').strip()
+    if not value:
+        return default
+    try:
+        year = int(value)
+    except ValueError:
+        return None
+    return year if REPORT_YEAR_MIN <= year <= REPORT_YEAR_MAX else None
+
+
+@property_bp.route('/tax-report')
+@require_tenant_admin
+def tax_report():
+    """収支内訳書（不動産所得用）。format=csv / pdf / json でダウンロード、既定は印刷用の画面"""
+    from urllib.parse import quote
+    from app.utils.tax_report import TAX_REPORT_COLUMNS, build_tax_report, tax_report_csv, tax_report_pdf, weasyprint
+
+    export_format = request.args.get('format')
+    # 既定は確定申告の対象となる前年分
+    year = _requested_year(date.today().year - 1)
+    if year is None:
+        message = f'対象年は{REPORT_YEAR_MIN}〜{REPORT_YEAR_MAX}年で指定してください'
+        if export_format == 'json':
+            return jsonify({'error': message}), 400
+        flash(message, 'danger')
+        return redirect(url_for('property.tax_report'))
+
+    db = SessionLocal()
+    report = build_tax_report(db, session.get('tenant_id'), year)
+    db.close()
+
+    if export_format == 'json':
+        return jsonify({
+            'year': year,
+            'properties': [{key: json_value(row[key]) for key in ['物件id'] + TAX_REPORT_COLUMNS} for row in report['properties']],
+            'total': {key: json_value(report['total'][key]) for key in TAX_REPORT_COLUMNS[2:]},
+            '集計時間ms': report['集計時間ms'],
+        })
+    if export_format == 'csv':
+        filename = quote(f'収支内訳書_{year}.csv')
+        return Response(
+            tax_report_csv(report),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f"attachment; filename*=UTF-8''{filename}"}
+        )
+    if export_format == 'pdf':
+        try:
+            pdf = tax_report_pdf(render_template('property_tax_report_print.html', report=report))
+        except ValueError as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('property.tax_report', year=year))
+        filename = quote(f'収支内訳書_{year}.pdf')
+        return Response(
+            pdf,
+            mimetype='application/pdf',
+            headers={'Content-Disposition': f"attachment; filename*=UTF-8''{filename}"}
+        )
+
+    return render_template('property_tax_report.html',
+                         report=report,
+                         years=range(date.today().year, date.today().year - 10, -1),
+                         pdf_available=weasyprint is not None)
+
+
 # ==================== 減価償却管理 ====================
 
 @property_bp.route('/depreciation')
@@ -796,7 +1311,8 @@ def depreciation():
             'latest_depreciation': latest_dep
         })
     
-    return render_template('property_depreciation.html', depreciation_list=depreciation_list)
+    return render_template('property_depreciation.html', depreciation_list=depreciation_list,
+                         current_year=date.today().year)
 
 
 @property_bp.route('/depreciation/<int:property_id>')
@@ -827,35 +1343,22 @@ def depreciation_detail(property_id):
                          current_year=date.today().year)
 
 
-@property_bp.route('/depreciation/<int:property_id>/calculate', methods=['POST'])
-@require_tenant_admin
-def depreciation_calculate(property_id):
-    """減価償却計算"""
-    db = SessionLocal()
-    tenant_id = session.get('tenant_id')
-    
-    property_data = db.execute(
-        select(TBukken).where(TBukken.id == property_id, TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
-    ).scalar_one_or_none()
-    
-    if not property_data:
-        flash('物件が見つかりません', 'danger')
-        return redirect(url_for('property.depreciation'))
-    
-    # 減価償却の計算に必要な情報を確認
-    if not property_data.取得価額 or not property_data.耐用年数 or not property_data.償却方法:
-        flash('減価償却の計算に必要な情報（取得価額、耐用年数、償却方法）が不足しています', 'danger')
-        return redirect(url_for('property.depreciation_detail', property_id=property_id))
+def calculate_depreciation_year(db, property_data, target_year):
+    """
+    物件の指定年度の減価償却を計算して登録（呼び出し側でcommit）
     
-    # 対象年度を取得（フォームから）
-    target_year = int(request.form.get('target_year', date.today().year))
+    期首帳簿価額は前年度の期末帳簿価額（前年度がない場合は取得価額）を使います。
+    同じ年度の減価償却が登録済みの場合は計算し直して更新します。
     
+    Returns:
+        TGenkashokaku: 登録・更新した減価償却（償却方法が不正な場合はNone）
+    """
     # 前年度の減価償却情報を取得
     prev_dep = db.execute(
         select(TGenkashokaku).where(
-            TGenkashokaku.property_id == property_id,
+            TGenkashokaku.property_id == property_data.id,
             TGenkashokaku.年度 == target_year - 1
-        )
+        ).order_by(TGenkashokaku.id.desc()).limit(1)
     ).scalar_one_or_none()
     
     # 期首帳簿価額を計算
@@ -871,8 +1374,7 @@ def depreciation_calculate(property_id):
         償却率 = Decimal('2.0') / property_data.耐用年数
         償却額 = 期首帳簿価額 * 償却率
     else:
-        flash('償却方法が不正です', 'danger')
-        return redirect(url_for('property.depreciation_detail', property_id=property_id))
+        return None
     
     # 期末帳簿価額を計算
     期末帳簿価額 = 期首帳簿価額 - 償却額
@@ -882,430 +1384,639 @@ def depreciation_calculate(property_id):
         償却額 = 期首帳簿価額 - property_data.残存価額
         期末帳簿価額 = property_data.残存価額
     
-    # 減価償却情報を登録
-    depreciation_data = TGenkashokaku(
-        property_id=property_id,
-        年度=target_year,
-        期首帳簿価額=期首帳簿価額,
-        償却額=償却額,
-        期末帳簿価額=期末帳簿価額
-    )
+    depreciation_data = db.execute(
+        select(TGenkashokaku).where(
+            TGenkashokaku.property_id == property_data.id,
+            TGenkashokaku.年度 == target_year
+        ).order_by(TGenkashokaku.id.desc()).limit(1)
+    ).scalar_one_or_none()
+    if depreciation_data is None:
+        depreciation_data = TGenkashokaku(property_id=property_data.id, 年度=target_year)
+        db.add(depreciation_data)
+    depreciation_data.期首帳簿価額 = 期首帳簿価額
+    depreciation_data.償却額 = 償却額
+    depreciation_data.期末帳簿価額 = 期末帳簿価額
+    db.flush()
+    return depreciation_data
+
+
+@property_bp.route('/depreciation/<int:property_id>/calculate', methods=['POST'])
+@require_tenant_admin
+def depreciation_calculate(property_id):
+    """減価償却計算"""
+    db = SessionLocal()
+    tenant_id = session.get('tenant_id')
     
-    db.add(depreciation_data)
+    property_data = db.execute(
+        select(TBukken).where(TBukken.id == property_id, TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+    ).scalar_one_or_none()
+    
+    if not property_data:
+        flash('物件が見つかりません', 'danger')
+        return redirect(url_for('property.depreciation'))
+    
+    # 減価償却の計算に必要な情報を確認
+    if not property_data.取得価額 or not property_data.耐用年数 or not property_data.償却方法:
+        flash('減価償却の計算に必要な情報（取得価額、耐用年数、償却方法）が不足しています', 'danger')
+        return redirect(url_for('property.depreciation_detail', property_id=property_id))
+    
+    # 対象年度を取得（フォームから）
+    target_year = int(request.form.get('target_year', date.today().year))
+    
+    if calculate_depreciation_year(db, property_data, target_year) is None:
+        db.close()
+        flash('償却方法が不正です', 'danger')
+        return redirect(url_for('property.depreciation_detail', property_id=property_id))
     db.commit()
+    db.close()
     
     flash(f'{target_year}年度の減価償却を計算しました', 'success')
     return redirect(url_for('property.depreciation_detail', property_id=property_id))
 
 
+@property_bp.route('/depreciation/backfill', methods=['POST'])
+@require_tenant_admin
+def depreciation_backfill():
+    """物件の減価償却を取得年度から対象年度まで一括計算（ジョブとして実行）"""
+    try:
+        target_year = int(request.form.get('target_year', date.today().year))
+    except (TypeError, ValueError):
+        target_year = date.today().year
+    payload = {'target_year': target_year}
+    if request.form.get('property_id'):
+        payload['property_id'] = int(request.form['property_id'])
+    
+    db = SessionLocal()
+    job = _submit_job(db, '減価償却計算', payload)
+    db.close()
+    return _job_redirect(job, '減価償却の一括計算')
+
+
 # ==================== シミュレーション ====================
 
-def calculate_loan_payment(principal, annual_rate, years, method='元利均等'):
+def calculate_tax_rate(total_income):
     """
-    ローン返済額を計算（年間）
+    表示用の実効税率を計算（互換性のため残す）
     
     Args:
-        principal: 借入金額（円）
-        annual_rate: 年利（%）
-        years: 返済期間（年）
-        method: 返済方法（'元利均等' or '元金均等'）
+        total_income: 課税所得（円）
     
     Returns:
-        tuple: (年間返済額, 年間元本返済額, 年間利息支払額)
+        実効税率（%）
     """
-    principal = Decimal(str(principal))
-    annual_rate = Decimal(str(annual_rate))
-    years = int(years)
-    
-    if principal <= 0 or years <= 0:
-        return Decimal('0'), Decimal('0'), Decimal('0')
-    
-    annual_principal_payment = Decimal('0')
-    annual_interest_payment = Decimal('0')
-    
-    if method == '元利均等':
-        # 元利均等返済
-        if annual_rate == 0:
-            # 金利0%の場合は単純に元金を分割
-            months = years * 12
-            monthly_payment = principal / months
-            annual_payment = monthly_payment * Decimal('12')
-            annual_principal_payment = annual_payment
-            annual_interest_payment = Decimal('0')
-        else:
-            # 月利を計算
-            monthly_rate = annual_rate / Decimal('100') / Decimal('12')
-            months = years * 12
-            
-            # 元利均等返済の計算式
-            rate_plus_one = Decimal('1') + monthly_rate
-            power_term = rate_plus_one ** months
-            monthly_payment = principal * monthly_rate * power_term / (power_term - Decimal('1'))
-            
-            # 初年度の元本と利息を計算
-            remaining_principal = principal
-            for month in range(12):
-                monthly_interest = remaining_principal * monthly_rate
-                monthly_principal = monthly_payment - monthly_interest
-                annual_principal_payment += monthly_principal
-                annual_interest_payment += monthly_interest
-                remaining_principal -= monthly_principal
-            
-            annual_payment = monthly_payment * Decimal('12')
-        
-    elif method == '元金均等':
-        # 元金均等返済（初年度）
-        months = years * 12
-        monthly_rate = annual_rate / Decimal('100') / Decimal('12')
-        
-        # 毎月の元金返済額
-        monthly_principal = principal / months
-        
-        # 初年度（1～12ヶ月目）の返済額を計算
-        annual_payment = Decimal('0')
-        remaining_principal = principal
-        
-        for month in range(12):
-            # 当月の利息
-            monthly_interest = remaining_principal * monthly_rate
-            # 当月の返済額
-            monthly_payment_amount = monthly_principal + monthly_interest
-            annual_payment += monthly_payment_amount
-            annual_principal_payment += monthly_principal
-            annual_interest_payment += monthly_interest
-            # 残高を更新
-            remaining_principal -= monthly_principal
-    else:
-        annual_payment = Decimal('0')
-        annual_principal_payment = Decimal('0')
-        annual_interest_payment = Decimal('0')
+    total_income = Decimal(str(total_income))
     
-    return annual_payment, annual_principal_payment, annual_interest_payment
+    if total_income <= 0:
+        return Decimal('0')
+    
+    total_tax = calculate_progressive_tax(total_income)
+    effective_rate = (total_tax / total_income) * Decimal('100')
+    
+    return effective_rate
 
 
-def calculate_progressive_tax(total_income):
+def _load_simulation_inputs(simulation, db):
     """
-    超過累進税率による税金計算（所得税+住民税）
+    シミュレーション計算の入力（ローン条件・金利スケジュール・物件の想定賃料・契約）を読み込む
     
-    Args:
-        total_income: 課税所得（円）
+    契約は月次計算の場合のみ読み込みます。
     
     Returns:
-        税金額（円）
+        tuple: (loan_condition, interest_schedules, property_rents, contracts)。対象物件がない場合はNone
+        property_rents は物件集計の [(物件id, 想定賃料), ...]
     """
-    total_income = Decimal(str(total_income))
-    
-    # 所得税の計算（超過累進）
-    income_tax = Decimal('0')
+    tenant_id = simulation.tenant_id
     
-    if total_income <= 0:
-        income_tax = Decimal('0')
-    elif total_income <= 1950000:
-        # 195万円以下: 5%
-        income_tax = total_income * Decimal('0.05')
-    elif total_income <= 3300000:
-        # 195万円超～330万円以下: 195万円まで5%、超過分10%
-        income_tax = Decimal('1950000') * Decimal('0.05') + \
-                     (total_income - Decimal('1950000')) * Decimal('0.10')
-    elif total_income <= 6950000:
-        # 330万円超～695万円以下
-        income_tax = Decimal('1950000') * Decimal('0.05') + \
-                     Decimal('1350000') * Decimal('0.10') + \
-                     (total_income - Decimal('3300000')) * Decimal('0.20')
-    elif total_income <= 9000000:
-        # 695万円超～900万円以下
-        income_tax = Decimal('1950000') * Decimal('0.05') + \
-                     Decimal('1350000') * Decimal('0.10') + \
-                     Decimal('3650000') * Decimal('0.20') + \
-                     (total_income - Decimal('6950000')) * Decimal('0.23')
-    elif total_income <= 18000000:
-        # 900万円超～1,800万円以下
-        income_tax = Decimal('1950000') * Decimal('0.05') + \
-                     Decimal('1350000') * Decimal('0.10') + \
-                     Decimal('3650000') * Decimal('0.20') + \
-                     Decimal('2050000') * Decimal('0.23') + \
-                     (total_income - Decimal('9000000')) * Decimal('0.33')
-    elif total_income <= 40000000:
-        # 1,800万円超～4,000万円以下
-        income_tax = Decimal('1950000') * Decimal('0.05') + \
-                     Decimal('1350000') * Decimal('0.10') + \
-                     Decimal('3650000') * Decimal('0.20') + \
-                     Decimal('2050000') * Decimal('0.23') + \
-                     Decimal('9000000') * Decimal('0.33') + \
-                     (total_income - Decimal('18000000')) * Decimal('0.40')
-    else:
-        # 4,000万円超
-        income_tax = Decimal('1950000') * Decimal('0.05') + \
-                     Decimal('1350000') * Decimal('0.10') + \
-                     Decimal('3650000') * Decimal('0.20') + \
-                     Decimal('2050000') * Decimal('0.23') + \
-                     Decimal('9000000') * Decimal('0.33') + \
-                     Decimal('22000000') * Decimal('0.40') + \
-                     (total_income - Decimal('40000000')) * Decimal('0.45')
-    
-    # 住民税の計算（一律10%）
-    if total_income > 0:
-        resident_tax = total_income * Decimal('0.10')
-    else:
-        resident_tax = Decimal('0')
+    loan_condition = None
+    interest_schedules = []
+    if simulation.ローン計算モード == 2:
+        loan_condition = db.execute(
+            select(TLoanCondition).where(TLoanCondition.シミュレーションid == simulation.id)
+        ).scalar_one_or_none()
+        
+        interest_schedules = db.execute(
+            select(TLoanInterestSchedule).where(
+                TLoanInterestSchedule.シミュレーションid == simulation.id
+            ).order_by(TLoanInterestSchedule.開始年月)
+        ).scalars().all()
     
-    # 合計税金
-    total_tax = income_tax + resident_tax
+    property_rents = []
+    contracts = []
+    if simulation.シミュレーション種別 != '独立':
+        if simulation.物件id:
+            property_data = db.execute(
+                select(TBukken).where(TBukken.id == simulation.物件id, TBukken.tenant_id == tenant_id)
+            ).scalar_one_or_none()
+            
+            if not property_data:
+                return None
+            
+            property_filter = TBukken.id == property_data.id
+        else:
+            property_filter = and_(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+        
+        # 満室時の賃料は物件集計から取得（部屋を読まずに1物件1行）
+        property_rents = db.execute(
+            select(TPropertySummary.物件id, TPropertySummary.想定賃料)
+            .join(TBukken, TBukken.id == TPropertySummary.物件id)
+            .where(property_filter)
+        ).all()
+        
+        # 月次計算では部屋ごとの契約期間を使用（同じ部屋で重なる契約は後の契約だけを計上）
+        if simulation.計算粒度 == 2:
+            contracts = merge_room_contracts(
+                db.execute(
+                    select(THeya.id, TKeiyaku.id, THeya.賃料, TKeiyaku.契約開始日, TKeiyaku.契約終了日, TKeiyaku.月額賃料)
+                    .join(THeya, THeya.id == TKeiyaku.room_id)
+                    .join(TBukken, TBukken.id == THeya.property_id)
+                    .where(property_filter, THeya.有効 == 1)
+                ).all()
+            )
     
-    return total_tax
+    return loan_condition, interest_schedules, property_rents, contracts
 
 
-def calculate_tax_rate(total_income):
+def _build_loan_yearly_data(simulation, loan_condition, interest_schedules, loan_amount=None):
     """
-    表示用の実効税率を計算（互換性のため残す）
+    詳細モードのローン年度別データを計算（詳細条件がない場合はNone）
     
     Args:
-        total_income: 課税所得（円）
-    
-    Returns:
-        実効税率（%）
+        loan_amount: 借入金額（省略時はシミュレーションの借入金額）
     """
-    total_income = Decimal(str(total_income))
+    from app.utils.loan_calculator import calculate_detailed_loan_payment
     
-    if total_income <= 0:
-        return Decimal('0')
+    if not (loan_condition and interest_schedules):
+        return None
     
-    total_tax = calculate_progressive_tax(total_income)
-    effective_rate = (total_tax / total_income) * Decimal('100')
+    interest_schedule_list = [{'開始年月': s.開始年月, '終了年月': s.終了年月, '金利': s.金利} for s in interest_schedules]
     
-    return effective_rate
+    # 借入日の型を確認
+    if isinstance(loan_condition.借入日, str):
+        loan_start_date = datetime.strptime(loan_condition.借入日, '%Y-%m-%d').date()
+    else:
+        loan_start_date = loan_condition.借入日
+    
+    if loan_amount is None:
+        loan_amount = simulation.借入金額 or Decimal('0')
+    
+    return calculate_detailed_loan_payment(
+        loan_amount=loan_amount,
+        loan_start_date=loan_start_date,
+        payment_day=loan_condition.返済日,
+        payment_start_ym=loan_condition.返済開始年月,
+        grace_period_end_ym=loan_condition.据置期間終了年月,
+        first_interest_payment_method=loan_condition.初回利息支払方法,
+        interest_schedules=interest_schedule_list,
+        repayment_method=simulation.返済方法 or '元利均等',
+        repayment_period_years=simulation.返済期間_年 or 0,
+        start_year=simulation.開始年度,
+        period_years=simulation.期間
+    )
+
+
+def _effective_occupancy_rate(simulation, db):
+    """
+    計算に使う稼働率
+    
+    実績稼働率を使う設定で月次稼働の実績がある場合は直近Nか月の稼働率、それ以外は入力した稼働率を返します。
+    入力値はシミュレーションに残したまま、計算・入力ハッシュ・月別内訳・逆算にこの値を渡します。
+    """
+    from app.utils.occupancy_history import actual_occupancy_rate
+    
+    if not simulation.実績稼働率_月数 or simulation.シミュレーション種別 == '独立':
+        return simulation.稼働率
+    rate = actual_occupancy_rate(db, simulation.tenant_id, simulation.物件id, simulation.実績稼働率_月数)
+    return simulation.稼働率 if rate is None else rate
+
+
+def _simulation_total_rent(simulation, property_rents):
+    """満室時の年間家賃収入を計算"""
+    if simulation.シミュレーション種別 == '独立':
+        # 独立シミュレーション: 手動入力値を使用
+        return simulation.年間家賃収入 or Decimal('0')
+    # 物件ベースシミュレーション: 物件集計の想定賃料（部屋の賃料の合計）から年間家賃収入を計算
+    return sum(rent or 0 for _, rent in property_rents) * 12
+
+
+def _simulation_total_investment(simulation):
+    """投資総額（土地の取得価額は入力項目がないため含まない）"""
+    return (
+        (simulation.建物_取得価額 or Decimal('0')) +
+        (simulation.付属設備_取得価額 or Decimal('0')) +
+        (simulation.構築物_取得価額 or Decimal('0'))
+    )
 
 
 def calculate_simulation(simulation, db):
-    """シミュレーション計算を実行"""
-    from app.utils.loan_calculator import calculate_detailed_loan_payment
-    from datetime import datetime
+    """
+    シミュレーション計算を実行
     
-    tenant_id = session.get('tenant_id')
+    入力ハッシュが前回計算時と一致する場合は再計算しません。
+    同じテナントに同一入力のシミュレーションがある場合はその結果を複製します。
+    処理時間はメトリクス simulation_calculation_seconds に記録します。
+    """
+    from app.utils.metrics import observe
+    
+    started = time.perf_counter()
+    result = _calculate_simulation(simulation, db)
+    observe('simulation_calculation_seconds', time.perf_counter() - started,
+            {'granularity': 'monthly' if simulation.計算粒度 == 2 else 'yearly'})
+    return result
+
+
+def _calculate_simulation(simulation, db):
+    """calculate_simulation の本体"""
+    from app.utils.simulation_metrics import compute_investment_metrics
+    from app.utils.simulation_hash import compute_simulation_input_hash
+    from app.utils.expense_rollup import simulation_expense_plan
+    
+    # ---- 入力を読み込み ----
+    inputs = _load_simulation_inputs(simulation, db)
+    if inputs is None:
+        return False
+    loan_condition, interest_schedules, property_rents, contracts = inputs
+    occupancy_rate = _effective_occupancy_rate(simulation, db)
+    expense_plan = simulation_expense_plan(db, simulation)
+    
+    # ---- 入力ハッシュによる再計算スキップ・結果の再利用 ----
+    input_hash = compute_simulation_input_hash(
+        simulation, property_rents, loan_condition, interest_schedules, contracts, expense_plan,
+        occupancy_rate=occupancy_rate
+    )
+    
+    if simulation.入力ハッシュ == input_hash and _simulation_has_results(db, simulation.id):
+        if simulation.要再計算:
+            simulation.要再計算 = 0
+            db.commit()
+        return True
     
-    # 既存の結果を削除
+    # 既存の結果と投資指標を削除
     db.execute(
         delete(TSimulationResult).where(TSimulationResult.シミュレーションid == simulation.id)
     )
+    db.execute(
+        delete(TSimulationSummary).where(TSimulationSummary.シミュレーションid == simulation.id)
+    )
     db.commit()
     
-    # ローン計算モードによる分岐
-    loan_yearly_data = None
-    if simulation.ローン計算モード == 2:
-        # 詳細モード
-        loan_condition = db.execute(
-            select(TLoanCondition).where(TLoanCondition.シミュレーションid == simulation.id)
-        ).scalar_one_or_none()
-        
-        interest_schedules = db.execute(
-            select(TLoanInterestSchedule).where(
-                TLoanInterestSchedule.シミュレーションid == simulation.id
-            ).order_by(TLoanInterestSchedule.開始年月)
-        ).scalars().all()
-        
-        if loan_condition and interest_schedules:
-            interest_schedule_list = [{'開始年月': s.開始年月, '終了年月': s.終了年月, '金利': s.金利} for s in interest_schedules]
-            
-            # 借入日の型を確認
-            if isinstance(loan_condition.借入日, str):
-                loan_start_date = datetime.strptime(loan_condition.借入日, '%Y-%m-%d').date()
-            else:
-                loan_start_date = loan_condition.借入日
-            
-            loan_yearly_data = calculate_detailed_loan_payment(
-                loan_amount=simulation.借入金額 or Decimal('0'),
-                loan_start_date=loan_start_date,
-                payment_day=loan_condition.返済日,
-                payment_start_ym=loan_condition.返済開始年月,
-                grace_period_end_ym=loan_condition.据置期間終了年月,
-                first_interest_payment_method=loan_condition.初回利息支払方法,
-                interest_schedules=interest_schedule_list,
-                repayment_method=simulation.返済方法 or '元利均等',
-                repayment_period_years=simulation.返済期間_年 or 0,
-                start_year=simulation.開始年度,
-                period_years=simulation.期間
-            )
+    if _copy_simulation_results(db, simulation, input_hash):
+        simulation.入力ハッシュ = input_hash
+        simulation.要再計算 = 0
+        db.commit()
+        return True
     
-    # シミュレーション種別による分岐
-    property_data = None
+    total_rent = _simulation_total_rent(simulation, property_rents)
     
-    if simulation.シミュレーション種別 == '独立':
-        # 独立シミュレーション: 手動入力値を使用
-        total_rent = simulation.年間家賃収入 or Decimal('0')
+    # 年度ごとにシミュレーションして結果を一括保存
+    if simulation.計算粒度 == 2:
+        # 月次計算: 契約期間・空室・月次返済を月単位で計算して年度に集計
+        _, yearly_rows = run_monthly_simulation(
+            simulation, total_rent / 12, contracts, loan_condition, interest_schedules, expense_plan,
+            occupancy_rate=occupancy_rate
+        )
     else:
-        # 物件ベースシミュレーション: 物件データから取得
-        if simulation.物件id:
-            property_data = db.execute(
-                select(TBukken).where(TBukken.id == simulation.物件id, TBukken.tenant_id == tenant_id)
-            ).scalar_one_or_none()
-            
-            if not property_data:
-                return False
-            
-            # 物件の部屋を取得
-            rooms = db.execute(
-                select(THeya).where(THeya.property_id == property_data.id, THeya.有効 == 1)
-            ).scalars().all()
-            
-            # 年間家賃収入を計算
-            total_rent = sum(room.賃料 or 0 for room in rooms) * 12
-        else:
-            # 全物件の場合
-            properties = db.execute(
-                select(TBukken).where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
-            ).scalars().all()
-            
-            total_rent = Decimal('0')
-            for prop in properties:
-                rooms = db.execute(
-                    select(THeya).where(THeya.property_id == prop.id, THeya.有効 == 1)
-                ).scalars().all()
-                total_rent += sum(room.賃料 or 0 for room in rooms) * 12
-    
-    # 年度ごとにシミュレーション
-    current_loan_balance = simulation.ローン残高
-    
-    for year_offset in range(simulation.期間):
-        year = simulation.開始年度 + year_offset
-        
-        # 収入計算
-        家賃収入 = total_rent * (simulation.稼働率 / 100)
-        その他収入 = simulation.その他収入
-        総収入 = 家賃収入 + その他収入
-        
-        # 経費計算
-        管理費 = 家賃収入 * (simulation.管理費率 / 100)
-        修繕費 = 家賃収入 * (simulation.修繕費率 / 100)
-        固定資産税 = simulation.固定資産税
-        損害保険料 = simulation.損害保険料
-        # ローン計算モードによる分岐
-        if loan_yearly_data and year in loan_yearly_data:
-            # 詳細モード
-            借入金利息 = loan_yearly_data[year]['利息']
-            ローン元本返済 = loan_yearly_data[year]['元本返済額']
-            current_loan_balance = loan_yearly_data[year]['ローン残高']
-        else:
-            # 簡易モード
-            借入金利息 = current_loan_balance * (simulation.ローン金利 / 100)
-        その他経費 = simulation.その他経費
-        
-        # 減価償却費を計算（3分割方式）
-        減価償却費 = Decimal('0')
-        
-        # 建物部分の減価償却費
-        if simulation.建物_取得価額 and simulation.建物_取得価額 > 0:
-            if simulation.建物_償却方法 == '定額法' and simulation.建物_耐用年数:
-                減価償却費 += (simulation.建物_取得価額 - simulation.建物_残存価額) / simulation.建物_耐用年数
-            elif simulation.建物_償却方法 == '定率法' and simulation.建物_耐用年数:
-                償却率 = Decimal('2.0') / simulation.建物_耐用年数
-                # 簡易計算（実際は期首帳簿価額を追跡する必要がある）
-                減価償却費 += simulation.建物_取得価額 * 償却率 * (Decimal('0.9') ** year_offset)
-        
-        # 建物付属設備の減価償却費
-        if simulation.付属設備_取得価額 and simulation.付属設備_取得価額 > 0:
-            if simulation.付属設備_償却方法 == '定額法' and simulation.付属設備_耐用年数:
-                減価償却費 += (simulation.付属設備_取得価額 - simulation.付属設備_残存価額) / simulation.付属設備_耐用年数
-            elif simulation.付属設備_償却方法 == '定率法' and simulation.付属設備_耐用年数:
-                償却率 = Decimal('2.0') / simulation.付属設備_耐用年数
-                減価償却費 += simulation.付属設備_取得価額 * 償却率 * (Decimal('0.9') ** year_offset)
-        
-        # 構築物の減価償却費
-        if simulation.構築物_取得価額 and simulation.構築物_取得価額 > 0:
-            if simulation.構築物_償却方法 == '定額法' and simulation.構築物_耐用年数:
-                減価償却費 += (simulation.構築物_取得価額 - simulation.構築物_残存価額) / simulation.構築物_耐用年数
-            elif simulation.構築物_償却方法 == '定率法' and simulation.構築物_耐用年数:
-                償却率 = Decimal('2.0') / simulation.構築物_耐用年数
-                減価償却費 += simulation.構築物_取得価額 * 償却率 * (Decimal('0.9') ** year_offset)
-        
-        # 旧方式の減価償却費が設定されている場合はそれを使用（互換性のため）
-        if 減価償却費 == 0 and simulation.減価償却費 and simulation.減価償却費 > 0:
-            減価償却費 = simulation.減価償却費
-        
-        総経費 = 管理費 + 修繕費 + 固定資産税 + 損害保険料 + 借入金利息 + 減価償却費 + その他経費
-        
-        # 不動産所得
-        不動産所得 = 総収入 - 総経費
-        
-        # 税金計算（超過累進税率）
-        if simulation.税率:
-            # 手動設定された税率を使用
-            税金 = (不動産所得 + simulation.その他所得) * (simulation.税率 / 100)
-            if 税金 < 0:
-                税金 = Decimal('0')
-        else:
-            # 超過累進税率で税金を計算
-            課税所得 = 不動産所得 + simulation.その他所得
-            税金 = calculate_progressive_tax(課税所得)
-            if 税金 < 0:
-                税金 = Decimal('0')
-        
-        # キャッシュフロー
-        if not (loan_yearly_data and year in loan_yearly_data):
-            # 簡易モードの場合のみ計算
-            ローン元本返済 = simulation.ローン年間返済額 - 借入金利息
-            current_loan_balance -= ローン元本返済
-            if current_loan_balance < 0:
-                current_loan_balance = Decimal('0')
-        
-        キャッシュフロー = 総収入 - (総経費 - 減価償却費) - 税金 - ローン元本返済
-        
-        # 結果を保存
-        result = TSimulationResult(
-            シミュレーションid=simulation.id,
-            年度=year,
-            家賃収入=家賃収入,
-            その他収入=その他収入,
-            総収入=総収入,
-            管理費=管理費,
-            修繕費=修繕費,
-            固定資産税=固定資産税,
-            損害保険料=損害保険料,
-            借入金利息=借入金利息,
-            減価償却費=減価償却費,
-            その他経費=その他経費,
-            総経費=総経費,
-            不動産所得=不動産所得,
-            税金=税金,
-            キャッシュフロー=キャッシュフロー,
-            ローン残高=current_loan_balance
+        # ローン計算モードによる分岐（詳細モードのみ年度別データを使用）
+        loan_yearly_data = _build_loan_yearly_data(simulation, loan_condition, interest_schedules)
+        yearly_rows = run_simulation_kernel(simulation, total_rent, loan_yearly_data, expense_plan=expense_plan,
+                                            occupancy_rate=occupancy_rate)
+    if yearly_rows:
+        db.execute(
+            insert(TSimulationResult),
+            [dict({column: row[column] for column in SIMULATION_RESULT_COLUMNS}, シミュレーションid=simulation.id)
+             for row in yearly_rows]
         )
-        
-        db.add(result)
     
+    # 投資指標を保存
+    metrics = compute_investment_metrics(
+        yearly_rows,
+        total_investment=_simulation_total_investment(simulation),
+        loan_amount=simulation.借入金額 or simulation.ローン残高 or Decimal('0'),
+        discount_rate=simulation.割引率 if simulation.割引率 is not None else Decimal('3.00')
+    )
+    db.add(TSimulationSummary(シミュレーションid=simulation.id, **metrics))
+    
+    simulation.入力ハッシュ = input_hash
+    simulation.要再計算 = 0
     db.commit()
     return True
 
 
+def _simulation_has_results(db, simulation_id):
+    """シミュレーション結果が保存済みか確認"""
+    return db.execute(
+        select(TSimulationResult.id).where(TSimulationResult.シミュレーションid == simulation_id).limit(1)
+    ).first() is not None
+
+
+def _copy_simulation_results(db, simulation, input_hash):
+    """
+    同一テナント内で入力ハッシュが一致するシミュレーションの結果を複製
+    
+    Returns:
+        bool: 複製した場合True
+    """
+    donor_ids = db.execute(
+        select(TSimulation.id).where(
+            TSimulation.tenant_id == simulation.tenant_id,
+            TSimulation.入力ハッシュ == input_hash,
+            TSimulation.id != simulation.id
+        )
+    ).scalars().all()
+    
+    for donor_id in donor_ids:
+        donor_results = db.execute(
+            select(TSimulationResult).where(TSimulationResult.シミュレーションid == donor_id)
+            .order_by(TSimulationResult.年度)
+        ).scalars().all()
+        if not donor_results:
+            continue
+        
+        result_columns = [c.key for c in TSimulationResult.__table__.columns
+                          if c.key not in ('id', 'シミュレーションid', 'created_at')]
+        db.execute(
+            insert(TSimulationResult),
+            [dict({c: getattr(r, c) for c in result_columns}, シミュレーションid=simulation.id)
+             for r in donor_results]
+        )
+        
+        donor_summary = db.execute(
+            select(TSimulationSummary).where(TSimulationSummary.シミュレーションid == donor_id)
+        ).scalar_one_or_none()
+        if donor_summary:
+            summary_columns = [c.key for c in TSimulationSummary.__table__.columns
+                               if c.key not in ('id', 'シミュレーションid', 'created_at', 'updated_at')]
+            db.add(TSimulationSummary(
+                シミュレーションid=simulation.id,
+                **{c: getattr(donor_summary, c) for c in summary_columns}
+            ))
+        return True
+    
+    return False
+
+
+# シミュレーション一覧の並び替えキー
+SIMULATION_SORT_COLUMNS = {
+    'created_at': TSimulation.created_at,
+    'irr': TSimulationSummary.IRR,
+    'npv': TSimulationSummary.NPV,
+    'cap_rate': TSimulationSummary.キャップレート,
+    'dscr': TSimulationSummary.最小DSCR,
+    'payback': TSimulationSummary.投資回収年度,
+    'equity_multiple': TSimulationSummary.自己資金倍率,
+}
+
+
 @property_bp.route('/simulations')
 @require_tenant_admin
 def simulations():
-    """シミュレーション一覧"""
+    """シミュレーション一覧（投資指標による並び替え・絞り込み・キーセットページング / format=json でJSONを返す）"""
     db = SessionLocal()
     tenant_id = session.get('tenant_id')
+    args = parse_list_args(request.args, SIMULATION_SORT_COLUMNS, 'created_at')
+    sort_column = SIMULATION_SORT_COLUMNS[args['sort']]
+    
+    # シミュレーション・投資指標・物件名を1クエリで取得
+    query = (
+        select(TSimulation, TSimulationSummary, TBukken.物件名)
+        .outerjoin(TSimulationSummary, TSimulationSummary.シミュレーションid == TSimulation.id)
+        .outerjoin(TBukken, TBukken.id == TSimulation.物件id)
+        .where(TSimulation.tenant_id == tenant_id)
+    )
+    condition = search_condition(args['q'], TSimulation.名称, TBukken.物件名)
+    if condition is not None:
+        query = query.where(condition)
+    
+    # 投資指標による絞り込み
+    filters = {}
+    for param, column in (('min_irr', TSimulationSummary.IRR),
+                          ('min_dscr', TSimulationSummary.最小DSCR),
+                          ('min_cap_rate', TSimulationSummary.キャップレート)):
+        value = request.args.get(param)
+        if value:
+            try:
+                query = query.where(column >= Decimal(value))
+                filters[param] = value
+            except ArithmeticError:
+                flash(f'絞り込み条件が不正です: {value}', 'warning')
+    if args['q']:
+        filters['q'] = args['q']
+    
+    # 並び替えカラムは T_シミュレーション か T_シミュレーション指標 のどちらか
+    sort_entity_index = 0 if sort_column.class_ is TSimulation else 1
+    page = keyset_page(
+        db, query, sort_column, TSimulation.id, args['order'], args['cursor'], args['limit'],
+        sort_key=lambda row: (getattr(row[sort_entity_index], sort_column.key, None), row[0].id)
+    )
+    totals = aggregate_totals(
+        db, query,
+        件数=func.count(),
+        平均IRR=func.avg(TSimulationSummary.IRR),
+        NPV合計=func.coalesce(func.sum(TSimulationSummary.NPV), 0),
+    )
     
-    simulations = db.execute(
-        select(TSimulation).where(TSimulation.tenant_id == tenant_id)
-        .order_by(TSimulation.created_at.desc())
-    ).scalars().all()
-    
-    # 各シミュレーションの物件名を取得
     simulation_list = []
-    for sim in simulations:
+    for sim, summary, property_name in page['rows']:
         if sim.物件id:
-            property_data = db.execute(
-                select(TBukken).where(TBukken.id == sim.物件id)
-            ).scalar_one_or_none()
-            property_name = property_data.物件名 if property_data else '不明'
+            property_name = property_name or '不明'
         else:
             property_name = '全物件'
         
         simulation_list.append({
             'simulation': sim,
+            'summary': summary,
             'property_name': property_name
         })
     
     db.close()
-    return render_template('property_simulations.html', simulations=simulation_list)
+    
+    if args['format'] == 'json':
+        items = []
+        for item in simulation_list:
+            sim, summary = item['simulation'], item['summary']
+            row = {
+                'id': sim.id,
+                '名称': sim.名称,
+                '対象物件': item['property_name'],
+                '期間': sim.期間,
+                '開始年度': sim.開始年度,
+                '要再計算': bool(sim.要再計算),
+                'created_at': json_value(sim.created_at),
+            }
+            for key in ('IRR', 'NPV', 'キャップレート', '最小DSCR', '投資回収年度', '自己資金倍率'):
+                row[key] = json_value(getattr(summary, key)) if summary else None
+            items.append(row)
+        return jsonify(list_response(items, page, totals, args))
+    
+    return render_template('property_simulations.html',
+                         simulations=simulation_list,
+                         sort=args['sort'],
+                         order=args['order'],
+                         filters=filters,
+                         totals=totals,
+                         next_cursor=page['next_cursor'],
+                         params=link_params(request.args))
+
+
+# シミュレーション比較
+SIMULATION_COMPARE_LIMIT = 50
+SIMULATION_COMPARE_FIELDS = ['キャッシュフロー', '累積キャッシュフロー', '税金', 'ローン残高']
+SIMULATION_COMPARE_KPIS = ['IRR', 'NPV', 'キャップレート', '最小DSCR', '平均DSCR', '投資回収年度', '自己資金倍率', '累積キャッシュフロー']
+
+
+def pivot_simulation_results(results, simulation_ids, fields):
+    """
+    シミュレーション結果の行を 年度 × シミュレーション の行列に変換
+    
+    Args:
+        results: TSimulationResultのリスト（複数シミュレーション分）
+        simulation_ids: 列の並び順となるシミュレーションIDのリスト
+        fields: 行列化する項目名のリスト
+    
+    Returns:
+        tuple: (年度のリスト, {項目名: [[値 or None, ...], ...]})
+    """
+    column_index = {sim_id: i for i, sim_id in enumerate(simulation_ids)}
+    years = sorted({r.年度 for r in results})
+    row_index = {year: i for i, year in enumerate(years)}
+    
+    matrices = {
+        field: [[None] * len(simulation_ids) for _ in years]
+        for field in fields
+    }
+    for r in results:
+        col = column_index.get(r.シミュレーションid)
+        if col is None:
+            continue
+        row = row_index[r.年度]
+        for field in fields:
+            matrices[field][row][col] = getattr(r, field)
+    
+    # 累積CFを保存していない古い結果は列ごとに補完
+    if '累積キャッシュフロー' in matrices and 'キャッシュフロー' in matrices:
+        cumulative = matrices['累積キャッシュフロー']
+        cashflows = matrices['キャッシュフロー']
+        for col in range(len(simulation_ids)):
+            running = Decimal('0')
+            for row in range(len(years)):
+                if cashflows[row][col] is None:
+                    continue
+                running += cashflows[row][col]
+                if cumulative[row][col] is None:
+                    cumulative[row][col] = running
+    
+    return years, matrices
+
+
+def _json_number(value):
+    """Decimal等をJSONで扱える数値に変換"""
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+@property_bp.route('/simulations/compare')
+@require_tenant_admin
+def simulation_compare():
+    """複数シミュレーションの比較（?ids=1,2,3 / format=json でJSONを返す）"""
+    tenant_id = session.get('tenant_id')
+    
+    # ids=1,2,3 と ids=1&ids=2 のどちらの形式も受け付ける
+    simulation_ids = []
+    for value in request.args.getlist('ids'):
+        for part in value.split(','):
+            part = part.strip()
+            if part.isdigit() and int(part) not in simulation_ids:
+                simulation_ids.append(int(part))
+    
+    wants_json = request.args.get('format') == 'json'
+    
+    if not simulation_ids:
+        if wants_json:
+            return jsonify({'error': '比較するシミュレーションを指定してください'}), 400
+        flash('比較するシミュレーションを選択してください', 'warning')
+        return redirect(url_for('property.simulations'))
+    
+    if len(simulation_ids) > SIMULATION_COMPARE_LIMIT:
+        if wants_json:
+            return jsonify({'error': f'比較できるのは{SIMULATION_COMPARE_LIMIT}件までです'}), 400
+        flash(f'比較できるのは{SIMULATION_COMPARE_LIMIT}件までです', 'warning')
+        return redirect(url_for('property.simulations'))
+    
+    db = SessionLocal()
+    
+    # シミュレーション・投資指標・物件名を1クエリで取得
+    rows = db.execute(
+        select(TSimulation, TSimulationSummary, TBukken.物件名)
+        .outerjoin(TSimulationSummary, TSimulationSummary.シミュレーションid == TSimulation.id)
+        .outerjoin(TBukken, TBukken.id == TSimulation.物件id)
+        .where(TSimulation.tenant_id == tenant_id, TSimulation.id.in_(simulation_ids))
+    ).all()
+    found = {sim.id: (sim, summary, property_name) for sim, summary, property_name in rows}
+    simulation_ids = [sim_id for sim_id in simulation_ids if sim_id in found]
+    
+    if not simulation_ids:
+        db.close()
+        if wants_json:
+            return jsonify({'error': 'シミュレーションが見つかりません'}), 404
+        flash('シミュレーションが見つかりません', 'danger')
+        return redirect(url_for('property.simulations'))
+    
+    # 全シミュレーションの結果を1クエリで取得
+    results = db.execute(
+        select(TSimulationResult)
+        .where(TSimulationResult.シミュレーションid.in_(simulation_ids))
+        .order_by(TSimulationResult.シミュレーションid, TSimulationResult.年度)
+    ).scalars().all()
+    
+    years, matrices = pivot_simulation_results(results, simulation_ids, SIMULATION_COMPARE_FIELDS)
+    
+    columns = []
+    for sim_id in simulation_ids:
+        sim, summary, property_name = found[sim_id]
+        if sim.シミュレーション種別 == '独立':
+            property_name = '独立シミュレーション'
+        elif not sim.物件id:
+            property_name = '全物件'
+        columns.append({
+            'simulation': sim,
+            'property_name': property_name or '不明',
+            'kpis': {kpi: getattr(summary, kpi) if summary else None for kpi in SIMULATION_COMPARE_KPIS}
+        })
+    
+    db.close()
+    
+    if wants_json:
+        return jsonify({
+            'simulations': [
+                {
+                    'id': col['simulation'].id,
+                    '名称': col['simulation'].名称,
+                    '対象物件': col['property_name'],
+                    'kpis': {k: _json_number(v) for k, v in col['kpis'].items()}
+                }
+                for col in columns
+            ],
+            'years': years,
+            'series': {
+                field: [[_json_number(v) for v in row] for row in matrix]
+                for field, matrix in matrices.items()
+            }
+        })
+    
+    # グラフ用にシミュレーションごとの系列へ転置
+    chart_series = {
+        field: [[_json_number(row[col]) for row in matrices[field]] for col in range(len(columns))]
+        for field in ('累積キャッシュフロー', 'ローン残高')
+    }
+    
+    return render_template('property_simulation_compare.html',
+                         columns=columns,
+                         years=years,
+                         matrices=matrices,
+                         chart_series=chart_series,
+                         kpi_names=SIMULATION_COMPARE_KPIS)
 
 
 @property_bp.route('/simulations/new', methods=['GET', 'POST'])
@@ -1325,16 +2036,20 @@ def simulation_new():
         開始年度 = int(request.form.get('開始年度', date.today().year))
         期間 = int(request.form.get('期間', 10))
         稼働率 = Decimal(request.form.get('稼働率', '95.00'))
+        実績稼働率_月数 = int(request.form.get('実績稼働率_月数')) if request.form.get('実績稼働率_月数') else None
         管理費率 = Decimal(request.form.get('管理費率', '5.00'))
         修繕費率 = Decimal(request.form.get('修繕費率', '5.00'))
         固定資産税 = Decimal(request.form.get('固定資産税', '0'))
         損害保険料 = Decimal(request.form.get('損害保険料', '0'))
+        実績経費_年数 = int(request.form.get('実績経費_年数')) if request.form.get('実績経費_年数') else None
+        経費上昇率 = Decimal(request.form.get('経費上昇率') or '0')
         ローン残高 = Decimal(request.form.get('ローン残高', '0'))
         ローン金利 = Decimal(request.form.get('ローン金利', '0'))
         ローン年間返済額 = Decimal(request.form.get('ローン年間返済額', '0'))
         
         # ローン計算モード
         ローン計算モード = int(request.form.get('ローン計算モード', '1'))  # デフォルトは簡易モード
+        計算粒度 = int(request.form.get('計算粒度', '1'))  # デフォルトは年次
         
         # ローン詳細情報（モードによって異なるフィールド名を使用）
         if ローン計算モード == 2:
@@ -1376,6 +2091,7 @@ def simulation_new():
         その他経費 = Decimal(request.form.get('その他経費', '0'))
         減価償却費 = Decimal(request.form.get('減価償却費', '0'))
         その他所得 = Decimal(request.form.get('その他所得', '0'))
+        割引率 = Decimal(request.form.get('割引率') or '3.00')
         
         # 減価償却設定（建物部分）
         建物_取得価額 = Decimal(request.form.get('建物_取得価額', '0'))
@@ -1423,15 +2139,19 @@ def simulation_new():
             開始年度=開始年度,
             期間=期間,
             稼働率=稼働率,
+            実績稼働率_月数=実績稼働率_月数,
             管理費率=管理費率,
             修繕費率=修繕費率,
             固定資産税=固定資産税,
             損害保険料=損害保険料,
+            実績経費_年数=実績経費_年数,
+            経費上昇率=経費上昇率,
             ローン残高=ローン残高,
             ローン金利=ローン金利,
             ローン年間返済額=ローン年間返済額,
             # ローン計算モード
             ローン計算モード=ローン計算モード,
+            計算粒度=計算粒度,
             # ローン詳細情報
             借入金額=借入金額,
             返済期間_年=返済期間_年,
@@ -1453,7 +2173,8 @@ def simulation_new():
             構築物_取得価額=構築物_取得価額,
             構築物_耐用年数=構築物_耐用年数,
             構築物_償却方法=構築物_償却方法,
-            構築物_残存価額=構築物_残存価額
+            構築物_残存価額=構築物_残存価額,
+            割引率=割引率
         )
         
         db.add(simulation)
@@ -1568,21 +2289,172 @@ def simulation_detail(simulation_id):
         .order_by(TSimulationResult.年度)
     ).scalars().all()
     
-    # 累積キャッシュフローを計算
+    # 投資指標を取得
+    summary = db.execute(
+        select(TSimulationSummary).where(TSimulationSummary.シミュレーションid == simulation_id)
+    ).scalar_one_or_none()
+    
+    # 累積キャッシュフローは計算時に保存済み（保存前の結果のみここで計算）
     累積CF = Decimal('0')
     results_with_cumulative = []
     for result in results:
         累積CF += result.キャッシュフロー
         results_with_cumulative.append({
             'result': result,
-            '累積キャッシュフロー': 累積CF
+            '累積キャッシュフロー': result.累積キャッシュフロー if result.累積キャッシュフロー is not None else 累積CF
         })
     
     db.close()
     return render_template('property_simulation_detail.html',
                          simulation=simulation,
                          property_name=property_name,
-                         results=results_with_cumulative)
+                         results=results_with_cumulative,
+                         summary=summary)
+
+
+@property_bp.route('/simulations/<int:simulation_id>/monthly')
+@require_tenant_admin
+def simulation_monthly(simulation_id):
+    """月次シミュレーションの月別内訳（format=json でJSONを返す）"""
+    from app.utils.expense_rollup import simulation_expense_plan
+    
+    db = SessionLocal()
+    tenant_id = session.get('tenant_id')
+    wants_json = request.args.get('format') == 'json'
+    
+    simulation = db.execute(
+        select(TSimulation).where(TSimulation.id == simulation_id, TSimulation.tenant_id == tenant_id)
+    ).scalar_one_or_none()
+    
+    inputs = _load_simulation_inputs(simulation, db) if simulation and simulation.計算粒度 == 2 else None
+    expense_plan = simulation_expense_plan(db, simulation) if inputs is not None else None
+    occupancy_rate = _effective_occupancy_rate(simulation, db) if inputs is not None else None
+    db.close()
+    
+    if inputs is None:
+        message = '月次計算のシミュレーションが見つかりません'
+        if wants_json:
+            return jsonify({'error': message}), 404
+        flash(message, 'danger')
+        return redirect(url_for('property.simulations'))
+    
+    loan_condition, interest_schedules, property_rents, contracts = inputs
+    monthly_rows, _ = run_monthly_simulation(
+        simulation, _simulation_total_rent(simulation, property_rents) / 12,
+        contracts, loan_condition, interest_schedules, expense_plan, occupancy_rate=occupancy_rate
+    )
+    
+    if wants_json:
+        return jsonify({
+            'simulation_id': simulation.id,
+            'months': [{key: _json_number(value) for key, value in row.items()} for row in monthly_rows]
+        })
+    
+    # 年度ごとにまとめて表示
+    months_by_year = {}
+    for row in monthly_rows:
+        months_by_year.setdefault(int(row['年月'][:4]), []).append(row)
+    
+    return render_template('property_simulation_monthly.html',
+                         simulation=simulation,
+                         months_by_year=months_by_year)
+
+
+@property_bp.route('/simulations/<int:simulation_id>/goal-seek', methods=['GET', 'POST'])
+@require_tenant_admin
+def simulation_goal_seek(simulation_id):
+    """目標を満たす借入金額・家賃収入・稼働率の逆算（format=json でJSONを返す）"""
+    from app.utils.simulation_goal_seek import GOAL_SEEK_VARIABLES, GOAL_SEEK_TARGETS, goal_seek_simulation
+    from app.utils.expense_rollup import simulation_expense_plan
+    
+    db = SessionLocal()
+    tenant_id = session.get('tenant_id')
+    wants_json = request.values.get('format') == 'json'
+    
+    simulation = db.execute(
+        select(TSimulation).where(TSimulation.id == simulation_id, TSimulation.tenant_id == tenant_id)
+    ).scalar_one_or_none()
+    
+    if not simulation:
+        db.close()
+        if wants_json:
+            return jsonify({'error': 'シミュレーションが見つかりません'}), 404
+        flash('シミュレーションが見つかりません', 'danger')
+        return redirect(url_for('property.simulations'))
+    
+    variable = request.values.get('variable', '借入金額')
+    target = request.values.get('target', '累積キャッシュフロー')
+    threshold = request.values.get('threshold', '').strip()
+    
+    results = []
+    error = None
+    if request.method == 'POST' or wants_json:
+        inputs = _load_simulation_inputs(simulation, db)
+        if (variable != 'all' and variable not in GOAL_SEEK_VARIABLES) or target not in GOAL_SEEK_TARGETS:
+            error = '逆算する変数または目標が正しくありません'
+        elif inputs is None:
+            error = '対象の物件が見つかりません'
+        else:
+            loan_condition, interest_schedules, property_rents, contracts = inputs
+            expense_plan = simulation_expense_plan(db, simulation)
+            occupancy_rate = _effective_occupancy_rate(simulation, db)
+            # 月次計算は保存される結果と同じく契約期間・月次返済を含めて逆算する
+            monthly = simulation.計算粒度 == 2
+            loan_yearly_data = None
+            if not monthly:
+                loan_yearly_data = _build_loan_yearly_data(simulation, loan_condition, interest_schedules)
+            loan_builder = None
+            if loan_yearly_data is not None:
+                loan_builder = lambda amount: _build_loan_yearly_data(
+                    simulation, loan_condition, interest_schedules, loan_amount=amount
+                )
+            
+            # variable=all の場合は全変数をまとめて逆算
+            variables = list(GOAL_SEEK_VARIABLES) if variable == 'all' else [variable]
+            try:
+                for name in variables:
+                    results.append(goal_seek_simulation(
+                        simulation,
+                        _simulation_total_rent(simulation, property_rents),
+                        name,
+                        target=target,
+                        threshold=threshold or None,
+                        loan_yearly_data=loan_yearly_data,
+                        loan_builder=loan_builder,
+                        expense_plan=expense_plan,
+                        occupancy_rate=occupancy_rate,
+                        monthly=monthly,
+                        contracts=contracts,
+                        loan_condition=loan_condition,
+                        interest_schedules=interest_schedules
+                    ))
+            except (ValueError, ArithmeticError):
+                error = '閾値が正しくありません'
+                results = []
+    db.close()
+    
+    if wants_json:
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify({
+            'simulation_id': simulation.id,
+            'results': [
+                {key: _json_number(value) for key, value in result.items()}
+                for result in results
+            ]
+        })
+    
+    if error:
+        flash(error, 'danger')
+    
+    return render_template('property_simulation_goal_seek.html',
+                         simulation=simulation,
+                         variables=list(GOAL_SEEK_VARIABLES),
+                         targets=GOAL_SEEK_TARGETS,
+                         variable=variable,
+                         target=target,
+                         threshold=threshold,
+                         results=results)
 
 
 @property_bp.route('/simulations/<int:simulation_id>/edit', methods=['GET', 'POST'])
@@ -1610,16 +2482,20 @@ def simulation_edit(simulation_id):
         simulation.開始年度 = int(request.form.get('開始年度', date.today().year))
         simulation.期間 = int(request.form.get('期間', 10))
         simulation.稼働率 = Decimal(request.form.get('稼働率', '95.00'))
+        simulation.実績稼働率_月数 = int(request.form.get('実績稼働率_月数')) if request.form.get('実績稼働率_月数') else None
         simulation.管理費率 = Decimal(request.form.get('管理費率', '5.00'))
         simulation.修繕費率 = Decimal(request.form.get('修繕費率', '5.00'))
         simulation.固定資産税 = Decimal(request.form.get('固定資産税', '0'))
         simulation.損害保険料 = Decimal(request.form.get('損害保険料', '0'))
+        simulation.実績経費_年数 = int(request.form.get('実績経費_年数')) if request.form.get('実績経費_年数') else None
+        simulation.経費上昇率 = Decimal(request.form.get('経費上昇率') or '0')
         simulation.ローン残高 = Decimal(request.form.get('ローン残高', '0'))
         simulation.ローン金利 = Decimal(request.form.get('ローン金利', '0'))
         simulation.ローン年間返済額 = Decimal(request.form.get('ローン年間返済額', '0'))
         
         # ローン計算モード
         simulation.ローン計算モード = int(request.form.get('ローン計算モード', '1'))  # デフォルトは簡易モード
+        simulation.計算粒度 = int(request.form.get('計算粒度', '1'))  # デフォルトは年次
         
         # ローン詳細情報（自動計算用）
         借入金額 = request.form.get('借入金額')
@@ -1660,6 +2536,7 @@ def simulation_edit(simulation_id):
         simulation.その他経費 = Decimal(request.form.get('その他経費', '0'))
         simulation.減価償却費 = Decimal(request.form.get('減価償却費', '0'))
         simulation.その他所得 = Decimal(request.form.get('その他所得', '0'))
+        simulation.割引率 = Decimal(request.form.get('割引率') or '3.00')
         
         # 減価償却設定（建物部分）
         simulation.建物_取得価額 = Decimal(request.form.get('建物_取得価額', '0'))
@@ -1832,10 +2709,13 @@ def simulation_delete(simulation_id):
         flash('シミュレーションが見つかりません', 'danger')
         return redirect(url_for('property.simulations'))
     
-    # 結果も削除
+    # 結果と投資指標も削除
     db.execute(
         delete(TSimulationResult).where(TSimulationResult.シミュレーションid == simulation_id)
     )
+    db.execute(
+        delete(TSimulationSummary).where(TSimulationSummary.シミュレーションid == simulation_id)
+    )
     
     # シミュレーションを削除
     db.execute(
@@ -1852,7 +2732,7 @@ def simulation_delete(simulation_id):
 @property_bp.route('/simulations/<int:simulation_id>/recalculate', methods=['POST'])
 @require_tenant_admin
 def simulation_recalculate(simulation_id):
-    """シミュレーション再計算"""
+    """シミュレーション再計算（ジョブとして実行）"""
     db = SessionLocal()
     tenant_id = session.get('tenant_id')
     
@@ -1861,19 +2741,32 @@ def simulation_recalculate(simulation_id):
     ).scalar_one_or_none()
     
     if not simulation:
+        db.close()
         flash('シミュレーションが見つかりません', 'danger')
         return redirect(url_for('property.simulations'))
     
-    # シミュレーション計算を実行
-    if calculate_simulation(simulation, db):
+    job = _submit_job(db, 'シミュレーション再計算', {'simulation_id': simulation_id})
+    db.close()
+    
+    if job['状況'] == '完了':
         flash('シミュレーションを再計算しました', 'success')
-    else:
+    elif job['エラー']:
         flash('シミュレーションの計算に失敗しました', 'danger')
-    
-    db.close()
+    else:
+        return _job_redirect(job, 'シミュレーションの再計算')
     return redirect(url_for('property.simulation_detail', simulation_id=simulation_id))
 
 
+@property_bp.route('/simulations/recalculate-stale', methods=['POST'])
+@require_tenant_admin
+def simulation_recalculate_stale():
+    """要再計算のシミュレーションをまとめて再計算（ジョブとして実行）"""
+    db = SessionLocal()
+    job = _submit_job(db, 'シミュレーション再計算', {'stale_only': True})
+    db.close()
+    return _job_redirect(job, '要再計算シミュレーションの再計算')
+
+
 # ==================== 物件経費管理 ====================
 
 # 経費カテゴリと支払方法の定義
@@ -1882,6 +2775,85 @@ ROOM_EXPENSE_CATEGORIES = ['原状回復', 'クリーニング', '仲介手数
 PAYMENT_METHODS = ['現金', '銀行振込', 'クレジットカード', '口座引落']
 
 
+EXPENSE_SORT_KEYS = ('date', 'amount', 'name', 'paid_date')
+EXPENSE_LIST_COLUMNS = ['経費名', '経費カテゴリ', '金額', '発生日', '支払日', '支払方法', '備考']
+
+
+def _parse_date_arg(name):
+    """クエリパラメータの日付（YYYY-MM-DD）を解釈。不正な値はNone"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        flash(f'日付の形式が不正です: {value}', 'warning')
+        return None
+
+
+def _expense_listing(db, model, parent_condition, id_column):
+    """
+    物件経費・部屋経費の一覧を取得（検索・カテゴリ/期間/支払状況の絞り込み・並び替え・キーセットページング）
+    
+    Parameters:
+    - model: TBukkenKeihi または THeyaKeihi
+    - parent_condition: 対象の物件・部屋で絞り込む条件
+    - id_column: 経費の主キーカラム
+    
+    Returns:
+    - dict: {'args', 'expenses', 'totals', 'categories', 'next_cursor', 'params', 'json'}
+    """
+    sort_columns = dict(zip(EXPENSE_SORT_KEYS, (model.発生日, model.金額, model.経費名, model.支払日)))
+    args = parse_list_args(request.args, sort_columns, 'date')
+    
+    query = select(model).where(parent_condition)
+    condition = search_condition(args['q'], model.経費名, model.備考)
+    if condition is not None:
+        query = query.where(condition)
+    category = request.args.get('category')
+    if category:
+        query = query.where(model.経費カテゴリ == category)
+    date_from = _parse_date_arg('from')
+    if date_from:
+        query = query.where(model.発生日 >= date_from)
+    date_to = _parse_date_arg('to')
+    if date_to:
+        query = query.where(model.発生日 <= date_to)
+    status = request.args.get('status')
+    if status == 'paid':
+        query = query.where(model.支払日.isnot(None))
+    elif status == 'unpaid':
+        query = query.where(model.支払日.is_(None))
+    
+    page = keyset_page(db, query, sort_columns[args['sort']], id_column,
+                       args['order'], args['cursor'], args['limit'])
+    expenses = [row[0] for row in page['rows']]
+    totals = aggregate_totals(
+        db, query,
+        件数=func.count(),
+        合計金額=func.coalesce(func.sum(model.金額), 0),
+        未払金額=func.coalesce(func.sum(case((model.支払日.is_(None), model.金額), else_=0)), 0),
+    )
+    
+    listing = {
+        'args': args,
+        'expenses': expenses,
+        'totals': totals,
+        'next_cursor': page['next_cursor'],
+        'params': link_params(request.args),
+    }
+    if args['format'] == 'json':
+        items = serialize_rows(expenses, EXPENSE_LIST_COLUMNS)
+        for item, expense in zip(items, expenses):
+            item['id'] = getattr(expense, id_column.key)
+        listing['json'] = list_response(items, page, totals, args)
+    else:
+        listing['categories'] = db.execute(
+            select(model.経費カテゴリ).where(parent_condition).distinct().order_by(model.経費カテゴリ)
+        ).scalars().all()
+    return listing
+
+
 @property_bp.route('/properties/<int:property_id>/expenses')
 @require_tenant_admin
 def expense_list_property(property_id):
@@ -1898,20 +2870,22 @@ def expense_list_property(property_id):
         flash('物件が見つかりません', 'danger')
         return redirect(url_for('property.properties'))
     
-    # 経費一覧を取得
-    expenses = db.execute(
-        select(TBukkenKeihi).where(TBukkenKeihi.物件id == property_id)
-        .order_by(TBukkenKeihi.発生日.desc())
-    ).scalars().all()
+    # 経費一覧を取得（合計は絞り込み条件の全件をSQLで集計）
+    listing = _expense_listing(db, TBukkenKeihi, TBukkenKeihi.物件id == property_id, TBukkenKeihi.物件経費id)
+    db.close()
     
-    # 合計金額を計算
-    total_amount = sum(expense.金額 for expense in expenses)
+    if listing['args']['format'] == 'json':
+        return jsonify(listing['json'])
     
-    db.close()
     return render_template('property_expense_list.html', 
                          property=property_data, 
-                         expenses=expenses,
-                         total_amount=total_amount)
+                         expenses=listing['expenses'],
+                         total_amount=listing['totals']['合計金額'],
+                         totals=listing['totals'],
+                         categories=listing['categories'],
+                         next_cursor=listing['next_cursor'],
+                         list_args=listing['args'],
+                         params=listing['params'])
 
 
 @property_bp.route('/properties/<int:property_id>/expenses/new', methods=['GET', 'POST'])
@@ -2066,21 +3040,23 @@ def expense_list_room(room_id):
         flash('物件が見つかりません', 'danger')
         return redirect(url_for('property.properties'))
     
-    # 経費一覧を取得
-    expenses = db.execute(
-        select(THeyaKeihi).where(THeyaKeihi.部屋id == room_id)
-        .order_by(THeyaKeihi.発生日.desc())
-    ).scalars().all()
+    # 経費一覧を取得（合計は絞り込み条件の全件をSQLで集計）
+    listing = _expense_listing(db, THeyaKeihi, THeyaKeihi.部屋id == room_id, THeyaKeihi.部屋経費id)
+    db.close()
     
-    # 合計金額を計算
-    total_amount = sum(expense.金額 for expense in expenses)
+    if listing['args']['format'] == 'json':
+        return jsonify(listing['json'])
     
-    db.close()
     return render_template('room_expense_list.html', 
                          room=room,
                          property=property_data,
-                         expenses=expenses,
-                         total_amount=total_amount)
+                         expenses=listing['expenses'],
+                         total_amount=listing['totals']['合計金額'],
+                         totals=listing['totals'],
+                         categories=listing['categories'],
+                         next_cursor=listing['next_cursor'],
+                         list_args=listing['args'],
+                         params=listing['params'])
 
 
 @property_bp.route('/rooms/<int:room_id>/expenses/new', methods=['GET', 'POST'])
@@ -2276,17 +3252,19 @@ def simulation_year_detail(simulation_id, year):
     # 税引後利益を計算（データベースには保存されていない）
     税引後利益 = year_data_obj.不動産所得 - year_data_obj.税金
     
-    # 累積キャッシュフローを計算（当年度までの合計）
-    cumulative_results = db.execute(
-        select(TSimulationResult).where(
-            and_(
-                TSimulationResult.シミュレーションid == simulation_id,
-                TSimulationResult.年度 <= year
-            )
-        ).order_by(TSimulationResult.年度)
-    ).scalars().all()
-    
-    累積キャッシュフロー = sum(r.キャッシュフロー for r in cumulative_results)
+    # 累積キャッシュフロー（計算時に保存済み。保存前の結果は当年度までの合計を計算）
+    累積キャッシュフロー = year_data_obj.累積キャッシュフロー
+    if 累積キャッシュフロー is None:
+        cumulative_results = db.execute(
+            select(TSimulationResult).where(
+                and_(
+                    TSimulationResult.シミュレーションid == simulation_id,
+                    TSimulationResult.年度 <= year
+                )
+            ).order_by(TSimulationResult.年度)
+        ).scalars().all()
+        
+        累積キャッシュフロー = sum(r.キャッシュフロー for r in cumulative_results)
     
     # テンプレートに渡すデータを作成
     year_data = {
@@ -2398,7 +3376,7 @@ def simulation_loan_detail_save(simulation_id):
             loan_condition = TLoanCondition(シミュレーションid=simulation_id)
             db.add(loan_condition)
         
-        loan_condition.借入日 = request.form.get('借入日')
+        loan_condition.借入日 = datetime.strptime(request.form.get('借入日'), '%Y-%m-%d').date()
         loan_condition.返済日 = int(request.form.get('返済日'))
         loan_condition.返済開始年月 = request.form.get('返済開始年月')
         loan_condition.据置期間終了年月 = request.form.get('据置期間終了年月') or None
@@ -2430,7 +3408,7 @@ def simulation_loan_detail_save(simulation_id):
         db.commit()
         
         # シミュレーションを再計算
-        calculate_simulation(simulation_id, db)
+        calculate_simulation(simulation, db)
         
         flash('ローン詳細設定を保存し、シミュレーションを再計算しました', 'success')
         db.close()
@@ -2441,3 +3419,107 @@ def simulation_loan_detail_save(simulation_id):
         flash(f'保存中にエラーが発生しました: {str(e)}', 'danger')
         db.close()
         return redirect(url_for('property.simulation_loan_detail', simulation_id=simulation_id))
+
+
+# ==================== ジョブ ====================
+
+def _submit_job(db, kind, payload=None, file=None):
+    """
+    テナントのジョブを登録（設定 JOBS_INLINE が有効な場合はワーカーを待たずにこの場で実行）
+    
+    file (ファイル名, 内容bytes) は引数に含めずジョブの添付ファイルとして渡します。
+    
+    Returns:
+        dict: 登録したジョブの状態（job_dict）
+    """
+    from app.utils.job_queue import submit_job, job_dict
+    from app.utils import job_handlers  # noqa: F401  処理関数を登録
+    
+    return job_dict(submit_job(db, kind, payload, tenant_id=session.get('tenant_id'),
+                               inline=current_app.config.get('JOBS_INLINE', False), file=file))
+
+
+def _job_redirect(job, label):
+    """ジョブの登録・実行結果を表示してジョブの進捗ページへ"""
+    if job['状況'] == '完了':
+        flash(f'{label}が完了しました', 'success')
+    elif job['状況'] == '失敗':
+        flash(f'{label}に失敗しました', 'danger')
+    else:
+        flash(f'{label}を受け付けました。進捗はこのページで確認できます', 'info')
+    return redirect(url_for('property.job_detail', job_id=job['id']))
+
+
+def _tenant_job(db, job_id):
+    """テナントのジョブを取得"""
+    from app.models_property import TJob
+    
+    return db.execute(
+        select(TJob).where(TJob.id == job_id, TJob.tenant_id == session.get('tenant_id'))
+    ).scalar_one_or_none()
+
+
+@property_bp.route('/jobs')
+@require_tenant_admin
+def jobs():
+    """ジョブ一覧（直近100件。format=json でJSONを返す）"""
+    from app.models_property import TJob
+    from app.utils.job_queue import JOB_STATUSES, job_dict
+    
+    db = SessionLocal()
+    status = request.args.get('status')
+    query = select(TJob).where(TJob.tenant_id == session.get('tenant_id'))
+    if status in JOB_STATUSES:
+        query = query.where(TJob.状況 == status)
+    job_list = db.execute(query.order_by(TJob.created_at.desc(), TJob.id.desc()).limit(100)).scalars().all()
+    items = [job_dict(job) for job in job_list]
+    db.close()
+    
+    if request.args.get('format') == 'json':
+        return jsonify({'jobs': items})
+    return render_template('property_jobs.html', jobs=items, status=status, statuses=JOB_STATUSES)
+
+
+@property_bp.route('/jobs/<int:job_id>')
+@require_tenant_admin
+def job_detail(job_id):
+    """ジョブの進捗・結果（format=json でJSONを返す。実行中はページを自動更新）"""
+    from app.utils.job_queue import job_dict
+    
+    db = SessionLocal()
+    job = _tenant_job(db, job_id)
+    item = job_dict(job) if job else None
+    db.close()
+    
+    if request.args.get('format') == 'json':
+        if item is None:
+            return jsonify({'error': 'ジョブが見つかりません'}), 404
+        return jsonify(item)
+    if item is None:
+        flash('ジョブが見つかりません', 'danger')
+        return redirect(url_for('property.jobs'))
+    return render_template('property_job_detail.html', job=item)
+
+
+@property_bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@require_tenant_admin
+def job_retry(job_id):
+    """失敗したジョブを再試行"""
+    from app.utils.job_queue import retry_job, claim_job, run_job, worker_name
+    from app.utils import job_handlers  # noqa: F401  処理関数を登録
+    
+    db = SessionLocal()
+    job = _tenant_job(db, job_id)
+    if not job or job.状況 != '失敗':
+        db.close()
+        flash('再試行できるジョブが見つかりません', 'danger')
+        return redirect(url_for('property.jobs'))
+    
+    retry_job(db, job)
+    db.commit()
+    if current_app.config.get('JOBS_INLINE', False) and claim_job(db, job.id, worker_name()):
+        run_job(job.id)
+    db.close()
+    
+    flash('ジョブを再試行します', 'info')
+    return redirect(url_for('property.job_detail', job_id=job_id))
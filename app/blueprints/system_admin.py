@@ -3,13 +3,14 @@
 システム管理者ダッシュボード（SQLAlchemy版）
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, send_file, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.db import SessionLocal
 from app.models_login import TKanrisha, TJugyoin, TTenant, TTenpo, TKanrishaTenpo, TJugyoinTenpo, TTenantAppSetting, TTenpoAppSetting, TTenantAdminTenant
 from sqlalchemy import func, and_, or_
 from ..utils.decorators import ROLES
 from ..utils.decorators import require_roles
+from ..utils.tenant_directory import get_tenant_store_tree, search_tenants, search_stores
 from ..blueprints.tenant_admin import AVAILABLE_APPS
 import os
 import markdown
@@ -93,18 +94,7 @@ def mypage():
                 
                 if not login_id or not name:
                     flash('ログインIDと氏名は必須です', 'error')
-                    # テナント・店舗リストを取得
-                    tenant_list = [{'id': t.id, 'name': t.名称} for t in db.query(TTenant).filter(TTenant.有効 == 1).order_by(TTenant.id).all()]
-                    store_list = []
-                    for s in db.query(TTenpo).filter(TTenpo.有効 == 1).order_by(TTenpo.tenant_id, TTenpo.id).all():
-                        tenant = db.query(TTenant).filter(TTenant.id == s.tenant_id).first()
-                        store_list.append({
-                            'id': s.id,
-                            'name': s.名称,
-                            'tenant_id': s.tenant_id,
-                            'tenant_name': tenant.名称 if tenant else ''
-                        })
-                    return render_template('sys_mypage.html', user=user, tenant_list=tenant_list, store_list=store_list)
+                    return render_template('sys_mypage.html', user=user)
                 
                 # ログインID重複チェック（自分以外）
                 existing = db.query(TKanrisha).filter(
@@ -113,18 +103,7 @@ def mypage():
                 
                 if existing:
                     flash('このログインIDは既に使用されています', 'error')
-                    # テナント・店舗リストを取得
-                    tenant_list = [{'id': t.id, 'name': t.名称} for t in db.query(TTenant).filter(TTenant.有効 == 1).order_by(TTenant.id).all()]
-                    store_list = []
-                    for s in db.query(TTenpo).filter(TTenpo.有効 == 1).order_by(TTenpo.tenant_id, TTenpo.id).all():
-                        tenant = db.query(TTenant).filter(TTenant.id == s.tenant_id).first()
-                        store_list.append({
-                            'id': s.id,
-                            'name': s.名称,
-                            'tenant_id': s.tenant_id,
-                            'tenant_name': tenant.名称 if tenant else ''
-                        })
-                    return render_template('sys_mypage.html', user=user, tenant_list=tenant_list, store_list=store_list)
+                    return render_template('sys_mypage.html', user=user)
                 
                 # プロフィール更新
                 admin.login_id = login_id
@@ -145,34 +124,12 @@ def mypage():
                 
                 if new_password != new_password_confirm:
                     flash('パスワードが一致しません', 'error')
-                    # テナント・店舗リストを取得
-                    tenant_list = [{'id': t.id, 'name': t.名称} for t in db.query(TTenant).filter(TTenant.有効 == 1).order_by(TTenant.id).all()]
-                    store_list = []
-                    for s in db.query(TTenpo).filter(TTenpo.有効 == 1).order_by(TTenpo.tenant_id, TTenpo.id).all():
-                        tenant = db.query(TTenant).filter(TTenant.id == s.tenant_id).first()
-                        store_list.append({
-                            'id': s.id,
-                            'name': s.名称,
-                            'tenant_id': s.tenant_id,
-                            'tenant_name': tenant.名称 if tenant else ''
-                        })
-                    return render_template('sys_mypage.html', user=user, tenant_list=tenant_list, store_list=store_list)
+                    return render_template('sys_mypage.html', user=user)
                 
                 # 現在のパスワードを確認
                 if not check_password_hash(admin.password_hash, current_password):
                     flash('現在のパスワードが正しくありません', 'error')
-                    # テナント・店舗リストを取得
-                    tenant_list = [{'id': t.id, 'name': t.名称} for t in db.query(TTenant).filter(TTenant.有効 == 1).order_by(TTenant.id).all()]
-                    store_list = []
-                    for s in db.query(TTenpo).filter(TTenpo.有効 == 1).order_by(TTenpo.tenant_id, TTenpo.id).all():
-                        tenant = db.query(TTenant).filter(TTenant.id == s.tenant_id).first()
-                        store_list.append({
-                            'id': s.id,
-                            'name': s.名称,
-                            'tenant_id': s.tenant_id,
-                            'tenant_name': tenant.名称 if tenant else ''
-                        })
-                    return render_template('sys_mypage.html', user=user, tenant_list=tenant_list, store_list=store_list)
+                    return render_template('sys_mypage.html', user=user)
                 
                 # パスワード更新
                 admin.password_hash = generate_password_hash(new_password)
@@ -181,23 +138,41 @@ def mypage():
                 flash('パスワードを変更しました', 'success')
                 return redirect(url_for('system_admin.mypage'))
         
-        # GETリクエスト - テナント・店舗リストを取得
-        tenant_list = [{'id': t.id, 'name': t.名称} for t in db.query(TTenant).filter(TTenant.有効 == 1).order_by(TTenant.id).all()]
-        store_list = []
-        for s in db.query(TTenpo).filter(TTenpo.有効 == 1).order_by(TTenpo.tenant_id, TTenpo.id).all():
-            tenant = db.query(TTenant).filter(TTenant.id == s.tenant_id).first()
-            store_list.append({
-                'id': s.id,
-                'name': s.名称,
-                'tenant_id': s.tenant_id,
-                'tenant_name': tenant.名称 if tenant else ''
-            })
-        return render_template('sys_mypage.html', user=user, tenant_list=tenant_list, store_list=store_list)
+        # テナント・店舗はタイプアヘッド（picker_tenants / picker_stores）で取得
+        return render_template('sys_mypage.html', user=user)
     
     finally:
         db.close()
 
 
+@bp.route('/picker/tenants')
+@require_roles(ROLES["SYSTEM_ADMIN"])
+def picker_tenants():
+    """テナント選択のタイプアヘッド（?q=名称の一部）"""
+    db = SessionLocal()
+    try:
+        tree = get_tenant_store_tree(db)
+    finally:
+        db.close()
+    return jsonify(search_tenants(tree, request.args.get('q', '')))
+
+
+@bp.route('/picker/stores')
+@require_roles(ROLES["SYSTEM_ADMIN"])
+def picker_stores():
+    """店舗選択のタイプアヘッド（?q=店舗名またはテナント名の一部&tenant_id=）"""
+    db = SessionLocal()
+    try:
+        tree = get_tenant_store_tree(db)
+    finally:
+        db.close()
+    return jsonify(search_stores(
+        tree,
+        request.args.get('q', ''),
+        tenant_id=request.args.get('tenant_id', type=int)
+    ))
+
+
 @bp.route('/settings', methods=['GET', 'POST'])
 @require_roles(ROLES["SYSTEM_ADMIN"])
 def settings():
@@ -306,6 +281,43 @@ def doc_download(filename):
     return send_file(doc_path, as_attachment=True, download_name=filename)
 
 
+# ========================================
+# プロファイル
+# ========================================
+
+@bp.route('/profiles')
+@require_roles(ROLES["SYSTEM_ADMIN"])
+def profiles():
+    """保存済みのリクエストプロファイル一覧（画面のURLに ?_profile=1 を付けて開くと保存されます）"""
+    from ..utils.request_profiler import list_profiles, PROFILE_PARAM, PROFILE_KEEP
+    return render_template('sys_profiles.html', profiles=list_profiles(),
+                           profile_param=PROFILE_PARAM, profile_keep=PROFILE_KEEP)
+
+
+@bp.route('/profiles/<profile_id>')
+@require_roles(ROLES["SYSTEM_ADMIN"])
+def profile_detail(profile_id):
+    """リクエストプロファイルの詳細（累積時間の多い関数と実行したSQL）"""
+    from ..utils.request_profiler import load_profile
+    profile = load_profile(profile_id)
+    if profile is None:
+        flash('プロファイルが見つかりません', 'error')
+        return redirect(url_for('system_admin.profiles'))
+    return render_template('sys_profile_detail.html', profile=profile)
+
+
+@bp.route('/profiles/<profile_id>/download')
+@require_roles(ROLES["SYSTEM_ADMIN"])
+def profile_download(profile_id):
+    """cProfile の .prof ファイルをダウンロード（snakeviz / flameprof で表示できます）"""
+    from ..utils.request_profiler import profile_file
+    path = profile_file(profile_id)
+    if path is None:
+        flash('プロファイルが見つかりません', 'error')
+        return redirect(url_for('system_admin.profiles'))
+    return send_file(path, as_attachment=True, download_name=f'{profile_id}.prof')
+
+
 # ========================================
 # テナント管理
 # ========================================
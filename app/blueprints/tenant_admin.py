@@ -8,8 +8,10 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from app.db import SessionLocal
 from app.models_login import TKanrisha, TJugyoin, TTenant, TTenpo, TKanrishaTenpo, TJugyoinTenpo, TTenantAppSetting, TTenpoAppSetting, TTenantAdminTenant
 from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from ..utils.decorators import ROLES
 from ..utils.decorators import require_roles
+from ..utils.employee_directory import list_employees
 
 bp = Blueprint('tenant_admin', __name__, url_prefix='/tenant_admin')
 
@@ -690,55 +692,50 @@ def store_delete(store_id):
 def tenant_admins():
     """テナント管理者一覧"""
     tenant_id = session.get('tenant_id')
-    print(f"DEBUG: tenant_id = {tenant_id}")
     db = SessionLocal()
     
     try:
-        # 中間テーブルを使用してテナント管理者を取得
-        relations = db.query(TTenantAdminTenant).filter(
-            TTenantAdminTenant.tenant_id == tenant_id
+        # 中間テーブルから管理者と所属テナントをまとめて取得（件数によらず一定のクエリ数）
+        relations = db.query(TTenantAdminTenant).join(
+            TKanrisha, TTenantAdminTenant.admin_id == TKanrisha.id
+        ).filter(
+            and_(
+                TTenantAdminTenant.tenant_id == tenant_id,
+                TKanrisha.role == ROLES["TENANT_ADMIN"]
+            )
+        ).options(
+            contains_eager(TTenantAdminTenant.admin)
+            .selectinload(TKanrisha.tenant_links)
+            .joinedload(TTenantAdminTenant.tenant)
         ).all()
-        print(f"DEBUG: relations count = {len(relations)}")
-        for rel in relations:
-            print(f"DEBUG: relation - admin_id={rel.admin_id}, tenant_id={rel.tenant_id}, is_owner={rel.is_owner}")
         
         admins_data = []
         for rel in relations:
-            admin = db.query(TKanrisha).filter(
-                and_(
-                    TKanrisha.id == rel.admin_id,
-                    TKanrisha.role == ROLES["TENANT_ADMIN"]
-                )
-            ).first()
+            admin = rel.admin
+            
+            # 所属テナント情報
+            tenants = [
+                {
+                    'id': tenant_rel.tenant.id,
+                    'name': tenant_rel.tenant.名称,
+                    'is_owner': tenant_rel.is_owner
+                }
+                for tenant_rel in admin.tenant_links
+                if tenant_rel.tenant is not None
+            ]
             
-            if admin:
-                # 所属テナント情報を取得
-                tenant_relations = db.query(TTenantAdminTenant).filter(
-                    TTenantAdminTenant.admin_id == admin.id
-                ).all()
-                
-                tenants = []
-                for tenant_rel in tenant_relations:
-                    tenant_info = db.query(TTenant).filter(TTenant.id == tenant_rel.tenant_id).first()
-                    if tenant_info:
-                        tenants.append({
-                            'id': tenant_info.id,
-                            'name': tenant_info.名称,
-                            'is_owner': tenant_rel.is_owner
-                        })
-                
-                admins_data.append({
-                    'id': admin.id,
-                    'login_id': admin.login_id,
-                    'name': admin.name,
-                    'email': admin.email,
-                    'active': admin.active,
-                    'can_manage_admins': rel.can_manage_tenant_admins,
-                    'is_owner': rel.is_owner,
-                    'tenants': tenants,
-                    'created_at': admin.created_at,
-                    'updated_at': admin.updated_at
-                })
+            admins_data.append({
+                'id': admin.id,
+                'login_id': admin.login_id,
+                'name': admin.name,
+                'email': admin.email,
+                'active': admin.active,
+                'can_manage_admins': rel.can_manage_tenant_admins,
+                'is_owner': rel.is_owner,
+                'tenants': tenants,
+                'created_at': admin.created_at,
+                'updated_at': admin.updated_at
+            })
         
         # IDでソート
         admins_data.sort(key=lambda x: x['id'])
@@ -1330,37 +1327,37 @@ def store_admins():
             flash('店舗を選択してください', 'error')
             return redirect(url_for('tenant_admin.dashboard'))
         
-        # 中間テーブルを使用して店舗管理者を取得
-        admin_relations = db.query(TKanrishaTenpo, TKanrisha).join(
+        # 中間テーブルを使用して店舗管理者と所属店舗をまとめて取得
+        admin_relations = db.query(TKanrishaTenpo).join(
             TKanrisha, TKanrishaTenpo.admin_id == TKanrisha.id
         ).filter(
             and_(
                 TKanrishaTenpo.store_id == store_id,
                 TKanrisha.role == ROLES["ADMIN"]
             )
+        ).options(
+            contains_eager(TKanrishaTenpo.admin)
+            .selectinload(TKanrisha.store_links)
+            .joinedload(TKanrishaTenpo.store)
         ).order_by(TKanrishaTenpo.is_owner.desc(), TKanrisha.id).all()
         
         admins_data = []
         current_user_id = session.get('user_id')
         
-        for rel, admin in admin_relations:
-            # 管理者が所属する全店舗を取得（オーナー情報も含む）
-            store_rels = db.query(TTenpo, TKanrishaTenpo).join(
-                TKanrishaTenpo, TTenpo.id == TKanrishaTenpo.store_id
-            ).filter(
-                and_(
-                    TKanrishaTenpo.admin_id == admin.id,
-                    TTenpo.tenant_id == tenant_id
-                )
-            ).order_by(TTenpo.名称).all()
+        for rel in admin_relations:
+            admin = rel.admin
             
-            # 所属店舗の名称とオーナー情報を取得
-            stores_with_owner = []
-            for store, store_rel in store_rels:
-                stores_with_owner.append({
-                    'name': store.名称,
+            # 所属店舗の名称とオーナー情報（同じテナントの店舗のみ、名称順）
+            stores_with_owner = [
+                {
+                    'name': store_rel.store.名称,
                     'is_owner': store_rel.is_owner == 1
-                })
+                }
+                for store_rel in sorted(
+                    (r for r in admin.store_links if r.store is not None and r.store.tenant_id == tenant_id),
+                    key=lambda r: r.store.名称
+                )
+            ]
             
             admins_data.append({
                 'id': admin.id,
@@ -1615,44 +1612,14 @@ def employees():
     
     try:
         # 店舗が選択されている場合はその店舗に所属する従業員のみを表示
-        if store_id:
-            employee_list = db.query(TJugyoin).join(
-                TJugyoinTenpo, TJugyoin.id == TJugyoinTenpo.employee_id
-            ).filter(
-                and_(
-                    TJugyoin.tenant_id == tenant_id,
-                    TJugyoinTenpo.store_id == store_id
-                )
-            ).order_by(TJugyoin.id).all()
-        else:
-            # 店舗が選択されていない場合は全従業員を表示
-            employee_list = db.query(TJugyoin).filter(
-                TJugyoin.tenant_id == tenant_id
-            ).order_by(TJugyoin.id).all()
-        
-        employees_data = []
-        for e in employee_list:
-            # 所属店舗を取得
-            store_relations = db.query(TJugyoinTenpo).filter(
-                TJugyoinTenpo.employee_id == e.id
-            ).all()
-            
-            stores_list = []
-            for rel in store_relations:
-                store = db.query(TTenpo).filter(TTenpo.id == rel.store_id).first()
-                if store:
-                    stores_list.append({'name': store.名称})
-            
-            employees_data.append({
-                'id': e.id,
-                'login_id': e.login_id,
-                'name': e.name,
-                'email': e.email,
-                'active': e.active,
-                'created_at': e.created_at,
-                'updated_at': e.updated_at,
-                'stores': stores_list
-            })
+        search = request.args.get('q', '').strip()
+        page = list_employees(
+            db,
+            tenant_id=tenant_id,
+            store_id=store_id,
+            search=search,
+            after_id=request.args.get('after', type=int)
+        )
         
         # 店舗情報を取得
         store = None
@@ -1663,7 +1630,9 @@ def employees():
         tenant = db.query(TTenant).filter(TTenant.id == tenant_id).first()
         
         return render_template('tenant_employees.html', 
-                             employees=employees_data,
+                             employees=page['employees'],
+                             next_cursor=page['next_cursor'],
+                             search=search,
                              store=store,
                              tenant=tenant)
     finally:
@@ -12,5 +12,9 @@ class Settings:
     ENV: str = os.getenv("ENV", "dev")
     VERSION: str = os.getenv("APP_VERSION", "0.1.0")
     TZ: str = os.getenv("TZ", "Asia/Tokyo")
+    # 1の場合、ジョブをワーカーに渡さずリクエスト内で実行（ワーカーを起動しない開発環境用）
+    JOBS_INLINE: bool = os.getenv("JOBS_INLINE", "0") in ("1", "true", "True")
+    # 1リクエストで同じ形のSQLがこの回数を超えたらN+1クエリとして警告ログを出す（0で無効）
+    SQL_REPEAT_THRESHOLD: int = int(os.getenv("SQL_REPEAT_THRESHOLD", "10"))
 
 settings = Settings()
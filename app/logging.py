@@ -2,6 +2,9 @@ import json
 import logging
 import sys
 
+# LogRecord が標準で持つ属性（これ以外は logger.info(..., extra={...}) で渡された項目としてJSONに含める）
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
 class JsonFormatter(logging.Formatter):
     def format(self, record):
         base = {
@@ -9,9 +12,12 @@ class JsonFormatter(logging.Formatter):
             "message": record.getMessage(),
             "logger": record.name,
         }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in base:
+                base[key] = value
         if record.exc_info:
             base["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(base, ensure_ascii=False)
+        return json.dumps(base, ensure_ascii=False, default=str)
 
 def setup_logging(debug: bool = False) -> None:
     """
@@ -1,7 +1,12 @@
 """
 login-system-app用のSQLAlchemyモデル
+
+中間テーブルとのリレーションは一覧画面で selectinload するために定義しています。
+削除時の振る舞いは従来どおり呼び出し側で中間テーブルを削除する前提のため、
+一対多側は passive_deletes=True としてORMが子行を更新しないようにしています。
 """
 from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -23,6 +28,9 @@ class TKanrisha(Base):
     openai_api_key = Column(Text, nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    tenant_links = relationship('TTenantAdminTenant', back_populates='admin', passive_deletes=True)
+    store_links = relationship('TKanrishaTenpo', back_populates='admin', passive_deletes=True)
 
 
 class TJugyoin(Base):
@@ -39,6 +47,8 @@ class TJugyoin(Base):
     active = Column(Integer, default=1)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+    
+    store_links = relationship('TJugyoinTenpo', back_populates='employee', passive_deletes=True)
 
 
 class TTenant(Base):
@@ -56,6 +66,9 @@ class TTenant(Base):
     有効 = Column(Integer, default=1)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
+    
+    admin_links = relationship('TTenantAdminTenant', back_populates='tenant', passive_deletes=True)
+    stores = relationship('TTenpo', back_populates='tenant', passive_deletes=True)
 
 
 class TTenpo(Base):
@@ -74,6 +87,10 @@ class TTenpo(Base):
     有効 = Column(Integer, default=1)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
+    
+    tenant = relationship('TTenant', back_populates='stores')
+    admin_links = relationship('TKanrishaTenpo', back_populates='store', passive_deletes=True)
+    employee_links = relationship('TJugyoinTenpo', back_populates='store', passive_deletes=True)
 
 
 class TKanrishaTenpo(Base):
@@ -86,6 +103,9 @@ class TKanrishaTenpo(Base):
     is_owner = Column(Integer, default=0, comment='この店舗のオーナーかどうか')
     can_manage_admins = Column(Integer, default=0, comment='店舗管理者を管理する権限')
     created_at = Column(DateTime, server_default=func.now())
+    
+    admin = relationship('TKanrisha', back_populates='store_links')
+    store = relationship('TTenpo', back_populates='admin_links')
 
 
 class TJugyoinTenpo(Base):
@@ -96,6 +116,9 @@ class TJugyoinTenpo(Base):
     employee_id = Column(Integer, ForeignKey('T_従業員.id'), nullable=False)
     store_id = Column(Integer, ForeignKey('T_店舗.id'), nullable=False)
     created_at = Column(DateTime, server_default=func.now())
+    
+    employee = relationship('TJugyoin', back_populates='store_links')
+    store = relationship('TTenpo', back_populates='employee_links')
 
 
 class TTenantAppSetting(Base):
@@ -135,3 +158,6 @@ class TTenantAdminTenant(Base):
     __table_args__ = (
         {'mysql_charset': 'utf8mb4', 'mysql_collate': 'utf8mb4_unicode_ci', 'extend_existing': True}
     )
+    
+    admin = relationship('TKanrisha', back_populates='tenant_links')
+    tenant = relationship('TTenant', back_populates='admin_links')
@@ -1,7 +1,7 @@
 """
 不動産管理アプリ用のSQLAlchemyモデル
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Numeric, Date
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Numeric, Date, Index, LargeBinary
 from sqlalchemy.sql import func
 from app.db import Base
 
@@ -9,6 +9,10 @@ from app.db import Base
 class TBukken(Base):
     """T_物件テーブル"""
     __tablename__ = 'T_物件'
+    __table_args__ = (
+        # 一覧のキーセットページング用（テナント・有効で絞り込み、作成日時順）
+        Index('ix_T_物件_一覧', 'tenant_id', '有効', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
@@ -69,6 +73,9 @@ class THeya(Base):
 class TNyukyosha(Base):
     """T_入居者テーブル"""
     __tablename__ = 'T_入居者'
+    __table_args__ = (
+        Index('ix_T_入居者_一覧', 'tenant_id', '有効', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
@@ -88,6 +95,11 @@ class TNyukyosha(Base):
 class TKeiyaku(Base):
     """T_契約テーブル"""
     __tablename__ = 'T_契約'
+    __table_args__ = (
+        # 満了・更新の検出用（契約中の契約を終了日の範囲で取得）
+        Index('ix_T_契約_状況_終了日', '契約状況', '契約終了日'),
+        Index('ix_T_契約_部屋', 'room_id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     room_id = Column(Integer, ForeignKey('T_部屋.id'), nullable=False)
@@ -138,6 +150,9 @@ class TGenkashokaku(Base):
 class TSimulation(Base):
     """T_シミュレーションテーブル"""
     __tablename__ = 'T_シミュレーション'
+    __table_args__ = (
+        Index('ix_T_シミュレーション_一覧', 'tenant_id', 'created_at', 'id'),
+    )
     
     id = Column(Integer, primary_key=True, autoincrement=True)
     tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
@@ -155,14 +170,18 @@ class TSimulation(Base):
     開始年度 = Column(Integer, nullable=False)
     期間 = Column(Integer, nullable=False)
     稼働率 = Column(Numeric(5, 2), default=95.00)
+    実績稼働率_月数 = Column(Integer, nullable=True)  # 指定時は直近Nか月の稼働実績（T_月次稼働）を稼働率に使用
     管理費率 = Column(Numeric(5, 2), default=5.00)
     修繕費率 = Column(Numeric(5, 2), default=5.00)
     固定資産税 = Column(Numeric(15, 2), default=0)
     損害保険料 = Column(Numeric(15, 2), default=0)
+    実績経費_年数 = Column(Integer, nullable=True)  # 指定時は直近N年の経費実績（カテゴリ別の年平均）を経費に使用
+    経費上昇率 = Column(Numeric(5, 2), nullable=True, default=0)  # 金額で指定する経費の年間上昇率（%）
     ローン残高 = Column(Numeric(15, 2), default=0)
     ローン金利 = Column(Numeric(5, 2), default=0)
     ローン年間返済額 = Column(Numeric(15, 2), default=0)
     ローン計算モード = Column(Integer, default=1)  # 1:簡易モード, 2:詳細モード
+    計算粒度 = Column(Integer, default=1)  # 1:年次, 2:月次（契約期間・空室・月次返済を反映）
     
     # ローン詳細情報（自動計算用）
     借入金額 = Column(Numeric(15, 2), nullable=True)
@@ -193,6 +212,13 @@ class TSimulation(Base):
     構築物_償却方法 = Column(String(20), nullable=True, default='定額法')
     構築物_残存価額 = Column(Numeric(15, 2), nullable=True, default=0)
     
+    # 投資指標設定
+    割引率 = Column(Numeric(5, 2), nullable=True, default=3.00)  # NPV計算用（%）
+    
+    # 計算結果キャッシュ
+    入力ハッシュ = Column(String(64), nullable=True, index=True)  # 前回計算時の全入力のハッシュ
+    要再計算 = Column(Integer, default=0)  # 1: 物件の賃料変更などで結果が古い
+    
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -218,15 +244,42 @@ class TSimulationResult(Base):
     不動産所得 = Column(Numeric(15, 2), default=0)
     税金 = Column(Numeric(15, 2), default=0)
     キャッシュフロー = Column(Numeric(15, 2), default=0)
+    累積キャッシュフロー = Column(Numeric(15, 2), nullable=True)
     ローン残高 = Column(Numeric(15, 2), default=0)
+    DSCR = Column(Numeric(10, 3), nullable=True)  # 返済がない年度はNULL
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class TSimulationSummary(Base):
+    """T_シミュレーション指標テーブル（計算時に1シミュレーション1行で保存）"""
+    __tablename__ = 'T_シミュレーション指標'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    シミュレーションid = Column(Integer, ForeignKey('T_シミュレーション.id'), nullable=False, unique=True, index=True)
+    投資総額 = Column(Numeric(15, 2), default=0)
+    自己資金 = Column(Numeric(15, 2), default=0)
+    割引率 = Column(Numeric(5, 2), nullable=True)  # %
+    IRR = Column(Numeric(9, 4), nullable=True)  # %
+    NPV = Column(Numeric(15, 2), nullable=True)
+    キャップレート = Column(Numeric(9, 4), nullable=True)  # %
+    最小DSCR = Column(Numeric(10, 3), nullable=True)
+    平均DSCR = Column(Numeric(10, 3), nullable=True)
+    投資回収年度 = Column(Integer, nullable=True)
+    自己資金倍率 = Column(Numeric(10, 3), nullable=True)
+    累積キャッシュフロー = Column(Numeric(15, 2), default=0)
     created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 
 class TBukkenKeihi(Base):
     """T_物件経費テーブル"""
     __tablename__ = 'T_物件経費'
+    __table_args__ = (
+        # 物件ごとの経費一覧（発生日順）・合計用
+        Index('ix_T_物件経費_物件_発生日', '物件id', '発生日'),
+    )
     
-    物件経貿id = Column(Integer, primary_key=True, autoincrement=True)
+    物件経費id = Column('物件経貿id', Integer, primary_key=True, autoincrement=True)  # 既存DBのカラム名は「経貿」のまま
     物件id = Column(Integer, ForeignKey('T_物件.id'), nullable=False)
     経費名 = Column(String(100), nullable=False)
     経費カテゴリ = Column(String(50), nullable=False)
@@ -242,8 +295,11 @@ class TBukkenKeihi(Base):
 class THeyaKeihi(Base):
     """T_部屋経費テーブル"""
     __tablename__ = 'T_部屋経費'
+    __table_args__ = (
+        Index('ix_T_部屋経費_部屋_発生日', '部屋id', '発生日'),
+    )
     
-    部屋経貿id = Column(Integer, primary_key=True, autoincrement=True)
+    部屋経費id = Column('部屋経貿id', Integer, primary_key=True, autoincrement=True)  # 既存DBのカラム名は「経貿」のまま
     部屋id = Column(Integer, ForeignKey('T_部屋.id'), nullable=False)
     経費名 = Column(String(100), nullable=False)
     経費カテゴリ = Column(String(50), nullable=False)
@@ -283,3 +339,136 @@ class TLoanInterestSchedule(Base):
     備考 = Column(String(200), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class TSearchIndex(Base):
+    """T_検索インデックステーブル（物件・部屋・入居者の横断検索用）"""
+    __tablename__ = 'T_検索インデックス'
+    __table_args__ = (
+        Index('ix_T_検索インデックス_種別_対象', '種別', '対象id', unique=True),
+        Index('ix_T_検索インデックス_テナント', 'tenant_id', '種別'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
+    種別 = Column(String(20), nullable=False)  # '物件', '部屋', '入居者'
+    対象id = Column(Integer, nullable=False)
+    表示名 = Column(String(255), nullable=False)
+    補足 = Column(String(500), nullable=True)  # 部屋の場合は物件名、入居者の場合は電話番号など
+    検索テキスト = Column(Text, nullable=False)  # 正規化済み（NFKC・ひらがな・小文字・空白/ハイフン除去）
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class TPropertySummary(Base):
+    """T_物件集計テーブル（物件ごとの部屋数・入居状況・賃料の集計。部屋・契約の変更時に差分更新）"""
+    __tablename__ = 'T_物件集計'
+    __table_args__ = (
+        Index('ix_T_物件集計_テナント', 'tenant_id'),
+    )
+    
+    物件id = Column(Integer, ForeignKey('T_物件.id'), primary_key=True, autoincrement=False)
+    tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
+    部屋数 = Column(Integer, nullable=False, default=0)  # 有効な部屋の数
+    入居中部屋数 = Column(Integer, nullable=False, default=0)
+    空室数 = Column(Integer, nullable=False, default=0)
+    契約中件数 = Column(Integer, nullable=False, default=0)
+    契約賃料 = Column(Numeric(15, 0), nullable=False, default=0)  # 契約中の月額賃料の合計
+    想定賃料 = Column(Numeric(15, 0), nullable=False, default=0)  # 満室時の月額賃料（部屋の賃料の合計）
+    稼働率 = Column(Numeric(5, 2), nullable=True)  # 入居中部屋数 / 部屋数（%）。部屋がない場合はNULL
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class TRenewalTask(Base):
+    """T_更新タスクテーブル（契約満了が近い契約の更新手続き。契約満了スキャンで作成）"""
+    __tablename__ = 'T_更新タスク'
+    __table_args__ = (
+        # 同じ契約・同じ満了日のタスクは1件だけ（スキャンを何度実行しても重複しない）
+        Index('ix_T_更新タスク_契約_期限', 'contract_id', '期限', unique=True),
+        Index('ix_T_更新タスク_テナント', 'tenant_id', '状況', '期限'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
+    contract_id = Column(Integer, ForeignKey('T_契約.id'), nullable=False)
+    期限 = Column(Date, nullable=False)  # 契約終了日
+    状況 = Column(String(20), nullable=False, default='未対応')  # '未対応', '対応済'
+    備考 = Column(Text, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class TOccupancyMonthly(Base):
+    """T_月次稼働テーブル（部屋ごと・月ごとの稼働日数と空室損失。契約の期間から再構築）"""
+    __tablename__ = 'T_月次稼働'
+    __table_args__ = (
+        Index('ix_T_月次稼働_テナント_年月', 'tenant_id', '年月'),
+        Index('ix_T_月次稼働_物件_年月', '物件id', '年月'),
+    )
+    
+    部屋id = Column(Integer, ForeignKey('T_部屋.id'), primary_key=True, autoincrement=False)
+    年月 = Column(String(7), primary_key=True)  # YYYY-MM形式
+    物件id = Column(Integer, ForeignKey('T_物件.id'), nullable=False)
+    tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
+    月日数 = Column(Integer, nullable=False)
+    稼働日数 = Column(Integer, nullable=False, default=0)  # 契約期間に含まれる日数（重複する契約は1日として数える）
+    契約賃料 = Column(Numeric(12, 0), nullable=False, default=0)  # 契約の月額賃料（開始月・終了月は日割り）
+    想定賃料 = Column(Numeric(12, 0), nullable=False, default=0)  # 部屋の賃料（満室時）
+    空室損失 = Column(Numeric(12, 0), nullable=False, default=0)  # 想定賃料 × 空室日数 / 月日数
+
+
+class TOccupancyMonthlyProperty(Base):
+    """T_月次稼働_物件テーブル（T_月次稼働 を物件・月ごとに合計したもの。推移グラフ・実績稼働率はこちらを読む）"""
+    __tablename__ = 'T_月次稼働_物件'
+    __table_args__ = (
+        Index('ix_T_月次稼働_物件_テナント_年月', 'tenant_id', '年月'),
+    )
+    
+    物件id = Column(Integer, ForeignKey('T_物件.id'), primary_key=True, autoincrement=False)
+    年月 = Column(String(7), primary_key=True)  # YYYY-MM形式
+    tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=False)
+    部屋数 = Column(Integer, nullable=False, default=0)
+    月日数 = Column(Integer, nullable=False, default=0)  # 部屋数 × 月の日数
+    稼働日数 = Column(Integer, nullable=False, default=0)
+    契約賃料 = Column(Numeric(15, 0), nullable=False, default=0)
+    想定賃料 = Column(Numeric(15, 0), nullable=False, default=0)
+    空室損失 = Column(Numeric(15, 0), nullable=False, default=0)
+
+
+class TJob(Base):
+    """T_ジョブテーブル（再計算・一括処理などの非同期ジョブ。ワーカープロセスが取り出して実行）"""
+    __tablename__ = 'T_ジョブ'
+    __table_args__ = (
+        # ワーカーが次に実行するジョブの取得用（待機中を実行予定日時順）
+        Index('ix_T_ジョブ_状況_予定', '状況', '実行予定日時', 'id'),
+        Index('ix_T_ジョブ_テナント', 'tenant_id', 'created_at'),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    tenant_id = Column(Integer, ForeignKey('T_テナント.id'), nullable=True)  # NULLは全テナント対象のジョブ
+    種別 = Column(String(50), nullable=False)
+    引数 = Column(Text, nullable=True)  # JSON
+    状況 = Column(String(20), nullable=False, default='待機')  # '待機', '実行中', '完了', '失敗'
+    試行回数 = Column(Integer, nullable=False, default=0)
+    最大試行回数 = Column(Integer, nullable=False, default=3)
+    進捗 = Column(Integer, nullable=False, default=0)  # 0〜100（%）
+    進捗メッセージ = Column(String(255), nullable=True)
+    結果 = Column(Text, nullable=True)  # JSON
+    エラー = Column(Text, nullable=True)
+    実行予定日時 = Column(DateTime, nullable=False)  # 再試行時は待ち時間後の日時
+    開始日時 = Column(DateTime, nullable=True)
+    終了日時 = Column(DateTime, nullable=True)
+    ハートビート日時 = Column(DateTime, nullable=True)  # 実行中のワーカーが定期的に更新（途中で停止したジョブの検出用）
+    ワーカー = Column(String(100), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+
+class TJobFile(Base):
+    """T_ジョブファイルテーブル（ジョブに渡すアップロードファイル。引数には含めず、ジョブの終了時に削除）"""
+    __tablename__ = 'T_ジョブファイル'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ジョブid = Column(Integer, ForeignKey('T_ジョブ.id'), nullable=False, index=True)
+    ファイル名 = Column(String(255), nullable=False)
+    内容 = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
@@ -2,7 +2,7 @@
 自動マイグレーション機能
 
 アプリケーション起動時に自動的にデータベーススキーマをチェックし、
-不足しているカラムやテーブルを追加します。
+不足しているカラム・インデックスやテーブルを追加します。
 """
 
 import logging
@@ -90,6 +90,27 @@ def add_missing_columns(engine, model, table_name):
     return True
 
 
+def add_missing_indexes(engine, model, table_name):
+    """モデルに定義されていて既存テーブルに無いインデックスを作成"""
+    try:
+        existing_indexes = {index['name'] for index in inspect(engine).get_indexes(table_name)}
+    except Exception as e:
+        logger.warning(f"テーブル '{table_name}' が存在しないためスキップ: {e}")
+        return True
+    
+    for index in model.__table__.indexes:
+        if index.name in existing_indexes:
+            continue
+        try:
+            index.create(bind=engine, checkfirst=True)
+            logger.info(f"✓ インデックス '{index.name}' を作成しました")
+        except SQLAlchemyError as e:
+            logger.error(f"✗ インデックス '{index.name}' の作成に失敗: {e}")
+            continue
+    
+    return True
+
+
 def auto_migrate_all(engine, models):
     """
     すべてのモデルに対して自動マイグレーションを実行
@@ -109,6 +130,7 @@ def auto_migrate_all(engine, models):
         try:
             logger.info(f"\nテーブル '{table_name}' をチェック中...")
             add_missing_columns(engine, model, table_name)
+            add_missing_indexes(engine, model, table_name)
             success_count += 1
         except Exception as e:
             logger.error(f"テーブル '{table_name}' のマイグレーションに失敗: {e}")
@@ -0,0 +1,450 @@
+"""
+一括取込ユーティリティ
+CSV / Excel から物件・部屋・入居者・契約をチャンク単位で検証し、
+外部キー（物件名→物件id、部屋番号→部屋id、入居者氏名→入居者id）をメモリ上の索引で解決して一括登録する
+"""
+import codecs
+import csv
+import io
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import select, insert, update, Integer, Numeric, Date, DateTime, String
+
+from app.models_property import TBukken, THeya, TNyukyosha, TKeiyaku
+from app.utils.global_search import index_search_entries, normalize_search_text
+from app.utils.property_summary import refresh_property_summaries
+from app.utils.occupancy_history import rebuild_occupancy_history
+from app.utils.simulation_hash import mark_tenant_simulations_stale
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+# 1回の検証・登録で扱う行数
+IMPORT_CHUNK_SIZE = 1000
+
+# 画面に表示するエラーの最大件数（件数自体はすべて数える）
+MAX_REPORTED_ERRORS = 500
+
+# ファイルから取り込まない（システムが設定する）カラム
+_SYSTEM_COLUMNS = {'id', 'tenant_id', '有効', 'created_at', 'updated_at'}
+
+# 取込対象: 種別 → (モデル, 外部キーの代わりに指定する列, 検索インデックスの種別)
+IMPORT_TARGETS = {
+    '物件': (TBukken, [], '物件'),
+    '部屋': (THeya, ['物件名'], '部屋'),
+    '入居者': (TNyukyosha, [], '入居者'),
+    '契約': (TKeiyaku, ['物件名', '部屋番号', '入居者氏名', '入居者電話番号'], None),
+}
+
+# 外部キー列（ファイルでは名称で指定する）
+_FOREIGN_KEY_COLUMNS = {'property_id', 'room_id', 'tenant_person_id'}
+
+# 名称で指定する列のうち必須のもの
+_REQUIRED_LOOKUPS = {'物件名', '部屋番号', '入居者氏名'}
+
+_DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%Y年%m月%d日', '%Y%m%d')
+
+
+class ImportRowError(ValueError):
+    """行の検証エラー"""
+
+    def __init__(self, column, message):
+        super().__init__(message)
+        self.column = column
+        self.message = message
+
+
+# ==================== ファイルの読み込み ====================
+
+def _detect_encoding(stream) -> str:
+    """先頭を読んでCSVの文字コードを判定（UTF-8で読めなければShift_JIS系）"""
+    head = stream.read(64 * 1024)
+    stream.seek(0)
+    try:
+        # 途中で切れたマルチバイト文字は無視して判定
+        codecs.getincrementaldecoder('utf-8-sig')().decode(head, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp932'
+
+
+def iter_csv_rows(stream):
+    """
+    CSVを1行ずつ辞書で返す（ファイル全体をメモリに読み込まない）
+
+    Parameters:
+    - stream: バイナリのファイルオブジェクト（seek可能）
+    """
+    text_stream = io.TextIOWrapper(stream, encoding=_detect_encoding(stream), newline='')
+    try:
+        for row in csv.DictReader(text_stream):
+            yield {(key or '').strip(): value for key, value in row.items()}
+    finally:
+        text_stream.detach()
+
+
+def iter_excel_rows(stream):
+    """Excel（.xlsx）の先頭シートを1行ずつ辞書で返す（読み取り専用モード）"""
+    if openpyxl is None:
+        raise ImportRowError(None, 'Excelの取込には openpyxl のインストールが必要です')
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        keys = [str(value).strip() if value is not None else '' for value in header]
+        for values in rows:
+            if values is None or all(value is None for value in values):
+                continue
+            yield dict(zip(keys, values))
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(stream, filename: str):
+    """ファイル名の拡張子でCSV / Excelを判定して行を返す"""
+    if (filename or '').lower().endswith(('.xlsx', '.xlsm')):
+        return iter_excel_rows(stream)
+    return iter_csv_rows(stream)
+
+
+# ==================== スキーマからの変換・検証 ====================
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_int(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(str(value).replace(',', '').strip())
+
+
+def _to_decimal(value, column_type):
+    if isinstance(value, float):
+        value = repr(value)
+    number = Decimal(str(value).replace(',', '').replace('¥', '').replace('円', '').strip())
+    if not number.is_finite():
+        raise InvalidOperation
+    if column_type.precision is not None:
+        scale = column_type.scale or 0
+        if abs(number) >= Decimal(10) ** (column_type.precision - scale):
+            raise ImportRowError(None, f'桁数が大きすぎます（整数部{column_type.precision - scale}桁まで）')
+        number = number.quantize(Decimal(1).scaleb(-scale))
+    return number
+
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text_value = str(value).strip()
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text_value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(text_value)
+
+
+def _column_spec(column):
+    """モデルのカラムから (必須かどうか, 値の変換関数, 型の表示名) を作成"""
+    column_type = column.type
+    required = not column.nullable and column.default is None and column.server_default is None
+
+    if isinstance(column_type, Integer):
+        convert, label = _to_int, '整数'
+    elif isinstance(column_type, Numeric):
+        def convert(value, column_type=column_type):
+            return _to_decimal(value, column_type)
+        label = '数値'
+    elif isinstance(column_type, (Date, DateTime)):
+        convert, label = _to_date, '日付（YYYY-MM-DD）'
+    else:
+        length = getattr(column_type, 'length', None) if isinstance(column_type, String) else None
+
+        def convert(value, length=length):
+            text_value = value.strftime('%Y-%m-%d') if isinstance(value, date) else str(value).strip()
+            if length and len(text_value) > length:
+                raise ImportRowError(None, f'{length}文字以内で入力してください')
+            return text_value
+        label = '文字列'
+    return required, convert, label
+
+
+def import_columns(target: str) -> list:
+    """
+    取込ファイルの列（ヘッダー）一覧
+
+    Returns:
+    - list: [(列名, 必須かどうか)]
+    """
+    model, lookups, _kind = IMPORT_TARGETS[target]
+    columns = [(name, name in _REQUIRED_LOOKUPS) for name in lookups]
+    for column in model.__table__.columns:
+        if column.key in _SYSTEM_COLUMNS or column.key in _FOREIGN_KEY_COLUMNS:
+            continue
+        columns.append((column.key, _column_spec(column)[0]))
+    return columns
+
+
+def _build_row_converter(target: str, header):
+    """ヘッダーを検証し、1行を (カラム値の辞書, 名称列の辞書) に変換する関数を返す"""
+    model, lookups, _kind = IMPORT_TARGETS[target]
+    header = set(header)
+    missing = [name for name, required in import_columns(target) if required and name not in header]
+    if missing:
+        raise ImportRowError(None, f'必須の列がありません: {", ".join(missing)}')
+
+    specs = []
+    for column in model.__table__.columns:
+        if column.key in _SYSTEM_COLUMNS or column.key in _FOREIGN_KEY_COLUMNS:
+            continue
+        required, convert, label = _column_spec(column)
+        # 空欄はモデルの既定値（なければNULL）。全行で同じキーを持たせてexecutemanyを1つにまとめる
+        default = column.default.arg if column.default is not None and column.default.is_scalar else None
+        specs.append((column.key, required, convert, label, default))
+
+    def convert_row(raw: dict) -> tuple:
+        values = {}
+        for key, required, convert, label, default in specs:
+            value = raw.get(key)
+            if _blank(value):
+                if required:
+                    raise ImportRowError(key, '必須項目です')
+                values[key] = default
+                continue
+            try:
+                values[key] = convert(value)
+            except ImportRowError as e:
+                raise ImportRowError(key, e.message)
+            except (ValueError, InvalidOperation, TypeError):
+                raise ImportRowError(key, f'{label}として解釈できません: {value}')
+        names = {}
+        for name in lookups:
+            value = raw.get(name)
+            if _blank(value):
+                if name in _REQUIRED_LOOKUPS:
+                    raise ImportRowError(name, '必須項目です')
+                continue
+            names[name] = str(value).strip()
+        return values, names
+
+    return convert_row
+
+
+# ==================== 外部キーのメモリ索引 ====================
+
+class _LookupIndex:
+    """テナント内の物件・部屋・入居者を名称で引くための索引（取込開始時に1回ずつ読み込む）"""
+
+    def __init__(self, db, tenant_id, target):
+        self.properties = {}
+        self.rooms = {}
+        self.people = {}
+        if target == '入居者':
+            return
+
+        for property_id, name in db.execute(
+            select(TBukken.id, TBukken.物件名).where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+        ):
+            self.properties.setdefault(name, []).append(property_id)
+
+        if target in ('部屋', '契約'):
+            for room_id, property_id, room_number in db.execute(
+                select(THeya.id, THeya.property_id, THeya.部屋番号)
+                .join(TBukken, TBukken.id == THeya.property_id)
+                .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1, THeya.有効 == 1)
+            ):
+                self.rooms[(property_id, room_number)] = room_id
+
+        if target == '契約':
+            for person_id, name, phone in db.execute(
+                select(TNyukyosha.id, TNyukyosha.氏名, TNyukyosha.電話番号)
+                .where(TNyukyosha.tenant_id == tenant_id, TNyukyosha.有効 == 1)
+            ):
+                self.people.setdefault(normalize_search_text(name), []).append(
+                    (person_id, normalize_search_text(phone))
+                )
+
+    def property_id(self, name: str) -> int:
+        ids = self.properties.get(name, [])
+        if not ids:
+            raise ImportRowError('物件名', f'物件が見つかりません: {name}')
+        if len(ids) > 1:
+            raise ImportRowError('物件名', f'同じ名前の物件が複数あります: {name}')
+        return ids[0]
+
+    def room_id(self, property_id: int, room_number: str) -> int:
+        room_id = self.rooms.get((property_id, room_number))
+        if room_id is None:
+            raise ImportRowError('部屋番号', f'部屋が見つかりません: {room_number}')
+        return room_id
+
+    def person_id(self, name: str, phone=None) -> int:
+        candidates = self.people.get(normalize_search_text(name), [])
+        if phone:
+            candidates = [c for c in candidates if c[1] == normalize_search_text(phone)]
+        if not candidates:
+            raise ImportRowError('入居者氏名', f'入居者が見つかりません: {name}')
+        if len(candidates) > 1:
+            raise ImportRowError('入居者電話番号', f'同じ氏名の入居者が複数あります（電話番号で指定してください）: {name}')
+        return candidates[0][0]
+
+
+def _resolve(target: str, values: dict, names: dict, index: _LookupIndex, tenant_id: int, seen: set) -> dict:
+    """名称の外部キーを解決し、重複を検査して登録する行を返す"""
+    if target in ('物件', '入居者'):
+        values['tenant_id'] = tenant_id
+    elif target == '部屋':
+        values['property_id'] = index.property_id(names['物件名'])
+        key = (values['property_id'], values['部屋番号'])
+        if key in index.rooms:
+            raise ImportRowError('部屋番号', f'既に登録されている部屋です: {values["部屋番号"]}')
+        if key in seen:
+            raise ImportRowError('部屋番号', f'ファイル内で部屋番号が重複しています: {values["部屋番号"]}')
+        seen.add(key)
+    elif target == '契約':
+        property_id = index.property_id(names['物件名'])
+        values['room_id'] = index.room_id(property_id, names['部屋番号'])
+        values['tenant_person_id'] = index.person_id(names['入居者氏名'], names.get('入居者電話番号'))
+        end_date = values.get('契約終了日')
+        if end_date and end_date < values['契約開始日']:
+            raise ImportRowError('契約終了日', '契約終了日が契約開始日より前です')
+        values['_property_id'] = property_id
+    return values
+
+
+# ==================== 取込 ====================
+
+def _insert_chunk(db, target: str, rows: list, result: dict, touched: dict):
+    """検証済みの行をexecutemanyで登録し、検索インデックスと関連データを更新"""
+    model, _lookups, kind = IMPORT_TARGETS[target]
+    property_ids = [row.pop('_property_id', None) for row in rows]
+    inserted_ids = db.execute(insert(model).returning(model.id), rows).scalars().all()
+    result['inserted'] += len(inserted_ids)
+
+    if kind:
+        index_search_entries(db, kind, inserted_ids)
+    if target == '物件':
+        touched['summaries'].update(inserted_ids)
+    elif target == '部屋':
+        touched['properties'].update(row['property_id'] for row in rows if row.get('賃料'))
+        touched['summaries'].update(row['property_id'] for row in rows)
+    elif target == '契約':
+        touched['rooms'].update(
+            row['room_id'] for row in rows if row.get('契約状況', '契約中') == '契約中'
+        )
+        touched['properties'].update(pid for pid in property_ids if pid)
+        touched['summaries'].update(pid for pid in property_ids if pid)
+        touched['contract_rooms'].update(row['room_id'] for row in rows)
+
+
+def import_rows(db, tenant_id: int, target: str, rows, dry_run: bool = False,
+                chunk_size: int = IMPORT_CHUNK_SIZE) -> dict:
+    """
+    行のイテレータを検証して一括登録
+
+    IMPORT_CHUNK_SIZE 行ずつ検証し、エラーのない行だけを executemany で登録します。
+    エラーのある行は登録せず、行番号・列・内容を結果に含めます。コミットは呼び出し側で行い、
+    dry_run の場合は検証のみ（登録しない）です。
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID
+    - target: '物件', '部屋', '入居者', '契約'
+    - rows: 列名→値の辞書のイテレータ（iter_file_rows の戻り値）
+    - dry_run: Trueの場合は検証のみ
+
+    Returns:
+    - dict: {'target', 'dry_run', 'total', 'valid', 'inserted', 'error_count',
+             'errors': [{'row', 'column', 'message'}], 'aborted', 'elapsed'}
+      aborted がTrueの場合はファイルを最後まで読めなかったため、呼び出し側でロールバックしてください
+    """
+    started = time.perf_counter()
+    result = {
+        'target': target, 'dry_run': dry_run, 'total': 0, 'valid': 0, 'inserted': 0,
+        'error_count': 0, 'errors': [], 'aborted': False, 'elapsed': 0.0,
+    }
+
+    def add_error(row_number, column, message):
+        result['error_count'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'row': row_number, 'column': column, 'message': message})
+
+    rows = iter(rows)
+    try:
+        first = next(rows, None)
+        if first is None:
+            add_error(None, None, 'データ行がありません')
+            return result
+        convert_row = _build_row_converter(target, first.keys())
+    except ImportRowError as e:
+        add_error(None, e.column, e.message)
+        return result
+    except (UnicodeDecodeError, csv.Error, ValueError) as e:
+        add_error(None, None, f'ファイルを読み込めません: {e}')
+        return result
+
+    index = _LookupIndex(db, tenant_id, target)
+    seen = set()
+    touched = {'properties': set(), 'rooms': set(), 'summaries': set(), 'contract_rooms': set()}
+    chunk = []
+
+    def process(row_number, raw):
+        result['total'] += 1
+        try:
+            values, names = convert_row(raw)
+            chunk.append(_resolve(target, values, names, index, tenant_id, seen))
+            result['valid'] += 1
+        except ImportRowError as e:
+            add_error(row_number, e.column, e.message)
+
+    # 1行目はヘッダー
+    process(2, first)
+    try:
+        for row_number, raw in enumerate(rows, start=3):
+            process(row_number, raw)
+            if len(chunk) >= chunk_size:
+                if not dry_run:
+                    _insert_chunk(db, target, chunk, result, touched)
+                chunk = []
+    except (UnicodeDecodeError, csv.Error) as e:
+        # ファイル自体が壊れている場合は途中までの登録も取り消せるように中断を返す
+        add_error(result['total'] + 2, None, f'ファイルを読み込めません: {e}')
+        result['aborted'] = True
+        return result
+    if chunk and not dry_run:
+        _insert_chunk(db, target, chunk, result, touched)
+
+    if not dry_run:
+        if touched['rooms']:
+            room_ids = list(touched['rooms'])
+            for start in range(0, len(room_ids), chunk_size):
+                db.execute(
+                    update(THeya)
+                    .where(THeya.id.in_(room_ids[start:start + chunk_size]))
+                    .values(入居状況='入居中', updated_at=datetime.now())
+                    .execution_options(synchronize_session=False)
+                )
+        # executemany の登録ではORMイベントが発生しないため、物件集計と月次稼働はまとめて作り直す
+        refresh_property_summaries(db, touched['summaries'])
+        rebuild_occupancy_history(db, room_ids=touched['contract_rooms'])
+        mark_tenant_simulations_stale(db, tenant_id, touched['properties'])
+
+    result['elapsed'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def template_csv(target: str) -> str:
+    """取込用CSVのヘッダー行（Excelで開けるようBOM付きで保存する想定）"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow([name for name, _required in import_columns(target)])
+    return buffer.getvalue()
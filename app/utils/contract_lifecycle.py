@@ -0,0 +1,274 @@
+"""
+契約満了・更新スキャンユーティリティ
+契約終了日を過ぎた契約の終了と部屋の入居状況の更新、満了が近い契約の更新タスク作成、
+テナントごとのダイジェスト作成を、全テナント分まとめて集合演算（UPDATE / INSERT ... SELECT）で行う。
+夜間バッチ（scripts/scan_contracts.py）と画面から実行する。
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import select, update, insert, exists, literal, true, and_, or_
+
+from app.models_property import TBukken, THeya, TNyukyosha, TKeiyaku, TRenewalTask
+from app.utils.property_summary import refresh_property_summaries
+from app.utils.simulation_hash import mark_tenant_simulations_stale
+
+
+# 満了の何日前から更新タスクを作成するか
+RENEWAL_NOTICE_DAYS = 90
+
+_SCAN_BATCH_SIZE = 1000
+
+
+def _tenant_contracts(tenant_id):
+    """テナントの契約に絞り込む条件（部屋→物件をたどる）。tenant_id がNoneの場合は全テナント"""
+    if tenant_id is None:
+        return true()
+    return TKeiyaku.room_id.in_(
+        select(THeya.id).join(TBukken, TBukken.id == THeya.property_id).where(TBukken.tenant_id == tenant_id)
+    )
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), _SCAN_BATCH_SIZE):
+        yield values[start:start + _SCAN_BATCH_SIZE]
+
+
+def expire_contracts(db, today: date, tenant_id=None) -> dict:
+    """
+    契約終了日を過ぎた契約中の契約を「契約終了」にし、他に有効な契約がない部屋を空室にする
+
+    Parameters:
+    - db: SQLAlchemyセッション（呼び出し側でcommit）
+    - today: 基準日（契約終了日がこの日より前の契約が対象）
+    - tenant_id: 指定した場合はそのテナントのみ
+
+    Returns:
+    - dict: {'expired': 終了した契約数, 'vacated': 空室にした部屋数,
+             'by_tenant': {テナントID: 終了した契約数}, 'property_ids': 変更があった物件IDの集合}
+    """
+    expired = db.execute(
+        update(TKeiyaku.__table__)
+        .where(
+            TKeiyaku.契約状況 == '契約中',
+            TKeiyaku.契約終了日 < today,
+            _tenant_contracts(tenant_id),
+        )
+        .values(契約状況='契約終了')
+        .returning(TKeiyaku.id, TKeiyaku.room_id)
+    ).all()
+    if not expired:
+        return {'expired': 0, 'vacated': 0, 'by_tenant': {}, 'property_ids': set()}
+
+    contract_ids = [row.id for row in expired]
+    room_ids = sorted({row.room_id for row in expired})
+
+    # 満了した契約の更新タスクは閉じる
+    for chunk in _chunks(contract_ids):
+        db.execute(
+            update(TRenewalTask.__table__)
+            .where(TRenewalTask.contract_id.in_(chunk), TRenewalTask.状況 == '未対応')
+            .values(状況='満了')
+        )
+
+    # 同じ部屋に続けて有効な契約（更新後の契約など）がある場合は空室にしない
+    still_active = exists().where(
+        TKeiyaku.room_id == THeya.id,
+        TKeiyaku.契約状況 == '契約中',
+        or_(TKeiyaku.契約終了日.is_(None), TKeiyaku.契約終了日 >= today),
+    )
+    vacated = 0
+    rooms_by_tenant = {}
+    property_ids = set()
+    for chunk in _chunks(room_ids):
+        vacated += db.execute(
+            update(THeya.__table__)
+            .where(THeya.id.in_(chunk), THeya.入居状況 == '入居中', ~still_active)
+            .values(入居状況='空室')
+        ).rowcount or 0
+        for room_id, property_id, owner_id in db.execute(
+            select(THeya.id, THeya.property_id, TBukken.tenant_id)
+            .join(TBukken, TBukken.id == THeya.property_id)
+            .where(THeya.id.in_(chunk))
+        ):
+            rooms_by_tenant[room_id] = owner_id
+            property_ids.add(property_id)
+
+    by_tenant = {}
+    for row in expired:
+        owner_id = rooms_by_tenant.get(row.room_id)
+        by_tenant[owner_id] = by_tenant.get(owner_id, 0) + 1
+    return {'expired': len(expired), 'vacated': vacated, 'by_tenant': by_tenant, 'property_ids': property_ids}
+
+
+def occupy_started_rooms(db, today: date, tenant_id=None) -> list:
+    """
+    開始日を迎えた契約中の契約がある空室の部屋を入居中にする
+
+    Returns:
+    - list: 入居中にした部屋の物件ID（部屋ごとに1要素）
+    """
+    started = exists().where(
+        TKeiyaku.room_id == THeya.id,
+        TKeiyaku.契約状況 == '契約中',
+        TKeiyaku.契約開始日 <= today,
+        or_(TKeiyaku.契約終了日.is_(None), TKeiyaku.契約終了日 >= today),
+    )
+    conditions = [THeya.有効 == 1, THeya.入居状況 != '入居中', started]
+    if tenant_id is not None:
+        conditions.append(THeya.property_id.in_(select(TBukken.id).where(TBukken.tenant_id == tenant_id)))
+    return db.execute(
+        update(THeya.__table__).where(*conditions).values(入居状況='入居中').returning(THeya.property_id)
+    ).scalars().all()
+
+
+def create_renewal_tasks(db, today: date, days: int = RENEWAL_NOTICE_DAYS, tenant_id=None) -> int:
+    """
+    契約終了日が today〜today+days の契約中の契約に更新タスクを作成（作成済みの契約は除く）
+
+    Returns:
+    - int: 作成したタスク数
+    """
+    already_created = exists().where(
+        TRenewalTask.contract_id == TKeiyaku.id,
+        TRenewalTask.期限 == TKeiyaku.契約終了日,
+    )
+    source = (
+        select(TBukken.tenant_id, TKeiyaku.id, TKeiyaku.契約終了日, literal('未対応'))
+        .select_from(TKeiyaku)
+        .join(THeya, THeya.id == TKeiyaku.room_id)
+        .join(TBukken, TBukken.id == THeya.property_id)
+        .where(
+            TKeiyaku.契約状況 == '契約中',
+            TKeiyaku.契約終了日.between(today, today + timedelta(days=days)),
+            ~already_created,
+        )
+    )
+    if tenant_id is not None:
+        source = source.where(TBukken.tenant_id == tenant_id)
+    result = db.execute(
+        insert(TRenewalTask.__table__).from_select(['tenant_id', 'contract_id', '期限', '状況'], source)
+    )
+    return result.rowcount or 0
+
+
+def expiring_contracts_query(today: date, days: int = RENEWAL_NOTICE_DAYS, tenant_id=None):
+    """
+    契約終了日が today+days 以前の契約中の契約（満了済みを含む）と物件・部屋・入居者・更新タスク
+
+    (契約状況, 契約終了日) のインデックスによる範囲検索になります。
+    """
+    query = (
+        select(
+            TBukken.tenant_id, TKeiyaku.id.label('contract_id'), TKeiyaku.契約終了日, TKeiyaku.月額賃料,
+            TBukken.id.label('property_id'), TBukken.物件名, THeya.id.label('room_id'), THeya.部屋番号,
+            TNyukyosha.氏名, TRenewalTask.id.label('task_id'), TRenewalTask.状況,
+        )
+        .select_from(TKeiyaku)
+        .join(THeya, THeya.id == TKeiyaku.room_id)
+        .join(TBukken, TBukken.id == THeya.property_id)
+        .outerjoin(TNyukyosha, TNyukyosha.id == TKeiyaku.tenant_person_id)
+        .outerjoin(TRenewalTask, and_(
+            TRenewalTask.contract_id == TKeiyaku.id, TRenewalTask.期限 == TKeiyaku.契約終了日
+        ))
+        .where(
+            TKeiyaku.契約状況 == '契約中',
+            TKeiyaku.契約終了日 <= today + timedelta(days=days),
+        )
+        .order_by(TBukken.tenant_id, TKeiyaku.契約終了日, TKeiyaku.id)
+    )
+    if tenant_id is not None:
+        query = query.where(TBukken.tenant_id == tenant_id)
+    return query
+
+
+def build_digests(db, today: date, days: int = RENEWAL_NOTICE_DAYS, tenant_id=None, expired_by_tenant=None) -> dict:
+    """
+    テナントごとのダイジェスト（満了が近い契約の一覧と件数）を1クエリで作成
+
+    Parameters:
+    - expired_by_tenant: expire_contracts の by_tenant（今回終了した契約数として含める）
+
+    Returns:
+    - dict: {テナントID: {'tenant_id', '満了', '更新期限間近': [...], '未対応タスク', '月額賃料合計'}}
+    """
+    expired_by_tenant = expired_by_tenant or {}
+    digests = {}
+
+    def digest_for(owner_id):
+        if owner_id not in digests:
+            digests[owner_id] = {
+                'tenant_id': owner_id, '満了': expired_by_tenant.get(owner_id, 0),
+                '更新期限間近': [], '未対応タスク': 0, '月額賃料合計': 0,
+            }
+        return digests[owner_id]
+
+    for row in db.execute(expiring_contracts_query(today, days, tenant_id)):
+        digest = digest_for(row.tenant_id)
+        digest['更新期限間近'].append({
+            'contract_id': row.contract_id, '物件名': row.物件名, '部屋番号': row.部屋番号, '入居者': row.氏名,
+            '契約終了日': row.契約終了日, '残日数': (row.契約終了日 - today).days, '月額賃料': row.月額賃料,
+            'task_id': row.task_id, 'タスク状況': row.状況,
+        })
+        digest['月額賃料合計'] += row.月額賃料 or 0
+        if row.状況 == '未対応':
+            digest['未対応タスク'] += 1
+    for owner_id in expired_by_tenant:
+        if owner_id is not None and (tenant_id is None or owner_id == tenant_id):
+            digest_for(owner_id)
+    return digests
+
+
+def run_contract_scan(db, today=None, days: int = RENEWAL_NOTICE_DAYS, tenant_id=None) -> dict:
+    """
+    契約満了スキャンを実行（満了処理 → 入居状況の同期 → 更新タスク作成 → ダイジェスト）
+
+    Parameters:
+    - db: SQLAlchemyセッション（呼び出し側でcommit）
+    - today: 基準日（省略時は今日）
+    - days: 満了の何日前から更新タスクを作成するか
+    - tenant_id: 指定した場合はそのテナントのみ（省略時は全テナント）
+
+    Returns:
+    - dict: {'date', 'expired', 'vacated', 'occupied', 'tasks_created', 'digests'}
+    """
+    today = today or date.today()
+    expiry = expire_contracts(db, today, tenant_id)
+    occupied = occupy_started_rooms(db, today, tenant_id)
+    tasks_created = create_renewal_tasks(db, today, days, tenant_id)
+
+    # 一括UPDATEではORMイベントが発生しないため、物件集計と要再計算フラグはまとめて更新
+    changed_property_ids = expiry['property_ids'] | set(occupied)
+    refresh_property_summaries(db, changed_property_ids)
+    if changed_property_ids:
+        owners = db.execute(
+            select(TBukken.tenant_id, TBukken.id).where(TBukken.id.in_(changed_property_ids))
+        ).all()
+        property_ids_by_tenant = {}
+        for owner_id, property_id in owners:
+            property_ids_by_tenant.setdefault(owner_id, []).append(property_id)
+        for owner_id, property_ids in property_ids_by_tenant.items():
+            mark_tenant_simulations_stale(db, owner_id, property_ids)
+
+    return {
+        'date': today,
+        'expired': expiry['expired'],
+        'vacated': expiry['vacated'],
+        'occupied': len(occupied),
+        'tasks_created': tasks_created,
+        'digests': build_digests(db, today, days, tenant_id, expiry['by_tenant']),
+    }
+
+
+def format_digest(digest: dict) -> str:
+    """ダイジェストをテキストに整形（バッチのログ・通知用）"""
+    lines = [
+        f"テナント {digest['tenant_id']}: 満了 {digest['満了']}件 / 満了間近 {len(digest['更新期限間近'])}件"
+        f"（未対応タスク {digest['未対応タスク']}件）"
+    ]
+    for item in digest['更新期限間近']:
+        lines.append(
+            f"  {item['契約終了日']}（あと{item['残日数']}日） {item['物件名']} {item['部屋番号']} "
+            f"{item['入居者'] or '-'} {item['タスク状況'] or '-'}"
+        )
+    return '\n'.join(lines)
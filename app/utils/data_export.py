@@ -0,0 +1,231 @@
+"""
+データエクスポートユーティリティ
+テナントのデータをサーバーサイドカーソル（yield_per）で少しずつ読み出し、
+CSV / JSON Lines / 列指向（カラムナーJSON・Parquet）でストリーミング出力する
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select, Integer, Numeric, Date, DateTime
+
+from app.db import SessionLocal
+from app.models_property import (
+    TBukken, THeya, TNyukyosha, TKeiyaku, TYachinShushi, TBukkenKeihi, THeyaKeihi,
+    TSimulation, TSimulationResult
+)
+from app.utils.list_api import json_value
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# 1回にDBから読み出して出力する行数（メモリ使用量はこの行数分で一定）
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'jsonl': ('application/x-ndjson; charset=utf-8', 'jsonl'),
+    'columnar': ('application/x-ndjson; charset=utf-8', 'columnar.jsonl'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def _tenant_query(model, tenant_id):
+    """テーブルごとのテナントで絞り込んだクエリ（全カラム、主キー順）"""
+    query = select(*model.__table__.columns)
+    if model in (TBukken, TNyukyosha, TSimulation):
+        query = query.where(model.tenant_id == tenant_id)
+    elif model in (THeya, TBukkenKeihi):
+        property_column = THeya.property_id if model is THeya else TBukkenKeihi.物件id
+        query = query.join(TBukken, TBukken.id == property_column).where(TBukken.tenant_id == tenant_id)
+    elif model is THeyaKeihi:
+        query = (
+            query.join(THeya, THeya.id == THeyaKeihi.部屋id)
+            .join(TBukken, TBukken.id == THeya.property_id)
+            .where(TBukken.tenant_id == tenant_id)
+        )
+    elif model is TKeiyaku:
+        query = (
+            query.join(THeya, THeya.id == TKeiyaku.room_id)
+            .join(TBukken, TBukken.id == THeya.property_id)
+            .where(TBukken.tenant_id == tenant_id)
+        )
+    elif model is TYachinShushi:
+        query = (
+            query.join(TKeiyaku, TKeiyaku.id == TYachinShushi.contract_id)
+            .join(THeya, THeya.id == TKeiyaku.room_id)
+            .join(TBukken, TBukken.id == THeya.property_id)
+            .where(TBukken.tenant_id == tenant_id)
+        )
+    elif model is TSimulationResult:
+        query = (
+            query.join(TSimulation, TSimulation.id == TSimulationResult.シミュレーションid)
+            .where(TSimulation.tenant_id == tenant_id)
+        )
+    primary_key = model.__table__.primary_key.columns.values()[0]
+    return query.order_by(primary_key)
+
+
+# エクスポート対象: 名前 → モデル
+EXPORT_TABLES = {
+    '物件': TBukken,
+    '部屋': THeya,
+    '入居者': TNyukyosha,
+    '契約': TKeiyaku,
+    '家賃収支': TYachinShushi,
+    '物件経費': TBukkenKeihi,
+    '部屋経費': THeyaKeihi,
+    'シミュレーション': TSimulation,
+    'シミュレーション結果': TSimulationResult,
+}
+
+
+def export_columns(table: str) -> list:
+    """出力する列名（モデルの属性名）"""
+    return [column.key for column in EXPORT_TABLES[table].__table__.columns]
+
+
+def iter_batches(table: str, tenant_id: int, batch_size: int = EXPORT_BATCH_SIZE):
+    """
+    テナントのデータを batch_size 行ずつ返す
+
+    yield_per により、PostgreSQLではサーバーサイドカーソルで必要な分だけ取得します。
+    セッションはこのジェネレーターの中で開いて閉じるため、レスポンスのストリーミング中も使えます。
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            _tenant_query(EXPORT_TABLES[table], tenant_id).execution_options(yield_per=batch_size)
+        )
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def stream_csv(table: str, tenant_id: int):
+    """CSV（BOM付きUTF-8、1行目は列名）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(export_columns(table))
+    for rows in iter_batches(table, tenant_id):
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_jsonl(table: str, tenant_id: int):
+    """JSON Lines（1行に1レコードのJSONオブジェクト）"""
+    columns = export_columns(table)
+    for rows in iter_batches(table, tenant_id):
+        yield ''.join(
+            json.dumps({column: json_value(value) for column, value in zip(columns, row)}, ensure_ascii=False) + '\n'
+            for row in rows
+        )
+
+
+def stream_columnar(table: str, tenant_id: int):
+    """
+    列指向のJSON Lines
+
+    1行目に {"table", "columns"}、以降はバッチごとに {"rows": 件数, "data": {列名: [値, ...]}} を出力します。
+    列名を行ごとに繰り返さないため、JSON Linesより小さく、BIツールで列単位に読み込めます。
+    """
+    columns = export_columns(table)
+    yield json.dumps({'table': table, 'columns': columns}, ensure_ascii=False) + '\n'
+    for rows in iter_batches(table, tenant_id):
+        data = {column: [json_value(row[i]) for row in rows] for i, column in enumerate(columns)}
+        yield json.dumps({'rows': len(rows), 'data': data}, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """ParquetWriter が書き込んだバイト列をためて、ストリーミングで取り出すためのファイル風オブジェクト"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(table: str):
+    fields = []
+    for column in EXPORT_TABLES[table].__table__.columns:
+        column_type = column.type
+        if isinstance(column_type, Integer):
+            arrow_type = pyarrow.int64()
+        elif isinstance(column_type, Numeric):
+            arrow_type = pyarrow.decimal128(column_type.precision or 38, column_type.scale or 0)
+        elif isinstance(column_type, DateTime):
+            arrow_type = pyarrow.timestamp('s')
+        elif isinstance(column_type, Date):
+            arrow_type = pyarrow.date32()
+        else:
+            arrow_type = pyarrow.string()
+        fields.append(pyarrow.field(column.key, arrow_type))
+    return pyarrow.schema(fields)
+
+
+def stream_parquet(table: str, tenant_id: int):
+    """Parquet（バッチごとに1つの行グループ。pyarrow が必要）"""
+    schema = _arrow_schema(table)
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in iter_batches(table, tenant_id):
+            columns = {name: [row[i] for row in rows] for i, name in enumerate(schema.names)}
+            writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_stream(table: str, tenant_id: int, export_format: str):
+    """
+    エクスポートのストリーム（文字列またはバイト列のジェネレーター）
+
+    Parameters:
+    - table: EXPORT_TABLES のキー
+    - tenant_id: テナントID
+    - export_format: EXPORT_FORMATS のキー
+
+    Raises:
+    - ValueError: 対象・形式が不正、または parquet で pyarrow がない場合
+    """
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'エクスポートできないテーブルです: {table}')
+    if export_format == 'csv':
+        return stream_csv(table, tenant_id)
+    if export_format == 'jsonl':
+        return stream_jsonl(table, tenant_id)
+    if export_format == 'columnar':
+        return stream_columnar(table, tenant_id)
+    if export_format == 'parquet':
+        if pyarrow is None:
+            raise ValueError('Parquet形式の出力には pyarrow のインストールが必要です')
+        return stream_parquet(table, tenant_id)
+    raise ValueError(f'対応していない形式です: {export_format}')
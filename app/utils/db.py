@@ -7,12 +7,17 @@ import os
 import sqlite3
 from urllib.parse import urlparse
 
+from .request_metrics import TimedSqliteConnection, timed_pg_cursor_factory, record_connection
+
 # ---- psycopg2 の有無 ----
 try:
     import psycopg2
 except Exception:
     psycopg2 = None
 
+# SQLの実行回数・時間をリクエスト計測に記録するカーソル
+_TimedPgCursor = timed_pg_cursor_factory(psycopg2) if psycopg2 else None
+
 
 def _is_pg(conn) -> bool:
     """PostgreSQL/SQLite 判定"""
@@ -57,9 +62,11 @@ def get_db():
                 host=url.hostname,
                 port=url.port,
                 sslmode=sslmode,
-                application_name="login_system"
+                application_name="login_system",
+                cursor_factory=_TimedPgCursor
             )
             conn.autocommit = True
+            record_connection()
             print(f"✅ PostgreSQL 接続成功: {url.hostname}:{url.port}/{url.path[1:]}")
             return conn
         except Exception as e:
@@ -67,7 +74,9 @@ def get_db():
 
     # --- SQLite フォールバック ---
     os.makedirs("database", exist_ok=True)
-    conn = sqlite3.connect("database/login_auth.db", detect_types=sqlite3.PARSE_DECLTYPES)
+    conn = sqlite3.connect("database/login_auth.db", detect_types=sqlite3.PARSE_DECLTYPES,
+                           factory=TimedSqliteConnection)
     conn.row_factory = sqlite3.Row
+    record_connection()
     print("⚠️ SQLite にフォールバック: database/login_auth.db")
     return conn
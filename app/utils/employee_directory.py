@@ -0,0 +1,112 @@
+"""
+従業員ディレクトリサービス
+従業員と所属店舗を1回の結合クエリで取得し、検索とキーセットページングを提供
+"""
+from sqlalchemy import select, cast, String, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from app.models_login import TJugyoin, TJugyoinTenpo, TTenpo
+from app.utils.list_api import search_condition
+
+
+# 1ページの表示件数
+EMPLOYEE_PAGE_SIZE = 50
+EMPLOYEE_PAGE_SIZE_MAX = 200
+
+# group_concat で店舗を連結する区切り文字（店舗名に含まれない制御文字）
+_STORE_SEPARATOR = '\x1f'
+
+
+def _store_aggregate(dialect_name: str):
+    """所属店舗を「id:名称」の形で集約する式（PostgreSQLはarray_agg、それ以外はgroup_concat）"""
+    entry = cast(TTenpo.id, String) + ':' + TTenpo.名称
+    if dialect_name == 'postgresql':
+        return func.array_agg(aggregate_order_by(entry, TTenpo.id)).filter(TTenpo.id.isnot(None))
+    return func.group_concat(entry, _STORE_SEPARATOR)
+
+
+def _parse_stores(value) -> list:
+    """集約した所属店舗を [{'id': int, 'name': str}] に変換"""
+    if not value:
+        return []
+    entries = value if isinstance(value, list) else value.split(_STORE_SEPARATOR)
+    stores = []
+    for entry in entries:
+        if not entry:
+            continue
+        store_id, _, name = entry.partition(':')
+        stores.append({'id': int(store_id), 'name': name})
+    stores.sort(key=lambda s: s['id'])
+    return stores
+
+
+def list_employees(db, tenant_id=None, store_id=None, search=None, after_id=None,
+                   limit=EMPLOYEE_PAGE_SIZE) -> dict:
+    """
+    従業員一覧を所属店舗付きで取得
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID（Noneの場合はテナントで絞り込まない）
+    - store_id: 店舗ID（指定した店舗に所属する従業員のみ。所属店舗の一覧は全店舗を返す）
+    - search: 氏名・ログインID・メールアドレスの部分一致検索
+    - after_id: キーセットページングのカーソル（前ページ最後の従業員ID）
+    - limit: 取得件数
+
+    Returns:
+    - dict: {'employees': [...], 'next_cursor': int or None}
+      employees の各要素は {'id', 'login_id', 'name', 'email', 'active',
+      'created_at', 'updated_at', 'stores': [{'id', 'name'}]}
+    """
+    limit = max(1, min(int(limit or EMPLOYEE_PAGE_SIZE), EMPLOYEE_PAGE_SIZE_MAX))
+    stores_column = _store_aggregate(db.get_bind().dialect.name).label('stores')
+
+    query = (
+        select(
+            TJugyoin.id, TJugyoin.login_id, TJugyoin.name, TJugyoin.email, TJugyoin.active,
+            TJugyoin.created_at, TJugyoin.updated_at, stores_column
+        )
+        .outerjoin(TJugyoinTenpo, TJugyoinTenpo.employee_id == TJugyoin.id)
+        .outerjoin(TTenpo, TTenpo.id == TJugyoinTenpo.store_id)
+        .group_by(
+            TJugyoin.id, TJugyoin.login_id, TJugyoin.name, TJugyoin.email, TJugyoin.active,
+            TJugyoin.created_at, TJugyoin.updated_at
+        )
+        .order_by(TJugyoin.id)
+        .limit(limit + 1)
+    )
+
+    if tenant_id is not None:
+        query = query.where(TJugyoin.tenant_id == tenant_id)
+    if store_id is not None:
+        query = query.where(
+            TJugyoin.id.in_(select(TJugyoinTenpo.employee_id).where(TJugyoinTenpo.store_id == store_id))
+        )
+    condition = search_condition(search, TJugyoin.name, TJugyoin.login_id, TJugyoin.email)
+    if condition is not None:
+        query = query.where(condition)
+    if after_id:
+        query = query.where(TJugyoin.id > after_id)
+
+    rows = db.execute(query).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    employees = [
+        {
+            'id': row.id,
+            'login_id': row.login_id,
+            'name': row.name,
+            'email': row.email,
+            'active': row.active,
+            'created_at': row.created_at,
+            'updated_at': row.updated_at,
+            'stores': _parse_stores(row.stores),
+        }
+        for row in rows
+    ]
+
+    return {
+        'employees': employees,
+        'next_cursor': employees[-1]['id'] if has_more else None,
+    }
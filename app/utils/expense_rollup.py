@@ -0,0 +1,294 @@
+"""
+経費集計ユーティリティ
+物件経費・部屋経費の金額を 経費カテゴリ × 月/年/期間 × 物件/部屋 の各単位で1クエリで集計する。
+物件の集計には、その物件の部屋の経費も含める。
+PostgreSQLでは GROUP BY GROUPING SETS、それ以外（SQLite）では同じ集計単位を UNION ALL で求め、
+結果は (テナント, 期間) ごとにプロセス内にキャッシュする。
+"""
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, union_all, literal, null, tuple_, cast, event, func, Integer
+
+from app.models_property import TBukken, THeya, TBukkenKeihi, THeyaKeihi
+from app.utils.metrics import record_cache
+
+
+# キャッシュの有効期間（秒）。同一プロセス内の経費の変更は即時に無効化し、
+# 他のワーカープロセスでの変更はこの時間内に反映される
+ROLLUP_CACHE_TTL = 300
+
+# キャッシュする (テナント, 期間) の最大数（超えた場合は古いものから破棄）
+ROLLUP_CACHE_SIZE = 64
+
+# 集計単位: 名前 → GROUP BY する列
+ROLLUP_LEVELS = {
+    '部屋_カテゴリ_月': ('物件id', '部屋id', '経費カテゴリ', '年月'),
+    '部屋_カテゴリ': ('物件id', '部屋id', '経費カテゴリ'),
+    '部屋': ('物件id', '部屋id'),
+    '物件_カテゴリ_月': ('物件id', '経費カテゴリ', '年月'),
+    '物件_カテゴリ_年': ('物件id', '経費カテゴリ', '年'),
+    '物件_カテゴリ': ('物件id', '経費カテゴリ'),
+    '物件_年': ('物件id', '年'),
+    '物件': ('物件id',),
+    'カテゴリ_月': ('経費カテゴリ', '年月'),
+    'カテゴリ_年': ('経費カテゴリ', '年'),
+    'カテゴリ': ('経費カテゴリ',),
+    '月': ('年月',),
+    '年': ('年',),
+    '合計': (),
+}
+
+# 集計行の列（CSV・JSONの出力順）
+ROLLUP_COLUMNS = ['集計単位', '物件id', '部屋id', '経費カテゴリ', '年', '年月', '件数', '金額']
+
+_GROUP_COLUMNS = ('物件id', '部屋id', '経費カテゴリ', '年', '年月')
+
+# シミュレーションの経費項目 → 対応する経費カテゴリ（それ以外のカテゴリは「その他経費」）
+SIMULATION_EXPENSE_LINES = {
+    '管理費': ('管理費',),
+    '修繕費': ('修繕費', '原状回復', 'クリーニング'),
+    '固定資産税': ('税金',),
+    '損害保険料': ('保険',),
+}
+_LINE_BY_CATEGORY = {
+    category: line for line, categories in SIMULATION_EXPENSE_LINES.items() for category in categories
+}
+
+_cache_lock = threading.Lock()
+_cache = {}
+
+
+def invalidate_expense_rollups(*_args, **_kwargs):
+    """キャッシュ済みの経費集計を破棄（SQLAlchemyイベントからも呼ばれる）"""
+    with _cache_lock:
+        _cache.clear()
+
+
+# ORM経由で経費が変更されたら（物件・部屋の無効化・付け替えを含む）キャッシュを破棄
+for _model in (TBukkenKeihi, THeyaKeihi):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, invalidate_expense_rollups)
+for _model in (TBukken, THeya):
+    for _event_name in ('after_update', 'after_delete'):
+        event.listen(_model, _event_name, invalidate_expense_rollups)
+
+
+def year_period(year: int) -> tuple:
+    """年の期間（1月1日〜12月31日）"""
+    return date(year, 1, 1), date(year, 12, 31)
+
+
+def _year_month(column, dialect_name: str):
+    """日付を 'YYYY-MM' にする式"""
+    if dialect_name == 'postgresql':
+        return func.to_char(column, 'YYYY-MM')
+    return func.strftime('%Y-%m', column)
+
+
+def _expense_rows(dialect_name: str, tenant_id: int, start: date, end: date):
+    """
+    テナントの有効な物件の、期間内の物件経費と部屋経費を1つにしたサブクエリ
+    （物件id, 部屋id（物件経費はNULL）, 経費カテゴリ, 年, 年月, 金額）
+    """
+    property_month = _year_month(TBukkenKeihi.発生日, dialect_name)
+    property_expenses = (
+        select(
+            TBukkenKeihi.物件id.label('物件id'),
+            cast(null(), Integer).label('部屋id'),
+            TBukkenKeihi.経費カテゴリ.label('経費カテゴリ'),
+            func.substr(property_month, 1, 4).label('年'),
+            property_month.label('年月'),
+            TBukkenKeihi.金額.label('金額'),
+        )
+        .join(TBukken, TBukken.id == TBukkenKeihi.物件id)
+        .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1, TBukkenKeihi.発生日.between(start, end))
+    )
+    room_month = _year_month(THeyaKeihi.発生日, dialect_name)
+    room_expenses = (
+        select(
+            THeya.property_id,
+            THeyaKeihi.部屋id,
+            THeyaKeihi.経費カテゴリ,
+            func.substr(room_month, 1, 4),
+            room_month,
+            THeyaKeihi.金額,
+        )
+        .join(THeya, THeya.id == THeyaKeihi.部屋id)
+        .join(TBukken, TBukken.id == THeya.property_id)
+        .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1, THeyaKeihi.発生日.between(start, end))
+    )
+    return union_all(property_expenses, room_expenses).subquery('expenses')
+
+
+def _grouping_sets_query(expenses):
+    """
+    PostgreSQL: GROUPING SETS で全集計単位を1回の走査で集計
+
+    GROUPING() は集計に使っていない列のビットが1になるため、そのビット列から集計単位を判定します。
+    """
+    columns = [expenses.c[name] for name in _GROUP_COLUMNS]
+    levels = {}
+    for level, names in ROLLUP_LEVELS.items():
+        mask = sum(1 << (len(_GROUP_COLUMNS) - 1 - i) for i, name in enumerate(_GROUP_COLUMNS) if name not in names)
+        levels[mask] = level
+    grouping_sets = [tuple_(*[expenses.c[name] for name in names]) for names in ROLLUP_LEVELS.values()]
+    query = (
+        select(
+            func.grouping(*columns).label('集計単位'),
+            *columns,
+            func.count().label('件数'),
+            func.sum(expenses.c.金額).label('金額'),
+        )
+        .group_by(func.grouping_sets(*grouping_sets))
+    )
+    return query, levels
+
+
+def _union_all_query(expenses):
+    """GROUPING SETS に対応していないDB（SQLite）: 集計単位ごとの GROUP BY を UNION ALL でまとめて1クエリにする"""
+    branches = []
+    for level, names in ROLLUP_LEVELS.items():
+        group_columns = [expenses.c[name] for name in names]
+        branches.append(
+            select(
+                literal(level).label('集計単位'),
+                *[expenses.c[name] if name in names else null().label(name) for name in _GROUP_COLUMNS],
+                func.count().label('件数'),
+                func.sum(expenses.c.金額).label('金額'),
+            )
+            .group_by(*group_columns)
+        )
+    return union_all(*branches), None
+
+
+def compute_expense_rollup(db, tenant_id: int, start: date, end: date) -> list:
+    """
+    期間内の経費を全集計単位で集計（キャッシュを使わない）
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID
+    - start, end: 期間（発生日で判定、両端を含む）
+
+    Returns:
+    - list: [{'集計単位', '物件id', '部屋id', '経費カテゴリ', '年', '年月', '件数', '金額'}]
+            集計に使っていない列はNone。物件の集計は部屋の経費を含み、
+            部屋単位の集計で部屋idがNoneの行は物件共通の経費
+    """
+    dialect_name = db.get_bind().dialect.name
+    expenses = _expense_rows(dialect_name, tenant_id, start, end)
+    if dialect_name == 'postgresql':
+        query, levels = _grouping_sets_query(expenses)
+    else:
+        query, levels = _union_all_query(expenses)
+
+    rows = []
+    for row in db.execute(query).mappings():
+        item = dict(row)
+        if levels is not None:
+            item['集計単位'] = levels[item['集計単位']]
+        if not item['件数']:
+            continue  # 経費がない場合の「合計」行
+        rows.append(item)
+    return rows
+
+
+def get_expense_rollup(db, tenant_id: int, start: date, end: date) -> dict:
+    """
+    (テナント, 期間) の経費集計をキャッシュから取得（期限切れ・未作成の場合は集計する）
+
+    Returns:
+    - dict: {'start', 'end', 'rows': compute_expense_rollup の結果, 'levels': {集計単位: [行]}}
+            （キャッシュを共有するため、呼び出し側で変更しないこと）
+    """
+    key = (tenant_id, start, end)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < ROLLUP_CACHE_TTL:
+            record_cache('expense_rollup', True)
+            return cached[1]
+    record_cache('expense_rollup', False)
+
+    rows = compute_expense_rollup(db, tenant_id, start, end)
+    levels = {level: [] for level in ROLLUP_LEVELS}
+    for row in rows:
+        levels[row['集計単位']].append(row)
+    rollup = {'start': start, 'end': end, 'rows': rows, 'levels': levels}
+
+    with _cache_lock:
+        _cache.pop(key, None)
+        while len(_cache) >= ROLLUP_CACHE_SIZE:
+            _cache.pop(next(iter(_cache)))
+        _cache[key] = (time.monotonic(), rollup)
+    return rollup
+
+
+def pivot(rollup: dict, level: str, row_field: str, column_field: str = '経費カテゴリ') -> dict:
+    """
+    集計単位の行を表形式にする
+
+    Returns:
+    - dict: {行の値: {列の値: 金額}}（例: 物件_カテゴリ → {物件id: {経費カテゴリ: 金額}}）
+    """
+    table = {}
+    for row in rollup['levels'][level]:
+        table.setdefault(row[row_field], {})[row[column_field]] = row['金額']
+    return table
+
+
+def trailing_category_averages(db, tenant_id: int, years: int, property_id=None, until_year=None) -> dict:
+    """
+    直近N年の経費カテゴリ別の年平均を1クエリで集計
+
+    年数は期間内で最初に経費がある年から数えます（取得してN年未満の物件で平均が小さくならないように）。
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID
+    - years: 集計する年数
+    - property_id: 指定した場合はその物件（部屋の経費を含む）、省略時はテナントの全物件
+    - until_year: 集計する最後の年（省略時は前年）
+
+    Returns:
+    - dict: {経費カテゴリ: 年平均金額}
+    """
+    until_year = until_year or date.today().year - 1
+    start, _ = year_period(until_year - years + 1)
+    _, end = year_period(until_year)
+    expenses = _expense_rows(db.get_bind().dialect.name, tenant_id, start, end)
+    query = (
+        select(expenses.c.経費カテゴリ, func.sum(expenses.c.金額), func.min(expenses.c.年))
+        .group_by(expenses.c.経費カテゴリ)
+    )
+    if property_id is not None:
+        query = query.where(expenses.c.物件id == property_id)
+    rows = db.execute(query).all()
+    if not rows:
+        return {}
+
+    span = until_year - min(int(first_year) for _, _, first_year in rows) + 1
+    return {
+        category: (Decimal(str(total)) / span).quantize(Decimal('0.01'))
+        for category, total, _ in rows
+    }
+
+
+def simulation_expense_plan(db, simulation):
+    """
+    実績経費を使う設定のシミュレーションの、経費項目ごとの年額（初年度）
+
+    Returns:
+    - dict or None: {'管理費' | '修繕費' | '固定資産税' | '損害保険料' | 'その他経費': 年額}
+      実績がない項目は含めない（入力値で計算）。設定がない・独立シミュレーションの場合はNone
+    """
+    if not simulation.実績経費_年数 or simulation.シミュレーション種別 == '独立':
+        return None
+    averages = trailing_category_averages(db, simulation.tenant_id, simulation.実績経費_年数, simulation.物件id)
+    plan = {}
+    for category, amount in averages.items():
+        line = _LINE_BY_CATEGORY.get(category, 'その他経費')
+        plan[line] = plan.get(line, Decimal('0')) + amount
+    return plan
@@ -0,0 +1,437 @@
+"""
+横断検索ユーティリティ
+物件・部屋・入居者を正規化した検索インデックス（T_検索インデックス）に登録し、
+PostgreSQLは pg_trgm のGINインデックス、SQLiteは FTS5（trigram）で部分一致検索する。
+契約は一致した部屋・入居者から1クエリで引き当てる。
+"""
+import logging
+import time
+import unicodedata
+from contextlib import contextmanager
+
+from sqlalchemy import select, delete, insert, text, event, inspect, case, func, column, Integer
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models_property import TBukken, THeya, TNyukyosha, TKeiyaku, TSearchIndex
+from app.utils.list_api import escape_like
+
+logger = logging.getLogger(__name__)
+
+
+# 種別ごとの最大表示件数
+SEARCH_GROUP_LIMIT = 10
+
+# 1回の検索にかける最大時間（ミリ秒）。超えた場合は打ち切って timed_out を返す
+SEARCH_TIMEOUT_MS = 300
+
+# trigramで検索できる最小文字数（これより短いクエリはテナント内のLIKE検索）
+TRIGRAM_MIN_LENGTH = 3
+
+SEARCH_KINDS = ('物件', '部屋', '入居者')
+
+_FTS_TABLE = 'T_検索インデックス_fts'
+_REBUILD_BATCH_SIZE = 1000
+
+# setup_search_backend で決定する検索方式（'pg_trgm', 'fts5', 'like'）
+_backend = {'name': 'like'}
+
+# カタカナ→ひらがな（ァ〜ヶ）
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+# 検索時に無視する文字（空白・各種ハイフン）。長音記号「ー」は残す
+_IGNORED_CHARS = {ord(c): None for c in ' \t\r\n　-‐‑‒–—−'}
+
+# 1エントリ内の項目の区切り（正規化後のクエリには含まれない）
+_FIELD_SEPARATOR = '\n'
+
+
+def normalize_search_text(value) -> str:
+    """
+    検索用にテキストを正規化
+
+    NFKCで半角カナ・全角英数を統一し、カタカナをひらがなに、英字を小文字にして、
+    空白とハイフンを除去します（「ヤマダ」と「やまだ」、「03-1234-5678」と「0312345678」が一致）。
+    """
+    if not value:
+        return ''
+    normalized = unicodedata.normalize('NFKC', str(value))
+    return normalized.translate(_KATAKANA_TO_HIRAGANA).lower().translate(_IGNORED_CHARS)
+
+
+def _search_text(*values) -> str:
+    return _FIELD_SEPARATOR.join(v for v in (normalize_search_text(value) for value in values) if v)
+
+
+# ==================== インデックスのエントリ ====================
+
+def _property_entry(tenant_id, property_id, name, address) -> dict:
+    return {
+        'tenant_id': tenant_id, '種別': '物件', '対象id': property_id,
+        '表示名': name, '補足': address, '検索テキスト': _search_text(name, address),
+    }
+
+
+def _room_entry(tenant_id, room_id, room_number, property_name) -> dict:
+    # 「物件名+部屋番号」でも部屋番号だけでも一致するように登録
+    return {
+        'tenant_id': tenant_id, '種別': '部屋', '対象id': room_id,
+        '表示名': room_number, '補足': property_name,
+        '検索テキスト': _search_text(f'{property_name or ""}{room_number}', room_number),
+    }
+
+
+def _person_entry(person) -> dict:
+    return {
+        'tenant_id': person.tenant_id, '種別': '入居者', '対象id': person.id,
+        '表示名': person.氏名, '補足': person.電話番号 or person.メールアドレス,
+        '検索テキスト': _search_text(person.氏名, person.フリガナ, person.電話番号, person.メールアドレス),
+    }
+
+
+def _replace_entries(connection, kind: str, ids, entries):
+    """指定した種別・IDのエントリを削除し、entries を登録"""
+    ids = list(ids)
+    if ids:
+        connection.execute(
+            delete(TSearchIndex.__table__).where(TSearchIndex.種別 == kind, TSearchIndex.対象id.in_(ids))
+        )
+    if entries:
+        connection.execute(insert(TSearchIndex.__table__), entries)
+
+
+# ==================== ORMイベントによる差分更新 ====================
+
+def _changed(target, fields) -> bool:
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _index_property(connection, target):
+    room_rows = connection.execute(
+        select(THeya.id, THeya.部屋番号).where(THeya.property_id == target.id, THeya.有効 == 1)
+    ).all()
+    room_ids = [row.id for row in room_rows]
+    if target.有効 == 0:
+        _replace_entries(connection, '物件', [target.id], [])
+        _replace_entries(connection, '部屋', room_ids, [])
+        return
+    _replace_entries(connection, '物件', [target.id],
+                     [_property_entry(target.tenant_id, target.id, target.物件名, target.住所)])
+    # 物件名の変更は部屋のエントリにも反映
+    _replace_entries(connection, '部屋', room_ids,
+                     [_room_entry(target.tenant_id, row.id, row.部屋番号, target.物件名) for row in room_rows])
+
+
+def _index_room(connection, target):
+    if target.有効 == 0:
+        _replace_entries(connection, '部屋', [target.id], [])
+        return
+    property_row = connection.execute(
+        select(TBukken.tenant_id, TBukken.物件名).where(TBukken.id == target.property_id)
+    ).first()
+    if property_row is None:
+        return
+    _replace_entries(connection, '部屋', [target.id],
+                     [_room_entry(property_row.tenant_id, target.id, target.部屋番号, property_row.物件名)])
+
+
+def _index_person(connection, target):
+    entries = [] if target.有効 == 0 else [_person_entry(target)]
+    _replace_entries(connection, '入居者', [target.id], entries)
+
+
+_INDEXERS = (
+    (TBukken, _index_property, ('物件名', '住所', '有効'), '物件'),
+    (THeya, _index_room, ('部屋番号', 'property_id', '有効'), '部屋'),
+    (TNyukyosha, _index_person, ('氏名', 'フリガナ', '電話番号', 'メールアドレス', '有効'), '入居者'),
+)
+
+
+def _register_listeners():
+    for model, indexer, fields, kind in _INDEXERS:
+        def after_insert(_mapper, connection, target, indexer=indexer):
+            indexer(connection, target)
+
+        def after_update(_mapper, connection, target, indexer=indexer, fields=fields):
+            if _changed(target, fields):
+                indexer(connection, target)
+
+        def after_delete(_mapper, connection, target, kind=kind):
+            _replace_entries(connection, kind, [target.id], [])
+
+        event.listen(model, 'after_insert', after_insert)
+        event.listen(model, 'after_update', after_update)
+        event.listen(model, 'after_delete', after_delete)
+
+
+_register_listeners()
+
+
+# ==================== 初期構築 ====================
+
+def _entry_sources():
+    """種別ごとの (元データのクエリ, 主キーカラム, テナントIDカラム, 行→エントリ変換)"""
+    return {
+        '物件': (
+            select(TBukken.tenant_id, TBukken.id, TBukken.物件名, TBukken.住所).where(TBukken.有効 == 1),
+            TBukken.id, TBukken.tenant_id, lambda row: _property_entry(*row),
+        ),
+        '部屋': (
+            select(TBukken.tenant_id, THeya.id, THeya.部屋番号, TBukken.物件名)
+            .join(TBukken, TBukken.id == THeya.property_id)
+            .where(THeya.有効 == 1, TBukken.有効 == 1),
+            THeya.id, TBukken.tenant_id, lambda row: _room_entry(*row),
+        ),
+        '入居者': (
+            select(TNyukyosha).where(TNyukyosha.有効 == 1),
+            TNyukyosha.id, TNyukyosha.tenant_id, lambda row: _person_entry(row[0]),
+        ),
+    }
+
+
+def index_search_entries(db, kind: str, ids) -> int:
+    """
+    一括登録（ORMイベントが発生しない insert）した行を検索インデックスに登録
+
+    Parameters:
+    - db: SQLAlchemyセッション（呼び出し側でcommit）
+    - kind: '物件', '部屋', '入居者'
+    - ids: 対象の主キーのリスト
+
+    Returns:
+    - int: 登録したエントリ数
+    """
+    query, id_column, _tenant_column, to_entry = _entry_sources()[kind]
+    ids = list(ids)
+    count = 0
+    for start in range(0, len(ids), _REBUILD_BATCH_SIZE):
+        chunk = ids[start:start + _REBUILD_BATCH_SIZE]
+        entries = [to_entry(row) for row in db.execute(query.where(id_column.in_(chunk)))]
+        _replace_entries(db, kind, chunk, entries)
+        count += len(entries)
+    return count
+
+
+def rebuild_search_index(db, tenant_id=None) -> int:
+    """
+    検索インデックスを元のテーブルから作り直す
+
+    Parameters:
+    - db: SQLAlchemyセッション（呼び出し側でcommit）
+    - tenant_id: 指定した場合はそのテナントのみ
+
+    Returns:
+    - int: 登録したエントリ数
+    """
+    removal = delete(TSearchIndex)
+    if tenant_id is not None:
+        removal = removal.where(TSearchIndex.tenant_id == tenant_id)
+    db.execute(removal)
+
+    count = 0
+    for query, _id_column, tenant_column, to_entry in _entry_sources().values():
+        if tenant_id is not None:
+            query = query.where(tenant_column == tenant_id)
+        batch = []
+        for row in db.execute(query.execution_options(yield_per=_REBUILD_BATCH_SIZE)):
+            batch.append(to_entry(row))
+            if len(batch) >= _REBUILD_BATCH_SIZE:
+                db.execute(insert(TSearchIndex), batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            db.execute(insert(TSearchIndex), batch)
+            count += len(batch)
+    return count
+
+
+def _setup_pg_trgm(engine) -> bool:
+    try:
+        with engine.begin() as conn:
+            conn.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            conn.execute(text(
+                'CREATE INDEX IF NOT EXISTS "ix_T_検索インデックス_trgm" '
+                'ON "T_検索インデックス" USING gin ("検索テキスト" gin_trgm_ops)'
+            ))
+        return True
+    except SQLAlchemyError as e:
+        logger.warning(f"pg_trgm を利用できないためLIKE検索を使用します: {e}")
+        return False
+
+
+def _setup_fts5(engine) -> bool:
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': _FTS_TABLE}
+            ).first()
+            conn.execute(text(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS "{_FTS_TABLE}" USING fts5('
+                f'"検索テキスト", content="T_検索インデックス", content_rowid="id", tokenize="trigram")'
+            ))
+            # 外部コンテンツのFTSテーブルを T_検索インデックス と同期させるトリガー
+            conn.execute(text(
+                f'CREATE TRIGGER IF NOT EXISTS "T_検索インデックス_ai" AFTER INSERT ON "T_検索インデックス" BEGIN '
+                f'INSERT INTO "{_FTS_TABLE}"(rowid, "検索テキスト") VALUES (new.id, new."検索テキスト"); END'
+            ))
+            conn.execute(text(
+                f'CREATE TRIGGER IF NOT EXISTS "T_検索インデックス_ad" AFTER DELETE ON "T_検索インデックス" BEGIN '
+                f'INSERT INTO "{_FTS_TABLE}"("{_FTS_TABLE}", rowid, "検索テキスト") '
+                f'VALUES (\'delete\', old.id, old."検索テキスト"); END'
+            ))
+            conn.execute(text(
+                f'CREATE TRIGGER IF NOT EXISTS "T_検索インデックス_au" AFTER UPDATE ON "T_検索インデックス" BEGIN '
+                f'INSERT INTO "{_FTS_TABLE}"("{_FTS_TABLE}", rowid, "検索テキスト") '
+                f'VALUES (\'delete\', old.id, old."検索テキスト"); '
+                f'INSERT INTO "{_FTS_TABLE}"(rowid, "検索テキスト") VALUES (new.id, new."検索テキスト"); END'
+            ))
+            if not exists:
+                # 既に登録済みのエントリをFTSに取り込む
+                conn.execute(text(f'INSERT INTO "{_FTS_TABLE}"("{_FTS_TABLE}") VALUES (\'rebuild\')'))
+        return True
+    except SQLAlchemyError as e:
+        logger.warning(f"FTS5（trigram）を利用できないためLIKE検索を使用します: {e}")
+        return False
+
+
+def setup_search_backend(engine) -> str:
+    """
+    検索インデックスの全文検索用の仕組みを準備（アプリ起動時に呼ぶ）
+
+    PostgreSQLは pg_trgm 拡張とGINインデックス、SQLiteは FTS5 仮想テーブルと同期トリガーを作成します。
+    インデックスが空で元データがある場合（導入直後）は既存データを登録します。
+
+    Returns:
+    - str: 使用する検索方式（'pg_trgm', 'fts5', 'like'）
+    """
+    dialect_name = engine.dialect.name
+    if dialect_name == 'postgresql' and _setup_pg_trgm(engine):
+        _backend['name'] = 'pg_trgm'
+    elif dialect_name == 'sqlite' and _setup_fts5(engine):
+        _backend['name'] = 'fts5'
+    else:
+        _backend['name'] = 'like'
+
+    with Session(bind=engine) as db:
+        is_empty = db.execute(select(TSearchIndex.id).limit(1)).first() is None
+        has_source = any(
+            db.execute(select(model.id).limit(1)).first() is not None for model in (TBukken, TNyukyosha)
+        )
+        if is_empty and has_source:
+            count = rebuild_search_index(db)
+            db.commit()
+            logger.info(f"検索インデックスを作成しました: {count}件")
+    return _backend['name']
+
+
+# ==================== 検索 ====================
+
+def _match_condition(normalized: str):
+    """正規化済みクエリに部分一致するエントリの条件"""
+    if _backend['name'] == 'fts5' and len(normalized) >= TRIGRAM_MIN_LENGTH:
+        phrase = '"' + normalized.replace('"', '""') + '"'
+        matched_ids = text(
+            f'SELECT rowid FROM "{_FTS_TABLE}" WHERE "{_FTS_TABLE}" MATCH :fts_query'
+        ).bindparams(fts_query=phrase).columns(column('rowid', Integer))
+        return TSearchIndex.id.in_(matched_ids)
+    # pg_trgm のGINインデックスは LIKE '%...%' に使われる
+    return TSearchIndex.検索テキスト.like(f'%{escape_like(normalized)}%', escape='\\')
+
+
+@contextmanager
+def _time_budget(db, timeout_ms: int):
+    """検索クエリの実行時間の上限（PostgreSQLは statement_timeout、SQLiteは progress handler）"""
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name == 'postgresql':
+        db.execute(text(f'SET LOCAL statement_timeout = {int(timeout_ms)}'))
+        yield
+        return
+    if dialect_name == 'sqlite':
+        raw = db.connection().connection.driver_connection
+        deadline = time.monotonic() + timeout_ms / 1000
+        raw.set_progress_handler(lambda: int(time.monotonic() > deadline), 1000)
+        try:
+            yield
+        finally:
+            raw.set_progress_handler(None, 0)
+        return
+    yield
+
+
+def global_search(db, tenant_id, query: str, limit: int = SEARCH_GROUP_LIMIT,
+                  timeout_ms: int = SEARCH_TIMEOUT_MS) -> dict:
+    """
+    物件・部屋・入居者・契約を横断検索
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID
+    - query: 検索キーワード（カナ・全角半角・大文字小文字・空白・ハイフンを区別しない）
+    - limit: 種別ごとの最大件数
+
+    Returns:
+    - dict: {'query', 'groups': {'物件': [...], '部屋': [...], '入居者': [...], '契約': [...]}, 'timed_out'}
+      各要素は {'id', '表示名', '補足'}
+    """
+    normalized = normalize_search_text(query)
+    groups = {kind: [] for kind in SEARCH_KINDS + ('契約',)}
+    result = {'query': query, 'groups': groups, 'timed_out': False}
+    if not normalized:
+        return result
+
+    condition = _match_condition(normalized)
+    prefix_rank = case(
+        (TSearchIndex.検索テキスト.like(f'{escape_like(normalized)}%', escape='\\'), 0), else_=1
+    )
+    ranked = (
+        select(
+            TSearchIndex.種別, TSearchIndex.対象id, TSearchIndex.表示名, TSearchIndex.補足,
+            func.row_number().over(
+                partition_by=TSearchIndex.種別,
+                order_by=(prefix_rank, TSearchIndex.表示名, TSearchIndex.対象id)
+            ).label('rank')
+        )
+        .where(TSearchIndex.tenant_id == tenant_id, condition)
+        .subquery()
+    )
+    matched = (
+        select(TSearchIndex.対象id)
+        .where(TSearchIndex.tenant_id == tenant_id, condition)
+    )
+
+    try:
+        with _time_budget(db, timeout_ms):
+            # 物件・部屋・入居者を種別ごとに上位 limit 件ずつ1クエリで取得
+            rows = db.execute(
+                select(ranked).where(ranked.c.rank <= limit).order_by(ranked.c.種別, ranked.c.rank)
+            ).all()
+            for row in rows:
+                groups[row.種別].append({'id': row.対象id, '表示名': row.表示名, '補足': row.補足})
+
+            # 一致した部屋・入居者の契約
+            contract_rows = db.execute(
+                select(TKeiyaku.id, TKeiyaku.契約状況, TKeiyaku.契約開始日,
+                       TNyukyosha.氏名, TBukken.物件名, THeya.部屋番号)
+                .join(THeya, THeya.id == TKeiyaku.room_id)
+                .join(TBukken, TBukken.id == THeya.property_id)
+                .join(TNyukyosha, TNyukyosha.id == TKeiyaku.tenant_person_id)
+                .where(
+                    TBukken.tenant_id == tenant_id,
+                    TKeiyaku.tenant_person_id.in_(matched.where(TSearchIndex.種別 == '入居者'))
+                    | TKeiyaku.room_id.in_(matched.where(TSearchIndex.種別 == '部屋'))
+                )
+                .order_by(TKeiyaku.契約開始日.desc(), TKeiyaku.id.desc())
+                .limit(limit)
+            ).all()
+            for row in contract_rows:
+                groups['契約'].append({
+                    'id': row.id,
+                    '表示名': f'{row.氏名} / {row.物件名} {row.部屋番号}',
+                    '補足': f'{row.契約状況}（{row.契約開始日.isoformat()}〜）',
+                })
+    except OperationalError as e:
+        db.rollback()
+        logger.warning(f"検索が時間内に終わらなかったため打ち切りました: {query} ({e.orig})")
+        result['timed_out'] = True
+    return result
@@ -0,0 +1,143 @@
+"""
+ジョブの処理関数
+リクエスト内で実行すると時間がかかる再計算・一括処理を job_queue のジョブとして登録する。
+ワーカー（scripts/job_worker.py）はこのモジュールを読み込んで処理関数を登録する。
+"""
+from datetime import date
+
+from sqlalchemy import select
+
+from app.models_property import TBukken, TSimulation
+from app.utils.job_queue import job_handler
+# ワーカープロセスでも派生テーブル・キャッシュを更新するイベントを登録しておく
+from app.utils import occupancy_history, expense_rollup  # noqa: F401
+
+
+# 進捗を更新する件数の間隔
+PROGRESS_EVERY = 10
+
+
+@job_handler('シミュレーション再計算')
+def recalculate_simulations(db, job, payload, progress):
+    """
+    シミュレーションを再計算
+
+    payload:
+    - simulation_id: 指定した場合はそのシミュレーションのみ
+    - stale_only: Trueの場合はテナントの要再計算のシミュレーションのみ（simulation_id 省略時）
+    """
+    from app.blueprints.property import calculate_simulation
+
+    query = select(TSimulation).where(TSimulation.tenant_id == job.tenant_id)
+    if payload.get('simulation_id'):
+        query = query.where(TSimulation.id == payload['simulation_id'])
+    elif payload.get('stale_only'):
+        query = query.where(TSimulation.要再計算 == 1)
+    simulations = db.execute(query.order_by(TSimulation.id)).scalars().all()
+    if payload.get('simulation_id') and not simulations:
+        raise ValueError('シミュレーションが見つかりません')
+
+    calculated = failed = 0
+    for index, simulation in enumerate(simulations, start=1):
+        if calculate_simulation(simulation, db):
+            calculated += 1
+        else:
+            failed += 1
+        if index % PROGRESS_EVERY == 0 or index == len(simulations):
+            progress(index * 100 // len(simulations), f'{index}/{len(simulations)}件')
+    if payload.get('simulation_id') and failed:
+        raise ValueError('シミュレーションの計算に失敗しました（対象物件がありません）')
+    return {'計算': calculated, '失敗': failed}
+
+
+@job_handler('減価償却計算')
+def backfill_depreciation(db, job, payload, progress):
+    """
+    テナントの物件の減価償却を取得年度から対象年度まで順に計算
+
+    payload:
+    - target_year: 最後の年度（省略時は今年）
+    - property_id: 指定した場合はその物件のみ
+    """
+    from app.blueprints.property import calculate_depreciation_year
+
+    target_year = int(payload.get('target_year') or date.today().year)
+    query = select(TBukken).where(
+        TBukken.tenant_id == job.tenant_id, TBukken.有効 == 1,
+        TBukken.取得価額.isnot(None), TBukken.耐用年数.isnot(None), TBukken.償却方法.isnot(None),
+    )
+    if payload.get('property_id'):
+        query = query.where(TBukken.id == payload['property_id'])
+    properties = db.execute(query.order_by(TBukken.id)).scalars().all()
+
+    years = skipped = 0
+    for index, property_data in enumerate(properties, start=1):
+        first_year = property_data.取得年月日.year if property_data.取得年月日 else target_year
+        for year in range(first_year, target_year + 1):
+            if calculate_depreciation_year(db, property_data, year) is None:
+                skipped += 1
+                break
+            years += 1
+        db.commit()
+        if index % PROGRESS_EVERY == 0 or index == len(properties):
+            progress(index * 100 // len(properties), f'{index}/{len(properties)}物件')
+    return {'物件': len(properties), '年度': years, '償却方法不正': skipped}
+
+
+@job_handler('月次稼働再集計')
+def rebuild_occupancy(db, job, payload, progress):
+    """テナントの月次稼働を契約から作り直す"""
+    count = occupancy_history.rebuild_occupancy_history(db, tenant_id=job.tenant_id)
+    db.commit()
+    return {'件数': count}
+
+
+@job_handler('契約満了スキャン')
+def scan_contracts(db, job, payload, progress):
+    """
+    契約満了スキャン
+
+    payload:
+    - days: 満了の何日前から更新タスクを作成するか
+    """
+    from app.utils.contract_lifecycle import RENEWAL_NOTICE_DAYS, run_contract_scan
+
+    result = run_contract_scan(db, days=int(payload.get('days') or RENEWAL_NOTICE_DAYS), tenant_id=job.tenant_id)
+    db.commit()
+    return {key: result[key] for key in ('expired', 'vacated', 'occupied', 'tasks_created')}
+
+
+# 一括取込の結果に含めるエラーの件数
+IMPORT_REPORTED_ERRORS = 20
+
+
+@job_handler('一括取込')
+def bulk_import_file(db, job, payload, progress):
+    """
+    CSV / Excelの一括取込（登録）
+
+    Webサーバーとワーカーが別のホストでも読めるよう、ファイルはジョブの添付ファイル（T_ジョブファイル）で渡します。
+    添付ファイルはジョブの完了時・最後の試行の失敗時に削除されます。
+
+    payload:
+    - target: 取込対象（'物件', '部屋', '入居者', '契約'）
+    """
+    import io
+    from app.utils.bulk_import import import_rows, iter_file_rows
+    from app.utils.job_queue import job_file
+
+    filename, content = job_file(db, job.id)
+    result = import_rows(db, job.tenant_id, payload['target'], iter_file_rows(io.BytesIO(content), filename))
+    if result['aborted']:
+        raise ValueError('ファイルを最後まで読み込めなかったため、取込を取り消しました')
+    errors = [
+        f"{error['row'] or '-'}行目{'（' + error['column'] + '）' if error['column'] else ''}: {error['message']}"
+        for error in result['errors'][:IMPORT_REPORTED_ERRORS]
+    ]
+    return {
+        '取込対象': payload['target'],
+        '読込行数': result['total'],
+        '登録件数': result['inserted'],
+        'エラー件数': result['error_count'],
+        'エラー内容': ' / '.join(errors) if errors else None,
+    }
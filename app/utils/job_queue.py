@@ -0,0 +1,403 @@
+"""
+ジョブキューユーティリティ
+再計算・一括処理などの重い処理を T_ジョブ に登録し、ワーカープロセス（scripts/job_worker.py）が
+1件ずつ取り出して実行する。PostgreSQLでは SELECT ... FOR UPDATE SKIP LOCKED で複数ワーカーが
+同じジョブを取らないようにし、失敗したジョブは待ち時間を空けて再試行する。
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.exc import OperationalError
+
+from app.db import SessionLocal, engine
+from app.models_property import TJob, TJobFile
+from app.utils.list_api import json_value
+from app.utils.metrics import inc
+
+logger = logging.getLogger(__name__)
+
+
+# ワーカーがジョブを探す間隔（秒）
+JOB_POLL_INTERVAL = 2
+
+# 再試行までの待ち時間（秒）。試行ごとに2倍にする
+JOB_RETRY_DELAY = 30
+
+# ハートビートがこの時間（秒）更新されない実行中のジョブは、ワーカーが停止したとみなして待機に戻す
+JOB_STALE_TIMEOUT = 600
+
+# 実行中のジョブのハートビート日時を更新する間隔（秒）。処理関数が progress を呼ばない間も更新する
+JOB_HEARTBEAT_INTERVAL = JOB_STALE_TIMEOUT / 10
+
+JOB_STATUSES = ('待機', '実行中', '完了', '失敗')
+
+# 終了した（再試行しない）状況。添付ファイルはこの状況になったら削除する
+JOB_FINISHED_STATUSES = ('完了', '失敗')
+
+# 種別 → 処理関数（job_handler で登録）
+JOB_HANDLERS = {}
+
+
+def job_handler(kind: str):
+    """
+    ジョブの処理関数を登録するデコレーター
+
+    処理関数は handler(db, job, payload, progress) の形で呼ばれ、戻り値（dict）が結果として保存されます。
+    progress(割合0〜100, メッセージ) で進捗を更新できます。コミットは処理関数の中で行ってください。
+    """
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def worker_name() -> str:
+    """ワーカーの識別名（ホスト名:プロセスID）"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue_job(db, kind: str, payload=None, tenant_id=None, max_attempts: int = 3, file=None) -> TJob:
+    """
+    ジョブを登録（呼び出し側でcommit）
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - kind: JOB_HANDLERS の種別
+    - payload: 処理関数に渡す引数（JSONにできるdict）
+    - tenant_id: 対象のテナントID（全テナント対象のジョブはNone）
+    - max_attempts: 最大試行回数
+    - file: 処理関数に渡すファイル (ファイル名, 内容bytes)。T_ジョブファイル に保存し、job_file で読む
+
+    Returns:
+    - TJob: 登録したジョブ
+    """
+    job = TJob(
+        tenant_id=tenant_id,
+        種別=kind,
+        引数=json.dumps(payload or {}, ensure_ascii=False),
+        状況='待機',
+        試行回数=0,
+        最大試行回数=max_attempts,
+        進捗=0,
+        実行予定日時=datetime.now(),
+    )
+    db.add(job)
+    db.flush()
+    if file is not None:
+        filename, content = file
+        db.add(TJobFile(ジョブid=job.id, ファイル名=filename, 内容=content))
+    return job
+
+
+def job_file(db, job_id: int) -> tuple:
+    """
+    ジョブの添付ファイル
+
+    Returns:
+    - tuple: (ファイル名, 内容bytes)
+
+    Raises:
+    - ValueError: ファイルがない（ジョブの終了時に削除済み）
+    """
+    row = db.execute(
+        select(TJobFile.ファイル名, TJobFile.内容).where(TJobFile.ジョブid == job_id).order_by(TJobFile.id).limit(1)
+    ).first()
+    if row is None:
+        raise ValueError('ファイルが削除されています。もう一度アップロードしてください')
+    return row.ファイル名, bytes(row.内容)
+
+
+def purge_job_files(db) -> int:
+    """
+    終了したジョブの添付ファイルを削除（呼び出し側でcommit）
+
+    Returns:
+    - int: 削除したファイル数
+    """
+    return db.execute(
+        delete(TJobFile.__table__).where(
+            TJobFile.ジョブid.in_(select(TJob.id).where(TJob.状況.in_(JOB_FINISHED_STATUSES)))
+        )
+    ).rowcount or 0
+
+
+def requeue_stale_jobs(db, timeout: int = JOB_STALE_TIMEOUT) -> int:
+    """
+    ハートビートが途絶えた実行中のジョブを待機に戻す（最大試行回数に達したものは失敗にする）
+
+    Returns:
+    - int: 戻した・失敗にしたジョブの数
+    """
+    now = datetime.now()
+    stale = (TJob.状況 == '実行中', TJob.ハートビート日時 < now - timedelta(seconds=timeout))
+    failed = db.execute(
+        update(TJob.__table__)
+        .where(*stale, TJob.試行回数 >= TJob.最大試行回数)
+        .values(状況='失敗', エラー='ワーカーが応答しなくなりました', 終了日時=now)
+    ).rowcount or 0
+    if failed:
+        purge_job_files(db)
+    requeued = db.execute(
+        update(TJob.__table__)
+        .where(*stale)
+        .values(状況='待機', 実行予定日時=now, ワーカー=None)
+    ).rowcount or 0
+    db.commit()
+    return failed + requeued
+
+
+def _claimed_values(worker: str) -> dict:
+    """ジョブを実行中にする更新内容"""
+    now = datetime.now()
+    return {
+        '状況': '実行中', '試行回数': TJob.試行回数 + 1, '開始日時': now, 'ハートビート日時': now,
+        'ワーカー': worker, 'エラー': None,
+    }
+
+
+def claim_job(db, job_id: int, worker: str) -> bool:
+    """
+    指定したジョブが待機中の場合だけ実行中にする（状況が「待機」のままの場合だけ更新する条件付きUPDATE）
+
+    Returns:
+    - bool: 取り出せた場合True（他のワーカーが先に取り出した場合False）
+    """
+    result = db.execute(
+        update(TJob.__table__).where(TJob.id == job_id, TJob.状況 == '待機').values(**_claimed_values(worker))
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def claim_next_job(db, worker: str, kinds=None):
+    """
+    実行予定日時を過ぎた待機中のジョブを1件取り出して実行中にする
+
+    PostgreSQLでは FOR UPDATE SKIP LOCKED で他のワーカーが取り出し中の行を飛ばします。
+    行ロックのないSQLiteでは claim_job の条件付きUPDATEで取り出しを確定します。
+
+    Returns:
+    - int or None: 取り出したジョブのID（実行できるジョブがない場合はNone）
+    """
+    query = (
+        select(TJob.id)
+        .where(TJob.状況 == '待機', TJob.実行予定日時 <= datetime.now())
+        .order_by(TJob.実行予定日時, TJob.id)
+        .limit(1)
+    )
+    if kinds:
+        query = query.where(TJob.種別.in_(kinds))
+
+    if db.get_bind().dialect.name == 'postgresql':
+        job_id = db.execute(query.with_for_update(skip_locked=True)).scalar_one_or_none()
+        if job_id is not None:
+            db.execute(update(TJob.__table__).where(TJob.id == job_id).values(**_claimed_values(worker)))
+        db.commit()
+        return job_id
+
+    job_id = db.execute(query).scalar_one_or_none()
+    if job_id is None:
+        db.rollback()
+        return None
+    return job_id if claim_job(db, job_id, worker) else None
+
+
+def _update_running_job(job_id: int, values: dict) -> None:
+    """実行中のジョブの進捗・ハートビートを更新（処理関数のトランザクションとは別のコネクションで即時に反映する）"""
+    try:
+        with engine.begin() as connection:
+            connection.execute(
+                update(TJob.__table__).where(TJob.id == job_id, TJob.状況 == '実行中').values(**values)
+            )
+    except OperationalError:
+        # SQLiteで処理関数が書き込み中の場合など。次の更新で反映されるため無視する
+        logger.debug(f'ジョブ {job_id} の進捗を更新できませんでした', exc_info=True)
+
+
+def _progress_updater(job_id: int):
+    """進捗を更新する関数"""
+    def progress(percent, message=None):
+        values = {'進捗': max(0, min(int(percent), 100)), 'ハートビート日時': datetime.now()}
+        if message is not None:
+            values['進捗メッセージ'] = str(message)[:255]
+        _update_running_job(job_id, values)
+    return progress
+
+
+def _start_heartbeat(job_id: int, interval: float) -> threading.Event:
+    """
+    実行中のジョブのハートビート日時を interval 秒ごとに更新するスレッドを開始
+
+    月次稼働の再集計のように progress を呼ばずに長く動く処理関数でも、JOB_STALE_TIMEOUT を過ぎて
+    待機に戻され二重に実行されることがないようにします。戻り値のEventをセットすると停止します。
+    """
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            _update_running_job(job_id, {'ハートビート日時': datetime.now()})
+
+    threading.Thread(target=beat, name=f'job-heartbeat-{job_id}', daemon=True).start()
+    return stop
+
+
+def run_job(job_id: int) -> str:
+    """
+    取り出したジョブを実行し、結果・エラーを保存
+
+    失敗した場合、最大試行回数に達していなければ待ち時間（JOB_RETRY_DELAY × 2^(試行回数-1)秒）後に再試行します。
+
+    Returns:
+    - str: 実行後の状況（'完了' / '待機'（再試行待ち） / '失敗'）
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(TJob, job_id)
+        handler = JOB_HANDLERS.get(job.種別)
+        heartbeat = _start_heartbeat(job_id, JOB_HEARTBEAT_INTERVAL)
+        try:
+            if handler is None:
+                raise ValueError(f'未対応のジョブ種別です: {job.種別}')
+            result = handler(db, job, json.loads(job.引数 or '{}'), _progress_updater(job_id))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            job = db.get(TJob, job_id)
+            error = f'{type(e).__name__}: {e}\n{traceback.format_exc()}'
+            if job.試行回数 < job.最大試行回数:
+                delay = JOB_RETRY_DELAY * 2 ** (job.試行回数 - 1)
+                job.状況 = '待機'
+                job.実行予定日時 = datetime.now() + timedelta(seconds=delay)
+                job.進捗メッセージ = f'失敗しました。{delay}秒後に再試行します（{job.試行回数}/{job.最大試行回数}回目）'
+            else:
+                job.状況 = '失敗'
+                job.終了日時 = datetime.now()
+            job.エラー = error
+            if job.状況 == '失敗':
+                db.execute(delete(TJobFile.__table__).where(TJobFile.ジョブid == job_id))
+            db.commit()
+            inc('job_runs_total', {'kind': job.種別, 'status': '失敗'})
+            logger.warning(f'ジョブ {job_id}（{job.種別}）が失敗しました: {e}')
+            return job.状況
+        finally:
+            heartbeat.set()
+
+        job = db.get(TJob, job_id)
+        job.状況 = '完了'
+        job.進捗 = 100
+        job.結果 = json.dumps(
+            {key: json_value(value) for key, value in (result or {}).items()}, ensure_ascii=False
+        )
+        job.終了日時 = datetime.now()
+        db.execute(delete(TJobFile.__table__).where(TJobFile.ジョブid == job_id))
+        db.commit()
+        inc('job_runs_total', {'kind': job.種別, 'status': '完了'})
+        return job.状況
+    finally:
+        db.close()
+
+
+def run_pending_jobs(worker=None, kinds=None, limit=None) -> int:
+    """
+    実行できるジョブがなくなるまで（または limit 件まで）順に実行
+
+    Returns:
+    - int: 実行したジョブの数
+    """
+    worker = worker or worker_name()
+    count = 0
+    while limit is None or count < limit:
+        db = SessionLocal()
+        try:
+            job_id = claim_next_job(db, worker, kinds)
+        finally:
+            db.close()
+        if job_id is None:
+            break
+        run_job(job_id)
+        count += 1
+    return count
+
+
+def work(poll_interval: float = JOB_POLL_INTERVAL, kinds=None, once: bool = False) -> None:
+    """
+    ワーカーのメインループ（ジョブを実行し、なければ poll_interval 秒待つ）
+
+    Parameters:
+    - poll_interval: ジョブがない場合の待ち時間（秒）
+    - kinds: 実行するジョブ種別（省略時はすべて）
+    - once: Trueの場合、実行できるジョブを実行したら終了
+    """
+    worker = worker_name()
+    logger.info(f'ジョブワーカーを開始しました: {worker}')
+    last_stale_check = 0.0
+    while True:
+        if time.monotonic() - last_stale_check > JOB_STALE_TIMEOUT / 10:
+            db = SessionLocal()
+            try:
+                requeue_stale_jobs(db)
+            finally:
+                db.close()
+            last_stale_check = time.monotonic()
+
+        count = run_pending_jobs(worker, kinds)
+        if once:
+            return
+        if not count:
+            time.sleep(poll_interval)
+
+
+def submit_job(db, kind: str, payload=None, tenant_id=None, inline: bool = False, file=None) -> TJob:
+    """
+    ジョブを登録してコミット（inline=True の場合はワーカーを待たずにこの場で実行）
+
+    Returns:
+    - TJob: 登録したジョブ（inline の場合は実行後の状態）
+    """
+    job = enqueue_job(db, kind, payload, tenant_id, file=file)
+    db.commit()
+    if inline:
+        if claim_job(db, job.id, worker_name()):
+            run_job(job.id)
+        db.refresh(job)
+    return job
+
+
+def retry_job(db, job: TJob) -> None:
+    """失敗したジョブを待機に戻して最初から再試行する（呼び出し側でcommit）"""
+    job.状況 = '待機'
+    job.試行回数 = 0
+    job.進捗 = 0
+    job.進捗メッセージ = None
+    job.エラー = None
+    job.実行予定日時 = datetime.now()
+    job.終了日時 = None
+
+
+def job_dict(job: TJob) -> dict:
+    """ジョブの状態をJSON用のdictにする（ファイルの内容は引数に残っていても返さない）"""
+    arguments = json.loads(job.引数 or '{}')
+    arguments.pop('content', None)
+    return {
+        'id': job.id,
+        '種別': job.種別,
+        '状況': job.状況,
+        '進捗': job.進捗,
+        '進捗メッセージ': job.進捗メッセージ,
+        '試行回数': job.試行回数,
+        '最大試行回数': job.最大試行回数,
+        '引数': arguments,
+        '結果': json.loads(job.結果) if job.結果 else None,
+        'エラー': job.エラー.splitlines()[0] if job.エラー else None,
+        '実行予定日時': json_value(job.実行予定日時),
+        '開始日時': json_value(job.開始日時),
+        '終了日時': json_value(job.終了日時),
+        'created_at': json_value(job.created_at),
+    }
@@ -0,0 +1,267 @@
+"""
+一覧APIユーティリティ
+キーセットページング・並び替え・SQLでの集計・JSON変換を一覧画面で共通化
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import and_, func, or_
+
+
+# 1ページの件数
+LIST_PAGE_SIZE = 50
+LIST_PAGE_SIZE_MAX = 500
+
+
+def escape_like(value: str) -> str:
+    """LIKE検索用に % と _ をエスケープ"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_condition(query_text: str, *columns):
+    """複数カラムの部分一致（大文字小文字を区別しない）検索条件。空文字の場合はNone"""
+    query_text = (query_text or '').strip()
+    if not query_text:
+        return None
+    pattern = f'%{escape_like(query_text)}%'
+    return or_(*[column.ilike(pattern, escape='\\') for column in columns])
+
+
+def _encode_value(value):
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        return ['n', str(value)]
+    if isinstance(value, datetime):
+        return ['dt', value.isoformat()]
+    if isinstance(value, date):
+        return ['d', value.isoformat()]
+    if isinstance(value, int):
+        return ['i', value]
+    return ['s', str(value)]
+
+
+def _decode_value(value):
+    if value is None:
+        return None
+    kind, raw = value
+    if kind == 'n':
+        number = Decimal(raw)
+        if not number.is_finite():
+            raise ValueError(f'数値ではありません: {raw}')
+        return number
+    if kind == 'dt':
+        return datetime.fromisoformat(raw)
+    if kind == 'd':
+        return date.fromisoformat(raw)
+    if kind == 'i':
+        return int(raw)
+    return raw
+
+
+def encode_cursor(sort_value, row_id) -> str:
+    """並び替えキーとIDからカーソル文字列を作成"""
+    payload = json.dumps([_encode_value(sort_value), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """
+    カーソル文字列を (並び替えキー, ID) に戻す
+
+    Returns:
+    - tuple or None: 不正なカーソルの場合はNone
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return _decode_value(sort_value), int(row_id)
+    except (ValueError, TypeError, ArithmeticError):
+        # Decimal の変換エラー（InvalidOperation）は ArithmeticError
+        return None
+
+
+def parse_list_args(args, sort_columns: dict, default_sort: str, default_order: str = 'desc') -> dict:
+    """
+    一覧のクエリパラメータを解釈
+
+    Parameters:
+    - args: request.args
+    - sort_columns: {並び替えキー: カラム}
+    - default_sort: 既定の並び替えキー
+
+    Returns:
+    - dict: {'sort', 'order', 'cursor', 'limit', 'q', 'format'}
+    """
+    sort = args.get('sort', default_sort)
+    if sort not in sort_columns:
+        sort = default_sort
+    order = args.get('order', default_order)
+    if order not in ('asc', 'desc'):
+        order = default_order
+    try:
+        limit = int(args.get('limit', LIST_PAGE_SIZE))
+    except (TypeError, ValueError):
+        limit = LIST_PAGE_SIZE
+    return {
+        'sort': sort,
+        'order': order,
+        'cursor': args.get('cursor') or None,
+        'limit': max(1, min(limit, LIST_PAGE_SIZE_MAX)),
+        'q': (args.get('q') or '').strip(),
+        'format': args.get('format'),
+    }
+
+
+def link_params(args, exclude=('cursor', 'format')) -> dict:
+    """並び替え・絞り込み条件を引き継いでリンクを作るためのパラメータ（空の値とカーソルは除く）"""
+    return {key: value for key, value in args.items() if value and key not in exclude}
+
+
+def _keyset_condition(sort_column, id_column, order: str, sort_value, row_id):
+    """
+    (並び替えキー, ID) より後ろの行を表す条件（NULLは常に末尾）
+    """
+    if order == 'asc':
+        after_id = id_column > row_id
+    else:
+        after_id = id_column < row_id
+
+    if sort_value is None:
+        return and_(sort_column.is_(None), after_id)
+    after_value = sort_column > sort_value if order == 'asc' else sort_column < sort_value
+    return or_(
+        after_value,
+        and_(sort_column == sort_value, after_id),
+        sort_column.is_(None),
+    )
+
+
+def _stored_sort_value(query, sort_column, id_column, sort_value, row_id):
+    """
+    カーソルの行の並び替えキーをDBから取り直すサブクエリ
+
+    SQLiteでは日時が文字列、Numericが REAL で保存されるため、カーソルに入れたPythonの値
+    （マイクロ秒付きの日時・Decimal）と保存値が等しくならず、同順位の比較でページが進まなくなる。
+    保存されている値どうしで比較し、カーソルの行が削除・絞り込みで消えた場合だけカーソルの値を使う。
+    """
+    stored = (
+        query.with_only_columns(sort_column, maintain_column_froms=True)
+        .where(id_column == row_id)
+        .order_by(None)
+        .limit(1)
+        .correlate(None)
+        .scalar_subquery()
+    )
+    return func.coalesce(stored, sort_value)
+
+
+def keyset_page(db, query, sort_column, id_column, order: str, cursor=None, limit: int = LIST_PAGE_SIZE,
+                sort_key=None) -> dict:
+    """
+    キーセットページングで1ページ分を取得
+
+    OFFSETを使わず「前ページ最後の (並び替えキー, ID) より後ろ」を条件にするため、
+    何ページ目でもインデックスを使って同じ速さで取得できます。
+
+    Parameters:
+    - query: 絞り込み済みのselect（ORDER BY / LIMIT は付けない）
+    - sort_column: 並び替えカラム
+    - id_column: 一意な主キーカラム（同順位の並び順と カーソルに使用）
+    - order: 'asc' または 'desc'
+    - cursor: 前ページの next_cursor
+    - sort_key: 行から (並び替えキー, ID) を取り出す関数（省略時は行の先頭要素の属性を参照）
+
+    Returns:
+    - dict: {'rows': [...], 'next_cursor': str or None}
+    """
+    decoded = decode_cursor(cursor)
+    if decoded is not None:
+        sort_value, row_id = decoded
+        if sort_value is not None:
+            sort_value = _stored_sort_value(query, sort_column, id_column, sort_value, row_id)
+        query = query.where(_keyset_condition(sort_column, id_column, order, sort_value, row_id))
+
+    if order == 'asc':
+        query = query.order_by(sort_column.asc().nulls_last(), id_column.asc())
+    else:
+        query = query.order_by(sort_column.desc().nulls_last(), id_column.desc())
+
+    rows = db.execute(query.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        if sort_key is None:
+            last = rows[-1][0]
+            next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+        else:
+            next_cursor = encode_cursor(*sort_key(rows[-1]))
+    return {'rows': rows, 'next_cursor': next_cursor}
+
+
+def aggregate_totals(db, query, **aggregates) -> dict:
+    """
+    絞り込み条件を保ったままSQLで集計（ページに関係なく全件が対象）
+
+    Parameters:
+    - query: keyset_page に渡すのと同じ絞り込み済みのselect
+    - aggregates: {ラベル: 集計式}（例: 件数=func.count(), 合計金額=func.coalesce(func.sum(金額), 0)）
+
+    Returns:
+    - dict: {ラベル: 値}
+    """
+    if not aggregates:
+        return {}
+    labels = list(aggregates)
+    statement = query.with_only_columns(
+        *[aggregates[label].label(f'agg_{i}') for i, label in enumerate(labels)],
+        maintain_column_froms=True
+    ).order_by(None)
+    row = db.execute(statement).one()
+    return {label: row[i] for i, label in enumerate(labels)}
+
+
+def json_value(value):
+    """JSONで扱える値に変換"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def serialize_rows(items, columns) -> list:
+    """
+    ORMオブジェクトのリストを指定カラムの辞書リストに変換
+
+    Parameters:
+    - items: ORMオブジェクト（または同名の属性を持つオブジェクト）のリスト
+    - columns: 出力するカラム名のリスト
+    """
+    return [{column: json_value(getattr(item, column)) for column in columns} for item in items]
+
+
+def list_response(items, page: dict, totals: dict, args: dict, columns=None) -> dict:
+    """
+    一覧JSONのレスポンス本体
+
+    Parameters:
+    - items: columns を指定した場合はORMオブジェクトのリスト、省略時はJSON化済みの辞書リスト
+    - page: keyset_page の戻り値
+    - totals: aggregate_totals の戻り値
+    - args: parse_list_args の戻り値
+    """
+    return {
+        'items': serialize_rows(items, columns) if columns else items,
+        'next_cursor': page['next_cursor'],
+        'totals': {key: json_value(value) for key, value in totals.items()},
+        'sort': args['sort'],
+        'order': args['order'],
+        'limit': args['limit'],
+    }
@@ -39,6 +39,80 @@ def calculate_detailed_loan_payment(
     Returns:
     - dict: 年度ごとの返済データ {year: {'元本返済額': Decimal, '利息': Decimal, '返済額': Decimal, 'ローン残高': Decimal}}
     """
+    monthly_schedule, first_interest = build_monthly_loan_schedule(
+        loan_amount=loan_amount,
+        loan_start_date=loan_start_date,
+        payment_day=payment_day,
+        payment_start_ym=payment_start_ym,
+        grace_period_end_ym=grace_period_end_ym,
+        first_interest_payment_method=first_interest_payment_method,
+        interest_schedules=interest_schedules,
+        repayment_method=repayment_method,
+        repayment_period_years=repayment_period_years
+    )
+    
+    # 年ごとに振り分け（1パス）
+    payments_by_year = {}
+    for m in monthly_schedule:
+        payments_by_year.setdefault(m['year'], []).append(m)
+    
+    # 年度ごとに集計
+    yearly_data = {}
+    for year in range(start_year, start_year + period_years):
+        year_payments = payments_by_year.get(year, [])
+        
+        total_payment = sum(m['payment'] for m in year_payments)
+        total_principal = sum(m['principal'] for m in year_payments)
+        total_interest = sum(m['interest'] for m in year_payments)
+        
+        # 初回利息の処理
+        if year == start_year and first_interest_payment_method == 1:
+            # 初回返済時にまとめて支払う
+            total_interest += first_interest
+            total_payment += first_interest
+        elif year == loan_start_date.year and first_interest_payment_method == 2:
+            # 借入月末に支払う
+            total_interest += first_interest
+            total_payment += first_interest
+        
+        # 年末のローン残高
+        if year_payments:
+            year_end_balance = year_payments[-1]['balance']
+        else:
+            year_end_balance = loan_amount
+        
+        yearly_data[year] = {
+            '元本返済額': total_principal,
+            '利息': total_interest,
+            '返済額': total_payment,
+            'ローン残高': year_end_balance
+        }
+    
+    return yearly_data
+
+
+def build_monthly_loan_schedule(
+    loan_amount: Decimal,
+    loan_start_date: date,
+    payment_day: int,
+    payment_start_ym: str,
+    grace_period_end_ym: str,
+    first_interest_payment_method: int,
+    interest_schedules: list,
+    repayment_method: str,
+    repayment_period_years: int
+) -> tuple:
+    """
+    詳細モードの月次返済スケジュールを生成
+    
+    Parameters:
+    - calculate_detailed_loan_payment と同じ（シミュレーション期間を除く）
+    
+    Returns:
+    - tuple: (月次スケジュール, 初回利息)
+      月次スケジュールは [{'date', 'year', 'month', 'payment', 'principal', 'interest', 'balance'}] のリスト。
+      初回利息は借入日から初回返済日までの日割り利息（初回利息支払方法が3の場合は0）
+    """
     
     # 返済開始日を計算
     payment_start_date = datetime.strptime(payment_start_ym, '%Y-%m').date()
@@ -118,39 +192,7 @@ def calculate_detailed_loan_payment(
             daily_rate = first_rate / Decimal('100') / Decimal('365')
             first_interest = (loan_amount * daily_rate * Decimal(days_to_first_payment)).quantize(Decimal('0'), rounding=ROUND_HALF_UP)
     
-    # 年度ごとに集計
-    yearly_data = {}
-    for year in range(start_year, start_year + period_years):
-        year_payments = [m for m in monthly_schedule if m['year'] == year]
-        
-        total_payment = sum(m['payment'] for m in year_payments)
-        total_principal = sum(m['principal'] for m in year_payments)
-        total_interest = sum(m['interest'] for m in year_payments)
-        
-        # 初回利息の処理
-        if year == start_year and first_interest_payment_method == 1:
-            # 初回返済時にまとめて支払う
-            total_interest += first_interest
-            total_payment += first_interest
-        elif year == loan_start_date.year and first_interest_payment_method == 2:
-            # 借入月末に支払う
-            total_interest += first_interest
-            total_payment += first_interest
-        
-        # 年末のローン残高
-        if year_payments:
-            year_end_balance = year_payments[-1]['balance']
-        else:
-            year_end_balance = loan_amount
-        
-        yearly_data[year] = {
-            '元本返済額': total_principal,
-            '利息': total_interest,
-            '返済額': total_payment,
-            'ローン残高': year_end_balance
-        }
-    
-    return yearly_data
+    return monthly_schedule, first_interest
 
 
 def get_interest_rate_for_month(target_date: date, interest_schedules: list) -> Decimal:
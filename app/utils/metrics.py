@@ -0,0 +1,388 @@
+"""
+メトリクスユーティリティ
+リクエストの処理時間・シミュレーション計算時間・キャッシュのヒット数などを集計し、
+/metrics でPrometheusのテキスト形式で出力する。
+
+gunicornの各ワーカープロセスは集計値を METRICS_DIR のプロセスごとのファイル（metrics_<pid>_<開始時刻>.json）に
+定期的に書き出し、/metrics はすべてのファイルを合算して返す（どのワーカーが応答しても同じ値になる）。
+カウンター・ヒストグラムは停止したプロセスの分も合算し、ゲージは稼働中のプロセスの分だけを合算する。
+停止したプロセスのファイルは /metrics の集計時に集約ファイル（metrics_aggregate.json）へ合算して削除する。
+ファイル名に開始時刻を含めるため、pid が再利用されても前のプロセスの集計値は上書きされない。
+"""
+import atexit
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# 集計値をファイルに書き出す間隔（秒）
+METRICS_FLUSH_INTERVAL = 5
+
+# ヒストグラムのバケット（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# メトリクス名 → (種類, 説明)
+METRICS = {
+    'http_requests_total': ('counter', 'リクエスト数'),
+    'http_request_duration_seconds': ('histogram', 'リクエストの処理時間（秒）'),
+    'http_request_sql_queries': ('histogram', '1リクエストで実行したSQLの数'),
+    'simulation_calculation_seconds': ('histogram', 'シミュレーション計算の処理時間（秒）'),
+    'cache_requests_total': ('counter', 'プロセス内キャッシュの参照数（result=hit/miss）'),
+    'job_runs_total': ('counter', '実行したジョブの数'),
+    'db_pool_size': ('gauge', 'DBコネクションプールのサイズ'),
+    'db_pool_checked_out': ('gauge', 'DBコネクションプールで使用中の接続数'),
+    'db_pool_overflow': ('gauge', 'DBコネクションプールのサイズを超えて作成した接続数'),
+    'job_queue_jobs': ('gauge', 'ジョブキューの状況別のジョブ数'),
+}
+
+# SQL数のヒストグラムのバケット
+SQL_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# 停止したプロセスのカウンター・ヒストグラムを合算しておくファイル
+AGGREGATE_FILENAME = 'metrics_aggregate.json'
+
+# 集約ファイルを更新する間、ワーカー間で排他するためのロックファイル
+LOCK_FILENAME = 'metrics.lock'
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+_state = {'flushed_at': 0.0, 'pid': None, 'started_at': None}
+
+
+def metrics_dir() -> str:
+    """プロセスごとの集計ファイルを置くディレクトリ（環境変数 METRICS_DIR、省略時は一時ディレクトリ）"""
+    path = os.getenv('METRICS_DIR') or os.path.join(tempfile.gettempdir(), 'property-app-metrics')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _process_identity() -> tuple:
+    """
+    このプロセスの識別子
+
+    Returns:
+    - tuple: (pid, 開始時刻（ミリ秒）)。開始時刻は最初に呼び出した時刻で、fork した子プロセスでは取り直す
+    """
+    pid = os.getpid()
+    if _state['pid'] != pid:
+        _state['pid'] = pid
+        _state['started_at'] = int(time.time() * 1000)
+    return pid, _state['started_at']
+
+
+def _reset_after_fork() -> None:
+    """fork した子プロセスは親の集計値を引き継がない（親の分は親のファイルで合算される）"""
+    global _lock
+    _lock = threading.Lock()
+    _counters.clear()
+    _histograms.clear()
+    _gauges.clear()
+    _state.update(flushed_at=0.0, pid=None, started_at=None)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(name: str, labels: dict) -> tuple:
+    return name, tuple(sorted((labels or {}).items()))
+
+
+def inc(name: str, labels=None, value: float = 1) -> None:
+    """カウンターを増やす"""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+    _maybe_flush()
+
+
+def observe(name: str, value: float, labels=None, buckets=DEFAULT_BUCKETS) -> None:
+    """ヒストグラムに値を記録"""
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+        for index, bound in enumerate(histogram['buckets']):
+            if value <= bound:
+                histogram['counts'][index] += 1
+                break
+        histogram['sum'] += value
+        histogram['count'] += 1
+    _maybe_flush()
+
+
+def set_gauge(name: str, value: float, labels=None) -> None:
+    """ゲージを設定（このプロセスの値）"""
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """プロセス内キャッシュの参照を記録"""
+    inc('cache_requests_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+
+def observe_request(endpoint, method: str, status: int, duration: float, sql_count: int) -> None:
+    """リクエストの処理時間・SQL数を記録"""
+    endpoint = endpoint or 'unknown'
+    inc('http_requests_total', {'endpoint': endpoint, 'method': method, 'status': str(status)})
+    observe('http_request_duration_seconds', duration, {'endpoint': endpoint, 'method': method})
+    observe('http_request_sql_queries', sql_count, {'endpoint': endpoint}, buckets=SQL_COUNT_BUCKETS)
+
+
+def _serialize(counters: dict, histograms: dict, gauges=None) -> dict:
+    data = {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [
+            [name, list(labels), histogram['buckets'], histogram['counts'], histogram['sum'], histogram['count']]
+            for (name, labels), histogram in histograms.items()
+        ],
+    }
+    if gauges is not None:
+        data['gauges'] = [[name, list(labels), value] for (name, labels), value in gauges.items()]
+    return data
+
+
+def _snapshot() -> dict:
+    pid, started_at = _process_identity()
+    with _lock:
+        return {'pid': pid, 'started_at': started_at, **_serialize(_counters, _histograms, _gauges)}
+
+
+def _write_json(path: str, data: dict) -> None:
+    """一時ファイルに書いてから置き換える（書き込み途中のファイルを読まないため）"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def flush() -> None:
+    """このプロセスの集計値をファイルに書き出す"""
+    data = _snapshot()
+    _write_json(os.path.join(metrics_dir(), f"metrics_{data['pid']}_{data['started_at']}.json"), data)
+    _state['flushed_at'] = time.monotonic()
+
+
+def _maybe_flush() -> None:
+    if time.monotonic() - _state['flushed_at'] >= METRICS_FLUSH_INTERVAL:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+def _flush_at_exit() -> None:
+    if _counters or _histograms:
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(_flush_at_exit)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _process_files(directory: str) -> list:
+    """プロセスごとの集計ファイル [(パス, 内容)]（集約ファイル・書き込み途中の一時ファイルは除く）"""
+    files = []
+    for filename in os.listdir(directory):
+        if filename == AGGREGATE_FILENAME or not (filename.startswith('metrics_') and filename.endswith('.json')):
+            continue
+        path = os.path.join(directory, filename)
+        data = _read_json(path)
+        if data is not None:
+            files.append((path, data))
+    return files
+
+
+def _stopped(files: list) -> set:
+    """
+    停止したプロセスのファイル
+
+    pid が再利用されて同じ pid のファイルが複数ある場合は、開始時刻が最新のもの以外を停止済みとみなします。
+
+    Returns:
+    - set: ファイルのパス
+    """
+    latest = {}
+    for _, data in files:
+        latest[data['pid']] = max(latest.get(data['pid'], 0), data.get('started_at', 0))
+    return {
+        path for path, data in files
+        if data.get('started_at', 0) < latest[data['pid']] or not _alive(data['pid'])
+    }
+
+
+def _merge(counters: dict, histograms: dict, data: dict) -> None:
+    """ファイルの内容のカウンター・ヒストグラムを合算"""
+    for name, labels, value in data['counters']:
+        key = (name, tuple(map(tuple, labels)))
+        counters[key] = counters.get(key, 0) + value
+    for name, labels, buckets, counts, total, count in data['histograms']:
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.setdefault(key, {'buckets': buckets, 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+        merged['counts'] = [a + b for a, b in zip(merged['counts'], counts)]
+        merged['sum'] += total
+        merged['count'] += count
+
+
+@contextlib.contextmanager
+def _directory_lock(directory: str):
+    """ワーカー間の排他（fcntl がない環境やロックファイルを作れない場合は排他しない）"""
+    try:
+        lock_file = open(os.path.join(directory, LOCK_FILENAME), 'a')
+    except OSError:
+        yield
+        return
+    with lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _fold_stopped(directory: str, files: list) -> None:
+    """
+    停止したプロセスのカウンター・ヒストグラムを集約ファイルに合算し、プロセスごとのファイルを削除
+
+    集約ファイルを書き出してから削除するため、途中で失敗しても集計値は失われません。
+    _directory_lock の中で呼び出してください。
+    """
+    counters, histograms = {}, {}
+    aggregate = _read_json(os.path.join(directory, AGGREGATE_FILENAME))
+    if aggregate is not None:
+        _merge(counters, histograms, aggregate)
+    for _, data in files:
+        _merge(counters, histograms, data)
+    _write_json(os.path.join(directory, AGGREGATE_FILENAME), _serialize(counters, histograms))
+    for path, _ in files:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def collect() -> tuple:
+    """
+    全プロセスの集計値を合算（停止したプロセスのファイルは集約ファイルに合算してから読む）
+
+    ほかのワーカーの合算と重なって二重に数えないよう、ファイルの読み込みと合算はロックの中で行います。
+
+    Returns:
+    - tuple: (counters, histograms, gauges)。いずれも {(名前, ラベル): 値}
+    """
+    directory = metrics_dir()
+    with _directory_lock(directory):
+        files = _process_files(directory)
+        stopped = _stopped(files)
+        if stopped:
+            try:
+                _fold_stopped(directory, [(path, data) for path, data in files if path in stopped])
+                files = [(path, data) for path, data in files if path not in stopped]
+            except OSError:
+                pass
+        aggregate = _read_json(os.path.join(directory, AGGREGATE_FILENAME))
+
+    counters, histograms, gauges = {}, {}, {}
+    if aggregate is not None:
+        _merge(counters, histograms, aggregate)
+    for path, data in files:
+        _merge(counters, histograms, data)
+        if path not in stopped:
+            for name, labels, value in data['gauges']:
+                key = (name, tuple(map(tuple, labels)))
+                gauges[key] = gauges.get(key, 0) + value
+    return counters, histograms, gauges
+
+
+def _labels_text(labels, extra=None) -> str:
+    items = list(labels) + (list(extra) if extra else [])
+    if not items:
+        return ''
+    escaped = [
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in items
+    ]
+    return '{' + ','.join(escaped) + '}'
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(counters: dict, histograms: dict, gauges: dict) -> str:
+    """集計値をPrometheusのテキスト形式にする"""
+    lines = []
+    series = {}
+    for source in (counters, histograms, gauges):
+        for name, labels in source:
+            series.setdefault(name, []).append(labels)
+
+    for name in sorted(series):
+        kind, help_text = METRICS.get(name, ('untyped', name))
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels in sorted(series[name]):
+            key = (name, labels)
+            if key in histograms:
+                histogram = histograms[key]
+                cumulative = 0
+                for bound, count in zip(histogram['buckets'], histogram['counts']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels_text(labels, [("le", _number(bound))])} {cumulative}')
+                lines.append(f'{name}_bucket{_labels_text(labels, [("le", "+Inf")])} {histogram["count"]}')
+                lines.append(f'{name}_sum{_labels_text(labels)} {_number(histogram["sum"])}')
+                lines.append(f'{name}_count{_labels_text(labels)} {histogram["count"]}')
+            else:
+                value = counters[key] if key in counters else gauges[key]
+                lines.append(f'{name}{_labels_text(labels)} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def update_pool_gauges(engine) -> None:
+    """このプロセスのDBコネクションプールの状態をゲージに設定"""
+    pool = engine.pool
+    for name, method in (('db_pool_size', 'size'), ('db_pool_checked_out', 'checkedout'), ('db_pool_overflow', 'overflow')):
+        if hasattr(pool, method):
+            # overflow() はプールに空きがある間は負の値になるため0にそろえる
+            set_gauge(name, max(0, getattr(pool, method)()))
+
+
+def job_queue_depth(db) -> dict:
+    """ジョブキューの状況別のジョブ数（完了は含めない）"""
+    from sqlalchemy import select, func
+    from app.models_property import TJob
+
+    rows = db.execute(
+        select(TJob.状況, func.count()).where(TJob.状況 != '完了').group_by(TJob.状況)
+    ).all()
+    return {status: count for status, count in rows}
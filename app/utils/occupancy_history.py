@@ -0,0 +1,438 @@
+"""
+稼働履歴ユーティリティ
+契約の開始日・終了日から部屋ごと・月ごとの稼働日数・契約賃料・空室損失を区間スイープで再構築して T_月次稼働 に保存し、
+物件・月ごとの合計を T_月次稼働_物件 に保存する。推移グラフ・空室損失の分析・シミュレーションの実績稼働率は、
+物件・月ごとの表（物件数 × 月数の行）を読むだけで求める。
+"""
+import calendar
+import logging
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from sqlalchemy import select, delete, insert, event, func, tuple_
+from sqlalchemy.orm import Session
+
+from app.models_property import TBukken, THeya, TKeiyaku, TOccupancyMonthly, TOccupancyMonthlyProperty
+from app.utils.property_summary import occupancy_rate, upsert, _changed, _history_values
+from app.utils.simulation_monthly import build_monthly_rent, month_index
+
+logger = logging.getLogger(__name__)
+
+
+_BATCH_SIZE = 1000
+
+# 実績稼働率の既定の集計期間（月数）
+ACTUAL_OCCUPANCY_MONTHS = 12
+
+
+def month_key(year: int, month: int) -> str:
+    """YYYY-MM形式の年月"""
+    return f'{year:04d}-{month:02d}'
+
+
+def add_months(year: int, month: int, count: int) -> tuple:
+    """count か月後の (年, 月)"""
+    index = year * 12 + month - 1 + count
+    return index // 12, index % 12 + 1
+
+
+def _month_end(value: date) -> date:
+    return value.replace(day=calendar.monthrange(value.year, value.month)[1])
+
+
+def merge_intervals(intervals) -> list:
+    """期間 [(開始日, 終了日), ...]（両端を含む）の重なり・連続をまとめ、開始日順のリストにする"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def sweep_occupied_days(merged: list, first: date, months: int) -> list:
+    """
+    月ごとの稼働日数（区間スイープ）
+
+    まとめた期間と月の境界を先頭から1回ずつ進めるため、計算量は O(期間数 + 月数) です。
+
+    Parameters:
+    - merged: merge_intervals の戻り値
+    - first: 最初の月（1日）
+    - months: 月数
+
+    Returns:
+    - list: 月ごとの稼働日数（長さ months）
+    """
+    days = [0] * months
+    position = 0
+    year, month = first.year, first.month
+    for m in range(months):
+        month_start = date(year, month, 1)
+        month_end = _month_end(month_start)
+        while position < len(merged) and merged[position][1] < month_start:
+            position += 1
+        index = position
+        while index < len(merged) and merged[index][0] <= month_end:
+            start, end = merged[index]
+            days[m] += (min(end, month_end) - max(start, month_start)).days + 1
+            index += 1
+        year, month = add_months(year, month, 1)
+    return days
+
+
+def _yen(value) -> Decimal:
+    return Decimal(value).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+
+
+def room_monthly_facts(room, contracts, until: date) -> list:
+    """
+    1部屋の月次稼働を計算
+
+    最初の契約開始月（部屋の登録月の方が早ければ登録月）から until の月までを対象にします。
+    終了日のない契約は契約中なら until まで、終了済みなら最終更新日までとして扱います。
+
+    Parameters:
+    - room: (部屋id, 物件id, tenant_id, 賃料, created_at)
+    - contracts: [(契約開始日, 契約終了日 or None, 月額賃料, 契約状況, updated_at), ...]
+    - until: 集計する最後の日（この日を含む月まで）
+
+    Returns:
+    - list: T_月次稼働 の行の辞書のリスト
+    """
+    room_id, property_id, tenant_id, room_rent, created_at = room
+    last_day = _month_end(until)
+
+    intervals = []
+    rent_contracts = []
+    for start, end, rent, status, updated_at in contracts:
+        if end is None and status != '契約中':
+            end = updated_at.date() if updated_at else start
+        end = min(end or last_day, last_day)
+        if start > last_day or end < start:
+            continue
+        intervals.append((start, end))
+        rent_contracts.append((0, start, end, rent))
+
+    starts = [start for start, _ in intervals]
+    if created_at is not None:
+        starts.append(created_at.date() if hasattr(created_at, 'date') else created_at)
+    if not starts:
+        return []
+    first = min(starts).replace(day=1)
+    if first > last_day:
+        return []
+
+    # 契約賃料は月次シミュレーションと同じ差分配列・日割りで計算（開始年の1月起点）
+    offset = first.month - 1
+    total_months = month_index(first.year, until.year, until.month) + 1
+    rents = build_monthly_rent(0, rent_contracts, first.year, total_months, 0)[offset:]
+    occupied_days = sweep_occupied_days(merge_intervals(intervals), first, total_months - offset)
+
+    potential = Decimal(str(room_rent or 0))
+    rows = []
+    year, month = first.year, first.month
+    for m in range(total_months - offset):
+        days_in_month = calendar.monthrange(year, month)[1]
+        occupied = min(occupied_days[m], days_in_month)
+        rows.append({
+            '部屋id': room_id, '年月': month_key(year, month), '物件id': property_id, 'tenant_id': tenant_id,
+            '月日数': days_in_month, '稼働日数': occupied, '契約賃料': _yen(rents[m]), '想定賃料': _yen(potential),
+            '空室損失': _yen(potential * (days_in_month - occupied) / days_in_month),
+        })
+        year, month = add_months(year, month, 1)
+    return rows
+
+
+def _rebuild(connection, room_condition, until: date) -> int:
+    rooms = connection.execute(
+        select(THeya.id, THeya.property_id, TBukken.tenant_id, THeya.賃料, THeya.created_at)
+        .join(TBukken, TBukken.id == THeya.property_id)
+        .where(room_condition, THeya.有効 == 1, TBukken.有効 == 1)
+        .order_by(THeya.id)
+    ).all()
+    contracts_by_room = {}
+    for room_id, *contract in connection.execute(
+        select(TKeiyaku.room_id, TKeiyaku.契約開始日, TKeiyaku.契約終了日, TKeiyaku.月額賃料,
+               TKeiyaku.契約状況, TKeiyaku.updated_at)
+        .join(THeya, THeya.id == TKeiyaku.room_id)
+        .join(TBukken, TBukken.id == THeya.property_id)
+        .where(room_condition)
+    ):
+        contracts_by_room.setdefault(room_id, []).append(contract)
+
+    count = 0
+    batch = []
+    for room in rooms:
+        batch.extend(room_monthly_facts(room, contracts_by_room.get(room.id, []), until))
+        if len(batch) >= _BATCH_SIZE:
+            connection.execute(insert(TOccupancyMonthly.__table__), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        connection.execute(insert(TOccupancyMonthly.__table__), batch)
+        count += len(batch)
+    return count
+
+
+# 物件・月ごとに合計する項目
+_ROLLUP_METRICS = ('部屋数', '月日数', '稼働日数', '契約賃料', '想定賃料', '空室損失')
+
+
+def _fact_totals_query():
+    facts = TOccupancyMonthly
+    return (
+        select(
+            facts.物件id, facts.年月, func.min(facts.tenant_id), func.count(),
+            func.sum(facts.月日数), func.sum(facts.稼働日数),
+            func.sum(facts.契約賃料), func.sum(facts.想定賃料), func.sum(facts.空室損失),
+        )
+        .group_by(facts.物件id, facts.年月)
+    )
+
+
+def _rollup(connection, tenant_id=None):
+    """T_月次稼働 を物件・月ごとに合計して T_月次稼働_物件 を作り直す（INSERT ... SELECT ... GROUP BY）"""
+    removal = delete(TOccupancyMonthlyProperty.__table__)
+    source = _fact_totals_query()
+    if tenant_id is not None:
+        removal = removal.where(TOccupancyMonthlyProperty.tenant_id == tenant_id)
+        source = source.where(TOccupancyMonthly.tenant_id == tenant_id)
+    connection.execute(removal)
+    connection.execute(
+        insert(TOccupancyMonthlyProperty.__table__).from_select(
+            ['物件id', '年月', 'tenant_id', *_ROLLUP_METRICS], source
+        )
+    )
+
+
+def _room_totals(connection, room_ids) -> dict:
+    """指定した部屋の月次稼働の物件・月ごとの合計 {(物件id, 年月): (tenant_id, 部屋数, ...)}"""
+    return {
+        (property_id, ym): tuple(values)
+        for property_id, ym, *values in connection.execute(
+            _fact_totals_query().where(TOccupancyMonthly.部屋id.in_(room_ids))
+        )
+    }
+
+
+def _apply_rollup_delta(connection, before: dict, after: dict):
+    """
+    部屋単位の作り直しの前後の差分だけを T_月次稼働_物件 に加減算
+
+    物件全体を集計し直さないため、部屋数の多い物件でも契約1件の変更は変更した部屋の月数分の更新で済みます。
+    既存の値を読んでから書くのではなく INSERT ... ON CONFLICT DO UPDATE で差分を加算するため、
+    同じ物件・月を同時に更新しても行の重複や更新の取りこぼしは起きません。部屋数が0になった行は削除します。
+    """
+    rows = []
+    for key in set(before) | set(after):
+        old = before.get(key, (None, *(0,) * len(_ROLLUP_METRICS)))
+        new = after.get(key, (None, *(0,) * len(_ROLLUP_METRICS)))
+        delta = [(n or 0) - (o or 0) for o, n in zip(old[1:], new[1:])]
+        if any(delta):
+            rows.append(dict(zip(('物件id', '年月', 'tenant_id', *_ROLLUP_METRICS),
+                                 (*key, new[0] if new[0] is not None else old[0], *delta))))
+    if not rows:
+        return
+
+    table = TOccupancyMonthlyProperty.__table__
+    upsert(connection, table, sorted(rows, key=lambda row: (row['物件id'], row['年月'])), ['物件id', '年月'],
+           lambda excluded: {metric: table.c[metric] + excluded[metric] for metric in _ROLLUP_METRICS})
+    connection.execute(
+        delete(table).where(
+            tuple_(table.c.物件id, table.c.年月).in_(sorted({(row['物件id'], row['年月']) for row in rows})),
+            table.c.部屋数 <= 0,
+        )
+    )
+
+
+def rebuild_occupancy_history(db, tenant_id=None, room_ids=None, until=None) -> int:
+    """
+    月次稼働を作り直す
+
+    Parameters:
+    - db: SQLAlchemyセッションまたはコネクション（呼び出し側でcommit）
+    - tenant_id: 指定した場合はそのテナントのみ
+    - room_ids: 指定した場合はその部屋のみ（契約・部屋の変更時の差分更新）
+    - until: 集計する最後の日（省略時は今日）
+
+    Returns:
+    - int: 作成した部屋・月ごとの行数
+    """
+    until = until or date.today()
+    if room_ids is not None:
+        count = 0
+        room_ids = sorted({room_id for room_id in room_ids if room_id is not None})
+        for start in range(0, len(room_ids), _BATCH_SIZE):
+            chunk = room_ids[start:start + _BATCH_SIZE]
+            before = _room_totals(db, chunk)
+            db.execute(delete(TOccupancyMonthly.__table__).where(TOccupancyMonthly.部屋id.in_(chunk)))
+            count += _rebuild(db, THeya.id.in_(chunk), until)
+            _apply_rollup_delta(db, before, _room_totals(db, chunk))
+        return count
+
+    removal = delete(TOccupancyMonthly.__table__)
+    if tenant_id is not None:
+        removal = removal.where(TOccupancyMonthly.tenant_id == tenant_id)
+        room_condition = TBukken.tenant_id == tenant_id
+    else:
+        room_condition = THeya.id.isnot(None)
+    db.execute(removal)
+    count = _rebuild(db, room_condition, until)
+    _rollup(db, tenant_id=tenant_id)
+    return count
+
+
+def ensure_occupancy_history(engine) -> int:
+    """
+    月次稼働が空で契約がある場合（導入直後）に全件を作成（アプリ起動時に呼ぶ）
+
+    Returns:
+    - int: 作成した行数
+    """
+    with Session(bind=engine) as db:
+        is_empty = db.execute(select(TOccupancyMonthly.部屋id).limit(1)).first() is None
+        has_source = db.execute(select(TKeiyaku.id).limit(1)).first() is not None
+        if not (is_empty and has_source):
+            return 0
+        count = rebuild_occupancy_history(db)
+        db.commit()
+        logger.info(f"月次稼働を作成しました: {count}件")
+        return count
+
+
+# ==================== 集計 ====================
+
+def _month_range_condition(query, first_month=None, last_month=None):
+    if first_month:
+        query = query.where(TOccupancyMonthlyProperty.年月 >= first_month)
+    if last_month:
+        query = query.where(TOccupancyMonthlyProperty.年月 <= last_month)
+    return query
+
+
+def monthly_occupancy(db, tenant_id: int, property_id=None, first_month=None, last_month=None) -> list:
+    """
+    月ごとの稼働率・契約賃料・空室損失の推移
+
+    Parameters:
+    - property_id: 指定した場合はその物件のみ（省略時はテナントの全物件）
+    - first_month, last_month: 対象期間（YYYY-MM、両端を含む）
+
+    Returns:
+    - list: [{'年月', '部屋数', '稼働日数', '月日数', '稼働率', '契約賃料', '想定賃料', '空室損失'}, ...]（年月順）
+    """
+    query = (
+        select(
+            TOccupancyMonthlyProperty.年月,
+            func.sum(TOccupancyMonthlyProperty.部屋数),
+            func.sum(TOccupancyMonthlyProperty.稼働日数),
+            func.sum(TOccupancyMonthlyProperty.月日数),
+            func.sum(TOccupancyMonthlyProperty.契約賃料),
+            func.sum(TOccupancyMonthlyProperty.想定賃料),
+            func.sum(TOccupancyMonthlyProperty.空室損失),
+        )
+        .where(TOccupancyMonthlyProperty.tenant_id == tenant_id)
+        .group_by(TOccupancyMonthlyProperty.年月)
+        .order_by(TOccupancyMonthlyProperty.年月)
+    )
+    if property_id is not None:
+        query = query.where(TOccupancyMonthlyProperty.物件id == property_id)
+    query = _month_range_condition(query, first_month, last_month)
+    return [
+        {
+            '年月': ym, '部屋数': rooms, '稼働日数': occupied, '月日数': days,
+            '稼働率': occupancy_rate(days, occupied), '契約賃料': contract_rent,
+            '想定賃料': potential_rent, '空室損失': loss,
+        }
+        for ym, rooms, occupied, days, contract_rent, potential_rent, loss in db.execute(query)
+    ]
+
+
+def vacancy_loss_by_property(db, tenant_id: int, first_month=None, last_month=None) -> list:
+    """
+    物件ごとの期間中の稼働率と空室損失（空室損失の大きい順）
+
+    Returns:
+    - list: [{'物件id', '物件名', '稼働率', '契約賃料', '想定賃料', '空室損失'}, ...]
+    """
+    query = (
+        select(
+            TBukken.id, TBukken.物件名,
+            func.sum(TOccupancyMonthlyProperty.稼働日数),
+            func.sum(TOccupancyMonthlyProperty.月日数),
+            func.sum(TOccupancyMonthlyProperty.契約賃料),
+            func.sum(TOccupancyMonthlyProperty.想定賃料),
+            func.sum(TOccupancyMonthlyProperty.空室損失).label('loss'),
+        )
+        .join(TBukken, TBukken.id == TOccupancyMonthlyProperty.物件id)
+        .where(TOccupancyMonthlyProperty.tenant_id == tenant_id)
+        .group_by(TBukken.id, TBukken.物件名)
+        .order_by(func.sum(TOccupancyMonthlyProperty.空室損失).desc(), TBukken.id)
+    )
+    query = _month_range_condition(query, first_month, last_month)
+    return [
+        {
+            '物件id': property_id, '物件名': name, '稼働率': occupancy_rate(days, occupied),
+            '契約賃料': contract_rent, '想定賃料': potential_rent, '空室損失': loss,
+        }
+        for property_id, name, occupied, days, contract_rent, potential_rent, loss in db.execute(query)
+    ]
+
+
+def trailing_months(months: int, until=None) -> tuple:
+    """until の前月までの直近 months か月の (最初の年月, 最後の年月)。当月は途中のため含めない"""
+    until = until or date.today()
+    year, month = add_months(until.year, until.month, -1)
+    first_year, first_month = add_months(year, month, -(months - 1))
+    return month_key(first_year, first_month), month_key(year, month)
+
+
+def actual_occupancy_rate(db, tenant_id: int, property_id=None, months: int = ACTUAL_OCCUPANCY_MONTHS, until=None):
+    """
+    直近 months か月の実績稼働率（%、稼働日数 / 日数）
+
+    Returns:
+    - Decimal or None: 対象期間の月次稼働がない場合はNone
+    """
+    first_month, last_month = trailing_months(months, until)
+    query = select(
+        func.sum(TOccupancyMonthlyProperty.月日数), func.sum(TOccupancyMonthlyProperty.稼働日数)
+    ).where(TOccupancyMonthlyProperty.tenant_id == tenant_id)
+    if property_id is not None:
+        query = query.where(TOccupancyMonthlyProperty.物件id == property_id)
+    days, occupied = db.execute(_month_range_condition(query, first_month, last_month)).one()
+    return occupancy_rate(days, occupied)
+
+
+# ==================== ORMイベントによる差分更新 ====================
+
+_ROOM_FIELDS = ('property_id', '賃料', '有効')
+_CONTRACT_FIELDS = ('room_id', '契約開始日', '契約終了日', '月額賃料', '契約状況')
+
+
+def _register_listeners():
+    def room_inserted(_mapper, connection, target):
+        rebuild_occupancy_history(connection, room_ids=[target.id])
+
+    def room_updated(_mapper, connection, target):
+        if _changed(target, _ROOM_FIELDS):
+            room_inserted(_mapper, connection, target)
+
+    def contract_changed(_mapper, connection, target):
+        rebuild_occupancy_history(connection, room_ids=_history_values(target, 'room_id'))
+
+    def contract_updated(_mapper, connection, target):
+        if _changed(target, _CONTRACT_FIELDS):
+            contract_changed(_mapper, connection, target)
+
+    event.listen(THeya, 'after_insert', room_inserted)
+    event.listen(THeya, 'after_update', room_updated)
+    event.listen(TKeiyaku, 'after_insert', contract_changed)
+    event.listen(TKeiyaku, 'after_update', contract_updated)
+    event.listen(TKeiyaku, 'after_delete', contract_changed)
+
+
+_register_listeners()
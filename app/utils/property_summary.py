@@ -0,0 +1,229 @@
+"""
+物件集計ユーティリティ
+物件ごとの部屋数・入居中/空室数・契約賃料・想定賃料・稼働率を T_物件集計 に保持し、
+部屋・契約の変更時（ORMイベント）と一括取込後に対象物件だけを集計し直す。
+ダッシュボード・物件一覧・シミュレーションは部屋を数えずに1物件1行を読む。
+"""
+import logging
+from decimal import Decimal
+
+from sqlalchemy import select, delete, event, inspect, case, func, and_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models_property import TBukken, THeya, TKeiyaku, TPropertySummary
+
+logger = logging.getLogger(__name__)
+
+
+_REFRESH_BATCH_SIZE = 1000
+
+# 一覧・JSONに出力する集計項目
+SUMMARY_COLUMNS = ['部屋数', '入居中部屋数', '空室数', '契約中件数', '契約賃料', '想定賃料', '稼働率']
+
+
+def occupancy_rate(rooms, occupied):
+    """稼働率（%、小数第2位まで）。部屋がない場合はNone"""
+    if not rooms:
+        return None
+    return (Decimal(occupied or 0) * 100 / Decimal(rooms)).quantize(Decimal('0.01'))
+
+
+def upsert(connection, table, rows, index_elements, set_):
+    """
+    INSERT ... ON CONFLICT (index_elements) DO UPDATE で行を作成・更新
+
+    DELETE してから INSERT すると、同じ物件を同時に集計し直したトランザクションどうしが
+    主キーの重複で失敗するため、集計表の書き込みはこの関数で行う。
+    PostgreSQLとそれ以外（SQLite）で方言の insert を使い分ける。
+
+    Parameters:
+    - connection: SQLAlchemyセッションまたはコネクション
+    - table: 対象のテーブル
+    - rows: 挿入する行の辞書のリスト
+    - index_elements: 衝突を判定する主キー・一意キーのカラム名のリスト
+    - set_: excluded（挿入しようとした行）を受け取り、既存行に設定する {カラム名: 式} を返す関数
+    """
+    if not rows:
+        return
+    bind = connection.get_bind() if isinstance(connection, Session) else connection
+    dialect = postgresql if bind.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(table)
+    connection.execute(
+        statement.on_conflict_do_update(index_elements=index_elements, set_=set_(statement.excluded)),
+        rows
+    )
+
+
+def _summary_query(property_ids):
+    """対象物件の集計を1クエリで求める（有効な部屋と、その部屋の契約中の契約を集計）"""
+    active_contracts = (
+        select(
+            TKeiyaku.room_id,
+            func.count().label('contract_count'),
+            func.sum(TKeiyaku.月額賃料).label('contract_rent'),
+        )
+        .join(THeya, THeya.id == TKeiyaku.room_id)
+        .where(TKeiyaku.契約状況 == '契約中', THeya.property_id.in_(property_ids))
+        .group_by(TKeiyaku.room_id)
+        .subquery()
+    )
+    return (
+        select(
+            TBukken.id,
+            TBukken.tenant_id,
+            func.count(THeya.id),
+            func.coalesce(func.sum(case((THeya.入居状況 == '入居中', 1), else_=0)), 0),
+            func.coalesce(func.sum(case((THeya.入居状況 == '空室', 1), else_=0)), 0),
+            func.coalesce(func.sum(active_contracts.c.contract_count), 0),
+            func.coalesce(func.sum(active_contracts.c.contract_rent), 0),
+            func.coalesce(func.sum(THeya.賃料), 0),
+        )
+        .select_from(TBukken)
+        .outerjoin(THeya, and_(THeya.property_id == TBukken.id, THeya.有効 == 1))
+        .outerjoin(active_contracts, active_contracts.c.room_id == THeya.id)
+        .where(TBukken.id.in_(property_ids))
+        .group_by(TBukken.id, TBukken.tenant_id)
+    )
+
+
+def refresh_property_summaries(connection, property_ids) -> int:
+    """
+    指定した物件の集計を作り直す
+
+    Parameters:
+    - connection: SQLAlchemyセッションまたはコネクション（呼び出し側でcommit）
+    - property_ids: 対象の物件IDのリスト（削除済みの物件は集計行を削除）
+
+    Returns:
+    - int: 作成した集計行の数
+    """
+    property_ids = sorted({property_id for property_id in property_ids if property_id is not None})
+    count = 0
+    for start in range(0, len(property_ids), _REFRESH_BATCH_SIZE):
+        chunk = property_ids[start:start + _REFRESH_BATCH_SIZE]
+        rows = [
+            {
+                '物件id': property_id, 'tenant_id': tenant_id, '部屋数': rooms,
+                '入居中部屋数': occupied, '空室数': vacant, '契約中件数': contract_count,
+                '契約賃料': contract_rent, '想定賃料': potential_rent,
+                '稼働率': occupancy_rate(rooms, occupied),
+            }
+            for property_id, tenant_id, rooms, occupied, vacant, contract_count, contract_rent, potential_rent
+            in connection.execute(_summary_query(chunk))
+        ]
+        # 削除済みの物件の集計行を消し、残りは上書きする
+        removed = set(chunk) - {row['物件id'] for row in rows}
+        if removed:
+            connection.execute(delete(TPropertySummary.__table__).where(TPropertySummary.物件id.in_(removed)))
+        upsert(connection, TPropertySummary.__table__, rows, ['物件id'],
+               lambda excluded: dict({column: excluded[column] for column in ('tenant_id', *SUMMARY_COLUMNS)},
+                                     updated_at=func.now()))
+        count += len(rows)
+    return count
+
+
+def rebuild_property_summaries(db, tenant_id=None) -> int:
+    """
+    物件集計を全件作り直す
+
+    Parameters:
+    - db: SQLAlchemyセッション（呼び出し側でcommit）
+    - tenant_id: 指定した場合はそのテナントのみ
+
+    Returns:
+    - int: 作成した集計行の数
+    """
+    query = select(TBukken.id)
+    removal = delete(TPropertySummary)
+    if tenant_id is not None:
+        query = query.where(TBukken.tenant_id == tenant_id)
+        removal = removal.where(TPropertySummary.tenant_id == tenant_id)
+    db.execute(removal)
+    return refresh_property_summaries(db, db.execute(query).scalars().all())
+
+
+def ensure_property_summaries(engine) -> int:
+    """
+    集計が空で物件がある場合（導入直後）に全件を作成（アプリ起動時に呼ぶ）
+
+    Returns:
+    - int: 作成した集計行の数
+    """
+    with Session(bind=engine) as db:
+        is_empty = db.execute(select(TPropertySummary.物件id).limit(1)).first() is None
+        has_source = db.execute(select(TBukken.id).limit(1)).first() is not None
+        if not (is_empty and has_source):
+            return 0
+        count = rebuild_property_summaries(db)
+        db.commit()
+        logger.info(f"物件集計を作成しました: {count}件")
+        return count
+
+
+# ==================== ORMイベントによる差分更新 ====================
+
+def _history_values(target, field):
+    """
+    属性の変更前後の値（変更がなければ現在の値）
+
+    変更前の値は _PREVIOUS_VALUE_ATTRIBUTES の属性だけ、コミット後に期限切れになっていても取得できます。
+    """
+    history = inspect(target).attrs[field].history
+    return [value for value in (*history.deleted, *history.added, *history.unchanged) if value is not None]
+
+
+def _changed(target, fields) -> bool:
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+def _refresh_for_rooms(connection, room_ids):
+    property_ids = connection.execute(
+        select(THeya.property_id).where(THeya.id.in_(room_ids)).distinct()
+    ).scalars().all()
+    refresh_property_summaries(connection, property_ids)
+
+
+# 移動元の物件・部屋を集計し直すため、期限切れでも変更前の値を読み込んでから変更する属性
+_PREVIOUS_VALUE_ATTRIBUTES = (THeya.property_id, TKeiyaku.room_id)
+
+# 集計に影響する項目
+_ROOM_FIELDS = ('property_id', '入居状況', '賃料', '有効')
+_CONTRACT_FIELDS = ('room_id', '契約状況', '月額賃料')
+
+
+def _register_listeners():
+    def room_changed(_mapper, connection, target):
+        refresh_property_summaries(connection, _history_values(target, 'property_id'))
+
+    def room_updated(_mapper, connection, target):
+        if _changed(target, _ROOM_FIELDS):
+            room_changed(_mapper, connection, target)
+
+    def contract_changed(_mapper, connection, target):
+        _refresh_for_rooms(connection, _history_values(target, 'room_id'))
+
+    def contract_updated(_mapper, connection, target):
+        if _changed(target, _CONTRACT_FIELDS):
+            contract_changed(_mapper, connection, target)
+
+    def property_inserted(_mapper, connection, target):
+        refresh_property_summaries(connection, [target.id])
+
+    def keep_previous_value(_target, value, _oldvalue, _initiator):
+        return value
+
+    for attribute in _PREVIOUS_VALUE_ATTRIBUTES:
+        event.listen(attribute, 'set', keep_previous_value, active_history=True, retval=True)
+
+    event.listen(THeya, 'after_insert', room_changed)
+    event.listen(THeya, 'after_update', room_updated)
+    event.listen(THeya, 'after_delete', room_changed)
+    event.listen(TKeiyaku, 'after_insert', contract_changed)
+    event.listen(TKeiyaku, 'after_update', contract_updated)
+    event.listen(TKeiyaku, 'after_delete', contract_changed)
+    event.listen(TBukken, 'after_insert', property_inserted)
+
+
+_register_listeners()
@@ -0,0 +1,139 @@
+"""
+レディネスチェックユーティリティ
+/readyz で使う依存先の状態（DBへの接続・スキーマが最新か・コネクションプールの空き）を調べ、
+それぞれの所要時間とあわせて返す。ロードバランサーからの頻繁な確認でDBに負荷をかけないよう、
+結果はプロセス内に短時間キャッシュする。
+"""
+import threading
+import time
+
+from sqlalchemy import inspect, text
+
+
+# チェック結果のキャッシュ期間（秒）
+READINESS_CACHE_TTL = 5
+
+# スキーマのチェック結果のキャッシュ期間（秒）。テーブルごとに問い合わせるため長めにする
+SCHEMA_CHECK_TTL = 300
+
+# 使用中の接続数 / 最大接続数 がこの割合以上で警告（1.0 で空きがなければ準備未完了）
+POOL_WARN_SATURATION = 0.8
+
+_cache_lock = threading.Lock()
+_cache = {'result': None, 'checked_at': 0.0, 'schema': None, 'schema_checked_at': 0.0}
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def check_pool(engine) -> dict:
+    """コネクションプールの使用状況"""
+    pool = engine.pool
+    if not hasattr(pool, 'checkedout'):
+        return {'ok': True, 'pool': type(pool).__name__}
+    size = pool.size()
+    max_overflow = max(0, getattr(pool, '_max_overflow', 0))
+    checked_out = pool.checkedout()
+    capacity = size + max_overflow
+    saturation = round(checked_out / capacity, 3) if capacity else 0.0
+    return {
+        'ok': saturation < 1.0,
+        'warning': saturation >= POOL_WARN_SATURATION,
+        'size': size,
+        'max_overflow': max_overflow,
+        'checked_out': checked_out,
+        'overflow': max(0, pool.overflow()),
+        'saturation': saturation,
+    }
+
+
+def check_database(engine) -> dict:
+    """プールの接続で SELECT 1 を実行"""
+    started = time.perf_counter()
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    except Exception as e:
+        return {'ok': False, 'latency_ms': _elapsed_ms(started), 'error': f'{type(e).__name__}: {e}'}
+    return {'ok': True, 'latency_ms': _elapsed_ms(started)}
+
+
+def check_schema(engine, metadata) -> dict:
+    """
+    モデル定義のテーブル・カラムがDBにすべてあるか（自動マイグレーションが済んでいるか）
+
+    Returns:
+    - dict: {'ok', 'latency_ms', 'tables', 'missing_tables', 'missing_columns': {テーブル: [カラム]}}
+    """
+    started = time.perf_counter()
+    try:
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+        missing_tables = []
+        missing_columns = {}
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                missing_tables.append(table.name)
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            missing = [column.name for column in table.columns if column.name not in columns]
+            if missing:
+                missing_columns[table.name] = missing
+    except Exception as e:
+        return {'ok': False, 'latency_ms': _elapsed_ms(started), 'error': f'{type(e).__name__}: {e}'}
+    return {
+        'ok': not missing_tables and not missing_columns,
+        'latency_ms': _elapsed_ms(started),
+        'tables': len(metadata.sorted_tables),
+        'missing_tables': missing_tables,
+        'missing_columns': missing_columns,
+    }
+
+
+def check_readiness(engine, metadata) -> dict:
+    """
+    依存先をすべてチェック（キャッシュしない）
+
+    プールに空きがない場合はDBへの問い合わせが待たされるため、DB・スキーマのチェックを行わずに準備未完了とします。
+    スキーマのチェック結果は SCHEMA_CHECK_TTL 秒間再利用します。
+    """
+    started = time.perf_counter()
+    checks = {'pool': check_pool(engine)}
+    if not checks['pool']['ok']:
+        checks['database'] = {'ok': False, 'error': 'コネクションプールに空きがありません'}
+    else:
+        checks['database'] = check_database(engine)
+
+    if checks['database']['ok']:
+        with _cache_lock:
+            schema = _cache['schema']
+            schema_age = time.monotonic() - _cache['schema_checked_at']
+        if schema is None or schema_age >= SCHEMA_CHECK_TTL or not schema['ok']:
+            schema = check_schema(engine, metadata)
+            schema_age = 0.0
+            with _cache_lock:
+                _cache['schema'] = schema
+                _cache['schema_checked_at'] = time.monotonic()
+        checks['schema'] = dict(schema, age_s=round(schema_age, 1))
+
+    return {
+        'ok': all(check['ok'] for check in checks.values()),
+        'checks': checks,
+        'latency_ms': _elapsed_ms(started),
+    }
+
+
+def get_readiness(engine, metadata) -> dict:
+    """チェック結果をキャッシュから取得（READINESS_CACHE_TTL 秒を過ぎていればチェックし直す）"""
+    with _cache_lock:
+        result = _cache['result']
+        age = time.monotonic() - _cache['checked_at']
+    if result is not None and age < READINESS_CACHE_TTL:
+        return dict(result, cached=True, age_s=round(age, 1))
+
+    result = check_readiness(engine, metadata)
+    with _cache_lock:
+        _cache['result'] = result
+        _cache['checked_at'] = time.monotonic()
+    return dict(result, cached=False, age_s=0.0)
@@ -0,0 +1,225 @@
+"""
+リクエスト計測ユーティリティ
+リクエストごとの処理時間・SQLの実行回数とDB時間・新規DB接続数を計測し、JSONログに出力する。
+SQLAlchemy（app/db.py の engine）はカーソル実行イベントで、get_db() の直接接続はカーソルを差し替えて計測する。
+同じ形のSQLを何度も実行しているリクエスト（N+1クエリ）は警告ログを出す。
+"""
+import contextvars
+import logging
+import re
+import sqlite3
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+# 同じ形のSQLがこの回数を超えたらN+1クエリとして警告（0以下で無効）
+SQL_REPEAT_THRESHOLD = 10
+
+# 警告ログに含めるSQLの最大文字数
+SQL_LOG_LENGTH = 300
+
+# プロファイル中に記録するSQLの最大件数
+SQL_CAPTURE_LIMIT = 2000
+
+
+class RequestStats:
+    """1リクエスト分の計測値"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.connections = 0
+        self.statements = Counter()
+        self.samples = {}
+        # プロファイル中はリストにして実行したSQLと時間を記録する
+        self.queries = None
+
+    def record_query(self, statement: str, duration: float) -> None:
+        self.sql_count += 1
+        self.sql_time += duration
+        shape = statement_shape(statement)
+        self.statements[shape] += 1
+        self.samples.setdefault(shape, statement)
+        if self.queries is not None and len(self.queries) < SQL_CAPTURE_LIMIT:
+            self.queries.append((statement, duration))
+
+    def repeated_statements(self, threshold: int) -> list:
+        """threshold 回を超えて実行された同じ形のSQL [(回数, SQL), ...]（回数の多い順）"""
+        if threshold <= 0:
+            return []
+        return [
+            (count, self.samples[shape]) for shape, count in self.statements.most_common()
+            if count > threshold
+        ]
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+_NUMBER = re.compile(r'\b\d+(\.\d+)?\b')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r'%\(\w+\)s|%s|\?|:\w+')
+_IN_LIST = re.compile(r'\(\s*\?(\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def statement_shape(statement: str) -> str:
+    """SQLのリテラル・パラメータ・IN句の要素数を除いた形（N+1クエリの判定用）"""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _IN_LIST.sub('(?)', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def start_request() -> RequestStats:
+    """計測を開始（このスレッド/コンテキストで実行されるSQLを記録する）"""
+    stats = RequestStats()
+    _current.set(stats)
+    return stats
+
+
+def finish_request():
+    """計測を終了して計測値を返す（開始していない場合はNone）"""
+    stats = _current.get()
+    _current.set(None)
+    return stats
+
+
+def current_stats():
+    """計測中の計測値（計測していない場合はNone）"""
+    return _current.get()
+
+
+def record_query(statement: str, duration: float) -> None:
+    """計測中であればSQLの実行を記録"""
+    stats = _current.get()
+    if stats is not None:
+        stats.record_query(statement, duration)
+
+
+def record_connection() -> None:
+    """計測中であれば新規DB接続を記録"""
+    stats = _current.get()
+    if stats is not None:
+        stats.connections += 1
+
+
+# ---- SQLAlchemy ----
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started'].pop()
+    record_query(statement, time.perf_counter() - started)
+
+
+def _on_connect(dbapi_connection, connection_record):
+    record_connection()
+
+
+def instrument_engine(engine) -> None:
+    """SQLAlchemyエンジンのSQL実行・新規接続を計測対象にする"""
+    if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'connect', _on_connect)
+
+
+# ---- get_db() の直接接続 ----
+
+def _timed(method):
+    def execute(self, statement, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(self, statement, *args, **kwargs)
+        finally:
+            record_query(statement if isinstance(statement, str) else str(statement), time.perf_counter() - started)
+    return execute
+
+
+class TimedSqliteCursor(sqlite3.Cursor):
+    """実行時間を記録するSQLiteカーソル"""
+    execute = _timed(sqlite3.Cursor.execute)
+    executemany = _timed(sqlite3.Cursor.executemany)
+
+
+class TimedSqliteConnection(sqlite3.Connection):
+    """カーソルの実行時間を記録するSQLite接続（sqlite3.connect の factory に指定する）"""
+
+    def cursor(self, factory=TimedSqliteCursor):
+        return super().cursor(factory)
+
+    def execute(self, statement, *args):
+        return self.cursor().execute(statement, *args)
+
+    def executemany(self, statement, *args):
+        return self.cursor().executemany(statement, *args)
+
+
+def timed_pg_cursor_factory(psycopg2):
+    """実行時間を記録するpsycopg2のカーソルクラス（psycopg2.connect の cursor_factory に指定する）"""
+    base = psycopg2.extensions.cursor
+    return type('TimedPgCursor', (base,), {
+        'execute': _timed(base.execute),
+        'executemany': _timed(base.executemany),
+    })
+
+
+# ---- Flask ----
+
+def init_request_metrics(app, engine) -> None:
+    """
+    リクエストの計測を有効にする
+
+    リクエスト終了時に「request」ログ（endpoint, method, status, 処理時間ms, SQL件数, SQL時間ms, 新規接続数）を出力し、
+    同じ形のSQLが SQL_REPEAT_THRESHOLD 回を超えた場合は警告ログを出します。
+    """
+    from flask import request
+    from app.utils.metrics import observe_request, update_pool_gauges
+
+    instrument_engine(engine)
+    threshold = app.config.get('SQL_REPEAT_THRESHOLD', SQL_REPEAT_THRESHOLD)
+
+    @app.before_request
+    def _start_request_metrics():
+        start_request()
+
+    @app.after_request
+    def _log_request_metrics(response):
+        stats = finish_request()
+        if stats is None:
+            return response
+        fields = {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - stats.started) * 1000, 1),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(stats.sql_time * 1000, 1),
+            'db_connections': stats.connections,
+        }
+        logger.info('request', extra=fields)
+        update_pool_gauges(engine)
+        observe_request(request.endpoint, request.method, response.status_code,
+                        time.perf_counter() - stats.started, stats.sql_count)
+        for count, statement in stats.repeated_statements(threshold):
+            logger.warning(
+                f'N+1クエリの可能性: 同じ形のSQLを{count}回実行しました',
+                extra={'endpoint': request.endpoint, 'path': request.path, 'repeat_count': count,
+                       'statement': statement[:SQL_LOG_LENGTH]},
+            )
+        return response
+
+    @app.teardown_request
+    def _clear_request_metrics(exc):
+        # 例外で after_request が呼ばれなかった場合も計測を終了する
+        finish_request()
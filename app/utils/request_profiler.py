@@ -0,0 +1,193 @@
+"""
+リクエストプロファイラ
+システム管理者がクエリパラメータ _profile=1（またはヘッダー X-Profile: 1）を付けたリクエストだけを
+cProfile で計測し、実行したSQLとあわせて PROFILE_DIR に保存する。
+保存した .prof は snakeviz / flameprof などでフレームグラフとして表示できる。
+_profile=view の場合は画面の代わりに計測結果をテキストで返す。
+"""
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from app.utils.request_metrics import current_stats
+
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+
+# 保存しておくプロファイルの数（超えた場合は古いものから削除）
+PROFILE_KEEP = 50
+
+# 計測結果に含める関数の数（累積時間の多い順）
+PROFILE_TOP_FUNCTIONS = 40
+
+PROFILE_ROLE = 'system_admin'
+
+
+def profile_dir() -> str:
+    """プロファイルの保存先（環境変数 PROFILE_DIR、省略時は一時ディレクトリ）"""
+    path = os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'property-app-profiles')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _profile_path(profile_id: str, extension: str) -> str:
+    if not profile_id or not all(c.isalnum() or c in '-_' for c in profile_id):
+        raise ValueError(f'不正なプロファイルIDです: {profile_id}')
+    return os.path.join(profile_dir(), f'{profile_id}.{extension}')
+
+
+def top_functions(profiler, limit: int = PROFILE_TOP_FUNCTIONS) -> list:
+    """累積時間の多い順の関数 [{'function', 'calls', 'total_ms', 'cumulative_ms'}]"""
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, name), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f'{filename}:{line}({name})',
+            'calls': calls,
+            'total_ms': round(total * 1000, 2),
+            'cumulative_ms': round(cumulative * 1000, 2),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def save_profile(profiler, info: dict) -> str:
+    """
+    プロファイル（.prof）と計測情報（.json）を保存し、古いものを削除
+
+    Returns:
+    - str: プロファイルID
+    """
+    profile_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    profiler.dump_stats(_profile_path(profile_id, 'prof'))
+    with open(_profile_path(profile_id, 'json'), 'w', encoding='utf-8') as f:
+        json.dump(dict(info, id=profile_id), f, ensure_ascii=False)
+
+    saved = sorted(name for name in os.listdir(profile_dir()) if name.endswith('.json'))
+    for name in saved[:-PROFILE_KEEP]:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(profile_dir(), f'{name[:-5]}.{extension}'))
+            except OSError:
+                pass
+    return profile_id
+
+
+def list_profiles() -> list:
+    """保存済みのプロファイルの計測情報（新しい順、関数・SQLの一覧は含めない）"""
+    profiles = []
+    for name in sorted(os.listdir(profile_dir()), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(profile_dir(), name), encoding='utf-8') as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        info.pop('functions', None)
+        info.pop('queries', None)
+        profiles.append(info)
+    return profiles
+
+
+def load_profile(profile_id: str):
+    """保存済みのプロファイルの計測情報（ない場合はNone）"""
+    try:
+        with open(_profile_path(profile_id, 'json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def profile_file(profile_id: str):
+    """保存済みの .prof のパス（ない場合はNone）"""
+    try:
+        path = _profile_path(profile_id, 'prof')
+    except ValueError:
+        return None
+    return path if os.path.exists(path) else None
+
+
+def format_report(info: dict) -> str:
+    """計測結果をテキストにする（_profile=view の応答）"""
+    lines = [
+        f"{info['method']} {info['path']} ({info['endpoint']}) status={info['status']}",
+        f"処理時間 {info['duration_ms']}ms / SQL {info['sql_count']}件 {info['sql_ms']}ms / プロファイルID {info['id']}",
+        '',
+        f"{'cumulative_ms':>14} {'total_ms':>10} {'calls':>8}  function",
+    ]
+    for row in info['functions']:
+        lines.append(f"{row['cumulative_ms']:>14} {row['total_ms']:>10} {row['calls']:>8}  {row['function']}")
+    lines += ['', 'SQL:']
+    for query in info['queries']:
+        lines.append(f"{query['ms']:>10}ms  {query['statement']}")
+    return '\n'.join(lines) + '\n'
+
+
+def init_request_profiler(app) -> None:
+    """
+    システム管理者のリクエストのプロファイルを有効にする
+
+    init_request_metrics の後に呼び出してください（SQLの記録にリクエスト計測を使います）。
+    """
+    from flask import request, session, g, Response
+
+    @app.before_request
+    def _start_profile():
+        flag = request.args.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+        if not flag or session.get('role') != PROFILE_ROLE:
+            return
+        stats = current_stats()
+        if stats is not None:
+            stats.queries = []
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # 他のプロファイラが動いている場合は計測しない
+            return
+        g.request_profile = (profiler, flag, time.perf_counter())
+
+    @app.after_request
+    def _finish_profile(response):
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return response
+        profiler, flag, started = profile
+        profiler.disable()
+        duration = time.perf_counter() - started
+
+        stats = current_stats()
+        queries = (stats.queries or []) if stats is not None else []
+        info = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 1),
+            'sql_count': stats.sql_count if stats is not None else 0,
+            'sql_ms': round(stats.sql_time * 1000, 1) if stats is not None else 0.0,
+            'functions': top_functions(profiler),
+            'queries': [{'statement': statement, 'ms': round(seconds * 1000, 2)} for statement, seconds in queries],
+        }
+        info['id'] = save_profile(profiler, info)
+
+        if flag == 'view':
+            return Response(format_report(info), mimetype='text/plain; charset=utf-8',
+                            headers={'X-Profile-Id': info['id']})
+        response.headers['X-Profile-Id'] = info['id']
+        return response
+
+    @app.teardown_request
+    def _discard_profile(exc):
+        # 例外で after_request が呼ばれなかった場合も計測を止める
+        profile = g.pop('request_profile', None)
+        if profile is not None:
+            profile[0].disable()
@@ -0,0 +1,282 @@
+"""
+シミュレーション逆算（ゴールシーク）ユーティリティ
+目標（累積キャッシュフロー・DSCR）を満たす借入金額・年間家賃収入・稼働率の限界値を二分法で求める
+"""
+import time
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from types import SimpleNamespace
+
+from app.utils.simulation_kernel import calculate_loan_payment, run_simulation_kernel
+from app.utils.simulation_monthly import run_monthly_simulation
+
+
+# 逆算できる変数と探索方向（'max': 目標を満たす最大値、'min': 目標を満たす最小値）
+GOAL_SEEK_VARIABLES = {
+    '借入金額': 'max',
+    '年間家賃収入': 'min',
+    '稼働率': 'min',
+}
+
+# 目標の種類と既定の閾値
+GOAL_SEEK_TARGETS = {
+    '累積キャッシュフロー': Decimal('0'),
+    'DSCR': Decimal('1.2'),
+}
+
+# 二分法の設定
+GOAL_SEEK_MAX_ITERATIONS = 60
+GOAL_SEEK_MAX_EXPANSIONS = 40
+
+# 借入金額の探索上限（円）。金利0%・返済期間0年などで返済が発生せず、いくら借りても
+# 目標を満たしてしまう場合はこの額で打ち切り、達成できない（上限が求まらない）とする
+GOAL_SEEK_MAX_LOAN_AMOUNT = Decimal('100000000000')
+
+# 詳細モードで比例換算した借入金額の検証設定
+GOAL_SEEK_MAX_REFINEMENTS = 10
+GOAL_SEEK_REFINEMENT_STEP = Decimal('0.0001')
+
+# 変数ごとの解の刻み（円・%）
+GOAL_SEEK_RESOLUTION = {
+    '借入金額': Decimal('1'),
+    '年間家賃収入': Decimal('1'),
+    '稼働率': Decimal('0.01'),
+}
+
+
+def snapshot_simulation(simulation) -> SimpleNamespace:
+    """
+    シミュレーションの入力値を複製（ORMオブジェクトを変更せずに試算するため）
+
+    Parameters:
+    - simulation: TSimulation
+
+    Returns:
+    - SimpleNamespace: カラム名をそのまま属性に持つオブジェクト
+    """
+    return SimpleNamespace(**{
+        column.key: getattr(simulation, column.key)
+        for column in simulation.__table__.columns
+    })
+
+
+def evaluate_target(yearly_rows: list, target: str):
+    """
+    年度別結果から目標指標を計算
+
+    Parameters:
+    - yearly_rows: run_simulation_kernel の戻り値
+    - target: '累積キャッシュフロー'（期間中の最小値）または 'DSCR'（返済のある年度の最小値）
+
+    Returns:
+    - Decimal or None: 指標値。DSCRで返済のある年度がない場合はNone
+    """
+    if target == 'DSCR':
+        values = [row['DSCR'] for row in yearly_rows if row['DSCR'] is not None]
+    else:
+        values = [row['累積キャッシュフロー'] for row in yearly_rows]
+    return min(values) if values else None
+
+
+def _is_satisfied(value, threshold: Decimal) -> bool:
+    """目標を満たすか判定（返済がなくDSCRが計算できない場合は満たすとみなす）"""
+    return value is None or value >= threshold
+
+
+def _scale_loan_yearly_data(base_data: dict, ratio: Decimal) -> dict:
+    """借入金額に比例させてローン年度別データを換算"""
+    return {
+        year: {key: value * ratio for key, value in data.items()}
+        for year, data in base_data.items()
+    }
+
+
+def _bisect(feasible, low: Decimal, high: Decimal, direction: str,
+            resolution: Decimal, max_iterations: int) -> tuple:
+    """
+    単調な判定関数の境界を二分法で探索
+
+    direction='max' のとき low は実行可能・high は実行不可能、
+    direction='min' のとき low は実行不可能・high は実行可能であること。
+
+    Returns:
+    - tuple: (実行可能側の境界値, 反復回数)
+    """
+    iterations = 0
+    while high - low > resolution and iterations < max_iterations:
+        iterations += 1
+        mid = (low + high) / 2
+        if feasible(mid) == (direction == 'max'):
+            low = mid
+        else:
+            high = mid
+    return (low if direction == 'max' else high), iterations
+
+
+def goal_seek_simulation(simulation, total_rent, variable: str, target: str = '累積キャッシュフロー',
+                         threshold=None, loan_yearly_data=None, loan_builder=None, expense_plan=None,
+                         occupancy_rate=None, monthly=False, contracts=None, loan_condition=None,
+                         interest_schedules=None) -> dict:
+    """
+    目標を満たす変数の限界値を逆算
+
+    シミュレーション計算カーネルをメモリ上で繰り返し評価します（データベースにはアクセスしません）。
+    月次計算のシミュレーション（monthly=True）は、保存される結果と同じく run_monthly_simulation で
+    契約期間・月次返済を含めて評価します。
+
+    Parameters:
+    - simulation: TSimulation（変更しません）
+    - total_rent: 満室時の年間家賃収入
+    - variable: '借入金額'（最大値）、'年間家賃収入'（最小値）、'稼働率'（最小値）
+    - target: '累積キャッシュフロー' または 'DSCR'
+    - threshold: 目標の閾値（省略時は GOAL_SEEK_TARGETS の既定値）
+    - loan_yearly_data: 詳細モードのローン年度別データ
+    - loan_builder: 借入金額からローン年度別データを計算する関数（詳細モードで借入金額を逆算する場合）
+    - expense_plan: 経費実績による経費項目ごとの年額（run_simulation_kernel に渡す）
+    - occupancy_rate: 計算に使う稼働率（実績稼働率など。省略時は simulation.稼働率）
+    - monthly: 月次計算で評価する場合True（loan_yearly_data・loan_builder は使わない）
+    - contracts: 月次計算の契約リスト（build_monthly_rent の形式）
+    - loan_condition: 月次計算の詳細モードのローン条件（TLoanCondition）
+    - interest_schedules: 月次計算の詳細モードの金利スケジュール（TLoanInterestSchedule のリスト）
+
+    Returns:
+    - dict: 逆算結果
+      {'変数', '方向', '目標', '閾値', '達成可能', '値', '現在値', '目標指標',
+       '反復回数', '評価回数', '計算時間ms'}
+      借入金額が GOAL_SEEK_MAX_LOAN_AMOUNT でも目標を満たす場合も '達成可能' はFalse
+    """
+    if variable not in GOAL_SEEK_VARIABLES:
+        raise ValueError(f'逆算できない変数です: {variable}')
+    if target not in GOAL_SEEK_TARGETS:
+        raise ValueError(f'未対応の目標です: {target}')
+
+    started = time.perf_counter()
+    direction = GOAL_SEEK_VARIABLES[variable]
+    resolution = GOAL_SEEK_RESOLUTION[variable]
+    threshold = GOAL_SEEK_TARGETS[target] if threshold is None else Decimal(str(threshold))
+    total_rent = Decimal(str(total_rent or 0))
+    trial = snapshot_simulation(simulation)
+    if occupancy_rate is not None:
+        trial.稼働率 = occupancy_rate
+    evaluations = 0
+
+    # 詳細モードで借入金額を動かす場合は、基準額の返済データを比例換算する
+    # （月次計算は試算ごとに借入金額から月次返済を計算するため換算しない）
+    base_loan_amount = Decimal(str(simulation.借入金額 or 0))
+    base_loan_data = None
+    if variable == '借入金額' and loan_builder is not None and not monthly:
+        reference_amount = base_loan_amount if base_loan_amount > 0 else Decimal('10000000')
+        base_loan_data = loan_builder(reference_amount)
+        if base_loan_data:
+            base_loan_data = _scale_loan_yearly_data(base_loan_data, 1 / reference_amount)
+
+    def apply(value: Decimal):
+        """試算値をシミュレーションの複製に反映し、(年間家賃収入, ローン年度別データ) を返す"""
+        if variable == '年間家賃収入':
+            return value, loan_yearly_data
+        if variable == '稼働率':
+            trial.稼働率 = value
+            return total_rent, loan_yearly_data
+        # 借入金額
+        trial.借入金額 = value
+        trial.ローン残高 = value
+        if base_loan_data:
+            return total_rent, _scale_loan_yearly_data(base_loan_data, value)
+        trial.ローン年間返済額, _, _ = calculate_loan_payment(
+            value, trial.ローン金利 or 0, trial.返済期間_年 or 0, trial.返済方法 or '元利均等'
+        )
+        return total_rent, None
+
+    def run(rent: Decimal, loan_data) -> list:
+        """試算値を反映した複製で年度別結果を計算"""
+        if monthly:
+            _, yearly_rows = run_monthly_simulation(
+                trial, rent / 12, contracts, loan_condition, interest_schedules, expense_plan
+            )
+            return yearly_rows
+        return run_simulation_kernel(trial, rent, loan_data, expense_plan=expense_plan)
+
+    def measure(value: Decimal):
+        nonlocal evaluations
+        evaluations += 1
+        rent, loan_data = apply(value)
+        return evaluate_target(run(rent, loan_data), target)
+
+    def feasible(value: Decimal) -> bool:
+        return _is_satisfied(measure(value), threshold)
+
+    # 現在値と探索範囲
+    if variable == '借入金額':
+        current = base_loan_amount
+        low, high = Decimal('0'), min(max(current, total_rent, Decimal('1000000')) * 2, GOAL_SEEK_MAX_LOAN_AMOUNT)
+    elif variable == '年間家賃収入':
+        current = total_rent
+        low, high = Decimal('0'), max(current, Decimal('1000000')) * 2
+    else:
+        current = Decimal(str(trial.稼働率 or 0))
+        low, high = Decimal('0'), Decimal('100')
+
+    achievable = True
+    iterations = 0
+    if direction == 'max':
+        if not feasible(low):
+            achievable = False
+        else:
+            # 実行不可能になるまで上限を広げる（探索上限でも目標を満たす場合は上限が求まらない）
+            expansions = 0
+            while feasible(high):
+                if high >= GOAL_SEEK_MAX_LOAN_AMOUNT or expansions >= GOAL_SEEK_MAX_EXPANSIONS:
+                    achievable = False
+                    break
+                low, high = high, min(high * 2, GOAL_SEEK_MAX_LOAN_AMOUNT)
+                expansions += 1
+    else:
+        if feasible(low):
+            high = low
+        elif not feasible(high):
+            if variable == '稼働率':
+                achievable = False
+            else:
+                expansions = 0
+                while not feasible(high) and expansions < GOAL_SEEK_MAX_EXPANSIONS:
+                    low, high = high, high * 2
+                    expansions += 1
+                achievable = expansions < GOAL_SEEK_MAX_EXPANSIONS
+
+    value = None
+    metric = None
+    if achievable:
+        if high > low:
+            value, iterations = _bisect(feasible, low, high, direction, resolution, GOAL_SEEK_MAX_ITERATIONS)
+        else:
+            value = high
+        # 刻みに丸める（目標を満たす側へ）
+        rounding = ROUND_FLOOR if direction == 'max' else ROUND_CEILING
+        value = value.quantize(resolution, rounding=rounding)
+
+        # 比例換算した場合は正確な返済データで解を検証し、
+        # 月次の端数処理で目標を下回る場合は少しずつ減額する
+        if base_loan_data:
+            for _ in range(GOAL_SEEK_MAX_REFINEMENTS):
+                trial.借入金額 = value
+                trial.ローン残高 = value
+                evaluations += 1
+                metric = evaluate_target(run(total_rent, loan_builder(value)), target)
+                if _is_satisfied(metric, threshold) or value <= 0:
+                    break
+                value = (value * (1 - GOAL_SEEK_REFINEMENT_STEP)).quantize(resolution, rounding=ROUND_FLOOR)
+        else:
+            metric = measure(value)
+
+    return {
+        '変数': variable,
+        '方向': direction,
+        '目標': target,
+        '閾値': threshold,
+        '達成可能': achievable,
+        '値': value,
+        '現在値': current,
+        '目標指標': metric,
+        '反復回数': iterations,
+        '評価回数': evaluations,
+        '計算時間ms': round((time.perf_counter() - started) * 1000, 2),
+    }
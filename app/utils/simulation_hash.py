@@ -0,0 +1,141 @@
+"""
+シミュレーション入力ハッシュユーティリティ
+計算に使う全入力から正規化したハッシュを作成し、再計算のスキップと結果の再利用に使用
+"""
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import select, update, or_
+
+
+# 計算ロジックを変更した場合はこの値を上げて既存のハッシュを無効化する
+SIMULATION_ENGINE_VERSION = 3
+
+# 計算結果に影響しないカラム
+HASH_EXCLUDED_COLUMNS = {
+    'id', 'tenant_id', '名称', 'created_at', 'updated_at', '入力ハッシュ', '要再計算',
+}
+
+
+def _canonical(value):
+    """ハッシュ用に値を正規化（Decimal('95.00') と 95 を同一視する）"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float, Decimal)):
+        normalized = Decimal(str(value)).normalize()
+        return format(normalized, 'f')
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def compute_simulation_input_hash(simulation, property_rents=None, loan_condition=None,
+                                  interest_schedules=None, contracts=None, expense_plan=None,
+                                  occupancy_rate=None) -> str:
+    """
+    シミュレーション入力ハッシュを計算
+
+    Parameters:
+    - simulation: TSimulation
+    - property_rents: [(物件id, 想定賃料), ...]（物件ベースの場合。物件集計の値）
+    - loan_condition: TLoanCondition または None
+    - interest_schedules: TLoanInterestSchedule のリスト
+    - contracts: [(部屋の賃料, 契約開始日, 契約終了日, 月額賃料), ...]（月次計算の場合）
+    - expense_plan: {経費項目: 年額}（経費実績を使う場合）
+    - occupancy_rate: 計算に使う稼働率（実績稼働率を使う場合。入力した稼働率の代わりにハッシュに含める）
+
+    Returns:
+    - str: SHA-256の16進文字列
+    """
+    payload = {
+        'version': SIMULATION_ENGINE_VERSION,
+        'simulation': {
+            column.name: _canonical(getattr(simulation, column.key))
+            for column in simulation.__table__.columns
+            if column.name not in HASH_EXCLUDED_COLUMNS
+        },
+        'properties': sorted([property_id, _canonical(rent)] for property_id, rent in (property_rents or [])),
+        'loan_condition': None,
+        'interest_schedules': [
+            [_canonical(s.開始年月), _canonical(s.終了年月), _canonical(s.金利)]
+            for s in (interest_schedules or [])
+        ],
+        'contracts': sorted([_canonical(value) for value in contract] for contract in (contracts or [])),
+        'expenses': sorted([line, _canonical(amount)] for line, amount in (expense_plan or {}).items()),
+    }
+    if occupancy_rate is not None:
+        payload['simulation']['稼働率'] = _canonical(occupancy_rate)
+    if loan_condition is not None:
+        payload['loan_condition'] = {
+            '借入日': _canonical(loan_condition.借入日),
+            '返済日': _canonical(loan_condition.返済日),
+            '返済開始年月': _canonical(loan_condition.返済開始年月),
+            '据置期間終了年月': _canonical(loan_condition.据置期間終了年月),
+            '初回利息支払方法': _canonical(loan_condition.初回利息支払方法),
+        }
+
+    encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def mark_simulations_stale(db, property_id: int) -> int:
+    """
+    物件の賃料・契約の変更などで結果が古くなったシミュレーションに要再計算フラグを立てる
+
+    対象は当該物件の物件ベースシミュレーションと、同じテナントの全物件シミュレーション。
+    コミットは呼び出し側で行います。
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - property_id: 変更があった物件ID
+
+    Returns:
+    - int: フラグを立てたシミュレーション数
+    """
+    from app.models_property import TBukken, TSimulation
+
+    tenant_id = db.execute(
+        select(TBukken.tenant_id).where(TBukken.id == property_id)
+    ).scalar_one_or_none()
+    if tenant_id is None:
+        return 0
+
+    return mark_tenant_simulations_stale(db, tenant_id, [property_id])
+
+
+def mark_tenant_simulations_stale(db, tenant_id: int, property_ids) -> int:
+    """
+    複数物件の変更（一括取込など）で古くなったシミュレーションに1回のUPDATEで要再計算フラグを立てる
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID
+    - property_ids: 変更があった物件IDのリスト
+
+    Returns:
+    - int: フラグを立てたシミュレーション数
+    """
+    from app.models_property import TSimulation
+
+    property_ids = list(property_ids)
+    if not property_ids:
+        return 0
+
+    result = db.execute(
+        update(TSimulation)
+        .where(
+            TSimulation.tenant_id == tenant_id,
+            TSimulation.シミュレーション種別 != '独立',
+            or_(
+                TSimulation.物件id.in_(property_ids),
+                TSimulation.物件id.is_(None)
+            )
+        )
+        .values(要再計算=1)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
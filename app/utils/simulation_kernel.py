@@ -0,0 +1,320 @@
+"""
+シミュレーション計算カーネル
+データベースに依存しない年度別の損益・キャッシュフロー計算を提供
+"""
+from decimal import Decimal
+
+from app.utils.simulation_metrics import calculate_dscr
+
+
+# T_シミュレーション結果に保存する項目
+SIMULATION_RESULT_COLUMNS = [
+    '年度', '家賃収入', 'その他収入', '総収入', '管理費', '修繕費', '固定資産税', '損害保険料',
+    '借入金利息', '減価償却費', 'その他経費', '総経費', '不動産所得', '税金',
+    'キャッシュフロー', '累積キャッシュフロー', 'ローン残高', 'DSCR',
+]
+
+
+def calculate_loan_payment(principal, annual_rate, years, method='元利均等'):
+    """
+    ローン返済額を計算（年間）
+    
+    Args:
+        principal: 借入金額（円）
+        annual_rate: 年利（%）
+        years: 返済期間（年）
+        method: 返済方法（'元利均等' or '元金均等'）
+    
+    Returns:
+        tuple: (年間返済額, 年間元本返済額, 年間利息支払額)
+    """
+    principal = Decimal(str(principal))
+    annual_rate = Decimal(str(annual_rate))
+    years = int(years)
+    
+    if principal <= 0 or years <= 0:
+        return Decimal('0'), Decimal('0'), Decimal('0')
+    
+    annual_principal_payment = Decimal('0')
+    annual_interest_payment = Decimal('0')
+    
+    if method == '元利均等':
+        # 元利均等返済
+        if annual_rate == 0:
+            # 金利0%の場合は単純に元金を分割
+            months = years * 12
+            monthly_payment = principal / months
+            annual_payment = monthly_payment * Decimal('12')
+            annual_principal_payment = annual_payment
+            annual_interest_payment = Decimal('0')
+        else:
+            # 月利を計算
+            monthly_rate = annual_rate / Decimal('100') / Decimal('12')
+            months = years * 12
+            
+            # 元利均等返済の計算式
+            rate_plus_one = Decimal('1') + monthly_rate
+            power_term = rate_plus_one ** months
+            monthly_payment = principal * monthly_rate * power_term / (power_term - Decimal('1'))
+            
+            # 初年度の元本と利息を計算
+            remaining_principal = principal
+            for month in range(12):
+                monthly_interest = remaining_principal * monthly_rate
+                monthly_principal = monthly_payment - monthly_interest
+                annual_principal_payment += monthly_principal
+                annual_interest_payment += monthly_interest
+                remaining_principal -= monthly_principal
+            
+            annual_payment = monthly_payment * Decimal('12')
+        
+    elif method == '元金均等':
+        # 元金均等返済（初年度）
+        months = years * 12
+        monthly_rate = annual_rate / Decimal('100') / Decimal('12')
+        
+        # 毎月の元金返済額
+        monthly_principal = principal / months
+        
+        # 初年度（1～12ヶ月目）の返済額を計算
+        annual_payment = Decimal('0')
+        remaining_principal = principal
+        
+        for month in range(12):
+            # 当月の利息
+            monthly_interest = remaining_principal * monthly_rate
+            # 当月の返済額
+            monthly_payment_amount = monthly_principal + monthly_interest
+            annual_payment += monthly_payment_amount
+            annual_principal_payment += monthly_principal
+            annual_interest_payment += monthly_interest
+            # 残高を更新
+            remaining_principal -= monthly_principal
+    else:
+        annual_payment = Decimal('0')
+        annual_principal_payment = Decimal('0')
+        annual_interest_payment = Decimal('0')
+    
+    return annual_payment, annual_principal_payment, annual_interest_payment
+
+
+def calculate_progressive_tax(total_income):
+    """
+    超過累進税率による税金計算（所得税+住民税）
+    
+    Args:
+        total_income: 課税所得（円）
+    
+    Returns:
+        税金額（円）
+    """
+    total_income = Decimal(str(total_income))
+    
+    # 所得税の計算（超過累進）
+    income_tax = Decimal('0')
+    
+    if total_income <= 0:
+        income_tax = Decimal('0')
+    elif total_income <= 1950000:
+        # 195万円以下: 5%
+        income_tax = total_income * Decimal('0.05')
+    elif total_income <= 3300000:
+        # 195万円超～330万円以下: 195万円まで5%、超過分10%
+        income_tax = Decimal('1950000') * Decimal('0.05') + \
+                     (total_income - Decimal('1950000')) * Decimal('0.10')
+    elif total_income <= 6950000:
+        # 330万円超～695万円以下
+        income_tax = Decimal('1950000') * Decimal('0.05') + \
+                     Decimal('1350000') * Decimal('0.10') + \
+                     (total_income - Decimal('3300000')) * Decimal('0.20')
+    elif total_income <= 9000000:
+        # 695万円超～900万円以下
+        income_tax = Decimal('1950000') * Decimal('0.05') + \
+                     Decimal('1350000') * Decimal('0.10') + \
+                     Decimal('3650000') * Decimal('0.20') + \
+                     (total_income - Decimal('6950000')) * Decimal('0.23')
+    elif total_income <= 18000000:
+        # 900万円超～1,800万円以下
+        income_tax = Decimal('1950000') * Decimal('0.05') + \
+                     Decimal('1350000') * Decimal('0.10') + \
+                     Decimal('3650000') * Decimal('0.20') + \
+                     Decimal('2050000') * Decimal('0.23') + \
+                     (total_income - Decimal('9000000')) * Decimal('0.33')
+    elif total_income <= 40000000:
+        # 1,800万円超～4,000万円以下
+        income_tax = Decimal('1950000') * Decimal('0.05') + \
+                     Decimal('1350000') * Decimal('0.10') + \
+                     Decimal('3650000') * Decimal('0.20') + \
+                     Decimal('2050000') * Decimal('0.23') + \
+                     Decimal('9000000') * Decimal('0.33') + \
+                     (total_income - Decimal('18000000')) * Decimal('0.40')
+    else:
+        # 4,000万円超
+        income_tax = Decimal('1950000') * Decimal('0.05') + \
+                     Decimal('1350000') * Decimal('0.10') + \
+                     Decimal('3650000') * Decimal('0.20') + \
+                     Decimal('2050000') * Decimal('0.23') + \
+                     Decimal('9000000') * Decimal('0.33') + \
+                     Decimal('22000000') * Decimal('0.40') + \
+                     (total_income - Decimal('40000000')) * Decimal('0.45')
+    
+    # 住民税の計算（一律10%）
+    if total_income > 0:
+        resident_tax = total_income * Decimal('0.10')
+    else:
+        resident_tax = Decimal('0')
+    
+    # 合計税金
+    total_tax = income_tax + resident_tax
+    
+    return total_tax
+
+
+def run_simulation_kernel(simulation, total_rent, loan_yearly_data=None, yearly_rent=None,
+                          expense_plan=None, occupancy_rate=None) -> list:
+    """
+    年度別シミュレーションを実行（データベースにはアクセスしない）
+    
+    Parameters:
+    - simulation: TSimulation、または同じ属性を持つオブジェクト
+    - total_rent: 満室時の年間家賃収入
+    - loan_yearly_data: 詳細モードのローン年度別データ（calculate_detailed_loan_paymentの戻り値）
+    - yearly_rent: 年度ごとの家賃収入（稼働率適用済み、月次計算の集計値）。指定した年度は total_rent より優先
+    - expense_plan: 経費実績による経費項目ごとの初年度の年額（simulation_expense_plan の戻り値）。
+      含まれる項目は管理費率・修繕費率・入力した金額の代わりに使用
+    - occupancy_rate: 計算に使う稼働率（%、実績稼働率など。省略時は simulation.稼働率）
+    
+    Returns:
+    - list: 年度ごとの辞書のリスト（SIMULATION_RESULT_COLUMNS に加えて 'NOI', 'ローン元本返済' を含む）
+    """
+    current_loan_balance = simulation.ローン残高
+    累積キャッシュフロー = Decimal('0')
+    yearly_rows = []
+    expense_plan = expense_plan or {}
+    # 金額で指定する経費（経費実績・固定資産税・損害保険料・その他経費）の年間上昇率
+    growth_rate = Decimal('1') + Decimal(str(simulation.経費上昇率 or 0)) / 100
+    if occupancy_rate is None:
+        occupancy_rate = simulation.稼働率
+    
+    for year_offset in range(simulation.期間):
+        year = simulation.開始年度 + year_offset
+        growth = growth_rate ** year_offset
+        
+        # 収入計算
+        if yearly_rent and year in yearly_rent:
+            家賃収入 = yearly_rent[year]
+        else:
+            家賃収入 = total_rent * (occupancy_rate / 100)
+        その他収入 = simulation.その他収入
+        総収入 = 家賃収入 + その他収入
+        
+        # 経費計算
+        if '管理費' in expense_plan:
+            管理費 = expense_plan['管理費'] * growth
+        else:
+            管理費 = 家賃収入 * (simulation.管理費率 / 100)
+        if '修繕費' in expense_plan:
+            修繕費 = expense_plan['修繕費'] * growth
+        else:
+            修繕費 = 家賃収入 * (simulation.修繕費率 / 100)
+        固定資産税 = expense_plan.get('固定資産税', simulation.固定資産税) * growth
+        損害保険料 = expense_plan.get('損害保険料', simulation.損害保険料) * growth
+        # ローン計算モードによる分岐
+        if loan_yearly_data and year in loan_yearly_data:
+            # 詳細モード
+            借入金利息 = loan_yearly_data[year]['利息']
+            ローン元本返済 = loan_yearly_data[year]['元本返済額']
+            current_loan_balance = loan_yearly_data[year]['ローン残高']
+        else:
+            # 簡易モード
+            借入金利息 = current_loan_balance * (simulation.ローン金利 / 100)
+        その他経費 = expense_plan.get('その他経費', simulation.その他経費) * growth
+        
+        # 減価償却費を計算（3分割方式）
+        減価償却費 = Decimal('0')
+        
+        # 建物部分の減価償却費
+        if simulation.建物_取得価額 and simulation.建物_取得価額 > 0:
+            if simulation.建物_償却方法 == '定額法' and simulation.建物_耐用年数:
+                減価償却費 += (simulation.建物_取得価額 - simulation.建物_残存価額) / simulation.建物_耐用年数
+            elif simulation.建物_償却方法 == '定率法' and simulation.建物_耐用年数:
+                償却率 = Decimal('2.0') / simulation.建物_耐用年数
+                # 簡易計算（実際は期首帳簿価額を追跡する必要がある）
+                減価償却費 += simulation.建物_取得価額 * 償却率 * (Decimal('0.9') ** year_offset)
+        
+        # 建物付属設備の減価償却費
+        if simulation.付属設備_取得価額 and simulation.付属設備_取得価額 > 0:
+            if simulation.付属設備_償却方法 == '定額法' and simulation.付属設備_耐用年数:
+                減価償却費 += (simulation.付属設備_取得価額 - simulation.付属設備_残存価額) / simulation.付属設備_耐用年数
+            elif simulation.付属設備_償却方法 == '定率法' and simulation.付属設備_耐用年数:
+                償却率 = Decimal('2.0') / simulation.付属設備_耐用年数
+                減価償却費 += simulation.付属設備_取得価額 * 償却率 * (Decimal('0.9') ** year_offset)
+        
+        # 構築物の減価償却費
+        if simulation.構築物_取得価額 and simulation.構築物_取得価額 > 0:
+            if simulation.構築物_償却方法 == '定額法' and simulation.構築物_耐用年数:
+                減価償却費 += (simulation.構築物_取得価額 - simulation.構築物_残存価額) / simulation.構築物_耐用年数
+            elif simulation.構築物_償却方法 == '定率法' and simulation.構築物_耐用年数:
+                償却率 = Decimal('2.0') / simulation.構築物_耐用年数
+                減価償却費 += simulation.構築物_取得価額 * 償却率 * (Decimal('0.9') ** year_offset)
+        
+        # 旧方式の減価償却費が設定されている場合はそれを使用（互換性のため）
+        if 減価償却費 == 0 and simulation.減価償却費 and simulation.減価償却費 > 0:
+            減価償却費 = simulation.減価償却費
+        
+        総経費 = 管理費 + 修繕費 + 固定資産税 + 損害保険料 + 借入金利息 + 減価償却費 + その他経費
+        
+        # 不動産所得
+        不動産所得 = 総収入 - 総経費
+        
+        # 税金計算（超過累進税率）
+        if simulation.税率:
+            # 手動設定された税率を使用
+            税金 = (不動産所得 + simulation.その他所得) * (simulation.税率 / 100)
+            if 税金 < 0:
+                税金 = Decimal('0')
+        else:
+            # 超過累進税率で税金を計算
+            課税所得 = 不動産所得 + simulation.その他所得
+            税金 = calculate_progressive_tax(課税所得)
+            if 税金 < 0:
+                税金 = Decimal('0')
+        
+        # キャッシュフロー
+        if not (loan_yearly_data and year in loan_yearly_data):
+            # 簡易モードの場合のみ計算
+            ローン元本返済 = simulation.ローン年間返済額 - 借入金利息
+            current_loan_balance -= ローン元本返済
+            if current_loan_balance < 0:
+                current_loan_balance = Decimal('0')
+        
+        キャッシュフロー = 総収入 - (総経費 - 減価償却費) - 税金 - ローン元本返済
+        累積キャッシュフロー += キャッシュフロー
+        
+        # 投資指標用のNOI（減価償却費・借入金利息を除く経費を控除）とDSCR
+        NOI = 総収入 - (管理費 + 修繕費 + 固定資産税 + 損害保険料 + その他経費)
+        DSCR = calculate_dscr(NOI, 借入金利息 + ローン元本返済)
+        yearly_rows.append({
+            '年度': year,
+            '家賃収入': 家賃収入,
+            'その他収入': その他収入,
+            '総収入': 総収入,
+            '管理費': 管理費,
+            '修繕費': 修繕費,
+            '固定資産税': 固定資産税,
+            '損害保険料': 損害保険料,
+            '借入金利息': 借入金利息,
+            '減価償却費': 減価償却費,
+            'その他経費': その他経費,
+            '総経費': 総経費,
+            '不動産所得': 不動産所得,
+            '税金': 税金,
+            'キャッシュフロー': キャッシュフロー,
+            '累積キャッシュフロー': 累積キャッシュフロー,
+            'ローン残高': current_loan_balance,
+            'DSCR': DSCR,
+            'NOI': NOI,
+            'ローン元本返済': ローン元本返済
+        })
+    
+    return yearly_rows
@@ -0,0 +1,175 @@
+"""
+シミュレーション投資指標ユーティリティ
+IRR・NPV・DSCR・キャップレート・投資回収年度・自己資金倍率を計算
+"""
+from decimal import Decimal
+
+
+# IRRソルバーの設定
+IRR_TOLERANCE = 1e-10
+IRR_MAX_ITERATIONS = 100
+IRR_LOWER_BOUND = -0.9999
+IRR_UPPER_BOUND = 10.0
+
+
+def npv(rate: float, cash_flows: list) -> float:
+    """
+    正味現在価値（NPV）を計算
+
+    Parameters:
+    - rate: 割引率（小数、例: 0.03）
+    - cash_flows: キャッシュフローのリスト（0番目が投資時点）
+
+    Returns:
+    - float: NPV
+    """
+    total = 0.0
+    discount = 1.0
+    factor = 1.0 + rate
+    for cf in cash_flows:
+        total += cf / discount
+        discount *= factor
+    return total
+
+
+def _npv_and_derivative(rate: float, cash_flows: list) -> tuple:
+    """NPVとその割引率に関する微分を1パスで計算"""
+    value = 0.0
+    derivative = 0.0
+    factor = 1.0 + rate
+    discount = 1.0
+    for t, cf in enumerate(cash_flows):
+        value += cf / discount
+        if t:
+            derivative -= t * cf / (discount * factor)
+        discount *= factor
+    return value, derivative
+
+
+def irr(cash_flows: list):
+    """
+    内部収益率（IRR）を計算
+
+    ニュートン法で収束を試み、発散した場合は二分法にフォールバックします。
+
+    Parameters:
+    - cash_flows: キャッシュフローのリスト（0番目が投資時点）
+
+    Returns:
+    - float or None: IRR（小数）。符号変化がなく解が存在しない場合はNone
+    """
+    flows = [float(cf) for cf in cash_flows]
+    if not any(cf < 0 for cf in flows) or not any(cf > 0 for cf in flows):
+        return None
+
+    # ニュートン法
+    rate = 0.1
+    for _ in range(IRR_MAX_ITERATIONS):
+        value, derivative = _npv_and_derivative(rate, flows)
+        if abs(value) < IRR_TOLERANCE:
+            return rate
+        if derivative == 0:
+            break
+        next_rate = rate - value / derivative
+        if not (IRR_LOWER_BOUND < next_rate < IRR_UPPER_BOUND):
+            break
+        if abs(next_rate - rate) < IRR_TOLERANCE:
+            return next_rate
+        rate = next_rate
+
+    # 二分法
+    low, high = IRR_LOWER_BOUND, IRR_UPPER_BOUND
+    low_value = npv(low, flows)
+    high_value = npv(high, flows)
+    if low_value * high_value > 0:
+        return None
+    for _ in range(200):
+        mid = (low + high) / 2
+        mid_value = npv(mid, flows)
+        if abs(mid_value) < IRR_TOLERANCE or (high - low) / 2 < IRR_TOLERANCE:
+            return mid
+        if low_value * mid_value < 0:
+            high, high_value = mid, mid_value
+        else:
+            low, low_value = mid, mid_value
+    return (low + high) / 2
+
+
+def calculate_dscr(noi: Decimal, debt_service: Decimal):
+    """
+    DSCR（借入金償還余裕率）を計算
+
+    Parameters:
+    - noi: 営業純収益（総収入 - 減価償却費と借入金利息を除く経費）
+    - debt_service: 年間返済額（元本 + 利息）
+
+    Returns:
+    - Decimal or None: DSCR。返済がない年度はNone
+    """
+    if not debt_service or debt_service <= 0:
+        return None
+    return Decimal(str(noi)) / Decimal(str(debt_service))
+
+
+def compute_investment_metrics(yearly_rows: list, total_investment: Decimal,
+                               loan_amount: Decimal, discount_rate: Decimal) -> dict:
+    """
+    年度別結果から投資指標を計算
+
+    Parameters:
+    - yearly_rows: 年度ごとの辞書のリスト
+      [{'年度': int, 'NOI': Decimal, 'DSCR': Decimal or None, 'キャッシュフロー': Decimal}]
+    - total_investment: 投資総額（建物・付属設備・構築物の取得価額合計）
+    - loan_amount: 借入金額
+    - discount_rate: NPVの割引率（%）
+
+    Returns:
+    - dict: T_シミュレーション指標に保存する値
+    """
+    total_investment = Decimal(str(total_investment or 0))
+    loan_amount = Decimal(str(loan_amount or 0))
+    discount_rate = Decimal(str(discount_rate or 0))
+    equity = total_investment - loan_amount
+    if equity < 0:
+        equity = Decimal('0')
+
+    cash_flows = [row['キャッシュフロー'] for row in yearly_rows]
+    total_cf = sum(cash_flows, Decimal('0'))
+
+    # 投資時点に自己資金を支出したものとしてIRR/NPVを計算
+    flows = [-float(equity)] + [float(cf) for cf in cash_flows]
+    irr_value = irr(flows) if equity > 0 else None
+    npv_value = npv(float(discount_rate) / 100, flows)
+
+    # 投資回収年度（累積CFが自己資金を上回った最初の年度）
+    payback_year = None
+    cumulative = Decimal('0')
+    for row in yearly_rows:
+        cumulative += row['キャッシュフロー']
+        if cumulative >= equity:
+            payback_year = row['年度']
+            break
+
+    dscr_values = [row['DSCR'] for row in yearly_rows if row.get('DSCR') is not None]
+
+    cap_rate = None
+    if yearly_rows and total_investment > 0:
+        cap_rate = yearly_rows[0]['NOI'] / total_investment * Decimal('100')
+
+    equity_multiple = None
+    if equity > 0:
+        equity_multiple = total_cf / equity
+
+    return {
+        '投資総額': total_investment,
+        '自己資金': equity,
+        '割引率': discount_rate,
+        'IRR': Decimal(str(round(irr_value * 100, 4))) if irr_value is not None else None,
+        'NPV': Decimal(str(round(npv_value, 2))),
+        'キャップレート': cap_rate,
+        '最小DSCR': min(dscr_values) if dscr_values else None,
+        '平均DSCR': sum(dscr_values) / len(dscr_values) if dscr_values else None,
+        '投資回収年度': payback_year,
+        '自己資金倍率': equity_multiple,
+        '累積キャッシュフロー': total_cf,
+    }
@@ -0,0 +1,256 @@
+"""
+月次シミュレーションユーティリティ
+契約期間・部屋ごとの空室・ローンの月次返済スケジュールを月単位の配列で計算し、年度に集計する
+"""
+import calendar
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.utils.loan_calculator import build_monthly_loan_schedule
+from app.utils.simulation_kernel import run_simulation_kernel
+
+
+def month_index(start_year: int, year: int, month: int) -> int:
+    """シミュレーション開始年1月を0とした月番号"""
+    return (year - start_year) * 12 + month - 1
+
+
+def _prefix_sum(diff: list) -> list:
+    """差分配列を累積して各月の値に戻す"""
+    values = []
+    running = Decimal('0')
+    for value in diff[:-1]:
+        running += value
+        values.append(running)
+    return values
+
+
+def merge_room_contracts(rows) -> list:
+    """
+    部屋ごとに契約期間が重ならないようにする（build_monthly_rent の入力）
+
+    同じ部屋の契約が重なる期間は後から始まった契約（開始日が同じ場合は後から登録した契約）だけを計上し、
+    前の契約は次の契約の開始日の前日で終わらせます。重なったまま渡すと家賃収入を二重に計上するためです。
+    期間をまとめるだけ（merge_intervals）では賃料の異なる更新契約が1つになるため、契約ごとに区切ります。
+
+    Parameters:
+    - rows: [(部屋id, 契約id, 部屋の月額賃料, 契約開始日, 契約終了日 or None, 契約の月額賃料), ...]
+
+    Returns:
+    - list: [(部屋の月額賃料, 契約開始日, 契約終了日 or None, 契約の月額賃料), ...]
+    """
+    by_room = {}
+    for room_id, contract_id, room_rent, start_date, end_date, contract_rent in rows:
+        by_room.setdefault(room_id, []).append((start_date, contract_id, room_rent, end_date, contract_rent))
+
+    contracts = []
+    for room_contracts in by_room.values():
+        room_contracts.sort(key=lambda contract: (contract[0], contract[1]))
+        for index, (start_date, _, room_rent, end_date, contract_rent) in enumerate(room_contracts):
+            if index + 1 < len(room_contracts):
+                next_start = room_contracts[index + 1][0]
+                if end_date is None or end_date >= next_start:
+                    end_date = next_start - timedelta(days=1)
+            if end_date is not None and end_date < start_date:
+                continue
+            contracts.append((room_rent, start_date, end_date, contract_rent))
+    return contracts
+
+
+def build_monthly_rent(monthly_room_rent, contracts: list, start_year: int, months: int,
+                       occupancy_rate) -> list:
+    """
+    月ごとの家賃収入を計算
+
+    契約期間中は契約の月額賃料（開始月・終了月は日割り）、契約のない期間は部屋の賃料に
+    稼働率を掛けた期待値を計上します。契約ごとに差分配列へ加算し、最後に1回だけ累積するため、
+    計算量は O(契約数 + 月数) です。
+
+    Parameters:
+    - monthly_room_rent: 対象の全部屋の月額賃料合計（満室時）
+    - contracts: [(部屋の月額賃料, 契約開始日, 契約終了日 or None, 契約の月額賃料), ...]
+    - start_year: シミュレーション開始年度
+    - months: 計算する月数
+    - occupancy_rate: 契約のない期間に適用する稼働率（%）
+
+    Returns:
+    - list: 月ごとの家賃収入（長さ months）
+    """
+    zero = Decimal('0')
+    contract_diff = [zero] * (months + 1)   # 契約賃料の差分配列
+    covered_diff = [zero] * (months + 1)    # 契約で埋まっている部屋賃料の差分配列
+    contract_point = [zero] * months        # 日割りによる月単位の補正
+    covered_point = [zero] * months
+
+    for room_rent, start_date, end_date, contract_rent in contracts:
+        room_rent = Decimal(str(room_rent or 0))
+        contract_rent = Decimal(str(contract_rent or 0))
+        first = month_index(start_year, start_date.year, start_date.month)
+        last = month_index(start_year, end_date.year, end_date.month) if end_date else months - 1
+        if last < 0 or first >= months or last < first:
+            continue
+
+        # 開始月・終了月に日割りの補正をかける
+        partial = {}
+        days = calendar.monthrange(start_date.year, start_date.month)[1]
+        if end_date and first == last:
+            partial[first] = Decimal(end_date.day - start_date.day + 1) / days
+        else:
+            partial[first] = Decimal(days - start_date.day + 1) / days
+            if end_date:
+                partial[last] = Decimal(end_date.day) / calendar.monthrange(end_date.year, end_date.month)[1]
+
+        lo, hi = max(first, 0), min(last, months - 1)
+        contract_diff[lo] += contract_rent
+        contract_diff[hi + 1] -= contract_rent
+        covered_diff[lo] += room_rent
+        covered_diff[hi + 1] -= room_rent
+        for index, ratio in partial.items():
+            if 0 <= index < months:
+                contract_point[index] -= contract_rent * (1 - ratio)
+                covered_point[index] -= room_rent * (1 - ratio)
+
+    monthly_room_rent = Decimal(str(monthly_room_rent or 0))
+    occupancy = Decimal(str(occupancy_rate or 0)) / 100
+    contract_values = _prefix_sum(contract_diff)
+    covered_values = _prefix_sum(covered_diff)
+
+    rents = []
+    for m in range(months):
+        vacant = monthly_room_rent - (covered_values[m] + covered_point[m])
+        if vacant < 0:
+            vacant = zero
+        rents.append(contract_values[m] + contract_point[m] + vacant * occupancy)
+    return rents
+
+
+def build_monthly_loan(simulation, start_year: int, months: int, loan_condition=None,
+                       interest_schedules=None) -> tuple:
+    """
+    月ごとの借入金利息・元本返済額・月末ローン残高を計算
+
+    詳細モード（ローン条件あり）は build_monthly_loan_schedule の返済日・据置期間・初回利息を
+    そのまま使い、簡易モードは年間返済額の1/12を毎月返済するものとして計算します。
+
+    Returns:
+    - tuple: (利息のリスト, 元本返済額のリスト, 月末ローン残高のリスト)
+    """
+    zero = Decimal('0')
+    interest = [zero] * months
+    principal = [zero] * months
+    balance = [None] * months
+
+    if loan_condition is not None and interest_schedules:
+        loan_amount = simulation.借入金額 or zero
+        loan_start_date = loan_condition.借入日
+        if isinstance(loan_start_date, str):
+            loan_start_date = datetime.strptime(loan_start_date, '%Y-%m-%d').date()
+        schedule, first_interest = build_monthly_loan_schedule(
+            loan_amount=loan_amount,
+            loan_start_date=loan_start_date,
+            payment_day=loan_condition.返済日,
+            payment_start_ym=loan_condition.返済開始年月,
+            grace_period_end_ym=loan_condition.据置期間終了年月,
+            first_interest_payment_method=loan_condition.初回利息支払方法,
+            interest_schedules=[
+                {'開始年月': s.開始年月, '終了年月': s.終了年月, '金利': s.金利} for s in interest_schedules
+            ],
+            repayment_method=simulation.返済方法 or '元利均等',
+            repayment_period_years=simulation.返済期間_年 or 0
+        )
+        for entry in schedule:
+            index = month_index(start_year, entry['year'], entry['month'])
+            if 0 <= index < months:
+                interest[index] += entry['interest']
+                principal[index] += entry['principal']
+                balance[index] = entry['balance']
+
+        # 初回利息（1: 初回返済月にまとめて, 2: 借入月に支払う）
+        if first_interest and schedule:
+            if loan_condition.初回利息支払方法 == 1:
+                index = month_index(start_year, schedule[0]['year'], schedule[0]['month'])
+            else:
+                index = month_index(start_year, loan_start_date.year, loan_start_date.month)
+            if 0 <= index < months:
+                interest[index] += first_interest
+
+        # 返済のない月は直前の残高を引き継ぐ（借入前は0、初回返済までは借入金額）
+        loan_start_index = month_index(start_year, loan_start_date.year, loan_start_date.month)
+        current = zero
+        repaid = False
+        for m in range(months):
+            if balance[m] is not None:
+                current = balance[m]
+                repaid = True
+            elif not repaid:
+                current = loan_amount if m >= loan_start_index else zero
+            balance[m] = current
+        return interest, principal, balance
+
+    # 簡易モード
+    monthly_rate = (simulation.ローン金利 or zero) / 100 / 12
+    monthly_payment = (simulation.ローン年間返済額 or zero) / 12
+    current = simulation.ローン残高 or zero
+    for m in range(months):
+        if current > 0:
+            interest[m] = current * monthly_rate
+            principal[m] = min(monthly_payment - interest[m], current)
+            current -= principal[m]
+        balance[m] = current
+    return interest, principal, balance
+
+
+def run_monthly_simulation(simulation, monthly_room_rent, contracts=None, loan_condition=None,
+                           interest_schedules=None, expense_plan=None, occupancy_rate=None) -> tuple:
+    """
+    月次シミュレーションを実行し、年度別結果に集計
+
+    家賃収入とローン返済を月単位で計算して年度ごとに合計し、減価償却費・税金などの
+    年度単位の計算は run_simulation_kernel に委ねます。
+
+    Parameters:
+    - simulation: TSimulation、または同じ属性を持つオブジェクト
+    - monthly_room_rent: 全部屋の月額賃料合計（独立シミュレーションは年間家賃収入の1/12）
+    - contracts: build_monthly_rent の契約リスト
+    - loan_condition: TLoanCondition（詳細モード）
+    - interest_schedules: TLoanInterestSchedule のリスト
+    - expense_plan: 経費実績による経費項目ごとの年額（run_simulation_kernel に渡す）
+    - occupancy_rate: 契約のない期間に適用する稼働率（%、省略時は simulation.稼働率）
+
+    Returns:
+    - tuple: (月次結果のリスト, 年度別結果のリスト)
+      月次結果は [{'年月': 'YYYY-MM', '家賃収入', '借入金利息', 'ローン元本返済', 'ローン残高'}]
+    """
+    start_year = simulation.開始年度
+    months = simulation.期間 * 12
+    if occupancy_rate is None:
+        occupancy_rate = simulation.稼働率
+
+    rents = build_monthly_rent(monthly_room_rent, contracts or [], start_year, months, occupancy_rate)
+    interest, principal, balance = build_monthly_loan(
+        simulation, start_year, months, loan_condition, interest_schedules
+    )
+
+    monthly_rows = []
+    yearly_rent = {}
+    loan_yearly_data = {}
+    for m in range(months):
+        year = start_year + m // 12
+        monthly_rows.append({
+            '年月': f'{year}-{m % 12 + 1:02d}',
+            '家賃収入': rents[m],
+            '借入金利息': interest[m],
+            'ローン元本返済': principal[m],
+            'ローン残高': balance[m],
+        })
+        yearly_rent[year] = yearly_rent.get(year, Decimal('0')) + rents[m]
+        data = loan_yearly_data.setdefault(year, {'元本返済額': Decimal('0'), '利息': Decimal('0')})
+        data['元本返済額'] += principal[m]
+        data['利息'] += interest[m]
+        data['ローン残高'] = balance[m]
+
+    yearly_rows = run_simulation_kernel(
+        simulation, monthly_room_rent * 12, loan_yearly_data, yearly_rent=yearly_rent, expense_plan=expense_plan,
+        occupancy_rate=occupancy_rate
+    )
+    return monthly_rows, yearly_rows
@@ -0,0 +1,307 @@
+"""
+収支内訳書（不動産所得用）作成ユーティリティ
+テナントの1年分の家賃収入（T_家賃収支）・経費（物件経費・部屋経費のカテゴリ別）・
+減価償却（T_減価償却）・借入金利子（詳細モードのローン返済予定）を、
+種類ごとに1回の集合クエリで集計して物件ごとの収支内訳にまとめる。
+"""
+import csv
+import io
+import time
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import select, func, case, and_
+
+from app.models_property import (
+    TBukken, THeya, TNyukyosha, TKeiyaku, TYachinShushi, TGenkashokaku,
+    TSimulation, TLoanCondition, TLoanInterestSchedule
+)
+from app.utils.expense_rollup import get_expense_rollup, year_period
+from app.utils.loan_calculator import build_monthly_loan_schedule
+
+try:
+    import weasyprint
+except ImportError:
+    weasyprint = None
+
+
+# 収支内訳書の経費科目 → 対応する経費カテゴリ（それ以外のカテゴリは「雑費」）
+TAX_EXPENSE_LINES = {
+    '租税公課': ('税金',),
+    '損害保険料': ('保険',),
+    '修繕費': ('修繕費', '原状回復', 'クリーニング'),
+    '管理費': ('管理費',),
+    '水道光熱費': ('水道光熱費',),
+    '支払手数料': ('仲介手数料',),
+    '広告宣伝費': ('広告宣伝',),
+    '雑費': (),
+}
+_LINE_BY_CATEGORY = {
+    category: line for line, categories in TAX_EXPENSE_LINES.items() for category in categories
+}
+
+# 物件ごとの収支の列（CSVの出力順）
+TAX_REPORT_COLUMNS = (
+    ['物件名', '所在地', '賃貸料', '礼金・更新料', '収入金額']
+    + list(TAX_EXPENSE_LINES) + ['減価償却費', '借入金利子', '必要経費', '差引金額']
+)
+
+
+def _empty_row(property_id, name, address):
+    row = {column: Decimal('0') for column in TAX_REPORT_COLUMNS}
+    row.update({'物件id': property_id, '物件名': name, '所在地': address})
+    return row
+
+
+def rent_income_by_contract(db, tenant_id: int, year: int) -> list:
+    """
+    年間の賃貸料（T_家賃収支の対象年月で計上）と礼金を契約ごとに1クエリで集計
+
+    礼金はその年に開始した契約のみ計上します。
+
+    Returns:
+    - list: [{'contract_id', '物件id', '部屋番号', '賃借人', '契約開始日', '契約終了日',
+              '賃貸料', '未入金', '礼金', '敷金'}]
+    """
+    first_month, last_month = f'{year}-01', f'{year}-12'
+    start, end = year_period(year)
+    rent_total = func.sum(TYachinShushi.賃料 + func.coalesce(TYachinShushi.管理費, 0))
+    unpaid_total = func.sum(case(
+        (TYachinShushi.入金日.is_(None), TYachinShushi.賃料 + func.coalesce(TYachinShushi.管理費, 0)), else_=0
+    ))
+    rows = db.execute(
+        select(
+            TKeiyaku.id, THeya.property_id, THeya.部屋番号, TNyukyosha.氏名, TKeiyaku.契約開始日, TKeiyaku.契約終了日,
+            func.coalesce(rent_total, 0), func.coalesce(unpaid_total, 0), TKeiyaku.礼金, TKeiyaku.敷金,
+        )
+        .select_from(TKeiyaku)
+        .join(THeya, THeya.id == TKeiyaku.room_id)
+        .join(TBukken, TBukken.id == THeya.property_id)
+        .outerjoin(TNyukyosha, TNyukyosha.id == TKeiyaku.tenant_person_id)
+        .outerjoin(TYachinShushi, and_(
+            TYachinShushi.contract_id == TKeiyaku.id,
+            TYachinShushi.対象年月.between(first_month, last_month),
+        ))
+        .where(
+            TBukken.tenant_id == tenant_id,
+            TBukken.有効 == 1,
+            TKeiyaku.契約開始日 <= end,
+            (TKeiyaku.契約終了日.is_(None)) | (TKeiyaku.契約終了日 >= start),
+        )
+        .group_by(
+            TKeiyaku.id, THeya.property_id, THeya.部屋番号, TNyukyosha.氏名, TKeiyaku.契約開始日,
+            TKeiyaku.契約終了日, TKeiyaku.礼金, TKeiyaku.敷金,
+        )
+        .order_by(THeya.property_id, THeya.部屋番号, TKeiyaku.契約開始日)
+    ).all()
+    return [
+        {
+            'contract_id': contract_id, '物件id': property_id, '部屋番号': room_number, '賃借人': person,
+            '契約開始日': started, '契約終了日': ended, '賃貸料': Decimal(str(rent)), '未入金': Decimal(str(unpaid)),
+            '礼金': Decimal(str(key_money or 0)) if start <= started <= end else Decimal('0'),
+            '敷金': deposit,
+        }
+        for contract_id, property_id, room_number, person, started, ended, rent, unpaid, key_money, deposit in rows
+    ]
+
+
+def depreciation_by_asset(db, tenant_id: int, year: int) -> list:
+    """
+    年度の減価償却（T_減価償却）を物件の取得価額・耐用年数・償却方法とあわせて1クエリで取得
+
+    同じ物件・年度の行が複数ある場合（再計算前の古い行など）は最新の行（idが最大）のみを使います。
+
+    Returns:
+    - list: [{'物件id', '物件名', '取得年月日', '取得価額', '耐用年数', '償却方法',
+              '期首帳簿価額', '償却額', '期末帳簿価額', '備考'}]
+    """
+    latest = (
+        select(func.max(TGenkashokaku.id))
+        .join(TBukken, TBukken.id == TGenkashokaku.property_id)
+        .where(TBukken.tenant_id == tenant_id, TGenkashokaku.年度 == year)
+        .group_by(TGenkashokaku.property_id)
+    )
+    rows = db.execute(
+        select(
+            TBukken.id, TBukken.物件名, TBukken.取得年月日, TBukken.取得価額, TBukken.耐用年数, TBukken.償却方法,
+            TGenkashokaku.期首帳簿価額, TGenkashokaku.償却額, TGenkashokaku.期末帳簿価額, TGenkashokaku.備考,
+        )
+        .join(TBukken, TBukken.id == TGenkashokaku.property_id)
+        .where(TBukken.有効 == 1, TGenkashokaku.id.in_(latest))
+        .order_by(TBukken.id)
+    ).all()
+    keys = ('物件id', '物件名', '取得年月日', '取得価額', '耐用年数', '償却方法',
+            '期首帳簿価額', '償却額', '期末帳簿価額', '備考')
+    return [dict(zip(keys, row)) for row in rows]
+
+
+def loan_interest_for_year(simulation, loan_condition, interest_schedules: list, year: int) -> Decimal:
+    """
+    詳細モードのローン返済予定から、その年に支払う利息を計算
+
+    初回利息は、初回返済時にまとめて支払う場合は返済開始年、借入月末に支払う場合は借入年に計上します。
+    """
+    loan_start_date = loan_condition.借入日
+    if isinstance(loan_start_date, str):
+        loan_start_date = date.fromisoformat(loan_start_date)
+    monthly_schedule, first_interest = build_monthly_loan_schedule(
+        loan_amount=simulation.借入金額 or Decimal('0'),
+        loan_start_date=loan_start_date,
+        payment_day=loan_condition.返済日,
+        payment_start_ym=loan_condition.返済開始年月,
+        grace_period_end_ym=loan_condition.据置期間終了年月,
+        first_interest_payment_method=loan_condition.初回利息支払方法,
+        interest_schedules=interest_schedules,
+        repayment_method=simulation.返済方法 or '元利均等',
+        repayment_period_years=simulation.返済期間_年 or 0,
+    )
+    interest = sum((m['interest'] for m in monthly_schedule if m['year'] == year), Decimal('0'))
+    if loan_condition.初回利息支払方法 == 1 and int(loan_condition.返済開始年月[:4]) == year:
+        interest += first_interest
+    elif loan_condition.初回利息支払方法 == 2 and loan_start_date.year == year:
+        interest += first_interest
+    return interest
+
+
+def loan_interest_by_property(db, tenant_id: int, year: int) -> dict:
+    """
+    物件ごとの借入金利子（物件の詳細モードのシミュレーションのうち最新のもののローン条件で計算）
+
+    ローン条件と金利スケジュールはそれぞれ1クエリで読み込みます。
+
+    Returns:
+    - dict: {物件id: {'シミュレーションid', '名称', '借入金額', '借入金利子'}}
+    """
+    latest = (
+        select(func.max(TSimulation.id))
+        .join(TLoanCondition, TLoanCondition.シミュレーションid == TSimulation.id)
+        .where(
+            TSimulation.tenant_id == tenant_id,
+            TSimulation.ローン計算モード == 2,
+            TSimulation.物件id.isnot(None),
+        )
+        .group_by(TSimulation.物件id)
+    )
+    loans = db.execute(
+        select(TSimulation, TLoanCondition)
+        .join(TLoanCondition, TLoanCondition.シミュレーションid == TSimulation.id)
+        .where(TSimulation.id.in_(latest))
+    ).all()
+    if not loans:
+        return {}
+
+    schedules = {}
+    for schedule in db.execute(
+        select(TLoanInterestSchedule)
+        .where(TLoanInterestSchedule.シミュレーションid.in_([simulation.id for simulation, _ in loans]))
+        .order_by(TLoanInterestSchedule.開始年月)
+    ).scalars():
+        schedules.setdefault(schedule.シミュレーションid, []).append(
+            {'開始年月': schedule.開始年月, '終了年月': schedule.終了年月, '金利': schedule.金利}
+        )
+
+    interest = {}
+    for simulation, loan_condition in loans:
+        if simulation.id not in schedules:
+            continue
+        interest[simulation.物件id] = {
+            'シミュレーションid': simulation.id,
+            '名称': simulation.名称,
+            '借入金額': simulation.借入金額,
+            '借入金利子': loan_interest_for_year(simulation, loan_condition, schedules[simulation.id], year),
+        }
+    return interest
+
+
+def build_tax_report(db, tenant_id: int, year: int) -> dict:
+    """
+    収支内訳書（不動産所得用）のデータを作成
+
+    Parameters:
+    - db: SQLAlchemyセッション
+    - tenant_id: テナントID
+    - year: 対象年（1月1日〜12月31日）
+
+    Returns:
+    - dict: {'year', 'properties': 物件ごとの収支（TAX_REPORT_COLUMNS と '物件id'）, 'total': 合計,
+             'income': 契約ごとの収入の内訳, 'property_names': {物件id: 物件名},
+             'depreciation': 減価償却の内訳, 'loans': 物件ごとの借入金,
+             'expense_lines': 経費科目, '集計時間ms'}
+    """
+    started = time.perf_counter()
+    properties = {
+        property_id: _empty_row(property_id, name, address)
+        for property_id, name, address in db.execute(
+            select(TBukken.id, TBukken.物件名, TBukken.住所)
+            .where(TBukken.tenant_id == tenant_id, TBukken.有効 == 1)
+            .order_by(TBukken.id)
+        )
+    }
+
+    income = rent_income_by_contract(db, tenant_id, year)
+    for item in income:
+        row = properties[item['物件id']]
+        row['賃貸料'] += item['賃貸料']
+        row['礼金・更新料'] += item['礼金']
+
+    start, end = year_period(year)
+    for item in get_expense_rollup(db, tenant_id, start, end)['levels']['物件_カテゴリ']:
+        row = properties.get(item['物件id'])
+        if row is not None:
+            row[_LINE_BY_CATEGORY.get(item['経費カテゴリ'], '雑費')] += Decimal(str(item['金額']))
+
+    depreciation = depreciation_by_asset(db, tenant_id, year)
+    for item in depreciation:
+        properties[item['物件id']]['減価償却費'] += item['償却額'] or 0
+
+    loans = loan_interest_by_property(db, tenant_id, year)
+    for property_id, loan in loans.items():
+        if property_id in properties:
+            properties[property_id]['借入金利子'] += loan['借入金利子']
+
+    rows = []
+    total = _empty_row(None, '合計', '')
+    for row in properties.values():
+        row['収入金額'] = row['賃貸料'] + row['礼金・更新料']
+        row['必要経費'] = sum(row[line] for line in TAX_EXPENSE_LINES) + row['減価償却費'] + row['借入金利子']
+        row['差引金額'] = row['収入金額'] - row['必要経費']
+        if not any(row[column] for column in TAX_REPORT_COLUMNS[2:]):
+            continue  # その年に収入・経費のない物件は載せない
+        for column in TAX_REPORT_COLUMNS[2:]:
+            total[column] += row[column]
+        rows.append(row)
+
+    return {
+        'year': year,
+        'properties': rows,
+        'total': total,
+        'income': [item for item in income if item['賃貸料'] or item['礼金']],
+        'property_names': {property_id: row['物件名'] for property_id, row in properties.items()},
+        'depreciation': depreciation,
+        'loans': loans,
+        'expense_lines': list(TAX_EXPENSE_LINES),
+        '集計時間ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+def tax_report_csv(report: dict) -> str:
+    """収支内訳書のCSV（物件ごとの収支と合計。BOM付きUTF-8）"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')
+    writer.writerow(TAX_REPORT_COLUMNS)
+    for row in report['properties'] + [report['total']]:
+        writer.writerow([row[column] for column in TAX_REPORT_COLUMNS])
+    return buffer.getvalue()
+
+
+def tax_report_pdf(html: str) -> bytes:
+    """
+    印刷用HTMLをPDFに変換（weasyprint が必要）
+
+    Raises:
+    - ValueError: weasyprint がインストールされていない場合
+    """
+    if weasyprint is None:
+        raise ValueError('PDF出力には weasyprint のインストールが必要です。印刷用画面からブラウザの「PDFに保存」を使用してください')
+    return weasyprint.HTML(string=html).write_pdf()
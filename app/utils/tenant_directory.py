@@ -0,0 +1,125 @@
+"""
+テナント・店舗ディレクトリ
+有効なテナントと店舗を1回の結合クエリでツリーにまとめ、プロセス内にキャッシュしてタイプアヘッド検索に使用
+"""
+import threading
+import time
+
+from sqlalchemy import select, and_, event
+
+from app.models_login import TTenant, TTenpo
+from app.utils.metrics import record_cache
+
+
+# キャッシュの有効期間（秒）。同一プロセス内の変更は即時に無効化し、
+# 他のワーカープロセスでの変更はこの時間内に反映される
+TREE_CACHE_TTL = 60
+
+# タイプアヘッドで返す最大件数
+PICKER_LIMIT = 20
+
+_cache_lock = threading.Lock()
+_cache = {'tree': None, 'loaded_at': 0.0}
+
+
+def invalidate_tenant_store_tree(*_args, **_kwargs):
+    """キャッシュ済みのテナント・店舗ツリーを破棄（SQLAlchemyイベントからも呼ばれる）"""
+    with _cache_lock:
+        _cache['tree'] = None
+
+
+# ORM経由でテナント・店舗が変更されたらキャッシュを破棄
+for _model in (TTenant, TTenpo):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, invalidate_tenant_store_tree)
+
+
+def load_tenant_store_tree(db) -> list:
+    """
+    有効なテナントと店舗のツリーを1クエリで取得
+
+    Returns:
+    - list: [{'id', 'name', 'stores': [{'id', 'name'}]}]（テナントID順、店舗ID順）
+    """
+    rows = db.execute(
+        select(TTenant.id, TTenant.名称, TTenpo.id, TTenpo.名称)
+        .outerjoin(TTenpo, and_(TTenpo.tenant_id == TTenant.id, TTenpo.有効 == 1))
+        .where(TTenant.有効 == 1)
+        .order_by(TTenant.id, TTenpo.id)
+    ).all()
+
+    tree = []
+    current = None
+    for tenant_id, tenant_name, store_id, store_name in rows:
+        if current is None or current['id'] != tenant_id:
+            current = {'id': tenant_id, 'name': tenant_name, 'stores': []}
+            tree.append(current)
+        if store_id is not None:
+            current['stores'].append({'id': store_id, 'name': store_name})
+    return tree
+
+
+def get_tenant_store_tree(db) -> list:
+    """キャッシュ済みのテナント・店舗ツリーを取得（期限切れ・未作成の場合は読み込む）"""
+    with _cache_lock:
+        tree = _cache['tree']
+        if tree is not None and time.monotonic() - _cache['loaded_at'] < TREE_CACHE_TTL:
+            record_cache('tenant_store_tree', True)
+            return tree
+    record_cache('tenant_store_tree', False)
+
+    tree = load_tenant_store_tree(db)
+    with _cache_lock:
+        _cache['tree'] = tree
+        _cache['loaded_at'] = time.monotonic()
+    return tree
+
+
+def _matches(name: str, query: str) -> bool:
+    return not query or query in (name or '').lower()
+
+
+def search_tenants(tree: list, query: str = '', limit: int = PICKER_LIMIT) -> list:
+    """
+    テナントを名称の部分一致で検索
+
+    Returns:
+    - list: [{'id', 'name', 'store_count'}]
+    """
+    query = (query or '').strip().lower()
+    results = []
+    for tenant in tree:
+        if _matches(tenant['name'], query):
+            results.append({'id': tenant['id'], 'name': tenant['name'], 'store_count': len(tenant['stores'])})
+            if len(results) >= limit:
+                break
+    return results
+
+
+def search_stores(tree: list, query: str = '', tenant_id=None, limit: int = PICKER_LIMIT) -> list:
+    """
+    店舗を名称（またはテナント名）の部分一致で検索
+
+    Parameters:
+    - tenant_id: 指定した場合はそのテナントの店舗のみ
+
+    Returns:
+    - list: [{'id', 'name', 'tenant_id', 'tenant_name'}]
+    """
+    query = (query or '').strip().lower()
+    results = []
+    for tenant in tree:
+        if tenant_id is not None and tenant['id'] != tenant_id:
+            continue
+        tenant_matches = tenant_id is None and query and _matches(tenant['name'], query)
+        for store in tenant['stores']:
+            if tenant_matches or _matches(store['name'], query):
+                results.append({
+                    'id': store['id'],
+                    'name': store['name'],
+                    'tenant_id': tenant['id'],
+                    'tenant_name': tenant['name'],
+                })
+                if len(results) >= limit:
+                    return results
+    return results
@@ -0,0 +1,17 @@
+"""
+負荷試験パッケージ
+
+合成ポートフォリオ（Nテナント × M物件 × 部屋・入居者・契約・家賃収支・経費・シミュレーション）を
+データベースに作成し、ログイン → ダッシュボード → 物件一覧・詳細 → シミュレーション編集 などの
+利用シナリオを複数の仮想ユーザーで実行して、エンドポイントごとのスループットと p50/p95/p99 を出力する。
+
+使い方:
+    DATABASE_URL=sqlite:///loadtest.db python -m loadtest seed --tenants 5 --properties 20 --rooms 10
+    DATABASE_URL=sqlite:///loadtest.db python -m loadtest run --users 8 --duration 60
+    python -m loadtest run --target http://localhost:5000 --users 8 --duration 60   # 起動中のサーバーに対して実行
+
+seed は作成したテナント・ログインID・物件ID・シミュレーションIDを manifest（既定 loadtest_manifest.json）に
+書き出し、run はそれを読んでシナリオを組み立てる。--target を省略した場合はアプリをプロセス内で起動して
+Flaskのテストクライアントで実行し、エンドポイントごとのSQL件数も集計する（N+1クエリの確認用）。
+同じ --seed・件数で空のデータベースに作成すれば、同じデータになる。
+"""
@@ -0,0 +1,122 @@
+"""
+負荷試験のコマンドライン（python -m loadtest seed / run）
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+from datetime import date
+
+DEFAULT_MANIFEST = 'loadtest_manifest.json'
+
+
+def _require_database_url(parser):
+    if not os.getenv('DATABASE_URL'):
+        parser.error('環境変数 DATABASE_URL に対象のデータベースを指定してください（例: sqlite:///loadtest.db）')
+
+
+def _progress(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+def seed_command(args, parser):
+    _require_database_url(parser)
+    # アプリのモジュールは DATABASE_URL を確認してから読み込む（読み込み時にテーブルを作成する）
+    with contextlib.redirect_stdout(sys.stderr):
+        from app.db import SessionLocal
+        from loadtest.seed import seed_portfolio
+
+    db = SessionLocal()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            manifest = seed_portfolio(
+                db, tenants=args.tenants, properties=args.properties, rooms=args.rooms,
+                ledger_months=args.ledger_months, seed=args.seed, password=args.password,
+                as_of=date.fromisoformat(args.as_of) if args.as_of else None,
+                calculate=not args.no_calculate, progress=_progress,
+            )
+    except ValueError as e:
+        parser.exit(1, f'{e}\n')
+    finally:
+        db.close()
+
+    with open(args.manifest, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    rooms = args.tenants * args.properties * args.rooms
+    _progress(f'作成しました: テナント{args.tenants}件 / 物件{args.tenants * args.properties}件 / 部屋{rooms}件 → {args.manifest}')
+
+
+def run_command(args, parser):
+    from loadtest.journeys import JOURNEYS
+    from loadtest.runner import HttpClient, InProcessClient, create_in_process_app, run_load, format_report
+
+    with open(args.manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+    for name in args.journey or []:
+        if name not in JOURNEYS:
+            parser.error(f'不明なシナリオ: {name}（{", ".join(JOURNEYS)}）')
+
+    options = dict(users=args.users, duration=args.duration, iterations=args.iterations,
+                   journeys=args.journey, think_time=args.think_time, seed=args.seed)
+    if args.target:
+        _progress(f'{args.target} に {args.users} ユーザーで実行します')
+        report = run_load(lambda: HttpClient(args.target), manifest, **options)
+    else:
+        _require_database_url(parser)
+        # アプリの標準出力（接続メッセージなど）とリクエストごとのログは表示しない
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = create_in_process_app()
+            if not args.verbose:
+                logging.disable(logging.WARNING)
+            _progress(f'プロセス内のアプリに {args.users} ユーザーで実行します')
+            report = run_load(lambda: InProcessClient(app), manifest, **options)
+
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if args.fail_on_error and report['errors']:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m loadtest', description='合成ポートフォリオによる負荷試験')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    seed = subparsers.add_parser('seed', help='合成ポートフォリオを DATABASE_URL のデータベースに作成')
+    seed.add_argument('--tenants', type=int, default=5, help='テナント数')
+    seed.add_argument('--properties', type=int, default=20, help='テナントごとの物件数')
+    seed.add_argument('--rooms', type=int, default=10, help='物件ごとの部屋数')
+    seed.add_argument('--ledger-months', type=int, default=12, help='家賃収支・物件経費を作成する月数')
+    seed.add_argument('--seed', type=int, default=20250101, help='乱数のシード')
+    seed.add_argument('--password', default='loadtest', help='作成する管理者のパスワード')
+    seed.add_argument('--as-of', help='基準日（YYYY-MM-DD、省略時は今日）')
+    seed.add_argument('--no-calculate', action='store_true', help='シミュレーションを計算しない')
+    seed.add_argument('--manifest', default=DEFAULT_MANIFEST, help='作成したデータの一覧を書き出すファイル')
+
+    run = subparsers.add_parser('run', help='シナリオを実行してエンドポイントごとの応答時間を集計')
+    run.add_argument('--manifest', default=DEFAULT_MANIFEST, help='seed が書き出したファイル')
+    run.add_argument('--target', help='起動中のサーバーのURL（省略時はプロセス内で実行）')
+    run.add_argument('--users', type=int, default=4, help='同時に動かす仮想ユーザー数')
+    run.add_argument('--duration', type=float, default=30, help='実行する秒数')
+    run.add_argument('--iterations', type=int, help='仮想ユーザーごとのシナリオ実行回数（指定時は --duration を無視）')
+    run.add_argument('--journey', action='append', help='実行するシナリオ（複数指定可、省略時はすべて）')
+    run.add_argument('--think-time', type=float, default=0.0, help='シナリオ間の待ち時間の上限（秒）')
+    run.add_argument('--seed', type=int, default=1, help='シナリオ・対象の選択に使う乱数のシード')
+    run.add_argument('--json', help='集計結果をJSONで書き出すファイル')
+    run.add_argument('--fail-on-error', action='store_true', help='エラーがあれば終了コード1で終了')
+    run.add_argument('--verbose', action='store_true', help='アプリのログを表示する（プロセス内実行）')
+
+    args = parser.parse_args()
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+    if args.command == 'seed':
+        seed_command(args, parser)
+    else:
+        run_command(args, parser)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+利用シナリオ
+仮想ユーザーがログインしてから画面を順にたどる流れを関数で定義する。
+各ステップは集計用の名前（URLのIDを <id> にしたもの）で記録し、想定外のステータスならシナリオを中断する。
+"""
+import random
+
+
+class JourneyError(Exception):
+    """想定外の応答でシナリオを中断する"""
+
+
+class VirtualUser:
+    """1人の仮想ユーザー（クライアント・担当テナント・乱数）"""
+
+    def __init__(self, client, recorder, manifest: dict, tenant: dict, rng: random.Random):
+        self.client = client
+        self.recorder = recorder
+        self.manifest = manifest
+        self.tenant = tenant
+        self.rng = rng
+
+    def step(self, name: str, method: str, path: str, data=None, expect=(200,)):
+        """リクエストを送って計測し、ステータスが expect 以外なら JourneyError"""
+        response = self.client.request(method, path, data)
+        ok = response.status in expect
+        self.recorder.record(name, response.elapsed, ok, response.sql_count)
+        if not ok:
+            raise JourneyError(f'{method} {path}: ステータス {response.status}（想定 {expect}）')
+        return response
+
+    def login_tenant_admin(self):
+        self.step('GET /tenant_admin_login', 'GET', '/tenant_admin_login')
+        self.step('POST /tenant_admin_login', 'POST', '/tenant_admin_login', {
+            'login_id': self.tenant['login_id'], 'password': self.manifest['password'],
+        }, expect=(302,))
+
+    def logout(self):
+        self.step('GET /logout', 'GET', '/logout', expect=(302,))
+
+
+def browse_portfolio(user: VirtualUser):
+    """テナント管理者: ダッシュボード → 物件一覧 → 物件詳細 ×2 → シミュレーション一覧・詳細"""
+    user.login_tenant_admin()
+    user.step('GET /property/', 'GET', '/property/')
+    user.step('GET /property/properties', 'GET', '/property/properties')
+    for property_id in user.rng.sample(user.tenant['property_ids'], min(2, len(user.tenant['property_ids']))):
+        user.step('GET /property/properties/<id>', 'GET', f'/property/properties/{property_id}')
+    user.step('GET /property/simulations', 'GET', '/property/simulations')
+    simulation_id = user.rng.choice(user.tenant['simulation_ids'])
+    user.step('GET /property/simulations/<id>', 'GET', f'/property/simulations/{simulation_id}')
+    user.logout()
+
+
+def edit_simulation(user: VirtualUser):
+    """
+    テナント管理者: シミュレーションを開いて稼働率だけ変えて保存（再計算）し、結果を表示
+
+    稼働率は数種類から選ぶため、前回と同じ入力になった場合は入力ハッシュによる再計算の省略も含めて計測する。
+    """
+    user.login_tenant_admin()
+    user.step('GET /property/simulations', 'GET', '/property/simulations')
+    simulation_id = user.rng.choice(user.tenant['simulation_ids'])
+    user.step('GET /property/simulations/<id>/edit', 'GET', f'/property/simulations/{simulation_id}/edit')
+    form = dict(user.tenant['edit_forms'][str(simulation_id)])
+    form['稼働率'] = user.rng.choice(['92.00', '94.00', '95.00', '96.00'])
+    user.step('POST /property/simulations/<id>/edit', 'POST', f'/property/simulations/{simulation_id}/edit',
+              form, expect=(302,))
+    user.step('GET /property/simulations/<id>', 'GET', f'/property/simulations/{simulation_id}')
+    user.logout()
+
+
+def system_admin_login(user: VirtualUser):
+    """システム管理者: ログインとログアウト"""
+    user.step('GET /system_admin_login', 'GET', '/system_admin_login')
+    user.step('POST /system_admin_login', 'POST', '/system_admin_login', {
+        'login_id': user.manifest['system_admin']['login_id'], 'password': user.manifest['password'],
+    }, expect=(302,))
+    user.logout()
+
+
+# シナリオ名 → (関数, 選ばれる重み)
+JOURNEYS = {
+    'browse': (browse_portfolio, 6),
+    'edit_simulation': (edit_simulation, 2),
+    'system_admin_login': (system_admin_login, 1),
+}
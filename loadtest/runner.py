@@ -0,0 +1,238 @@
+"""
+負荷試験の実行と集計
+仮想ユーザーごとにスレッドを起動してシナリオを繰り返し、ステップごとの応答時間を集計する。
+
+クライアントは2種類:
+- HttpClient: 起動中のサーバーにHTTPで送る（標準ライブラリのurllib、Cookieでセッションを維持）
+- InProcessClient: アプリをプロセス内で起動してFlaskのテストクライアントで送る（SQL件数も取得）
+"""
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from loadtest.journeys import JOURNEYS, JourneyError, VirtualUser
+
+
+SQL_COUNT_HEADER = 'X-Loadtest-SQL-Count'
+
+# HTTPのタイムアウト（秒）
+HTTP_TIMEOUT = 60
+
+
+class Response:
+    """1リクエストの結果（ステータス・応答時間・SQL件数）"""
+
+    def __init__(self, status: int, elapsed: float, sql_count=None):
+        self.status = status
+        self.elapsed = elapsed
+        self.sql_count = sql_count
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """リダイレクトを追わずに 302 をそのまま返す（シナリオ側で次のステップとして計測する）"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpClient:
+    """起動中のサーバーに送るクライアント（仮想ユーザーごとにCookieを持つ）"""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+    def request(self, method: str, path: str, data=None) -> Response:
+        body = urllib.parse.urlencode(data).encode('utf-8') if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        started = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=HTTP_TIMEOUT) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return Response(status, time.perf_counter() - started)
+
+
+class InProcessClient:
+    """プロセス内のアプリに送るクライアント"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method: str, path: str, data=None) -> Response:
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, data=data)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        sql_count = response.headers.get(SQL_COUNT_HEADER)
+        return Response(response.status_code, elapsed, int(sql_count) if sql_count is not None else None)
+
+
+def create_in_process_app():
+    """
+    負荷試験用にアプリを作成し、応答ヘッダーにリクエストごとのSQL件数を付ける
+
+    リクエスト計測（init_request_metrics）の after_request より先に実行されるよう、アプリ作成後に登録します。
+    """
+    from app import create_app
+    from app.utils.request_metrics import current_stats
+
+    app = create_app()
+
+    @app.after_request
+    def _sql_count_header(response):
+        stats = current_stats()
+        if stats is not None:
+            response.headers[SQL_COUNT_HEADER] = str(stats.sql_count)
+        return response
+
+    return app
+
+
+class Recorder:
+    """ステップごとの応答時間・エラー数・SQL件数を集める（スレッドセーフ）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.errors = {}
+        self.sql_counts = {}
+        self.journeys = {}
+
+    def record(self, name: str, elapsed: float, ok: bool, sql_count=None) -> None:
+        with self.lock:
+            self.timings.setdefault(name, []).append(elapsed)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            if sql_count is not None:
+                self.sql_counts.setdefault(name, []).append(sql_count)
+
+    def record_journey(self, name: str, ok: bool) -> None:
+        with self.lock:
+            done, failed = self.journeys.get(name, (0, 0))
+            self.journeys[name] = (done + 1, failed + (0 if ok else 1))
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """最近順位法によるパーセンタイル（sorted_values は昇順）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_load(client_factory, manifest: dict, users: int = 4, duration: float = 30, iterations=None,
+             journeys=None, think_time: float = 0.0, seed: int = 1) -> dict:
+    """
+    仮想ユーザーを起動してシナリオを実行し、集計結果を返す
+
+    Parameters:
+    - client_factory: 仮想ユーザーごとのクライアントを作る関数
+    - manifest: seed_portfolio の戻り値
+    - users: 同時に動かす仮想ユーザー数（テナントに順に割り当てる）
+    - duration: 実行する秒数（iterations を指定した場合は無視）
+    - iterations: 仮想ユーザーごとのシナリオ実行回数
+    - journeys: 実行するシナリオ名のリスト（省略時はすべてを重みに応じて選ぶ）
+    - think_time: ステップ間ではなくシナリオ間の待ち時間の上限（秒、0〜指定値の一様乱数）
+    - seed: シナリオ・対象の選択に使う乱数のシード
+
+    Returns:
+    - dict: build_report の戻り値
+    """
+    names = journeys or list(JOURNEYS)
+    weights = [JOURNEYS[name][1] for name in names]
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        tenant = manifest['tenants'][index % len(manifest['tenants'])]
+        user = VirtualUser(client_factory(), recorder, manifest, tenant, rng)
+        count = 0
+        while (count < iterations) if iterations is not None else (time.monotonic() < deadline):
+            name = rng.choices(names, weights)[0]
+            try:
+                JOURNEYS[name][0](user)
+                recorder.record_journey(name, True)
+            except JourneyError:
+                recorder.record_journey(name, False)
+            count += 1
+            if think_time:
+                time.sleep(rng.uniform(0, think_time))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return build_report(recorder, time.perf_counter() - started, users)
+
+
+def build_report(recorder: Recorder, elapsed: float, users: int) -> dict:
+    """
+    集計結果
+
+    Returns:
+    - dict: {'elapsed_s', 'users', 'requests', 'errors', 'throughput_rps',
+             'endpoints': [{'name', 'count', 'errors', 'rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'sql_mean', 'sql_max'}],
+             'journeys': {シナリオ名: {'count', 'failed'}}}
+    """
+    endpoints = []
+    for name in sorted(recorder.timings):
+        timings = sorted(recorder.timings[name])
+        sql_counts = recorder.sql_counts.get(name)
+        endpoints.append({
+            'name': name,
+            'count': len(timings),
+            'errors': recorder.errors.get(name, 0),
+            'rps': round(len(timings) / elapsed, 2) if elapsed else 0.0,
+            'mean_ms': round(sum(timings) / len(timings) * 1000, 1),
+            'p50_ms': round(percentile(timings, 50) * 1000, 1),
+            'p95_ms': round(percentile(timings, 95) * 1000, 1),
+            'p99_ms': round(percentile(timings, 99) * 1000, 1),
+            'max_ms': round(timings[-1] * 1000, 1),
+            'sql_mean': round(sum(sql_counts) / len(sql_counts), 1) if sql_counts else None,
+            'sql_max': max(sql_counts) if sql_counts else None,
+        })
+    requests = sum(endpoint['count'] for endpoint in endpoints)
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'users': users,
+        'requests': requests,
+        'errors': sum(endpoint['errors'] for endpoint in endpoints),
+        'throughput_rps': round(requests / elapsed, 2) if elapsed else 0.0,
+        'endpoints': endpoints,
+        'journeys': {name: {'count': done, 'failed': failed} for name, (done, failed) in sorted(recorder.journeys.items())},
+    }
+
+
+def format_report(report: dict) -> str:
+    """集計結果を表にする"""
+    lines = [
+        f"{report['users']}ユーザー / {report['elapsed_s']}秒 / {report['requests']}リクエスト"
+        f"（エラー {report['errors']}件） / {report['throughput_rps']} req/s",
+        '',
+        f"{'endpoint':<42} {'count':>6} {'err':>4} {'req/s':>7} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'SQL':>6}",
+    ]
+    for endpoint in report['endpoints']:
+        sql = f"{endpoint['sql_mean']:.1f}" if endpoint['sql_mean'] is not None else '-'
+        lines.append(
+            f"{endpoint['name']:<42} {endpoint['count']:>6} {endpoint['errors']:>4} {endpoint['rps']:>7} "
+            f"{endpoint['mean_ms']:>8} {endpoint['p50_ms']:>8} {endpoint['p95_ms']:>8} {endpoint['p99_ms']:>8} "
+            f"{endpoint['max_ms']:>8} {sql:>6}"
+        )
+    lines += ['', '（時間はミリ秒。SQLは1リクエストあたりの平均件数で、プロセス内実行の場合のみ）', '']
+    for name, counts in report['journeys'].items():
+        lines.append(f"シナリオ {name}: {counts['count']}回（失敗 {counts['failed']}回）")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,376 @@
+"""
+合成ポートフォリオの作成
+テナントごとにテナント管理者・物件・部屋・入居者・契約・家賃収支・物件経費・シミュレーションを作成し、
+物件集計・検索インデックス・月次稼働を作り直してシミュレーションを計算しておく。
+
+件数が多くても短時間で作れるよう、テーブルへはORMを通さずにまとめてINSERTする
+（ORMイベントによる集計の更新は行われないため、最後に対象テナント分をまとめて作り直す）。
+"""
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import create_engine, delete, insert, select
+
+from app.models_login import TKanrisha, TTenant, TTenantAdminTenant
+from app.models_property import (
+    TBukken, THeya, TNyukyosha, TKeiyaku, TYachinShushi, TBukkenKeihi, TSimulation,
+    TLoanCondition, TLoanInterestSchedule,
+)
+from app.utils.useful_life_calculator import calculate_useful_life
+
+
+DEFAULT_PASSWORD = 'loadtest'
+DEFAULT_SEED = 20250101
+
+# テナント・ログインIDの接頭辞（作成済みかどうかの判定にも使う）
+SLUG_PREFIX = 'loadtest-'
+SYSTEM_ADMIN_LOGIN_ID = 'loadtest-sysadmin'
+
+# get_db() が PostgreSQL に接続できない場合にログインで使うSQLiteファイル
+LOGIN_FALLBACK_PATH = os.path.join('database', 'login_auth.db')
+
+# 入居中の部屋の割合
+OCCUPANCY = 0.9
+
+# 家賃の入金済みの割合
+PAID_RATIO = 0.95
+
+# 物件ごとのシミュレーションを作成する物件数（テナント全体のシミュレーションとは別）
+PROPERTY_SIMULATIONS = 3
+
+_INSERT_BATCH_SIZE = 1000
+
+_SURNAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤', '吉田', '山田']
+_GIVEN_NAMES = ['翔太', '美咲', '大輔', '陽菜', '健一', '愛', '拓也', '結衣', '直樹', '彩', '誠', '真由美']
+_CITIES = ['東京都新宿区', '東京都世田谷区', '神奈川県横浜市港北区', '大阪府大阪市北区', '福岡県福岡市中央区']
+_STRUCTURES = ['RC造', '重量鉄骨造', '木造']
+_LAYOUTS = [('1K', 22), ('1LDK', 38), ('2LDK', 55), ('3LDK', 70)]
+
+
+def _insert(db, model, rows: list) -> list:
+    """まとめてINSERTし、作成した行のidを rows の順に返す"""
+    table = model.__table__
+    ids = []
+    for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+        chunk = rows[start:start + _INSERT_BATCH_SIZE]
+        result = db.execute(insert(table).returning(table.primary_key.columns[0], sort_by_parameter_order=True), chunk)
+        ids.extend(result.scalars().all())
+    return ids
+
+
+def _insert_rows(db, model, rows: list) -> None:
+    """idが不要な行をまとめてINSERT"""
+    for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+        db.execute(insert(model.__table__), rows[start:start + _INSERT_BATCH_SIZE])
+
+
+def _contract_end(start: date, as_of: date) -> date:
+    """2年契約を更新し続けた場合の、as_of 時点で有効な契約の終了日"""
+    end = start + relativedelta(years=2) - timedelta(days=1)
+    while end < as_of:
+        end += relativedelta(years=2)
+    return end
+
+
+def _simulation_row(tenant_id, name, property_id, granularity, loan_mode, start_year, loan_amount, building_cost) -> dict:
+    return {
+        'tenant_id': tenant_id, '名称': name, 'シミュレーション種別': '物件ベース', '物件id': property_id,
+        '開始年度': start_year, '期間': 30, '稼働率': Decimal('95.00'),
+        '実績稼働率_月数': 12 if property_id is None else None,
+        '実績経費_年数': 1 if property_id is None else None,
+        '管理費率': Decimal('5.00'), '修繕費率': Decimal('5.00'),
+        '固定資産税': (building_cost * Decimal('0.014')).quantize(Decimal('1')),
+        '損害保険料': (building_cost * Decimal('0.001')).quantize(Decimal('1')),
+        '経費上昇率': Decimal('1.00'),
+        'ローン残高': loan_amount, 'ローン金利': Decimal('1.50'),
+        'ローン年間返済額': (loan_amount / 25).quantize(Decimal('1')),
+        'ローン計算モード': loan_mode, '計算粒度': granularity,
+        '借入金額': loan_amount, '返済期間_年': 30, '返済方法': '元利均等',
+        'その他収入': Decimal('0'), 'その他経費': Decimal('0'), '減価償却費': Decimal('0'),
+        'その他所得': Decimal('5000000'), '税率': None,
+        '建物_取得価額': building_cost, '建物_耐用年数': 47, '建物_償却方法': '定額法', '建物_残存価額': Decimal('0'),
+        '付属設備_取得価額': (building_cost * Decimal('0.15')).quantize(Decimal('1')),
+        '付属設備_耐用年数': 15, '付属設備_償却方法': '定額法', '付属設備_残存価額': Decimal('0'),
+        '構築物_取得価額': Decimal('0'), '構築物_耐用年数': 20, '構築物_償却方法': '定額法', '構築物_残存価額': Decimal('0'),
+        '割引率': Decimal('3.00'), '要再計算': 0,
+    }
+
+
+def _edit_form(row: dict, loan_condition=None) -> dict:
+    """シミュレーション編集画面の送信内容（作成した値のまま。稼働率はシナリオで変える）"""
+    form = {
+        '名称': row['名称'], 'シミュレーション種別': row['シミュレーション種別'],
+        '物件id': str(row['物件id']) if row['物件id'] else 'all',
+        '実績稼働率_月数': str(row['実績稼働率_月数'] or ''), '実績経費_年数': str(row['実績経費_年数'] or ''),
+        'ローン計算モード': str(row['ローン計算モード']), '計算粒度': str(row['計算粒度']),
+        '借入金額': str(row['借入金額']), '返済期間_年': str(row['返済期間_年']), '返済方法': row['返済方法'],
+    }
+    for key in ('開始年度', '期間', '稼働率', '管理費率', '修繕費率', '固定資産税', '損害保険料', '経費上昇率',
+                'ローン残高', 'ローン金利', 'ローン年間返済額', 'その他収入', 'その他経費', '減価償却費',
+                'その他所得', '割引率'):
+        form[key] = str(row[key])
+    for asset in ('建物', '付属設備', '構築物'):
+        for item in ('取得価額', '耐用年数', '償却方法', '残存価額'):
+            form[f'{asset}_{item}'] = str(row[f'{asset}_{item}'])
+    if loan_condition:
+        form.update({
+            '借入金額_詳細': str(row['借入金額']), '返済期間_年_詳細': str(row['返済期間_年']),
+            '借入日': loan_condition['借入日'].isoformat(), '返済日': str(loan_condition['返済日']),
+            '返済開始年月': loan_condition['返済開始年月'], '据置期間終了年月': '',
+            '初回利息支払方法': str(loan_condition['初回利息支払方法']), 'ローン金利_詳細': str(row['ローン金利']),
+        })
+    return form
+
+
+def _seed_tenant(db, rng, number: int, properties: int, rooms: int, ledger_months: int, as_of: date,
+                 password_hash: str) -> dict:
+    """1テナント分を作成して manifest のテナント情報を返す"""
+    tenant_id = _insert(db, TTenant, [{
+        '名称': f'負荷試験テナント{number:03d}', 'slug': f'{SLUG_PREFIX}{number:03d}',
+        'email': f'tenant{number:03d}@loadtest.example.com', '有効': 1,
+    }])[0]
+    login_id = f'{SLUG_PREFIX}admin-{number:03d}'
+    account = {
+        'login_id': login_id, 'name': f'負荷試験管理者{number:03d}', 'email': f'{login_id}@loadtest.example.com',
+        'password_hash': password_hash, 'role': 'tenant_admin', 'tenant_id': tenant_id, 'active': 1, 'is_owner': 1,
+    }
+    admin_id = _insert(db, TKanrisha, [account])[0]
+    _insert_rows(db, TTenantAdminTenant, [{'admin_id': admin_id, 'tenant_id': tenant_id, 'is_owner': 1}])
+
+    # ---- 物件 ----
+    property_rows = []
+    for p in range(properties):
+        structure = rng.choice(_STRUCTURES)
+        built = date(rng.randint(1985, as_of.year - 1), rng.randint(1, 12), 1)
+        acquired = max(built, date(rng.randint(2010, as_of.year - 1), rng.randint(1, 12), 1))
+        useful_life, _ = calculate_useful_life(built, acquired, structure)
+        property_rows.append({
+            'tenant_id': tenant_id, '物件名': f'{rng.choice(_SURNAMES)}ハイツ{p + 1:03d}',
+            '物件種別': 'マンション' if structure == 'RC造' else 'アパート',
+            '住所': f'{rng.choice(_CITIES)}{rng.randint(1, 5)}-{rng.randint(1, 30)}-{rng.randint(1, 20)}',
+            '建築年月': built, '構造': structure, '階数': max(2, rooms // 4), '部屋数': rooms,
+            '取得価額': Decimal(rng.randrange(6000, 30000, 100)) * 10000, '取得年月日': acquired,
+            '耐用年数': useful_life, '償却方法': '定額法', '残存価額': Decimal('0'), '有効': 1,
+        })
+    property_ids = _insert(db, TBukken, property_rows)
+
+    # ---- 部屋・入居者・契約 ----
+    room_rows, room_rents = [], []
+    for property_id in property_ids:
+        for r in range(rooms):
+            layout, area = rng.choice(_LAYOUTS)
+            rent = Decimal(rng.randrange(area * 1500, area * 3000, 500))
+            occupied = rng.random() < OCCUPANCY
+            room_rows.append({
+                'property_id': property_id, '部屋番号': f'{r // 10 + 1}{r % 10 + 1:02d}', '間取り': layout,
+                '専有面積': Decimal(area), '賃料': rent, '管理費': Decimal(rng.choice([3000, 5000, 8000])),
+                '敷金': rent, '礼金': rent, '入居状況': '入居中' if occupied else '空室', '有効': 1,
+            })
+            room_rents.append((property_id, occupied))
+    room_ids = _insert(db, THeya, room_rows)
+
+    person_ids = _insert(db, TNyukyosha, [
+        {
+            'tenant_id': tenant_id, '氏名': f'{rng.choice(_SURNAMES)} {rng.choice(_GIVEN_NAMES)}',
+            '電話番号': f'090-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}', '有効': 1,
+        }
+        for _ in room_ids
+    ])
+
+    contract_rows = []
+    for room_id, person_id, room, (_, occupied) in zip(room_ids, person_ids, room_rows, room_rents):
+        if occupied:
+            start = as_of - timedelta(days=rng.randint(30, 6 * 365))
+            contract_rows.append({
+                'room_id': room_id, 'tenant_person_id': person_id, '契約開始日': start,
+                '契約終了日': _contract_end(start, as_of), '月額賃料': room['賃料'], '月額管理費': room['管理費'],
+                '敷金': room['敷金'], '礼金': room['礼金'], '契約状況': '契約中',
+            })
+        else:
+            # 空室は1年以内に終了した前の契約を持つ
+            end = as_of - timedelta(days=rng.randint(10, 365))
+            contract_rows.append({
+                'room_id': room_id, 'tenant_person_id': person_id, '契約開始日': end - relativedelta(years=2),
+                '契約終了日': end, '月額賃料': room['賃料'], '月額管理費': room['管理費'],
+                '敷金': room['敷金'], '礼金': room['礼金'], '契約状況': '契約終了',
+            })
+    contract_ids = _insert(db, TKeiyaku, contract_rows)
+
+    # ---- 家賃収支（直近 ledger_months か月） ----
+    first_month = date(as_of.year, as_of.month, 1) - relativedelta(months=ledger_months - 1)
+    ledger_rows = []
+    for contract_id, contract in zip(contract_ids, contract_rows):
+        for m in range(ledger_months):
+            month = first_month + relativedelta(months=m)
+            if month < contract['契約開始日'].replace(day=1) or month > contract['契約終了日']:
+                continue
+            paid = month < first_month + relativedelta(months=ledger_months - 1) or rng.random() < PAID_RATIO
+            ledger_rows.append({
+                'contract_id': contract_id, '対象年月': month.strftime('%Y-%m'),
+                '賃料': contract['月額賃料'], '管理費': contract['月額管理費'],
+                '入金日': month - timedelta(days=rng.randint(1, 5)) if paid else None,
+                '入金状況': '入金済' if paid else '未入金',
+            })
+    _insert_rows(db, TYachinShushi, ledger_rows)
+
+    # ---- 物件経費（毎月の管理費と、年1回の税金・保険・修繕） ----
+    expense_rows = []
+    for property_id, property_row in zip(property_ids, property_rows):
+        for m in range(ledger_months):
+            month = first_month + relativedelta(months=m)
+            expense_rows.append({
+                '物件id': property_id, '経費名': '管理委託料', '経費カテゴリ': '管理費',
+                '金額': Decimal(rng.randrange(30000, 90000, 1000)), '発生日': month + timedelta(days=24),
+                '支払方法': '振込',
+            })
+        for category, name, rate in (('税金', '固定資産税', '0.012'), ('保険', '火災保険料', '0.001'),
+                                     ('修繕費', '共用部修繕', '0.004')):
+            expense_rows.append({
+                '物件id': property_id, '経費名': name, '経費カテゴリ': category,
+                '金額': (property_row['取得価額'] * Decimal(rate)).quantize(Decimal('1')),
+                '発生日': first_month + timedelta(days=rng.randint(0, 28 * ledger_months - 1)), '支払方法': '振込',
+            })
+    _insert_rows(db, TBukkenKeihi, expense_rows)
+
+    # ---- シミュレーション（テナント全体: 月次・詳細ローン、物件ごと: 年次・簡易ローン） ----
+    total_cost = sum(row['取得価額'] for row in property_rows)
+    simulation_rows = [_simulation_row(tenant_id, 'ポートフォリオ全体', None, 2, 2, as_of.year,
+                                       (total_cost * Decimal('0.8')).quantize(Decimal('1')), total_cost)]
+    for property_id, property_row in list(zip(property_ids, property_rows))[:PROPERTY_SIMULATIONS]:
+        simulation_rows.append(_simulation_row(tenant_id, property_row['物件名'], property_id, 1, 1, as_of.year,
+                                               (property_row['取得価額'] * Decimal('0.8')).quantize(Decimal('1')),
+                                               property_row['取得価額']))
+    simulation_ids = _insert(db, TSimulation, simulation_rows)
+
+    loan_condition = {
+        'シミュレーションid': simulation_ids[0], '借入日': date(as_of.year, 1, 10), '返済日': 27,
+        '返済開始年月': f'{as_of.year}-02', '据置期間終了年月': None, '初回利息支払方法': 1,
+    }
+    _insert_rows(db, TLoanCondition, [loan_condition])
+    _insert_rows(db, TLoanInterestSchedule, [{
+        'シミュレーションid': simulation_ids[0], '開始年月': loan_condition['返済開始年月'], '終了年月': None,
+        '金利': simulation_rows[0]['ローン金利'], '備考': '初期金利',
+    }])
+
+    return {
+        'id': tenant_id,
+        'login_id': login_id,
+        'property_ids': property_ids,
+        'simulation_ids': simulation_ids,
+        'edit_forms': {
+            str(simulation_id): _edit_form(row, loan_condition if index == 0 else None)
+            for index, (simulation_id, row) in enumerate(zip(simulation_ids, simulation_rows))
+        },
+        '_account': account,
+    }
+
+
+def _login_fallback_in_use() -> bool:
+    """ログイン画面（get_db()）がSQLAlchemyとは別のSQLiteファイルを使うか"""
+    from app.utils.db import get_db
+
+    conn = get_db()
+    try:
+        return isinstance(conn, sqlite3.Connection)
+    finally:
+        conn.close()
+
+
+def _write_login_fallback(accounts: list) -> None:
+    """
+    get_db() がSQLiteにフォールバックする環境では、ログイン画面が読む database/login_auth.db にも
+    同じ管理者を作成する（DATABASE_URL がPostgreSQLなら同じDBを読むため不要）
+    """
+    os.makedirs(os.path.dirname(LOGIN_FALLBACK_PATH), exist_ok=True)
+    engine = create_engine(f'sqlite:///{LOGIN_FALLBACK_PATH}', future=True)
+    try:
+        TKanrisha.__table__.create(engine, checkfirst=True)
+        with engine.begin() as connection:
+            connection.execute(delete(TKanrisha.__table__).where(TKanrisha.login_id.like(f'{SLUG_PREFIX}%')))
+            connection.execute(insert(TKanrisha.__table__), accounts)
+    finally:
+        engine.dispose()
+
+
+def seed_portfolio(db, tenants: int = 5, properties: int = 20, rooms: int = 10, ledger_months: int = 12,
+                   seed: int = DEFAULT_SEED, password: str = DEFAULT_PASSWORD, as_of=None,
+                   calculate: bool = True, progress=None) -> dict:
+    """
+    合成ポートフォリオを作成
+
+    Parameters:
+    - db: SQLAlchemyセッション（この関数でcommit）
+    - tenants / properties / rooms: テナント数・テナントごとの物件数・物件ごとの部屋数
+    - ledger_months: 家賃収支・物件経費を作成する月数（as_of の月まで）
+    - seed: 乱数のシード（同じ値・件数なら同じデータになる）
+    - password: 作成する管理者のパスワード
+    - as_of: 基準日（契約・家賃収支の日付の基準、省略時は今日）
+    - calculate: 作成したシミュレーションを計算しておくか
+    - progress: 進捗を表示する関数 progress(メッセージ)
+
+    Returns:
+    - dict: manifest（テナントごとのログインID・物件ID・シミュレーションID・編集画面の送信内容）
+
+    Raises:
+    - ValueError: 負荷試験用のテナントが作成済みの場合
+    """
+    from werkzeug.security import generate_password_hash
+    from app.utils.property_summary import rebuild_property_summaries
+    from app.utils.global_search import rebuild_search_index
+    from app.utils.occupancy_history import rebuild_occupancy_history
+
+    as_of = as_of or date.today()
+    progress = progress or (lambda message: None)
+    if db.execute(select(TTenant.id).where(TTenant.slug.like(f'{SLUG_PREFIX}%')).limit(1)).first():
+        raise ValueError('負荷試験用のテナントが作成済みです。空のデータベースを指定してください')
+
+    rng = random.Random(seed)
+    # パスワードのハッシュ化は遅いため全員で同じハッシュを使う
+    password_hash = generate_password_hash(password)
+    system_admin = {
+        'login_id': SYSTEM_ADMIN_LOGIN_ID, 'name': '負荷試験システム管理者',
+        'email': f'{SYSTEM_ADMIN_LOGIN_ID}@loadtest.example.com', 'password_hash': password_hash,
+        'role': 'system_admin', 'tenant_id': None, 'active': 1, 'is_owner': 0,
+    }
+    _insert(db, TKanrisha, [system_admin])
+
+    tenant_entries = []
+    for number in range(1, tenants + 1):
+        entry = _seed_tenant(db, rng, number, properties, rooms, ledger_months, as_of, password_hash)
+        rebuild_property_summaries(db, entry['id'])
+        rebuild_search_index(db, entry['id'])
+        rebuild_occupancy_history(db, entry['id'], until=as_of)
+        db.commit()
+        tenant_entries.append(entry)
+        progress(f"テナント {number}/{tenants} を作成しました（物件{properties}件 × 部屋{rooms}件）")
+
+    accounts = [system_admin] + [entry.pop('_account') for entry in tenant_entries]
+    if _login_fallback_in_use():
+        _write_login_fallback(accounts)
+        progress(f'ログイン用の管理者を {LOGIN_FALLBACK_PATH} にも作成しました')
+
+    if calculate:
+        calculate_simulations(db, [sid for entry in tenant_entries for sid in entry['simulation_ids']])
+        progress('シミュレーションを計算しました')
+
+    return {
+        'seed': seed,
+        'as_of': as_of.isoformat(),
+        'password': password,
+        'counts': {'tenants': tenants, 'properties': properties, 'rooms': rooms, 'ledger_months': ledger_months},
+        'system_admin': {'login_id': SYSTEM_ADMIN_LOGIN_ID},
+        'tenants': tenant_entries,
+    }
+
+
+def calculate_simulations(db, simulation_ids: list) -> None:
+    """作成したシミュレーションを計算（詳細画面に結果を表示できるようにする）"""
+    from app.blueprints.property import calculate_simulation
+
+    for simulation_id in simulation_ids:
+        simulation = db.get(TSimulation, simulation_id)
+        calculate_simulation(simulation, db)
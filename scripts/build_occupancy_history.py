@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+月次稼働の再集計（夜間バッチ）
+
+契約の開始日・終了日から T_月次稼働 を作り直します。契約の登録・変更時は部屋ごとに自動で更新されますが、
+終了日のない契約を当月まで延ばすため、月に1回以上（夜間バッチなど）実行してください。
+
+使い方:
+    python scripts/build_occupancy_history.py              # 全テナント
+    python scripts/build_occupancy_history.py --tenant 3   # テナント3のみ
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db import SessionLocal
+from app.utils.occupancy_history import rebuild_occupancy_history
+
+
+def main():
+    parser = argparse.ArgumentParser(description='月次稼働の再集計')
+    parser.add_argument('--tenant', type=int, default=None, help='対象のテナントID（省略時は全テナント）')
+    parser.add_argument('--until', type=date.fromisoformat, default=None, help='集計する最後の日（YYYY-MM-DD、省略時は今日）')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        count = rebuild_occupancy_history(db, tenant_id=args.tenant, until=args.until)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print(f"✅ 月次稼働を再集計しました: {count:,}件（{time.perf_counter() - started:.1f}秒）")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+ジョブワーカー
+
+T_ジョブ に登録された再計算・一括処理を取り出して実行します（Procfile の worker プロセス）。
+複数のワーカーを同時に起動しても、同じジョブが二重に実行されることはありません（PostgreSQL）。
+
+使い方:
+    python scripts/job_worker.py                    # 常駐してジョブを実行
+    python scripts/job_worker.py --once             # 実行できるジョブを実行したら終了
+    python scripts/job_worker.py --kind 減価償却計算  # 指定した種別のみ実行
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.logging import setup_logging
+from app.utils.job_queue import JOB_POLL_INTERVAL, JOB_HANDLERS, work
+from app.utils import job_handlers  # noqa: F401  処理関数を登録
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ジョブワーカー')
+    parser.add_argument('--once', action='store_true', help='実行できるジョブを実行したら終了')
+    parser.add_argument('--poll', type=float, default=JOB_POLL_INTERVAL, help='ジョブがない場合の待ち時間（秒）')
+    parser.add_argument('--kind', action='append', choices=sorted(JOB_HANDLERS), help='実行するジョブ種別（複数指定可）')
+    args = parser.parse_args()
+
+    setup_logging(debug=os.getenv('DEBUG', '1') in ('1', 'true', 'True'))
+    try:
+        work(poll_interval=args.poll, kinds=args.kind, once=args.once)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+契約満了スキャン（夜間バッチ）
+
+全テナントの契約について、契約終了日を過ぎた契約の終了・部屋の入居状況の更新・
+満了が近い契約の更新タスク作成を行い、テナントごとのダイジェストを出力します。
+
+使い方:
+    python scripts/scan_contracts.py                 # 今日を基準に90日以内の満了を対象
+    python scripts/scan_contracts.py --days 60       # 60日以内
+    python scripts/scan_contracts.py --tenant 3      # テナント3のみ
+    python scripts/scan_contracts.py --date 2025-04-01 --json
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.db import SessionLocal
+from app.utils.contract_lifecycle import RENEWAL_NOTICE_DAYS, run_contract_scan, format_digest
+from app.utils.list_api import json_value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='契約満了スキャン')
+    parser.add_argument('--days', type=int, default=RENEWAL_NOTICE_DAYS, help='満了の何日前から更新タスクを作成するか')
+    parser.add_argument('--tenant', type=int, default=None, help='対象のテナントID（省略時は全テナント）')
+    parser.add_argument('--date', type=date.fromisoformat, default=None, help='基準日（YYYY-MM-DD、省略時は今日）')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        result = run_contract_scan(db, today=args.date, days=args.days, tenant_id=args.tenant)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if args.json:
+        digests = [
+            dict(digest, 更新期限間近=[{k: json_value(v) for k, v in item.items()} for item in digest['更新期限間近']],
+                 月額賃料合計=json_value(digest['月額賃料合計']))
+            for digest in result['digests'].values()
+        ]
+        print(json.dumps(dict(result, date=result['date'].isoformat(), digests=digests), ensure_ascii=False))
+        return
+
+    print(f"✅ 契約満了スキャン完了（{result['date']}）: 満了 {result['expired']}件 / 空室化 {result['vacated']}部屋 / "
+          f"入居中化 {result['occupied']}部屋 / 更新タスク作成 {result['tasks_created']}件")
+    for digest in result['digests'].values():
+        print(format_digest(digest))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+計算カーネルのベンチマーク用の設定
+
+pytest-benchmark がインストールされていればその benchmark フィクスチャを使い（比較は --benchmark-compare）、
+ない場合は同じ呼び出し方の簡易版（ラウンドごとの時間を測って中央値などを集計）と下記の基準値比較を使う。各ベンチマークは計算結果をゴールデン値
+（golden.json）と照合し、最適化の前後で結果が1円単位まで同じであることを確認する。
+
+使い方:
+    pytest tests/benchmarks                          # ゴールデン値の照合と計測
+    pytest tests/benchmarks --golden-update          # ゴールデン値を作り直す（計算結果を意図して変えた場合のみ）
+    pytest tests/benchmarks --baseline-save          # 今回の計測値を基準値として保存（.benchmarks/kernels.json）
+    pytest tests/benchmarks --fail-on-regression     # 基準値より閾値（--regression-threshold、既定25%）以上遅いと失敗
+
+データベースは tests/conftest.py で設定した一時ディレクトリのSQLiteを使います（TEST_DATABASE_URL で変更可）。
+"""
+import hashlib
+import json
+import os
+import random
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    import pytest_benchmark  # noqa: F401
+except ImportError:
+    pytest_benchmark = None
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(BENCHMARK_DIR, 'golden.json')
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, '..', '..', '.benchmarks', 'kernels.json')
+
+# 簡易版: 最低ラウンド数と、最低ラウンド数を超えて計測を続ける時間（秒）・最大ラウンド数
+MIN_ROUNDS = 3
+MIN_TIME = 0.5
+MAX_ROUNDS = 200
+
+_results = {}
+
+
+# ---- ゴールデン値 ----
+
+def canonical(value):
+    """比較・保存用にDecimal・日付を文字列にし、タプルをリストにする"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    return value
+
+
+def digest(value) -> str:
+    """計算結果全体のハッシュ（大きな結果はハッシュと代表値をゴールデン値にする）"""
+    return hashlib.sha256(json.dumps(canonical(value), ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+@pytest.fixture(scope='session')
+def golden(request):
+    """golden(名前, 値): 値をゴールデン値と照合（--golden-update の場合は保存）"""
+    update = request.config.getoption('--golden-update')
+    data = {}
+    if os.path.exists(GOLDEN_PATH):
+        with open(GOLDEN_PATH, encoding='utf-8') as f:
+            data = json.load(f)
+
+    def check(name, value):
+        value = canonical(value)
+        if update:
+            data[name] = value
+            return
+        assert name in data, f'ゴールデン値 {name} がありません（--golden-update で作成してください）'
+        assert value == data[name], f'{name} の計算結果がゴールデン値と一致しません'
+
+    yield check
+
+    if update:
+        with open(GOLDEN_PATH, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+            f.write('\n')
+
+
+# ---- 簡易版 benchmark フィクスチャ ----
+
+class SimpleBenchmark:
+    """pytest-benchmark の benchmark(func, *args) / benchmark.pedantic(...) と同じ呼び出し方の計測"""
+
+    def __init__(self, name):
+        self.name = name
+        self.stats = None
+
+    def __call__(self, func, *args, **kwargs):
+        return self._run(func, args, kwargs, None, None, 1)
+
+    def pedantic(self, target, args=(), kwargs=None, setup=None, rounds=None, iterations=1, warmup_rounds=0):
+        for _ in range(warmup_rounds):
+            self._call(target, args, kwargs or {}, setup)
+        return self._run(target, args, kwargs or {}, setup, rounds, iterations)
+
+    @staticmethod
+    def _call(target, args, kwargs, setup):
+        if setup is not None:
+            prepared = setup()
+            if prepared is not None:
+                args, kwargs = prepared
+        return target(*args, **kwargs)
+
+    def _run(self, target, args, kwargs, setup, rounds, iterations):
+        timings = []
+        started = time.perf_counter()
+        while True:
+            if setup is not None:
+                prepared = setup()
+                if prepared is not None:
+                    args, kwargs = prepared
+            round_started = time.perf_counter()
+            for _ in range(iterations):
+                result = target(*args, **kwargs)
+            timings.append((time.perf_counter() - round_started) / iterations)
+            if rounds is not None:
+                if len(timings) >= rounds:
+                    break
+            elif len(timings) >= MAX_ROUNDS or (
+                    len(timings) >= MIN_ROUNDS and time.perf_counter() - started >= MIN_TIME):
+                break
+
+        self.stats = {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.mean(timings),
+            'rounds': len(timings),
+        }
+        _results[self.name] = self.stats
+        return result
+
+
+if pytest_benchmark is None:
+    @pytest.fixture
+    def benchmark(request):
+        return SimpleBenchmark(request.node.name)
+
+
+# ---- 代表的な入力 ----
+
+START_YEAR = 2025
+PERIOD_YEARS = 35
+PORTFOLIO_PROPERTIES = 20
+PORTFOLIO_ROOMS_PER_PROPERTY = 50
+
+
+@pytest.fixture(scope='session')
+def loan_terms():
+    """420か月（35年）のローン: 1年3か月の据置期間と3段階の金利変更"""
+    return {
+        'loan_amount': Decimal('480000000'),
+        'loan_start_date': date(2025, 1, 20),
+        'payment_day': 27,
+        'payment_start_ym': '2025-03',
+        'grace_period_end_ym': '2026-06',
+        'first_interest_payment_method': 1,
+        'interest_schedules': [
+            {'開始年月': '2025-01', '終了年月': '2029-12', '金利': Decimal('0.875')},
+            {'開始年月': '2030-01', '終了年月': '2039-12', '金利': Decimal('1.450')},
+            {'開始年月': '2040-01', '終了年月': None, '金利': Decimal('2.100')},
+        ],
+        'repayment_method': '元利均等',
+        'repayment_period_years': 35,
+    }
+
+
+@pytest.fixture(scope='session')
+def simulation_inputs():
+    """35年のシミュレーション条件（TSimulation と同じ属性を持つオブジェクト）"""
+    return SimpleNamespace(
+        開始年度=START_YEAR, 期間=PERIOD_YEARS, 稼働率=Decimal('93.50'),
+        管理費率=Decimal('5.00'), 修繕費率=Decimal('7.00'), 経費上昇率=Decimal('1.20'),
+        固定資産税=Decimal('3200000'), 損害保険料=Decimal('450000'),
+        その他収入=Decimal('1200000'), その他経費=Decimal('600000'), その他所得=Decimal('8000000'),
+        減価償却費=Decimal('0'), 税率=None,
+        ローン残高=Decimal('480000000'), ローン金利=Decimal('1.45'), ローン年間返済額=Decimal('17500000'),
+        借入金額=Decimal('480000000'), 返済期間_年=35, 返済方法='元利均等',
+        建物_取得価額=Decimal('420000000'), 建物_耐用年数=47, 建物_償却方法='定額法', 建物_残存価額=Decimal('0'),
+        付属設備_取得価額=Decimal('90000000'), 付属設備_耐用年数=15, 付属設備_償却方法='定率法', 付属設備_残存価額=Decimal('0'),
+        構築物_取得価額=Decimal('30000000'), 構築物_耐用年数=20, 構築物_償却方法='定額法', 構築物_残存価額=Decimal('0'),
+    )
+
+
+def _room_rent(rng) -> Decimal:
+    return Decimal(rng.randrange(52000, 128000, 500))
+
+
+def _contract_period(rng):
+    """契約期間（開始日, 終了日 or None）。開始は2019〜2027年、約2割は終了日なし"""
+    start = date(rng.randint(2019, 2027), rng.randint(1, 12), rng.randint(1, 28))
+    if rng.random() < 0.2:
+        return start, None
+    years = rng.choice([2, 2, 2, 3, 4])
+    return start, date(start.year + years, start.month, max(start.day - 1, 1))
+
+
+@pytest.fixture(scope='session')
+def portfolio_contracts():
+    """1000部屋分の契約（build_monthly_rent の契約リスト）と全部屋の月額賃料合計"""
+    rng = random.Random(20250101)
+    contracts = []
+    total_room_rent = Decimal('0')
+    for _ in range(PORTFOLIO_PROPERTIES * PORTFOLIO_ROOMS_PER_PROPERTY):
+        room_rent = _room_rent(rng)
+        total_room_rent += room_rent
+        start, end = _contract_period(rng)
+        contracts.append((room_rent, start, end, room_rent - Decimal(rng.randrange(0, 5000, 500))))
+    return total_room_rent, contracts
+
+
+# ---- 基準値との比較 ----
+
+def _load_baseline() -> dict:
+    try:
+        with open(BASELINE_PATH, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _regressions(config, baseline: dict) -> list:
+    """基準値より --regression-threshold 以上遅いベンチマークの名前"""
+    threshold = config.getoption('--regression-threshold')
+    return [
+        name for name, stats in _results.items()
+        if baseline.get(name, {}).get('median') and stats['median'] > baseline[name]['median'] * (1 + threshold)
+    ]
+
+
+def pytest_sessionfinish(session, exitstatus):
+    # 終了コードは結果表示（pytest_terminal_summary）より前に決まるため、ここで判定する
+    if session.config.getoption('--fail-on-regression') and exitstatus == 0 \
+            and _regressions(session.config, _load_baseline()):
+        session.exitstatus = 1
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    if not _results:
+        return
+    threshold = config.getoption('--regression-threshold')
+    baseline = _load_baseline()
+    regressions = _regressions(config, baseline)
+
+    terminalreporter.section('kernel benchmarks')
+    terminalreporter.write_line(f"{'name':<48} {'median(ms)':>11} {'min(ms)':>9} {'rounds':>6} {'baseline(ms)':>12} {'ratio':>6}")
+    for name, stats in sorted(_results.items()):
+        base = baseline.get(name, {}).get('median')
+        ratio = stats['median'] / base if base else None
+        mark = '  << 遅くなっています' if name in regressions else ''
+        terminalreporter.write_line(
+            f"{name:<48} {stats['median'] * 1000:>11.3f} {stats['min'] * 1000:>9.3f} {stats['rounds']:>6} "
+            f"{(f'{base * 1000:.3f}' if base else '-'):>12} {(f'{ratio:.2f}' if ratio else '-'):>6}{mark}"
+        )
+    if regressions:
+        terminalreporter.write_line(f'基準値より{threshold:.0%}以上遅いベンチマーク: {len(regressions)}件')
+
+    if config.getoption('--baseline-save'):
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(dict(baseline, **_results), f, ensure_ascii=False, indent=1, sort_keys=True)
+        terminalreporter.write_line(f'基準値を保存しました: {os.path.normpath(BASELINE_PATH)}')
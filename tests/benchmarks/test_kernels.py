@@ -0,0 +1,96 @@
+"""
+データベースに依存しない計算カーネルのベンチマーク
+（ローン・税金・耐用年数・年度別/月次シミュレーション）
+"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.loan_calculator import calculate_detailed_loan_payment
+from app.utils.simulation_kernel import calculate_loan_payment, calculate_progressive_tax, run_simulation_kernel
+from app.utils.simulation_monthly import run_monthly_simulation
+from app.utils.useful_life_calculator import LEGAL_USEFUL_LIFE, calculate_useful_life
+
+from conftest import START_YEAR, PERIOD_YEARS, digest
+
+pytestmark = pytest.mark.benchmark
+
+
+def _loan_payments():
+    results = []
+    for principal in (10000000, 85000000, 300000000, 480000000):
+        for rate in ('0', '0.6', '1.45', '2.875', '4.5'):
+            for years in (10, 25, 35):
+                for method in ('元利均等', '元金均等'):
+                    results.append(calculate_loan_payment(principal, rate, years, method))
+    return results
+
+
+def test_calculate_loan_payment(benchmark, golden):
+    results = benchmark(_loan_payments)
+    golden('calculate_loan_payment', {'count': len(results), 'digest': digest(results), 'last': results[-1]})
+
+
+def _progressive_taxes():
+    # 各税率の境界をまたぐ -500万〜6,000万円
+    return [calculate_progressive_tax(income) for income in range(-5000000, 60000000, 250000)]
+
+
+def test_calculate_progressive_tax(benchmark, golden):
+    results = benchmark(_progressive_taxes)
+    golden('calculate_progressive_tax', {
+        'count': len(results), 'digest': digest(results),
+        '9000000': calculate_progressive_tax(9000000), '45000000': calculate_progressive_tax(45000000),
+    })
+
+
+def _useful_lives():
+    results = []
+    for structure in LEGAL_USEFUL_LIFE:
+        for built_year in range(1960, 2025, 4):
+            for month in (1, 7):
+                results.append(calculate_useful_life(date(built_year, month, 15), date(2025, 4, 1), structure))
+    return results
+
+
+def test_calculate_useful_life(benchmark, golden):
+    results = benchmark(_useful_lives)
+    golden('calculate_useful_life', {'count': len(results), 'digest': digest(results)})
+
+
+def test_detailed_loan_payment_420_months(benchmark, golden, loan_terms):
+    yearly = benchmark(calculate_detailed_loan_payment, **loan_terms, start_year=START_YEAR, period_years=PERIOD_YEARS)
+    golden('detailed_loan_payment_420_months', {
+        'digest': digest(yearly),
+        'first_year': yearly[START_YEAR],
+        'final_year': yearly[START_YEAR + PERIOD_YEARS - 1],
+        'total_interest': sum(row['利息'] for row in yearly.values()),
+    })
+
+
+def test_run_simulation_kernel_35_years(benchmark, golden, simulation_inputs, loan_terms):
+    loan_yearly_data = calculate_detailed_loan_payment(**loan_terms, start_year=START_YEAR, period_years=PERIOD_YEARS)
+    rows = benchmark(run_simulation_kernel, simulation_inputs, Decimal('98400000'), loan_yearly_data)
+    golden('run_simulation_kernel_35_years', {'digest': digest(rows), 'final_year': rows[-1]})
+
+
+def test_run_monthly_simulation_1000_rooms(benchmark, golden, simulation_inputs, loan_terms, portfolio_contracts):
+    total_room_rent, contracts = portfolio_contracts
+    loan_condition = SimpleNamespace(
+        借入日=loan_terms['loan_start_date'], 返済日=loan_terms['payment_day'],
+        返済開始年月=loan_terms['payment_start_ym'], 据置期間終了年月=loan_terms['grace_period_end_ym'],
+        初回利息支払方法=loan_terms['first_interest_payment_method'],
+    )
+    interest_schedules = [SimpleNamespace(**schedule) for schedule in loan_terms['interest_schedules']]
+
+    monthly_rows, yearly_rows = benchmark(
+        run_monthly_simulation, simulation_inputs, total_room_rent, contracts, loan_condition, interest_schedules
+    )
+    golden('run_monthly_simulation_1000_rooms', {
+        'months': len(monthly_rows),
+        'monthly_digest': digest(monthly_rows),
+        'yearly_digest': digest(yearly_rows),
+        'final_year': yearly_rows[-1],
+    })
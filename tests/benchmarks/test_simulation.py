@@ -0,0 +1,133 @@
+"""
+calculate_simulation（入力の読み込み・計算・結果の保存）のベンチマーク
+1000部屋（20物件×50部屋）のポートフォリオ全体を対象に、詳細モードのローンで35年間を計算する
+"""
+import random
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.blueprints.property import calculate_simulation
+from app.db import SessionLocal
+from app.models_login import TTenant
+from app.models_property import (
+    TBukken, THeya, TNyukyosha, TKeiyaku, TSimulation, TSimulationResult, TSimulationSummary,
+    TLoanCondition, TLoanInterestSchedule,
+)
+from app.utils.property_summary import rebuild_property_summaries
+
+from conftest import START_YEAR, PERIOD_YEARS, PORTFOLIO_PROPERTIES, PORTFOLIO_ROOMS_PER_PROPERTY, \
+    _room_rent, _contract_period, digest
+
+pytestmark = pytest.mark.benchmark
+
+SUMMARY_COLUMNS = ['投資総額', '自己資金', 'IRR', 'NPV', 'キャップレート', '最小DSCR', '平均DSCR',
+                   '投資回収年度', '自己資金倍率', '累積キャッシュフロー']
+
+
+@pytest.fixture(scope='module')
+def portfolio(simulation_inputs, loan_terms):
+    """
+    ベンチマーク用テナントに1000部屋のポートフォリオと、月次・年次のシミュレーションを作成
+
+    Returns:
+    - dict: {'tenant_id', 'monthly': シミュレーションid, 'yearly': シミュレーションid}
+    """
+    rng = random.Random(20250101)
+    db = SessionLocal()
+    try:
+        tenant = TTenant(名称='ベンチマーク', slug=f'benchmark-{rng.getrandbits(32):08x}')
+        db.add(tenant)
+        db.flush()
+
+        for p in range(PORTFOLIO_PROPERTIES):
+            property_data = TBukken(
+                tenant_id=tenant.id, 物件名=f'ベンチマーク物件{p + 1:02d}', 構造='RC造',
+                部屋数=PORTFOLIO_ROOMS_PER_PROPERTY, 取得価額=27000000, 取得年月日=date(2024, 4, 1),
+            )
+            db.add(property_data)
+            db.flush()
+            for r in range(PORTFOLIO_ROOMS_PER_PROPERTY):
+                room_rent = _room_rent(rng)
+                start, end = _contract_period(rng)
+                room = THeya(property_id=property_data.id, 部屋番号=f'{r // 10 + 1}{r % 10 + 1:02d}',
+                             賃料=room_rent, 入居状況='入居中')
+                person = TNyukyosha(tenant_id=tenant.id, 氏名=f'入居者{p + 1:02d}-{r + 1:02d}')
+                db.add_all([room, person])
+                db.flush()
+                db.add(TKeiyaku(room_id=room.id, tenant_person_id=person.id, 契約開始日=start, 契約終了日=end,
+                                月額賃料=room_rent - rng.randrange(0, 5000, 500)))
+        db.flush()
+        rebuild_property_summaries(db, tenant.id)
+
+        simulation_ids = {}
+        for key, granularity in (('monthly', 2), ('yearly', 1)):
+            simulation = TSimulation(
+                tenant_id=tenant.id, 名称=f'ベンチマーク（{key}）', シミュレーション種別='物件ベース',
+                ローン計算モード=2, 計算粒度=granularity, 割引率=3,
+                **vars(simulation_inputs),
+            )
+            db.add(simulation)
+            db.flush()
+            db.add(TLoanCondition(
+                シミュレーションid=simulation.id, 借入日=loan_terms['loan_start_date'],
+                返済日=loan_terms['payment_day'], 返済開始年月=loan_terms['payment_start_ym'],
+                据置期間終了年月=loan_terms['grace_period_end_ym'],
+                初回利息支払方法=loan_terms['first_interest_payment_method'],
+            ))
+            db.add_all([
+                TLoanInterestSchedule(シミュレーションid=simulation.id, **schedule)
+                for schedule in loan_terms['interest_schedules']
+            ])
+            simulation_ids[key] = simulation.id
+        db.commit()
+        return dict(simulation_ids, tenant_id=tenant.id)
+    finally:
+        db.close()
+
+
+def _run_calculation(simulation_id):
+    """入力ハッシュを消して毎回計算させる（結果の再利用を避ける）"""
+    db = SessionLocal()
+    try:
+        simulation = db.get(TSimulation, simulation_id)
+        simulation.入力ハッシュ = None
+        db.commit()
+        assert calculate_simulation(simulation, db)
+    finally:
+        db.close()
+
+
+def _saved_results(simulation_id) -> dict:
+    db = SessionLocal()
+    try:
+        results = db.execute(
+            select(TSimulationResult).where(TSimulationResult.シミュレーションid == simulation_id)
+            .order_by(TSimulationResult.年度)
+        ).scalars().all()
+        summary = db.execute(
+            select(TSimulationSummary).where(TSimulationSummary.シミュレーションid == simulation_id)
+        ).scalar_one()
+        columns = [c.key for c in TSimulationResult.__table__.columns
+                   if c.key not in ('id', 'シミュレーションid', 'created_at')]
+        rows = [{column: getattr(result, column) for column in columns} for result in results]
+        return {
+            'years': len(rows),
+            'digest': digest(rows),
+            'final_year': rows[-1],
+            'summary': {column: getattr(summary, column) for column in SUMMARY_COLUMNS},
+        }
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize('granularity', ['monthly', 'yearly'])
+def test_calculate_simulation_1000_rooms(benchmark, golden, portfolio, granularity):
+    simulation_id = portfolio[granularity]
+    benchmark.pedantic(_run_calculation, args=(simulation_id,), rounds=5, warmup_rounds=1)
+
+    saved = _saved_results(simulation_id)
+    assert saved['years'] == PERIOD_YEARS
+    assert saved['final_year']['年度'] == START_YEAR + PERIOD_YEARS - 1
+    golden(f'calculate_simulation_1000_rooms[{granularity}]', saved)
@@ -0,0 +1,20 @@
+"""
+テスト全体の設定
+（pytest は起動時に testpaths 直下の conftest.py しか読まないため、コマンドラインオプションはここで定義する）
+
+データベースは一時ディレクトリのSQLiteを使います（TEST_DATABASE_URL で変更可。DATABASE_URL は使いません）。
+"""
+import os
+import tempfile
+
+# アプリのモジュールを読み込む前に、テスト専用のデータベースを設定する
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or os.getenv('BENCHMARK_DATABASE_URL') or \
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='tests-'), 'tests.db')}"
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('kernel benchmarks')
+    group.addoption('--golden-update', action='store_true', help='ゴールデン値を今回の計算結果で作り直す')
+    group.addoption('--baseline-save', action='store_true', help='今回の計測値を基準値として保存する')
+    group.addoption('--regression-threshold', type=float, default=0.25, help='基準値に対して遅くなったとみなす割合（既定0.25）')
+    group.addoption('--fail-on-regression', action='store_true', help='基準値より閾値以上遅いベンチマークがあれば失敗にする')
@@ -0,0 +1,111 @@
+"""
+ジョブキュー
+progress を呼ばない処理関数でもハートビートが更新され、停止したジョブとして待機に戻されないこと、
+添付ファイルが引数・job_dict に含まれず、ジョブの終了時に削除されることを確認する
+"""
+import time
+
+from sqlalchemy import select
+
+from app.db import SessionLocal, engine
+from app.models_property import TJob, TJobFile
+from app.utils import job_queue
+
+
+def test_heartbeat_is_updated_while_handler_runs(monkeypatch):
+    beats = []
+
+    def silent_handler(db, job, payload, progress):
+        # progress を呼ばずに時間のかかる処理
+        for _ in range(3):
+            time.sleep(0.2)
+            with engine.connect() as connection:
+                beats.append(connection.execute(
+                    select(TJob.ハートビート日時).where(TJob.id == job.id)
+                ).scalar_one())
+        return {'件数': len(beats)}
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, 'テスト_ハートビート', silent_handler)
+    monkeypatch.setattr(job_queue, 'JOB_HEARTBEAT_INTERVAL', 0.05)
+
+    db = SessionLocal()
+    try:
+        job = job_queue.enqueue_job(db, 'テスト_ハートビート')
+        db.commit()
+        assert job_queue.claim_job(db, job.id, 'test-worker')
+        job_id = job.id
+    finally:
+        db.close()
+
+    assert job_queue.run_job(job_id) == '完了'
+    assert beats[0] < beats[-1]
+
+    db = SessionLocal()
+    try:
+        assert job_queue.requeue_stale_jobs(db, timeout=60) == 0
+        job = db.get(TJob, job_id)
+        assert job.状況 == '完了'
+        finished_beat = job.ハートビート日時
+    finally:
+        db.close()
+
+    # 完了後はハートビートを更新しない
+    time.sleep(0.2)
+    db = SessionLocal()
+    try:
+        assert db.get(TJob, job_id).ハートビート日時 == finished_beat
+    finally:
+        db.close()
+
+
+def submit_with_file(max_attempts: int) -> int:
+    db = SessionLocal()
+    try:
+        job = job_queue.enqueue_job(db, 'テスト_添付', {'filename': 'rows.csv'}, max_attempts=max_attempts,
+                                    file=('rows.csv', b'a,b\n1,2\n'))
+        db.commit()
+        assert 'content' not in job.引数
+        assert job_queue.claim_job(db, job.id, 'test-worker')
+        return job.id
+    finally:
+        db.close()
+
+
+def job_file_count(job_id: int) -> int:
+    with engine.connect() as connection:
+        return len(connection.execute(select(TJobFile.id).where(TJobFile.ジョブid == job_id)).all())
+
+
+def test_job_file_is_removed_when_job_finishes(monkeypatch):
+    def read_file(db, job, payload, progress):
+        filename, content = job_queue.job_file(db, job.id)
+        return {'ファイル名': filename, 'バイト数': len(content)}
+
+    def failing(db, job, payload, progress):
+        job_queue.job_file(db, job.id)
+        raise ValueError('取込に失敗')
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, 'テスト_添付', read_file)
+    job_id = submit_with_file(max_attempts=1)
+    assert job_file_count(job_id) == 1
+    assert job_queue.run_job(job_id) == '完了'
+    assert job_file_count(job_id) == 0
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, 'テスト_添付', failing)
+    # 再試行が残っている間はファイルを残し、最後の試行で失敗したら削除する
+    job_id = submit_with_file(max_attempts=2)
+    assert job_queue.run_job(job_id) == '待機'
+    assert job_file_count(job_id) == 1
+    db = SessionLocal()
+    try:
+        assert job_queue.claim_job(db, job_id, 'test-worker')
+    finally:
+        db.close()
+    assert job_queue.run_job(job_id) == '失敗'
+    assert job_file_count(job_id) == 0
+
+    db = SessionLocal()
+    try:
+        assert job_queue.job_dict(db.get(TJob, job_id))['引数'] == {'filename': 'rows.csv'}
+    finally:
+        db.close()
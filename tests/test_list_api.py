@@ -0,0 +1,128 @@
+"""
+一覧APIのキーセットページング
+SQLiteでは日時が文字列、数値がREALで保存されるため、カーソルの値と保存値の表現が異なっても
+全ページをたどると全件がちょうど1回ずつ返ることを確認する
+"""
+import base64
+import random
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app import create_app
+from app.db import SessionLocal
+from app.models_login import TTenant
+from app.models_property import TBukken, TNyukyosha, TPropertySummary, TSimulation, TSimulationSummary
+from app.utils.list_api import decode_cursor, encode_cursor
+
+ROW_COUNT = 23
+PAGE_SIZE = 5
+
+
+@pytest.fixture(scope='module')
+def tenant_data():
+    """
+    同じ秒に作成した物件・入居者・シミュレーションを持つテナントを作成（同順位・NULL・小数を含む）
+
+    Returns:
+    - dict: {'tenant_id', 'properties': [id], 'tenants': [id], 'simulations': [id]}
+    """
+    rng = random.Random(34)
+    db = SessionLocal()
+    try:
+        tenant = TTenant(名称='一覧API', slug=f'list-api-{rng.getrandbits(32):08x}')
+        db.add(tenant)
+        db.flush()
+
+        property_ids, person_ids, simulation_ids = [], [], []
+        for i in range(ROW_COUNT):
+            property_data = TBukken(tenant_id=tenant.id, 物件名=f'物件{i % 7}',
+                                    取得価額=Decimal(rng.choice([12345678, 23456789, 34567890])),
+                                    取得年月日=date(2024, 4, 1))
+            person = TNyukyosha(tenant_id=tenant.id, 氏名=f'入居者{i % 5}', フリガナ=None if i % 4 == 0 else f'カナ{i % 3}')
+            simulation = TSimulation(tenant_id=tenant.id, 名称=f'シミュレーション{i}', 開始年度=2025, 期間=10)
+            db.add_all([property_data, person, simulation])
+            db.flush()
+            rooms = rng.choice([0, 3, 7])
+            occupied = rng.randint(0, rooms)
+            # アプリ作成後は物件の登録時に集計行が作られるため merge で上書きする
+            db.merge(TPropertySummary(
+                物件id=property_data.id, tenant_id=tenant.id, 部屋数=rooms, 入居中部屋数=occupied, 空室数=rooms - occupied,
+                稼働率=(Decimal(occupied * 100) / rooms).quantize(Decimal('0.01')) if rooms else None,
+            ))
+            if i % 6:
+                db.add(TSimulationSummary(
+                    シミュレーションid=simulation.id,
+                    IRR=Decimal(rng.choice(['4.1234', '5.0700', '-1.3333'])),
+                    NPV=Decimal(rng.choice(['1234567.89', '-98765.43'])),
+                    キャップレート=Decimal(rng.choice(['5.1234', '6.0001'])),
+                    最小DSCR=Decimal(rng.choice(['1.234', '0.987'])) if i % 5 else None,
+                    投資回収年度=rng.choice([None, 12, 15]),
+                    自己資金倍率=Decimal(rng.choice(['1.333', '2.100'])),
+                ))
+            property_ids.append(property_data.id)
+            person_ids.append(person.id)
+            simulation_ids.append(simulation.id)
+        db.commit()
+        return {'tenant_id': tenant.id, 'properties': property_ids, 'tenants': person_ids,
+                'simulations': simulation_ids}
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope='module')
+def client(tenant_data):
+    app = create_app()
+    app.config['TESTING'] = True
+    test_client = app.test_client()
+    with test_client.session_transaction() as flask_session:
+        flask_session['user_id'] = 1
+        flask_session['role'] = 'tenant_admin'
+        flask_session['tenant_id'] = tenant_data['tenant_id']
+    return test_client
+
+
+def walk_pages(client, path: str, sort: str, order: str) -> list:
+    """next_cursor をたどって全ページのIDを返す（ページ数が件数を超えたら失敗）"""
+    ids, cursor = [], None
+    for _ in range(ROW_COUNT + 1):
+        params = {'format': 'json', 'sort': sort, 'order': order, 'limit': PAGE_SIZE}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get(path, query_string=params)
+        assert response.status_code == 200
+        body = response.get_json()
+        ids += [item['id'] for item in body['items']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids
+    pytest.fail(f'{path} sort={sort} order={order}: next_cursor が終わらない')
+
+
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+@pytest.mark.parametrize('path, key, sorts', [
+    ('/property/properties', 'properties', ['created_at', 'name', 'price', 'rooms', 'occupancy', 'vacant']),
+    ('/property/tenants', 'tenants', ['created_at', 'name', 'kana']),
+    ('/property/simulations', 'simulations', ['created_at', 'irr', 'npv', 'cap_rate', 'dscr', 'payback',
+                                              'equity_multiple']),
+])
+def test_keyset_pages_cover_every_row(client, tenant_data, path, key, sorts, order):
+    for sort in sorts:
+        ids = walk_pages(client, path, sort, order)
+        assert sorted(ids) == sorted(tenant_data[key]), f'{path} sort={sort} order={order}'
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(Decimal('4.1234'), 7)) == (Decimal('4.1234'), 7)
+    assert decode_cursor(encode_cursor(None, 3)) == (None, 3)
+    assert decode_cursor('壊れたカーソル') is None
+
+
+@pytest.mark.parametrize('payload', ['[["n","abc"],1]', '[["n","NaN"],1]', '[["n",null],1]', '[["d","2025-13-01"],1]',
+                                     '[["i","x"],1]', '[null,"x"]', '[["n"],1]'])
+def test_crafted_cursor_is_invalid(client, payload):
+    cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+    assert decode_cursor(cursor) is None
+    response = client.get('/property/simulations', query_string={'format': 'json', 'sort': 'irr', 'cursor': cursor})
+    assert response.status_code == 200
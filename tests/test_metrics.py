@@ -0,0 +1,65 @@
+"""
+メトリクスのプロセスごとのファイル
+停止したプロセスのカウンターは集約ファイルに合算してファイルを削除し、
+pid が再利用されても前のプロセスの集計値が上書き・消失しないことを確認する
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.utils import metrics
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv('METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_counters', {})
+    monkeypatch.setattr(metrics, '_histograms', {})
+    monkeypatch.setattr(metrics, '_gauges', {})
+    return tmp_path
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_process_file(directory, pid: int, started_at: int, requests: int, gauge: float) -> None:
+    data = {
+        'pid': pid, 'started_at': started_at,
+        'counters': [['job_runs_total', [], requests]],
+        'histograms': [['simulation_calculation_seconds', [], [0.1, 1.0], [requests, 0], 0.05 * requests, requests]],
+        'gauges': [['db_pool_size', [], gauge]],
+    }
+    (directory / f'metrics_{pid}_{started_at}.json').write_text(json.dumps(data), encoding='utf-8')
+
+
+def test_stopped_process_counters_are_folded(metrics_dir):
+    write_process_file(metrics_dir, dead_pid(), 1000, 3, 5)
+    # 同じ pid の前のプロセス（開始時刻が古い）は稼働中のプロセスと別のファイルに残る
+    write_process_file(metrics_dir, os.getpid(), 1, 4, 7)
+    metrics.inc('job_runs_total', value=2)
+    metrics.set_gauge('db_pool_size', 10)
+    metrics.flush()
+
+    for _ in range(2):
+        counters, histograms, gauges = metrics.collect()
+        assert counters[('job_runs_total', ())] == 9
+        assert histograms[('simulation_calculation_seconds', ())]['count'] == 7
+        assert gauges[('db_pool_size', ())] == 10
+
+    _, started_at = metrics._process_identity()
+    assert {name for name in os.listdir(metrics_dir) if name.endswith('.json')} == {
+        metrics.AGGREGATE_FILENAME, f'metrics_{os.getpid()}_{started_at}.json',
+    }
+
+
+def test_flush_keeps_previous_process_with_same_pid(metrics_dir):
+    write_process_file(metrics_dir, os.getpid(), 1, 4, 7)
+    metrics.inc('job_runs_total')
+    metrics.flush()
+    assert len([name for name in os.listdir(metrics_dir) if name.startswith(f'metrics_{os.getpid()}_')]) == 2
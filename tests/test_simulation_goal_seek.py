@@ -0,0 +1,64 @@
+"""
+シミュレーション逆算（ゴールシーク）
+月次計算のシミュレーションは月次カーネルで評価し、返済のないローンでは借入金額の探索を打ち切ることを確認する
+"""
+from datetime import date
+from decimal import Decimal
+
+from app.models_property import TSimulation
+from app.utils.simulation_goal_seek import GOAL_SEEK_MAX_LOAN_AMOUNT, evaluate_target, goal_seek_simulation
+from app.utils.simulation_kernel import calculate_loan_payment
+from app.utils.simulation_monthly import run_monthly_simulation
+
+TOTAL_RENT = Decimal('24000000')
+
+# 2025年10月まで空室の部屋と、2027年3月に退去する部屋（月次計算では年次計算と家賃収入が変わる）
+CONTRACTS = [
+    (Decimal('100000'), date(2025, 11, 1), None, Decimal('98000')),
+    (Decimal('120000'), date(2020, 4, 1), date(2027, 3, 31), Decimal('120000')),
+]
+
+
+def make_simulation(**overrides) -> TSimulation:
+    values = dict(
+        tenant_id=1, 名称='逆算', 開始年度=2025, 期間=10, 稼働率=Decimal('95.00'),
+        管理費率=Decimal('5.00'), 修繕費率=Decimal('5.00'), 経費上昇率=Decimal('0'),
+        固定資産税=Decimal('1200000'), 損害保険料=Decimal('200000'),
+        その他収入=Decimal('0'), その他経費=Decimal('0'), その他所得=Decimal('0'),
+        減価償却費=Decimal('0'), 税率=None,
+        ローン残高=Decimal('200000000'), ローン金利=Decimal('1.50'), 借入金額=Decimal('200000000'),
+        返済期間_年=30, 返済方法='元利均等', ローン計算モード=1, 計算粒度=1,
+        建物_取得価額=Decimal('180000000'), 建物_耐用年数=47, 建物_償却方法='定額法', 建物_残存価額=Decimal('0'),
+        付属設備_取得価額=Decimal('0'), 付属設備_耐用年数=15, 付属設備_償却方法='定額法', 付属設備_残存価額=Decimal('0'),
+        構築物_取得価額=Decimal('0'), 構築物_耐用年数=20, 構築物_償却方法='定額法', 構築物_残存価額=Decimal('0'),
+    )
+    values.update(overrides)
+    simulation = TSimulation(**values)
+    simulation.ローン年間返済額, _, _ = calculate_loan_payment(
+        simulation.借入金額, simulation.ローン金利, simulation.返済期間_年, simulation.返済方法
+    )
+    return simulation
+
+
+def test_monthly_goal_seek_uses_monthly_kernel():
+    simulation = make_simulation(計算粒度=2)
+    result = goal_seek_simulation(simulation, TOTAL_RENT, '稼働率', target='DSCR',
+                                  monthly=True, contracts=CONTRACTS)
+    assert result['達成可能']
+
+    def monthly_dscr(rate):
+        trial = make_simulation(計算粒度=2, 稼働率=rate)
+        _, yearly_rows = run_monthly_simulation(trial, TOTAL_RENT / 12, CONTRACTS)
+        return evaluate_target(yearly_rows, 'DSCR')
+
+    assert result['目標指標'] == monthly_dscr(result['値'])
+    assert monthly_dscr(result['値']) >= Decimal('1.2')
+    assert monthly_dscr(result['値'] - Decimal('0.01')) < Decimal('1.2')
+
+
+def test_loan_search_stops_when_repayment_never_binds():
+    simulation = make_simulation(ローン金利=Decimal('0'), 返済期間_年=0)
+    result = goal_seek_simulation(simulation, TOTAL_RENT, '借入金額', target='DSCR')
+    assert not result['達成可能']
+    assert result['値'] is None
+    assert result['評価回数'] <= 2 + (GOAL_SEEK_MAX_LOAN_AMOUNT / TOTAL_RENT).log10() / Decimal(2).log10()
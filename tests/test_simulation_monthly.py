@@ -0,0 +1,45 @@
+"""
+月次シミュレーションの契約
+同じ部屋で重なる契約の家賃を二重に計上しないことを確認する
+"""
+from datetime import date
+from decimal import Decimal
+
+from app.utils.simulation_monthly import build_monthly_rent, merge_room_contracts
+
+ROOM_RENT = Decimal('100000')
+
+
+def test_overlapping_contracts_count_rent_once():
+    rows = [
+        # 終了日のない古い契約と、途中から始まる新しい契約（同じ部屋）
+        (1, 10, ROOM_RENT, date(2025, 1, 1), None, Decimal('90000')),
+        (1, 11, ROOM_RENT, date(2025, 7, 1), None, Decimal('95000')),
+        # 別の部屋の契約は影響を受けない
+        (2, 12, ROOM_RENT, date(2025, 1, 1), date(2025, 12, 31), Decimal('80000')),
+    ]
+    contracts = merge_room_contracts(rows)
+    assert sorted(contracts) == sorted([
+        (ROOM_RENT, date(2025, 1, 1), date(2025, 6, 30), Decimal('90000')),
+        (ROOM_RENT, date(2025, 7, 1), None, Decimal('95000')),
+        (ROOM_RENT, date(2025, 1, 1), date(2025, 12, 31), Decimal('80000')),
+    ])
+
+    rents = build_monthly_rent(ROOM_RENT * 2, contracts, 2025, 12, Decimal('0'))
+    assert rents[0] == Decimal('170000')
+    assert rents[11] == Decimal('175000')
+
+
+def test_renewal_and_same_day_contracts():
+    rows = [
+        (1, 20, ROOM_RENT, date(2025, 1, 1), date(2025, 12, 31), Decimal('90000')),
+        (1, 21, ROOM_RENT, date(2026, 1, 1), None, Decimal('92000')),
+        # 同じ開始日の契約は後から登録した契約だけを計上
+        (3, 30, ROOM_RENT, date(2025, 4, 1), None, Decimal('70000')),
+        (3, 31, ROOM_RENT, date(2025, 4, 1), None, Decimal('75000')),
+    ]
+    assert sorted(merge_room_contracts(rows)) == sorted([
+        (ROOM_RENT, date(2025, 1, 1), date(2025, 12, 31), Decimal('90000')),
+        (ROOM_RENT, date(2026, 1, 1), None, Decimal('92000')),
+        (ROOM_RENT, date(2025, 4, 1), None, Decimal('75000')),
+    ])